@@ -0,0 +1,286 @@
+""" Benchmark suite for the preview formatters: wall time, peak memory and output size over a matrix of shapes and dtypes.
+
+    python benchmarks/bench_formatters.py                                     # the full matrix (1D arrays up to 1e8 elements, ~5 GB of RAM)
+    python benchmarks/bench_formatters.py --quick --save benchmarks/baselines/local.json
+    python benchmarks/bench_formatters.py --quick --compare benchmarks/baselines/local.json   # exits with 1 if anything regressed
+    python benchmarks/bench_formatters.py --filter heatmap --filter float32   # only the cases whose name contains every filter
+
+Runs headless: the formatters are called directly, the DataFrame formatter through a (kernel-less) `InteractiveShell`, and matplotlib
+uses the Agg backend. Each case is timed `--repeat` times (the best run is reported), then run once more under `tracemalloc` for its peak
+memory (allocations made while formatting, not the input). The render cache is cleared before every run so nothing is served from it.
+Baselines are machine-specific: save one on the machine (and with the package versions) you compare on.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault('MPLBACKEND', 'Agg') # before anything imports pyplot
+
+import numpy as np
+
+
+BASELINE_VERSION: int = 1
+
+# ==================================================================================================================== #
+# Case Matrix                                                                                                          #
+# ==================================================================================================================== #
+
+ARRAY_SHAPES: Dict[str, Tuple[int, ...]] = {
+    '1d_1e3': (1_000,),
+    '1d_1e6': (1_000_000,),
+    '1d_1e8': (100_000_000,),
+    'square_1e3': (1_000, 1_000),
+    'wide': (100, 100_000),
+    'tall': (100_000, 100),
+    'nd_4d': (20, 30, 40, 50),
+}
+ARRAY_DTYPES: Tuple[str, ...] = ('float64', 'float32', 'int64', 'uint8', 'bool')
+DATAFRAME_ROWS: Dict[str, int] = {'df_1e2': 100, 'df_1e4': 10_000, 'df_1e6': 1_000_000}
+FIGURE_SHAPES: Dict[str, Tuple[int, ...]] = {'fig_line_1e4': (10_000,), 'fig_image_500': (500, 500)}
+
+
+def make_array(shape: Tuple[int, ...], dtype: str, seed: int=0) -> np.ndarray:
+    """ Reproducible test data of `shape`/`dtype`; float arrays get a sprinkling of NaNs so the non-finite paths are exercised. """
+    rng = np.random.default_rng(seed)
+    n: int = int(np.prod(shape))
+    if dtype == 'bool':
+        arr = rng.random(n, dtype=np.float32) < 0.5
+    elif np.dtype(dtype).kind == 'f':
+        arr = rng.standard_normal(n, dtype=np.dtype(dtype))
+        arr[::997] = np.nan
+    else:
+        info = np.iinfo(dtype)
+        arr = rng.integers(max(info.min, -1000), min(info.max, 1000), size=n, dtype=dtype, endpoint=True)
+    return arr.reshape(shape)
+
+
+def make_dataframe(n_rows: int, seed: int=0):
+    """ A frame with mixed column dtypes (floats, ints, strings, timestamps, categoricals). """
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'a': rng.standard_normal(n_rows), 'b': rng.integers(0, 1000, n_rows), 'c': rng.random(n_rows).astype(np.float32),
+        'label': np.array(['alpha', 'beta', 'gamma', 'delta'])[rng.integers(0, 4, n_rows)],
+        'when': pd.date_range('2024-01-01', periods=n_rows, freq='s'),
+        'group': pd.Categorical(rng.integers(0, 8, n_rows)),
+    })
+
+
+def make_figure(shape: Tuple[int, ...], seed: int=0):
+    import matplotlib.pyplot as plt
+    data = make_array(shape, 'float64', seed=seed)
+    fig, ax = plt.subplots(figsize=(4, 3))
+    if data.ndim == 1:
+        ax.plot(data)
+    else:
+        ax.imshow(data)
+    return fig
+
+
+# ==================================================================================================================== #
+# Benchmarked Formatters                                                                                               #
+# ==================================================================================================================== #
+
+def _heatmap_repr_html(arr: np.ndarray) -> str:
+    from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
+    return array_preview_with_heatmap_repr_html(arr, use_render_cache=False, use_output_budget=False)
+
+
+def _shape_card(arr: np.ndarray) -> str:
+    from pho_jupyter_preview_widget.array_shape_display.array_shape_display import array_repr_html
+    return array_repr_html(arr.shape, None, arr.dtype)
+
+
+def _smart_array2string(arr: np.ndarray) -> str:
+    from pho_jupyter_preview_widget.display_helpers import smart_array2string
+    return smart_array2string(arr)
+
+
+_shell = None
+
+def _dataframe_formatter(df) -> Tuple[dict, dict]:
+    """ `dataframe_show_more_button`'s formatter, through the same `display_formatter.format` call a kernel makes. """
+    global _shell
+    if _shell is None:
+        from IPython.core.interactiveshell import InteractiveShell
+        from pho_jupyter_preview_widget.display_helpers import dataframe_show_more_button
+        _shell = dataframe_show_more_button(InteractiveShell.instance())
+    return _shell.display_formatter.format(df)
+
+
+def _matplotlib_fig_to_ipython_HTML(fig) -> str:
+    from pho_jupyter_preview_widget.display_helpers import MatplotlibToIPythonWidget
+    return MatplotlibToIPythonWidget.matplotlib_fig_to_ipython_HTML(fig)
+
+
+def build_cases(max_elements: int=100_000_000, dataframe_max_rows: int=1_000_000) -> Dict[str, Tuple[Callable[[Any], Any], Callable[[], Any]]]:
+    """ {case_name: (formatter, make_input)} for every (formatter, shape, dtype) combination, named 'formatter/shape/dtype'. """
+    cases = {}
+    for shape_name, shape in ARRAY_SHAPES.items():
+        if int(np.prod(shape)) > max_elements:
+            continue
+        for dtype in ARRAY_DTYPES:
+            make_input = (lambda shape=shape, dtype=dtype: make_array(shape, dtype))
+            for fn_name, fn in (('heatmap_repr_html', _heatmap_repr_html), ('shape_card', _shape_card), ('smart_array2string', _smart_array2string)):
+                cases[f'{fn_name}/{shape_name}/{dtype}'] = (fn, make_input)
+    for df_name, n_rows in DATAFRAME_ROWS.items():
+        if n_rows <= dataframe_max_rows:
+            cases[f'dataframe_formatter/{df_name}/mixed'] = (_dataframe_formatter, (lambda n_rows=n_rows: make_dataframe(n_rows)))
+    for fig_name, shape in FIGURE_SHAPES.items():
+        cases[f'matplotlib_fig_to_ipython_HTML/{fig_name}/float64'] = (_matplotlib_fig_to_ipython_HTML, (lambda shape=shape: make_figure(shape)))
+    return cases
+
+
+# ==================================================================================================================== #
+# Measurement                                                                                                          #
+# ==================================================================================================================== #
+
+def output_nbytes(output) -> int:
+    """ The size of what would be sent to the frontend: the UTF-8 length of html/text, or of the JSON of a (data, metadata) mimebundle. """
+    if isinstance(output, str):
+        return len(output.encode('utf-8'))
+    return len(json.dumps(output, default=str).encode('utf-8'))
+
+
+def _reset_caches():
+    from pho_jupyter_preview_widget.render_cache import default_render_cache
+    default_render_cache.clear()
+
+
+def measure(fn: Callable[[Any], Any], value, repeat: int=5) -> Dict[str, float]:
+    """ Calls `fn(value)` `repeat` times for its wall time, then once under `tracemalloc` for its peak memory. """
+    times: List[float] = []
+    for _ in range(repeat):
+        _reset_caches()
+        start = time.perf_counter()
+        output = fn(value)
+        times.append(time.perf_counter() - start)
+
+    _reset_caches()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn(value)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return dict(best_s=min(times), median_s=float(np.median(times)), peak_bytes=int(peak_bytes), output_bytes=output_nbytes(output))
+
+
+def run_suite(cases: Dict[str, Tuple[Callable[[Any], Any], Callable[[], Any]]], repeat: int=5, verbose: bool=True) -> dict:
+    """ Measures every case, building each input once (outside the measurement). Returns the baseline dict that `--save` writes. """
+    import matplotlib.pyplot as plt
+    results: Dict[str, Dict[str, float]] = {}
+    inputs_cache: Dict[int, Any] = {} # make_input id -> input, so the formatters sharing an input don't rebuild (and hold twice) a 1e8-element array
+    for name, (fn, make_input) in cases.items():
+        if id(make_input) not in inputs_cache:
+            inputs_cache.clear()
+            plt.close('all')
+            inputs_cache[id(make_input)] = make_input()
+        results[name] = measure(fn, inputs_cache[id(make_input)], repeat=repeat)
+        if verbose:
+            print(_format_row(name, results[name]), flush=True)
+    inputs_cache.clear()
+    plt.close('all')
+    return dict(version=BASELINE_VERSION, meta=environment_info(repeat), results=results)
+
+
+def environment_info(repeat: int) -> dict:
+    import IPython
+    return dict(created=datetime.now().isoformat(timespec='seconds'), python=platform.python_version(), numpy=np.__version__, ipython=IPython.__version__,
+                machine=platform.machine(), processor=platform.processor(), cpu_count=os.cpu_count(), platform=platform.platform(), repeat=repeat)
+
+
+# ==================================================================================================================== #
+# Baselines and Comparison                                                                                             #
+# ==================================================================================================================== #
+
+def save_baseline(suite_results: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(suite_results, f, indent=1, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(f'baseline {path} has version {baseline.get("version")}, expected {BASELINE_VERSION}. Re-save it with --save.')
+    return baseline
+
+
+def compare_results(results: Dict[str, Dict[str, float]], baseline_results: Dict[str, Dict[str, float]], time_tolerance: float=0.25, memory_tolerance: float=0.25, size_tolerance: float=0.05,
+                    min_time_delta_s: float=0.002, min_memory_delta_bytes: int=(256 * 1024), min_size_delta_bytes: int=256) -> List[str]:
+    """ One message per metric of a case that got worse than its baseline by more than the relative tolerance *and* the absolute noise floor.
+
+    Only cases present in both are compared, so the baseline may cover more (or fewer) cases than the current run.
+    """
+    checks = (('best_s', time_tolerance, min_time_delta_s), ('peak_bytes', memory_tolerance, min_memory_delta_bytes), ('output_bytes', size_tolerance, min_size_delta_bytes))
+    regressions: List[str] = []
+    for name in sorted(set(results) & set(baseline_results)):
+        for metric, tolerance, min_delta in checks:
+            new, old = results[name][metric], baseline_results[name][metric]
+            if (new > old * (1.0 + tolerance)) and ((new - old) > min_delta):
+                regressions.append(f'{name}: {metric} {_format_metric(metric, old)} -> {_format_metric(metric, new)} (+{((new / old) - 1.0) * 100 if old > 0 else float("inf"):.0f}%)')
+    return regressions
+
+
+def _format_metric(metric: str, value: float) -> str:
+    if metric.endswith('_s'):
+        return f'{value * 1e3:.2f} ms'
+    return f'{value / 1024:.1f} KB'
+
+
+def _format_row(name: str, result: Dict[str, float]) -> str:
+    return f'{name:<58}{result["best_s"] * 1e3:>11.2f} ms{result["peak_bytes"] / 1024**2:>11.2f} MB{result["output_bytes"] / 1024:>11.1f} KB'
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='only inputs of up to 1e6 elements (and 1e4 DataFrame rows), 3 repeats')
+    parser.add_argument('--repeat', type=int, default=None, help='timed runs per case (the best one is reported), defaults to 5 (3 with --quick)')
+    parser.add_argument('--max-elements', type=float, default=None, help='skip array shapes with more elements than this')
+    parser.add_argument('--filter', action='append', default=[], help='only run cases whose name contains this substring (repeatable, all must match)')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a JSON baseline, exiting with 1 on regressions')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='allowed relative slowdown of the best time')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed relative growth of the peak memory')
+    parser.add_argument('--size-tolerance', type=float, default=0.05, help='allowed relative growth of the output size')
+    args = parser.parse_args(argv)
+
+    repeat: int = args.repeat or (3 if args.quick else 5)
+    max_elements: int = int(args.max_elements or (1_000_000 if args.quick else 100_000_000))
+    cases = build_cases(max_elements=max_elements, dataframe_max_rows=(10_000 if args.quick else 1_000_000))
+    cases = {name: case for name, case in cases.items() if all(f in name for f in args.filter)}
+    if len(cases) == 0:
+        print(f'ERROR: no benchmark case matches the filters {args.filter}')
+        return 2
+    baseline = load_baseline(args.compare) if args.compare else None # fail on a bad baseline before spending minutes measuring
+
+    print(f'{"case":<58}{"best time":>14}{"peak memory":>14}{"output":>14}')
+    suite_results = run_suite(cases, repeat=repeat)
+    if args.save:
+        save_baseline(suite_results, args.save)
+        print(f'saved {len(suite_results["results"])} results to {args.save}')
+    if baseline is not None:
+        missing: List[str] = sorted(set(suite_results['results']) - set(baseline['results']))
+        if len(missing) > 0:
+            print(f'WARN: {len(missing)} cases are not in the baseline and were not compared (e.g. {missing[0]})')
+        regressions = compare_results(suite_results['results'], baseline['results'], time_tolerance=args.time_tolerance, memory_tolerance=args.memory_tolerance, size_tolerance=args.size_tolerance)
+        if len(regressions) > 0:
+            print(f'ERROR: {len(regressions)} regressions against {args.compare} (baseline from {baseline["meta"].get("created")} on {baseline["meta"].get("platform")}):')
+            for message in regressions:
+                print(f'\t{message}')
+            return 1
+        print(f'no regressions against {args.compare}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+""" Microbenchmark: per-call cost of the shape card (`array_repr_html`), which is rendered on every array display.
+
+Compares the previous implementation (a `jinja2.Template` compiled from a string literal on every call) against the shared,
+compile-once environment rendering the bundled `array.html.j2`.
+
+    python benchmarks/bench_shape_card.py # with the package installed (`pip install -e .`)
+    python benchmarks/bench_shape_card.py --number 5000
+
+"""
+import argparse
+import math
+import timeit
+
+import numpy as np
+from jinja2 import Template
+
+from pho_jupyter_preview_widget.array_shape_display.array_shape_display import array_repr_html, format_bytes, maybe_pluralize, to_svg
+
+
+def legacy_array_repr_html(shape, chunks, dtype, size=120):
+    """ `array_repr_html` as it was before the shared environment: the template is re-compiled on every call. """
+    if chunks is None:
+        chunks = [[dim] for dim in shape]
+
+    svg = to_svg(chunks, size=size)
+    nbytes = math.prod(shape) * dtype.itemsize if dtype and shape else "unknown"
+    cbytes = math.prod(max(dim) for dim in chunks) * dtype.itemsize if dtype else "unknown"
+
+    template = Template("""
+    <div>
+        <div>{{ grid }}</div>
+        <p>Shape: {{ array.shape }}</p>
+        <p>Chunk size: {{ array.chunksize }}</p>
+        <p>Total size: {{ nbytes }}</p>
+        <p>Chunk memory: {{ cbytes }}</p>
+        <p>{{ layers }}</p>
+    </div>
+    """)
+
+    layers = maybe_pluralize(len(chunks), "graph layer")
+
+    return template.render(
+        array={"shape": shape, "chunksize": [max(dim) for dim in chunks]},
+        grid=svg,
+        nbytes=format_bytes(nbytes) if nbytes != "unknown" else "unknown",
+        cbytes=format_bytes(cbytes) if cbytes != "unknown" else "unknown",
+        layers=layers,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='calls per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements (the best one is reported)')
+    args = parser.parse_args()
+
+    shape, dtype = (1000, 2000), np.dtype('float64')
+    array_repr_html(shape, None, dtype) # the one-off compile isn't part of the steady-state per-call cost
+
+    print(f'{"implementation":<32}{"per call":>12}')
+    for name, fn in (('legacy (Template per call)', legacy_array_repr_html), ('shared environment', array_repr_html)):
+        best_s: float = min(timeit.repeat(lambda: fn(shape, None, dtype), number=args.number, repeat=args.repeat)) / args.number
+        print(f'{name:<32}{best_s * 1e6:>9.1f} us')
+
+
+if __name__ == '__main__':
+    main()
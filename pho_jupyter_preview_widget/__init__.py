@@ -0,0 +1,37 @@
+""" Data previews for many common data types, such as NumPy arrays and Pandas DataFrames, in Jupyter.
+
+    import pho_jupyter_preview_widget
+    pho_jupyter_preview_widget.register() # heatmap + shape card previews for ndarrays (and lists/dask arrays of them), and the `%config_ndarray_preview`/`%%ndarray_preview` magics
+    pho_jupyter_preview_widget.register(graphical_preview=False) # just the shape card
+    pho_jupyter_preview_widget.register(dataframes=True, height=80, cmap='magma') # also scrollable virtual tables for large DataFrames
+
+Importing the package (and registering the formatters) doesn't import matplotlib, pandas, ipywidgets or jinja2: every feature imports
+what it needs the first time it's used.
+"""
+
+
+def register(ip=None, graphical_preview: bool=True, magics: bool=True, dataframes: bool=False, **preview_kwargs):
+    """ Registers the preview formatters (and magics) with the IPython shell `ip` (defaults to the running one) and returns it.
+
+    graphical_preview: thumbnail heatmap previews (see `display_helpers.array_repr_with_graphical_preview`, which takes the `preview_kwargs`), otherwise only the shape card.
+    magics: registers `ipython_helpers.PreviewWidgetMagics`.
+    dataframes: shows large DataFrames as windowed virtual tables (see `display_helpers.dataframe_show_more_button`).
+    """
+    if ip is None:
+        from IPython import get_ipython
+        ip = get_ipython()
+        if ip is None:
+            print('WARN: pho_jupyter_preview_widget.register() called outside of IPython, nothing was registered.')
+            return None
+
+    from pho_jupyter_preview_widget.display_helpers import array_repr_with_graphical_preview, array_repr_with_graphical_shape, dataframe_show_more_button
+    if graphical_preview:
+        array_repr_with_graphical_preview(ip=ip, **preview_kwargs)
+    else:
+        array_repr_with_graphical_shape(ip=ip)
+    if dataframes:
+        dataframe_show_more_button(ip=ip)
+    if magics:
+        from pho_jupyter_preview_widget.ipython_helpers import PreviewWidgetMagics
+        ip.register_magics(PreviewWidgetMagics)
+    return ip
@@ -0,0 +1,155 @@
+""" Latency-targeting quality control for the heatmap previews: picks how much work a preview may do so it displays within a target time.
+
+    from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
+
+    array_preview_with_heatmap_repr_html(np.random.rand(8000, 8000), latency_target_s=0.03) # rendered at whichever tier is predicted to take <= 30 ms
+
+or `%config_ndarray_preview latency_target_s=0.03` (the default), `latency_target_s=None` to always render at the configured settings.
+
+Previews are rendered at one of the `QUALITY_TIERS`, from the configured settings ('full') down to a strided 1/8-resolution thumbnail without
+statistics or plaintext ('minimal'). The controller keeps an online cost model of past renders: an exponentially weighted mean and mean
+absolute deviation of the render time per (tier, dtype, mode, log2 element count), and picks the richest tier whose pessimistic estimate
+(mean + `deviation_weight` deviations) fits the target. Sizes it hasn't seen yet are extrapolated from the nearest one it has, scaled by how the
+tier's prior cost grows with the element count; tiers never observed at all fall back to that prior. On the 2nd, 4th, 8th, ... and then every `probe_interval`-th display
+of a kind of array, the next richer tier is tried once if it's estimated to take at most twice the target, so estimates that were too pessimistic
+(e.g. from a first render that paid for one-off imports) recover.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# name, thumbnail_scale (of `max_thumbnail_pixels`), max_block_size (of the block reduction, 1 strides), stats ('exact', 'sampled' or None),
+# plaintext (False drops the plaintext repr), prior (overhead_s, seconds_per_element, max_elements_touched or None for all of them)
+QUALITY_TIERS: Tuple[Dict, ...] = (
+    dict(name='full', thumbnail_scale=1.0, max_block_size=8, stats='exact', plaintext=True, prior=(0.002, 20e-9, None)),
+    dict(name='reduced', thumbnail_scale=0.5, max_block_size=4, stats='sampled', plaintext=True, prior=(0.002, 20e-9, (1 << 20))),
+    dict(name='fast', thumbnail_scale=0.25, max_block_size=2, stats=None, plaintext=True, prior=(0.002, 20e-9, (1 << 16))),
+    dict(name='minimal', thumbnail_scale=0.125, max_block_size=1, stats=None, plaintext=False, prior=(0.001, 20e-9, (1 << 14))),
+)
+SAMPLED_STATS_MAX_ELEMENTS: int = (1 << 20) # arrays with more elements get their stats estimated from a sample in the 'sampled' tiers
+MIN_THUMBNAIL_PIXELS: int = 16
+
+
+def array_mode(arr: np.ndarray, nd_mode: str='montage') -> str:
+    """ The part of the cost model key describing how `arr` is previewed: its dimensionality ('1d', '2d' or the N-D `nd_mode`), and whether it's memory-mapped. """
+    from pho_jupyter_preview_widget.array_downsampling import is_out_of_core
+    n_dim: int = np.ndim(arr)
+    mode: str = f'{n_dim}d' if (n_dim <= 2) else f'nd-{nd_mode}'
+    return (mode + '-mmap') if is_out_of_core(arr) else mode
+
+
+class AdaptiveQualityController:
+    """ Chooses the quality tier of each preview from an online cost model of the previous renders (see the module docstring). Thread-safe.
+
+    alpha: the EWMA weight of each new render time.
+    deviation_weight: how many mean absolute deviations are added to the mean when estimating a render time, keeping the slow tail (not just the mean) under the target.
+    probe_interval: one richer tier is tried on the 2nd, 4th, 8th, ... display of the same kind of array, and every this many displays after that (0 disables probing).
+
+        tier_index = controller.choose_tier(arr, target_s=0.03)
+        render_kwargs = controller.tier_render_kwargs(tier_index, render_kwargs)
+        ... render, timing it ...
+        controller.record(arr, tier_index, elapsed_s)
+
+    """
+    def __init__(self, tiers: Tuple[Dict, ...]=QUALITY_TIERS, alpha: float=0.2, deviation_weight: float=3.0, probe_interval: int=100):
+        if len(tiers) == 0:
+            raise ValueError('AdaptiveQualityController needs at least one quality tier.')
+        self.tiers = tiers
+        self.alpha = alpha
+        self.deviation_weight = deviation_weight
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._model: Dict[Tuple[str, str, str], Dict[int, Tuple[float, float]]] = {} # (tier, dtype, mode) -> {log2 size bucket: (mean_s, mean_abs_deviation_s)}
+        self._n_choices: Dict[Tuple[str, str, int], int] = {} # (dtype, mode, bucket) -> displays so far
+
+
+    @staticmethod
+    def _size_bucket(n_elements: int) -> int:
+        return int(max(1, n_elements)).bit_length()
+
+    def _prior_s(self, tier_index: int, n_elements: int) -> float:
+        overhead_s, seconds_per_element, max_elements_touched = self.tiers[tier_index]['prior']
+        return overhead_s + seconds_per_element * (n_elements if (max_elements_touched is None) else min(n_elements, max_elements_touched))
+
+    def predict(self, arr: np.ndarray, tier_index: int, mode: Optional[str]=None) -> float:
+        """ The pessimistic (mean + `deviation_weight` deviations) render time of `arr` at the tier, in seconds. """
+        mode = array_mode(arr) if (mode is None) else mode
+        n_elements: int = int(np.size(arr))
+        bucket: int = self._size_bucket(n_elements)
+        with self._lock:
+            buckets = dict(self._model.get((self.tiers[tier_index]['name'], np.dtype(arr.dtype).str, mode), {}))
+        if len(buckets) == 0:
+            return self._prior_s(tier_index, n_elements)
+        nearest: int = min(buckets, key=lambda b: (abs(b - bucket), -b)) # ties go to the larger (more pessimistic) size
+        mean_s, deviation_s = buckets[nearest]
+        estimate_s: float = mean_s + self.deviation_weight * deviation_s
+        if nearest != bucket:
+            nearest_n_elements: int = int(1.5 * (1 << (nearest - 1))) # the middle of the bucket
+            estimate_s *= self._prior_s(tier_index, n_elements) / self._prior_s(tier_index, nearest_n_elements)
+        return estimate_s
+
+    def choose_tier(self, arr: np.ndarray, target_s: float, mode: Optional[str]=None) -> int:
+        """ The index of the richest tier estimated to render `arr` within `target_s` (the last, cheapest tier if none is). """
+        mode = array_mode(arr) if (mode is None) else mode
+        estimates = []
+        tier_index: int = len(self.tiers) - 1
+        for i in range(len(self.tiers)):
+            estimates.append(self.predict(arr, i, mode=mode))
+            if estimates[i] <= target_s:
+                tier_index = i
+                break
+
+        choice_key = (np.dtype(arr.dtype).str, mode, self._size_bucket(int(np.size(arr))))
+        with self._lock:
+            n_choices: int = self._n_choices.get(choice_key, 0) + 1
+            self._n_choices[choice_key] = n_choices
+        is_probe: bool = (self.probe_interval > 0) and (n_choices > 1) and (((n_choices & (n_choices - 1)) == 0) or ((n_choices % self.probe_interval) == 0)) # powers of two, then every probe_interval
+        if (tier_index > 0) and is_probe and (estimates[tier_index - 1] <= (2.0 * target_s)):
+            tier_index -= 1 # probe: re-measure the next richer tier once in a while
+        return tier_index
+
+    def record(self, arr: np.ndarray, tier_index: int, elapsed_s: float, mode: Optional[str]=None):
+        """ Updates the cost model with the time a render of `arr` at the tier actually took. """
+        mode = array_mode(arr) if (mode is None) else mode
+        key = (self.tiers[tier_index]['name'], np.dtype(arr.dtype).str, mode)
+        bucket: int = self._size_bucket(int(np.size(arr)))
+        with self._lock:
+            buckets = self._model.setdefault(key, {})
+            if bucket not in buckets:
+                buckets[bucket] = (float(elapsed_s), 0.0)
+            else:
+                mean_s, deviation_s = buckets[bucket]
+                deviation_s = (1.0 - self.alpha) * deviation_s + self.alpha * abs(elapsed_s - mean_s)
+                mean_s = (1.0 - self.alpha) * mean_s + self.alpha * elapsed_s
+                buckets[bucket] = (mean_s, deviation_s)
+
+    def tier_render_kwargs(self, tier_index: int, render_kwargs: Dict) -> Dict:
+        """ `render_kwargs` (of `display_helpers.single_NDArray_array_preview_with_heatmap_repr_html`) adjusted to the tier. The 'full' tier leaves them as they are. """
+        tier = self.tiers[tier_index]
+        render_kwargs = dict(render_kwargs)
+        if tier_index == 0:
+            return render_kwargs
+        render_kwargs['max_thumbnail_pixels'] = max(MIN_THUMBNAIL_PIXELS, int(render_kwargs.get('max_thumbnail_pixels', 256) * tier['thumbnail_scale']))
+        render_kwargs['max_block_size'] = min(render_kwargs.get('max_block_size', 8), tier['max_block_size'])
+        if tier['stats'] is None:
+            render_kwargs['include_stats'] = False
+        elif tier['stats'] == 'sampled':
+            render_kwargs['stats_max_exact_elements'] = SAMPLED_STATS_MAX_ELEMENTS
+        if not tier['plaintext']:
+            render_kwargs['include_plaintext_repr'] = False
+        return render_kwargs
+
+    def reset(self):
+        with self._lock:
+            self._model.clear()
+            self._n_choices.clear()
+
+    def stats(self) -> Dict:
+        """ The current cost model: {(tier, dtype, mode): {log2 size bucket: (mean_s, mean_abs_deviation_s)}}. """
+        with self._lock:
+            return {key: dict(buckets) for key, buckets in self._model.items()}
+
+
+default_quality_controller = AdaptiveQualityController()
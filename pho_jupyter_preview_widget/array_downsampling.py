@@ -0,0 +1,144 @@
+""" Vectorized downsampling of large arrays to (roughly) thumbnail resolution before they are rasterized.
+
+    from pho_jupyter_preview_widget.array_downsampling import downsample_2d
+
+    thumb = downsample_2d(np.random.rand(10000, 200000), target_shape=(256, 256), reducer='max')
+    thumb.shape # (256, 256)
+
+Each output pixel is produced by reducing a block of at most `max_block_size` x `max_block_size` input elements. When the
+input is larger than that (a block would have to be bigger), the input is first strided down so that the total work is bounded
+by `n_output_pixels * max_block_size**2` no matter how many elements the array has.
+
+Out-of-core arrays (`np.memmap`, `np.load(..., mmap_mode='r')`, ...) use `OUT_OF_CORE_MAX_BLOCK_SIZE` instead, so only about one
+element per output pixel is ever read from disk (see `is_out_of_core`).
+"""
+import math
+import mmap
+import warnings
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+DOWNSAMPLE_REDUCERS: Tuple[str, ...] = ('mean', 'max', 'minmax', 'stride')
+OUT_OF_CORE_MAX_BLOCK_SIZE: int = 1 # memory-mapped arrays are strided down to the thumbnail resolution: every extra element read may be a page read from disk
+OUT_OF_CORE_MAX_SAMPLES: int = (1 << 16) # the most elements read from an out-of-core array to estimate statistics (e.g. a color scale)
+
+
+def is_out_of_core(arr) -> bool:
+    """ True if `arr` (or the array it is a view of) is backed by a memory-mapped file, where touching an element can mean a disk read:
+    `np.memmap`s (including `np.load(..., mmap_mode=...)`) and arrays built over an `mmap.mmap` buffer (e.g. with `np.frombuffer`).
+    """
+    if isinstance(arr, np.memmap):
+        return True
+    base = getattr(arr, 'base', None)
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = base.obj if isinstance(base, memoryview) else getattr(base, 'base', None)
+    return False
+
+
+def thumbnail_max_block_size(arr, max_block_size: int=8) -> int:
+    """ The `max_block_size` to downsample `arr` with: `OUT_OF_CORE_MAX_BLOCK_SIZE` for out-of-core arrays, so a preview never pages in more than the thumbnail shows. """
+    return min(max_block_size, OUT_OF_CORE_MAX_BLOCK_SIZE) if is_out_of_core(arr) else max_block_size
+
+
+def _block_factor(n: int, target: int) -> int:
+    """ the number of consecutive input elements that get collapsed into one output element along an axis """
+    if (target is None) or (target <= 0) or (n <= target):
+        return 1
+    return int(math.ceil(n / target))
+
+
+def _block_reduce_axis(arr: np.ndarray, factor: int, axis: int, ufunc_reduce) -> np.ndarray:
+    """ Reduces consecutive blocks of `factor` elements along `axis` by reshaping (the trailing partial block is reduced separately). """
+    if factor <= 1:
+        return arr
+    arr = np.moveaxis(arr, axis, 0)
+    n: int = arr.shape[0]
+    n_full_blocks: int = n // factor
+    parts = []
+    if n_full_blocks > 0:
+        main = arr[:(n_full_blocks * factor)]
+        parts.append(ufunc_reduce(main.reshape((n_full_blocks, factor) + main.shape[1:]), axis=1))
+    if (n_full_blocks * factor) < n:
+        parts.append(ufunc_reduce(arr[(n_full_blocks * factor):], axis=0)[np.newaxis])
+    reduced = parts[0] if len(parts) == 1 else np.concatenate(parts, axis=0)
+    return np.moveaxis(reduced, 0, axis)
+
+
+def _nanmean_reduce(arr: np.ndarray, axis: int) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning) # all-NaN blocks just stay NaN
+        return np.nanmean(arr, axis=axis)
+
+
+def _get_reduce_fn(reducer: str, dtype: np.dtype):
+    """ NaN-ignoring reductions for float data (so a single NaN doesn't blank out a whole block), plain ones otherwise """
+    is_float: bool = np.issubdtype(dtype, np.floating)
+    if reducer == 'mean':
+        return _nanmean_reduce if is_float else (lambda a, axis: np.mean(a, axis=axis))
+    elif reducer == 'max':
+        return (lambda a, axis: np.fmax.reduce(a, axis=axis)) if is_float else (lambda a, axis: np.max(a, axis=axis))
+    elif reducer == 'min':
+        return (lambda a, axis: np.fmin.reduce(a, axis=axis)) if is_float else (lambda a, axis: np.min(a, axis=axis))
+    else:
+        raise ValueError(f'Unknown reducer: "{reducer}". Expected one of {DOWNSAMPLE_REDUCERS}.')
+
+
+def downsample_2d(arr: np.ndarray, target_shape: Tuple[Optional[int], Optional[int]]=(256, 256), reducer: str='mean', max_block_size: int=8) -> np.ndarray:
+    """ Reduces a 1D/2D array to at most `target_shape` elements per axis.
+
+    reducer:
+        'mean'   - block average (NaNs ignored)
+        'max'    - block maximum, keeps sparse peaks visible
+        'minmax' - min/max envelope: every output block becomes a (min, max) pair interleaved along the last axis, so both troughs and peaks survive
+        'stride' - plain strided subsampling (the cheapest, touches exactly one element per output pixel)
+    max_block_size: the largest block (per axis) that is reduced; beyond it the input is strided first so the cost per output pixel stays bounded.
+
+    Arrays that already fit are returned as-is (no copy).
+    """
+    if reducer not in DOWNSAMPLE_REDUCERS:
+        raise ValueError(f'Unknown reducer: "{reducer}". Expected one of {DOWNSAMPLE_REDUCERS}.')
+    arr = np.atleast_2d(arr)
+    if arr.ndim != 2:
+        raise ValueError(f'downsample_2d expects 1D or 2D data but got ndim: {arr.ndim}')
+
+    target_rows, target_cols = target_shape
+    if reducer == 'minmax' and (target_cols is not None):
+        target_cols = max(1, target_cols // 2) # each block produces two output columns
+
+    factors = [_block_factor(arr.shape[0], target_rows), _block_factor(arr.shape[1], target_cols)]
+    if all(f == 1 for f in factors):
+        return arr
+
+    if reducer == 'stride':
+        return arr[::factors[0], ::factors[1]]
+
+    # Pre-stride any axis whose blocks would exceed `max_block_size`, bounding the cost per output pixel:
+    pre_strides = [max(1, int(math.ceil(f / max_block_size))) for f in factors]
+    if any(s > 1 for s in pre_strides):
+        arr = arr[::pre_strides[0], ::pre_strides[1]]
+        factors = [_block_factor(arr.shape[0], target_rows), _block_factor(arr.shape[1], target_cols)]
+
+    if reducer == 'minmax':
+        min_fn, max_fn = _get_reduce_fn('min', arr.dtype), _get_reduce_fn('max', arr.dtype)
+        mins, maxs = arr, arr
+        for axis, factor in enumerate(factors):
+            mins = _block_reduce_axis(mins, factor, axis=axis, ufunc_reduce=min_fn)
+            maxs = _block_reduce_axis(maxs, factor, axis=axis, ufunc_reduce=max_fn)
+        out = np.empty((mins.shape[0], mins.shape[1] * 2), dtype=np.result_type(mins, maxs))
+        out[:, 0::2] = mins
+        out[:, 1::2] = maxs
+        return out
+
+    reduce_fn = _get_reduce_fn(reducer, arr.dtype)
+    for axis, factor in enumerate(factors):
+        arr = _block_reduce_axis(arr, factor, axis=axis, ufunc_reduce=reduce_fn)
+    return arr
+
+
+def thumbnail_target_shape(height: Optional[int]=None, width: Optional[int]=None, max_thumbnail_pixels: int=256) -> Tuple[int, int]:
+    """ The (rows, cols) resolution worth rasterizing for a thumbnail displayed at `height` x `width` CSS pixels (never below `max_thumbnail_pixels` per axis). """
+    return (max(max_thumbnail_pixels, (height or 0)), max(max_thumbnail_pixels, (width or 0)))
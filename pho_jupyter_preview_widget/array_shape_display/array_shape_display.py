@@ -1,23 +1,274 @@
+import functools
 import math
-from jinja2 import Template
-
-def to_svg(chunks, size=120):
-    """Convert chunks into an SVG grid."""
-    # Simplified SVG generation logic
-    svg = f'<svg width="{size}" height="{size}" xmlns="http://www.w3.org/2000/svg">'
-    total_size = sum(sum(dim) for dim in chunks)
-    scale = size / total_size
-    y_offset = 0
-    for dim in chunks:
-        x_offset = 0
-        for block in dim:
-            width = block * scale
-            height = block * scale
-            svg += f'<rect x="{x_offset}" y="{y_offset}" width="{width}" height="{height}" fill="blue" stroke="black"/>'
-            x_offset += width
-        y_offset += height
-    svg += "</svg>"
-    return svg
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import jinja2 # imported on first use of the templates (see `get_template_environment`)
+
+
+# ==================================================================================================================== #
+# Templates                                                                                                            #
+# ==================================================================================================================== #
+_template_environment: Optional["jinja2.Environment"] = None
+
+
+def get_template_environment() -> "jinja2.Environment":
+    """ The shared environment for the bundled `templates/*.html.j2`, created on first use.
+
+    Each template is compiled once per process and then served from the environment's cache (`auto_reload=False` also skips the
+    per-call mtime check). See `enable_template_bytecode_cache` to reuse the compiled templates across processes too.
+    """
+    global _template_environment
+    if _template_environment is None:
+        import jinja2
+        _template_environment = jinja2.Environment(
+            loader=jinja2.PackageLoader('pho_jupyter_preview_widget', 'array_shape_display/templates'),
+            autoescape=False, # the grid is pre-rendered SVG markup
+            auto_reload=False,
+        )
+    return _template_environment
+
+
+def get_template(name: str) -> "jinja2.Template":
+    """ A bundled template by file name, e.g. `get_template('array.html.j2')` """
+    return get_template_environment().get_template(name)
+
+
+def enable_template_bytecode_cache(directory: Optional[str]=None) -> "jinja2.FileSystemBytecodeCache":
+    """ Stores the compiled templates in `directory` (default: `jinja_bytecode` next to the render cache, see `render_cache.default_disk_cache_path`) so new kernels skip compiling them.
+
+    Usage:
+        from pho_jupyter_preview_widget.array_shape_display.array_shape_display import enable_template_bytecode_cache
+        enable_template_bytecode_cache()
+    """
+    if directory is None:
+        from pho_jupyter_preview_widget.render_cache import default_disk_cache_path
+        directory = os.path.join(os.path.dirname(default_disk_cache_path()), 'jinja_bytecode')
+    os.makedirs(directory, exist_ok=True)
+    import jinja2
+    bytecode_cache = jinja2.FileSystemBytecodeCache(directory)
+    environment = get_template_environment()
+    environment.bytecode_cache = bytecode_cache
+    environment.cache.clear() # templates compiled so far didn't go through the bytecode cache
+    return bytecode_cache
+
+
+# ==================================================================================================================== #
+# Shape Card                                                                                                           #
+# ==================================================================================================================== #
+
+# ==================================================================================================================== #
+# Shape Glyphs                                                                                                         #
+# ==================================================================================================================== #
+_GLYPH_FILL: str = '#ECB172A0'
+_GLYPH_MIN_FRACTION: float = 0.08 # the thinnest axis is still drawn this fraction of `size` wide
+_GLYPH_LABEL_MARGIN: int = 24
+
+
+def _glyph_draw_sizes(shape: Tuple[int, ...], size: int) -> List[float]:
+    """ Drawn length of each axis: the longest gets `size`, the others shrink with the log of how much shorter they are, so 1 x 1e6 arrays still look like a line rather than a 1 pixel sliver (and 1000 x 1200 ones look square). """
+    longest: int = max(max(shape), 1)
+    return [max(size * _GLYPH_MIN_FRACTION, size / (1.0 + math.log2(longest / max(n, 1)))) for n in shape]
+
+
+def _axis_signature(axis_chunks, max_lines: int) -> Tuple:
+    """ The part of an axis's chunking that affects its drawing: the chunk sizes, or just (total, n_chunks) once there are too many boundaries to draw (or unknown chunk sizes). """
+    n_chunks: int = len(axis_chunks)
+    total = sum(axis_chunks)
+    if total != total: # NaN: unknown chunk sizes, draw each chunk as one unit
+        return ('dense', n_chunks, n_chunks)
+    if (n_chunks - 1) > max_lines:
+        return ('dense', int(total), n_chunks)
+    return tuple(int(c) for c in axis_chunks)
+
+
+def _axis_boundaries(signature: Tuple, length: float) -> List[float]:
+    """ Drawn positions (in [0, length]) of the inner chunk boundaries of an axis. Dense axes have none (they're hatched instead). """
+    if (len(signature) > 0) and (signature[0] == 'dense'):
+        return []
+    total: int = sum(signature)
+    if total <= 0:
+        return []
+    positions: List[float] = []
+    offset: int = 0
+    for c in signature[:-1]:
+        offset += c
+        positions.append(length * offset / total)
+    return positions
+
+
+def _axis_total(signature: Tuple) -> int:
+    return signature[1] if ((len(signature) > 0) and (signature[0] == 'dense')) else sum(signature)
+
+
+def _is_dense(signature: Tuple) -> bool:
+    return (len(signature) > 0) and (signature[0] == 'dense')
+
+
+def _fmt(v: float) -> str:
+    return f'{v:.1f}'.rstrip('0').rstrip('.')
+
+
+@functools.lru_cache(maxsize=256)
+def _svg_from_signature(signature: Tuple[Tuple, ...], size: int) -> str:
+    """ Builds the glyph for a (hashable, bounded) chunk signature. Memoized: re-displaying arrays with the same shape/chunks is a dictionary lookup. """
+    ndim: int = len(signature)
+    shape = tuple(_axis_total(sig) for sig in signature)
+    parts: List[str] = []
+    hatch_fill: str = 'url(#pho-hatch)'
+    hatch_def: str = f'<defs><pattern id="pho-hatch" width="6" height="6" patternUnits="userSpaceOnUse" patternTransform="rotate(45)"><rect width="6" height="6" fill="{_GLYPH_FILL}"/><line x1="0" y1="0" x2="0" y2="6" stroke="black" stroke-width="1"/></pattern></defs>'
+
+    def _line(x1, y1, x2, y2, width=1):
+        parts.append(f'<line x1="{_fmt(x1)}" y1="{_fmt(y1)}" x2="{_fmt(x2)}" y2="{_fmt(y2)}" style="stroke-width:{width}"/>')
+
+    def _polygon(points, fill):
+        parts.append(f'<polygon points="{" ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in points)}" style="fill:{fill};stroke-width:2"/>')
+
+    def _text(x, y, label, rotate=None):
+        transform = f' transform="rotate({rotate},{_fmt(x)},{_fmt(y)})"' if rotate is not None else ''
+        parts.append(f'<text x="{_fmt(x)}" y="{_fmt(y)}" font-size="1.0rem" font-weight="100" text-anchor="middle"{transform}>{label}</text>')
+
+    if (ndim == 0) or any(n == 0 for n in shape):
+        # scalars and empty arrays: an empty dashed outline
+        side: float = size * 0.25
+        body = f'<rect x="1" y="1" width="{_fmt(side)}" height="{_fmt(side)}" style="fill:none;stroke-dasharray:4,2;stroke-width:2"/>'
+        label = '' if ndim == 0 else f'<text x="{_fmt(side / 2 + 1)}" y="{_fmt(side + 18)}" font-size="1.0rem" text-anchor="middle">{" x ".join(str(n) for n in shape)}</text>'
+        return f'<svg width="{_fmt(side + 2 + _GLYPH_LABEL_MARGIN)}" height="{_fmt(side + 2 + _GLYPH_LABEL_MARGIN)}" style="stroke:rgb(0,0,0)" xmlns="http://www.w3.org/2000/svg">{body}{label}</svg>'
+
+    leading_shape = shape[:-3]
+    signature = signature[-3:]
+    shape = shape[-3:]
+    if len(shape) == 1:
+        # 1D: a thin bar with its chunk boundaries
+        w = float(size)
+        h = size * _GLYPH_MIN_FRACTION * 2
+        dense = _is_dense(signature[0])
+        _polygon([(0, 0), (w, 0), (w, h), (0, h)], hatch_fill if dense else _GLYPH_FILL)
+        for x in _axis_boundaries(signature[0], w):
+            _line(x, 0, x, h)
+        _text(w / 2, h + 18, shape[0])
+        width, height = w, h
+
+    elif len(shape) == 2:
+        h, w = _glyph_draw_sizes(shape, size)
+        dense = any(_is_dense(sig) for sig in signature)
+        _polygon([(0, 0), (w, 0), (w, h), (0, h)], hatch_fill if dense else _GLYPH_FILL)
+        for y in _axis_boundaries(signature[0], h):
+            _line(0, y, w, y)
+        for x in _axis_boundaries(signature[1], w):
+            _line(x, 0, x, h)
+        _text(w / 2, h + 18, shape[1])
+        _text(w + 14, h / 2, shape[0], rotate=-90)
+        width, height = w, h
+
+    else:
+        # 3D: oblique cuboid, the first axis is the depth
+        d, h, w = _glyph_draw_sizes(shape, size)
+        o = d * 0.6 # projected depth offset
+        dense = any(_is_dense(sig) for sig in signature)
+        fill = hatch_fill if dense else _GLYPH_FILL
+        _polygon([(0, o), (o, 0), (o + w, 0), (w, o)], fill) # top
+        _polygon([(w, o), (w + o, 0), (w + o, h), (w, h + o)], fill) # side
+        _polygon([(0, o), (w, o), (w, o + h), (0, o + h)], fill) # front
+        for t in _axis_boundaries(signature[0], o):
+            _line(t, o - t, t + w, o - t) # depth boundaries, on the top ...
+            _line(w + t, o - t, w + t, o - t + h) # ... and the side face
+        for y in _axis_boundaries(signature[1], h):
+            _line(0, o + y, w, o + y)
+            _line(w, o + y, w + o, y)
+        for x in _axis_boundaries(signature[2], w):
+            _line(x, o, x, o + h)
+            _line(x, o, x + o, 0)
+        _text(w / 2, o + h + 18, shape[2])
+        _text(w + o + 14, o / 2 + h / 2, shape[1], rotate=-90)
+        _text(o / 2 - 10, o / 2 + 4, shape[0], rotate=-45)
+        width, height = w + o, h + o
+
+    svg_width, svg_height = width + _GLYPH_LABEL_MARGIN, height + _GLYPH_LABEL_MARGIN
+    leading_html: str = ''
+    if len(leading_shape) > 0:
+        # ndim > 3: the glyph shows the trailing three axes, the leading ones are listed above it
+        leading_html = f'<text x="0" y="14" font-size="1.0rem" text-anchor="start">{" x ".join(str(n) for n in leading_shape)} x</text>'
+        parts = [f'<g transform="translate(0,20)">'] + parts + ['</g>']
+        svg_height += 20
+    return ''.join([f'<svg width="{_fmt(svg_width)}" height="{_fmt(svg_height)}" style="stroke:rgb(0,0,0)" xmlns="http://www.w3.org/2000/svg">', hatch_def if dense else '', leading_html] + parts + ['</svg>'])
+
+
+def to_svg(chunks, size=120, max_primitives: int=300):
+    """Convert chunks into an SVG glyph of the array's shape (1D bar, 2D rectangle or 3D cuboid), Dask style, with the chunk boundaries drawn on it.
+
+    Axis lengths are log-scaled so extreme aspect ratios stay legible. At most `max_primitives` chunk boundary lines are drawn: axes with more
+    chunks than their share are drawn as a hatched fill instead, so both the time to build and the byte size of the SVG are bounded for any
+    number of chunks. Results are memoized on the (bounded) shape/chunk signature.
+
+        to_svg(((50, 50), (20, 20, 20))) # 2 x 3 chunks of a (100, 60) array
+    """
+    ndim: int = len(chunks)
+    n_drawn_axes: int = min(max(ndim, 1), 3)
+    lines_per_boundary: int = 2 if n_drawn_axes == 3 else 1 # 3D glyphs draw each boundary on two faces
+    max_lines_per_axis: int = max(1, max_primitives // (n_drawn_axes * lines_per_boundary))
+    signature = tuple(_axis_signature(axis_chunks, max_lines=max_lines_per_axis) for axis_chunks in chunks)
+    return _svg_from_signature(signature, int(size))
+
+
+# ==================================================================================================================== #
+# Statistics Rows                                                                                                      #
+# ==================================================================================================================== #
+
+def histogram_svg(counts: List[int], width: int=120, height: int=24) -> str:
+    """ A tiny bar chart of histogram `counts` (one bar per bin, scaled to the fullest bin). """
+    n_bins: int = len(counts)
+    max_count: int = max(counts) if n_bins > 0 else 0
+    if max_count <= 0:
+        return ''
+    bar_width: float = width / n_bins
+    bars = ''.join(f'<rect x="{_fmt(i * bar_width)}" y="{_fmt(height - (height * c / max_count))}" width="{_fmt(bar_width)}" height="{_fmt(height * c / max_count)}"/>' for i, c in enumerate(counts) if c > 0)
+    return f'<svg width="{width}" height="{height}" style="fill:{_GLYPH_FILL};stroke:none" xmlns="http://www.w3.org/2000/svg">{bars}</svg>'
+
+
+def _format_stat(v: Optional[float]) -> str:
+    return '&ndash;' if (v is None) else f'{v:.4g}'
+
+
+def stats_rows(stats: Optional[Dict]) -> Optional[Dict[str, str]]:
+    """ The shape card's statistics rows (label -> html) for a dict from `array_stats.compute_array_stats`. Non-finite counts are only listed when non-zero. """
+    if stats is None:
+        return None
+    approx: str = '~' if stats['is_estimate'] else ''
+    rows: Dict[str, str] = {
+        'Min / Max': f"{approx}{_format_stat(stats['min'])} / {approx}{_format_stat(stats['max'])}",
+        'Mean &plusmn; Std': f"{approx}{_format_stat(stats['mean'])} &plusmn; {_format_stat(stats['std'])}",
+    }
+    non_finite_counts = [(label, stats[key]) for label, key in (('NaN', 'n_nan'), ('+inf', 'n_posinf'), ('-inf', 'n_neginf'), ('masked', 'n_masked')) if stats[key] > 0]
+    if len(non_finite_counts) > 0:
+        rows['Non-finite'] = approx + ', '.join(f'{n} {label}' for label, n in non_finite_counts) + (f" (of {stats['n']} sampled)" if stats['is_estimate'] else '')
+    histogram_html: str = histogram_svg(stats['hist_counts'])
+    if histogram_html:
+        rows['Histogram'] = histogram_html
+    return rows
+
+
+def color_scale_html(color_scale: Dict) -> str:
+    """ The shape card's 'Color scale' row for the limits a heatmap was rendered with (the `color_scale_info` filled by `display_helpers._array_heatmap_html`),
+    followed by a swatch for each non-finite value drawn in a sentinel color.
+    """
+    vmin, vmax = color_scale['vmin'], color_scale['vmax']
+    low, high = color_scale.get('percentiles', (None, None))
+    scale: str = color_scale['color_scale']
+    if scale == 'percentile':
+        text = f'{_format_stat(vmin)} &hellip; {_format_stat(vmax)} ({low:g}&ndash;{high:g} pct)'
+    elif scale == 'symmetric':
+        text = f'&plusmn;{_format_stat(vmax)} ({high:g} pct of |x|)'
+    elif scale == 'log':
+        text = f'{_format_stat(vmin)} &hellip; {_format_stat(vmax)} (log, {low:g}&ndash;{high:g} pct)'
+    elif scale == 'fixed':
+        text = f'{_format_stat(vmin)} &hellip; {_format_stat(vmax)} (fixed)'
+    else:
+        text = f'{_format_stat(vmin)} &hellip; {_format_stat(vmax)} (min/max)'
+    swatches = ''.join(f' <span style="color: rgb{tuple(rgb)}; text-shadow: 0 0 1px #888;">&#9632;</span>&nbsp;{label}' for label, rgb in color_scale.get('sentinels', {}).items())
+    return text + swatches
+
 
 def format_bytes(nbytes):
     """Format bytes as human-readable."""
@@ -34,8 +285,16 @@ def maybe_pluralize(count, noun):
     """Return pluralized noun if count > 1."""
     return f"{count} {noun}" + ("s" if count > 1 else "")
 
-def array_repr_html(shape, chunks, dtype, size=120):
-    """Generate an HTML representation of an array's shape and chunks."""
+def array_repr_html(shape, chunks, dtype, size=120, n_layers: Optional[int]=None, meta_typename: str='numpy.ndarray', stats: Optional[Dict]=None, color_scale: Optional[Dict]=None):
+    """Generate an HTML representation of an array's shape and chunks (rendered with the bundled `array.html.j2`).
+
+    chunks: the chunk sizes along each axis (e.g. `darr.chunks`), or None for in-memory arrays (a single chunk).
+    n_layers: the number of graph layers of a lazy (dask) array, shown with its number of chunks.
+    meta_typename: the type of the (chunks of the) array, shown next to the dtype.
+    stats: summary statistics to list under the dtype (see `array_stats.get_array_stats`), or None.
+    color_scale: the color limits of the heatmap shown next to the card (see `color_scale_html`), or None.
+    """
+    is_chunked: bool = chunks is not None
     # Handle case when chunks is None (standard NumPy arrays)
     if chunks is None:
         # For NumPy arrays, create a simple representation with just one chunk per dimension
@@ -45,26 +304,18 @@ def array_repr_html(shape, chunks, dtype, size=120):
     nbytes = math.prod(shape) * dtype.itemsize if dtype and shape else "unknown"
     cbytes = math.prod(max(dim) for dim in chunks) * dtype.itemsize if dtype else "unknown"
 
-    template = Template("""
-    <div>
-        <div>{{ grid }}</div>
-        <p>Shape: {{ array.shape }}</p>
-        <p>Chunk size: {{ array.chunksize }}</p>
-        <p>Total size: {{ nbytes }}</p>
-        <p>Chunk memory: {{ cbytes }}</p>
-        <p>{{ layers }}</p>
-    </div>
-    """)
-    
-    layers = maybe_pluralize(len(chunks), "graph layer")
-
-    return template.render(
-        # array={"shape": shape, "chunksize": max(dim) for dim in chunks},
-        array={"shape": shape, "chunksize": [max(dim) for dim in chunks]},
+    layers = maybe_pluralize(n_layers, "graph layer") if n_layers else None
+    rows = stats_rows(stats) or {}
+    if color_scale is not None:
+        rows['Color scale'] = color_scale_html(color_scale)
+
+    return get_template('array.html.j2').render(
+        array={"shape": tuple(shape), "chunksize": tuple(max(dim) for dim in chunks), "dtype": dtype, "npartitions": (math.prod(len(dim) for dim in chunks) if is_chunked else None), "meta_typename": meta_typename},
         grid=svg,
         nbytes=format_bytes(nbytes) if nbytes != "unknown" else "unknown",
         cbytes=format_bytes(cbytes) if cbytes != "unknown" else "unknown",
         layers=layers,
+        stats_rows=(rows or None),
     )
 
 
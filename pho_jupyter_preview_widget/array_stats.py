@@ -0,0 +1,206 @@
+""" Summary statistics (min/max/mean/std, NaN/inf counts and a small histogram) of an array, computed in one chunked pass over its buffer.
+
+    from pho_jupyter_preview_widget.array_stats import get_array_stats
+
+    stats = get_array_stats(np.random.rand(4000, 4000))
+    stats['min'], stats['max'], stats['mean'], stats['std'], stats['n_nan'] # exact: every element was read once
+    stats['hist_counts'] # 32 bins over [min, max], from a bounded sample
+
+Every chunk of `chunk_elements` elements is cast once (so it stays cache-resident) and reduced to (count, min, max, mean, M2) plus its NaN/inf
+counts; the chunk results are merged with Chan et al.'s pairwise update, so nothing array-sized is ever allocated. Arrays of at least
+`parallel_min_elements` elements are split between threads (NumPy releases the GIL in these reductions). Arrays above `max_exact_elements`
+elements, and out-of-core arrays above `array_downsampling.OUT_OF_CORE_MAX_SAMPLES`, are summarized from a bounded sample instead (`is_estimate`).
+
+Results are plain JSON-able dicts, cached in `render_cache.default_render_cache` (so they also persist in its disk tier) and shared with the
+color scale estimate of `heatmap_rendering.sampled_finite_range`, so the data isn't read twice.
+"""
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+ARRAY_STATS_VERSION: int = 1 # part of the cache key: bump it when the contents of the stats dicts change
+
+_Moments = Tuple[int, int, int, int, float, float, float, float] # (n_finite, n_nan, n_posinf, n_neginf, min, max, mean, M2)
+_EMPTY_MOMENTS: _Moments = (0, 0, 0, 0, math.inf, -math.inf, 0.0, 0.0)
+
+
+def is_stats_dtype(dtype) -> bool:
+    """ Bools, integers and real floats have statistics; complex, datetime, string and object arrays don't. """
+    return np.dtype(dtype).kind in 'biuf'
+
+
+def bounded_sample(data: np.ndarray, max_samples: int) -> np.ndarray:
+    """ At most ~`max_samples` elements spread over the whole of `data` (keeps the mask of masked arrays).
+
+    Out-of-core (memory-mapped) contiguous arrays are sampled as 64 contiguous runs, which touch far fewer pages of the file than the same
+    number of strided elements; everything else is strided by the same factor along every axis.
+    """
+    data = np.asanyarray(data)
+    if data.size <= max_samples:
+        return data
+    from pho_jupyter_preview_widget.array_downsampling import is_out_of_core
+    if is_out_of_core(data) and (data.flags.c_contiguous or data.flags.f_contiguous):
+        n_blocks: int = 64
+        block_size: int = max(1, max_samples // n_blocks)
+        flat_data = data.reshape(-1, order='A')
+        starts = np.linspace(0, flat_data.shape[0] - block_size, num=n_blocks, dtype=np.int64)
+        return (np.ma.concatenate if np.ma.isMaskedArray(data) else np.concatenate)([flat_data[start:(start + block_size)] for start in starts])
+    step: int = int(np.ceil((data.size / max_samples) ** (1.0 / data.ndim)))
+    return data[tuple(slice(None, None, step) for _ in range(data.ndim))]
+
+
+# ==================================================================================================================== #
+# Chunk Kernels                                                                                                        #
+# ==================================================================================================================== #
+
+def _chunk_moments(chunk: np.ndarray) -> _Moments:
+    """ The moments of one (flat, cache-sized) chunk. Masked elements are skipped entirely. """
+    mask = np.ma.getmaskarray(chunk) if np.ma.isMaskedArray(chunk) else None
+    raw = np.ma.getdata(chunk)
+    values = raw.astype(np.float64, copy=False) if raw.dtype != np.bool_ else raw.astype(np.uint8).astype(np.float64)
+    n_nan = n_posinf = n_neginf = 0
+    if (raw.dtype.kind == 'f') or (mask is not None):
+        is_finite = np.isfinite(values)
+        if mask is not None:
+            is_finite &= ~mask
+        if not is_finite.all():
+            if raw.dtype.kind == 'f':
+                is_unmasked = ~mask if (mask is not None) else True
+                n_nan = int(np.count_nonzero(np.isnan(values) & is_unmasked))
+                n_posinf = int(np.count_nonzero((values == np.inf) & is_unmasked))
+                n_neginf = int(np.count_nonzero((values == -np.inf) & is_unmasked))
+            values = values[is_finite]
+    n: int = int(values.size)
+    if n == 0:
+        return (0, n_nan, n_posinf, n_neginf, math.inf, -math.inf, 0.0, 0.0)
+    mean: float = float(values.mean())
+    deviations = values - mean
+    return (n, n_nan, n_posinf, n_neginf, float(values.min()), float(values.max()), mean, float(np.dot(deviations, deviations)))
+
+
+def _merge_moments(a: _Moments, b: _Moments) -> _Moments:
+    """ Chan et al.'s pairwise combination of two partial (count, mean, M2) summaries, plus the counts and extrema. """
+    n_a, n_b = a[0], b[0]
+    n: int = n_a + n_b
+    counts = (n, a[1] + b[1], a[2] + b[2], a[3] + b[3], min(a[4], b[4]), max(a[5], b[5]))
+    if n_a == 0 or n_b == 0:
+        return counts + ((a[6], a[7]) if n_b == 0 else (b[6], b[7]))
+    delta: float = b[6] - a[6]
+    return counts + (a[6] + delta * (n_b / n), a[7] + b[7] + (delta * delta) * (n_a * n_b / n))
+
+
+def _flat_chunks(arr: np.ndarray, chunk_elements: int) -> List[np.ndarray]:
+    """ Views of `arr` holding about `chunk_elements` elements each (flat for contiguous arrays, runs of rows along axis 0 otherwise). """
+    if arr.ndim == 0:
+        return [arr.reshape(1)]
+    if arr.flags.c_contiguous or arr.flags.f_contiguous:
+        flat_arr = arr.reshape(-1, order='A')
+        return [flat_arr[start:(start + chunk_elements)] for start in range(0, flat_arr.shape[0], chunk_elements)]
+    rows_per_chunk: int = max(1, chunk_elements // max(1, math.prod(arr.shape[1:])))
+    return [arr[start:(start + rows_per_chunk)].reshape(-1) for start in range(0, arr.shape[0], rows_per_chunk)] # `reshape` copies one chunk at a time
+
+
+def _reduce_chunks(chunks: List[np.ndarray]) -> _Moments:
+    moments = _EMPTY_MOMENTS
+    for chunk in chunks:
+        moments = _merge_moments(moments, _chunk_moments(chunk))
+    return moments
+
+
+# ==================================================================================================================== #
+# Statistics                                                                                                           #
+# ==================================================================================================================== #
+
+def compute_array_stats(arr: np.ndarray, n_bins: int=32, chunk_elements: int=(1 << 16), parallel_min_elements: int=(1 << 22), max_workers: Optional[int]=None, max_exact_elements: int=(1 << 27), max_samples: Optional[int]=None, max_hist_samples: int=(1 << 16)) -> Optional[Dict]:
+    """ The summary statistics of `arr` (see the module docstring), or None for dtypes without any (see `is_stats_dtype`).
+
+    n_bins: the number of histogram bins over the finite [min, max] range.
+    chunk_elements: elements per chunk: small enough that the float64 copy of a chunk stays in cache.
+    parallel_min_elements, max_workers: arrays with at least this many elements are reduced on a thread pool.
+    max_exact_elements, max_samples: arrays with more elements (or out-of-core arrays with more than `OUT_OF_CORE_MAX_SAMPLES`) are summarized from
+        a bounded sample of `max_samples` elements (default 2**20, or `OUT_OF_CORE_MAX_SAMPLES` for out-of-core arrays).
+    max_hist_samples: the histogram is always counted from a sample of at most this many elements.
+
+    Returns a dict with: n (elements summarized), n_finite, n_nan, n_posinf, n_neginf, n_masked, min, max, mean, std (None without finite values),
+    hist_counts, hist_range, is_estimate.
+    """
+    from pho_jupyter_preview_widget.array_downsampling import is_out_of_core, OUT_OF_CORE_MAX_SAMPLES
+    arr = np.asanyarray(arr)
+    if not is_stats_dtype(arr.dtype):
+        return None
+
+    out_of_core: bool = is_out_of_core(arr)
+    exact_limit: int = OUT_OF_CORE_MAX_SAMPLES if out_of_core else max_exact_elements
+    if max_samples is None:
+        max_samples = OUT_OF_CORE_MAX_SAMPLES if out_of_core else (1 << 20)
+    is_estimate: bool = arr.size > exact_limit
+    data = bounded_sample(arr, max_samples) if is_estimate else arr
+
+    chunks = _flat_chunks(data, chunk_elements=chunk_elements)
+    if (data.size >= parallel_min_elements) and (len(chunks) > 1):
+        n_workers: int = min(len(chunks), max_workers or min(32, (os.cpu_count() or 1)))
+        groups = [chunks[i::n_workers] for i in range(n_workers)]
+        with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='pho_array_stats') as executor:
+            partials = list(executor.map(_reduce_chunks, groups))
+        moments = _EMPTY_MOMENTS
+        for partial in partials:
+            moments = _merge_moments(moments, partial)
+    else:
+        moments = _reduce_chunks(chunks)
+
+    n_finite, n_nan, n_posinf, n_neginf, vmin, vmax, mean, m2 = moments
+    n: int = int(data.size)
+    stats = dict(n=n, n_finite=n_finite, n_nan=n_nan, n_posinf=n_posinf, n_neginf=n_neginf, n_masked=(n - n_finite - n_nan - n_posinf - n_neginf),
+                 min=None, max=None, mean=None, std=None, hist_counts=[], hist_range=None, is_estimate=is_estimate)
+    if n_finite > 0:
+        stats.update(min=vmin, max=vmax, mean=mean, std=math.sqrt(max(0.0, m2 / n_finite)), hist_range=[vmin, vmax])
+        hist_sample = bounded_sample(data, max_hist_samples)
+        if np.ma.isMaskedArray(hist_sample):
+            hist_sample = hist_sample.compressed()
+        hist_sample = np.asarray(hist_sample, dtype=np.float64).reshape(-1)
+        hist_sample = hist_sample[np.isfinite(hist_sample)]
+        counts, _ = np.histogram(hist_sample, bins=n_bins, range=((vmin, vmax) if (vmax > vmin) else (vmin - 0.5, vmax + 0.5)))
+        stats['hist_counts'] = counts.tolist()
+    return stats
+
+
+def _stats_cache_key(arr: np.ndarray, stats_kwargs: Dict):
+    from pho_jupyter_preview_widget.render_cache import default_render_cache
+    return default_render_cache.make_key(arr, dict(array_stats=ARRAY_STATS_VERSION, **stats_kwargs))
+
+
+def get_array_stats(arr: np.ndarray, use_render_cache: bool=True, **stats_kwargs) -> Optional[Dict]:
+    """ `compute_array_stats(arr, **stats_kwargs)` behind the shared render cache: re-displaying (or re-scaling) the same array contents doesn't read them again. """
+    arr = np.asanyarray(arr)
+    if not is_stats_dtype(arr.dtype):
+        return None
+    cache_key = None
+    if use_render_cache:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        cache_key = _stats_cache_key(arr, stats_kwargs)
+        if cache_key is not None:
+            cached_json = default_render_cache.get(cache_key, None)
+            if cached_json is not None:
+                return json.loads(cached_json)
+
+    stats = compute_array_stats(arr, **stats_kwargs)
+    if (cache_key is not None) and (stats is not None):
+        default_render_cache.put(cache_key, json.dumps(stats)) # a string, so it's sized like the previews and can go to the disk tier
+    return stats
+
+
+def peek_array_stats(arr: np.ndarray) -> Optional[Dict]:
+    """ The (default-configured) stats of `arr` if they're already in the render cache, without computing anything. """
+    from pho_jupyter_preview_widget.render_cache import default_render_cache
+    if not is_stats_dtype(np.asanyarray(arr).dtype):
+        return None
+    cache_key = _stats_cache_key(np.asanyarray(arr), {})
+    if (cache_key is None) or (cache_key not in default_render_cache):
+        return None
+    cached_json = default_render_cache.get(cache_key, None)
+    return json.loads(cached_json) if (cached_json is not None) else None
@@ -0,0 +1,133 @@
+""" Non-blocking preview rendering: a cheap placeholder is displayed immediately under a `display_id` and a worker thread
+swaps in the fully rendered preview with `update_display` once it's ready.
+
+    from pho_jupyter_preview_widget.display_helpers import array_repr_with_graphical_preview
+    ip = array_repr_with_graphical_preview(ip=ip, async_rendering=True)
+
+"""
+import contextvars
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+
+class BackgroundPreviewRenderer:
+    """ Renders previews on a small thread pool and pushes each result into its display handle.
+
+    - At most `max_pending` renders are queued; submitting beyond that drops the oldest queued (not yet started) render, whose placeholder is replaced by `dropped_html`.
+    - Renders are tagged with the id of the cell that displayed them; when that cell is re-run (`pre_run_cell`), its still-queued renders are cancelled since their outputs are about to be cleared.
+    - Each render runs inside a copy of the submitting context so the kernel attributes the `update_display` message to the originating cell.
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 64):
+        self.max_pending: int = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pho_preview_render')
+        self._pending: "OrderedDict[int, Tuple[Future, Optional[str], object, Optional[str]]]" = OrderedDict()
+        self._lock = threading.RLock() # re-entrant: cancelling a future runs its done-callback (`_on_done`) synchronously
+        self._next_id = itertools.count()
+        self._current_cell_id: Optional[str] = None
+        self._hooked_shells = [] # shells whose 'pre_run_cell' event calls `on_pre_run_cell`
+        self.n_completed: int = 0
+        self.n_dropped: int = 0
+        self.n_cancelled: int = 0
+
+    @property
+    def n_pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, display_handle, render_fn: Callable[[], str], dropped_html: Optional[str] = None) -> Future:
+        """ Queues `render_fn()` (which returns the final HTML) and updates `display_handle` with the result. """
+        from IPython.display import HTML
+
+        ctx = contextvars.copy_context()
+        render_id: int = next(self._next_id)
+
+        def _run():
+            html: str = render_fn()
+            display_handle.update(HTML(html))
+            return html
+
+        future: Future = self._executor.submit(ctx.run, _run)
+        with self._lock:
+            self._pending[render_id] = (future, self._current_cell_id, display_handle, dropped_html)
+            while len(self._pending) > self.max_pending:
+                self._drop_oldest_queued()
+        future.add_done_callback(lambda f, render_id=render_id: self._on_done(render_id, f))
+        return future
+
+    def _on_done(self, render_id: int, future: Future):
+        with self._lock:
+            self._pending.pop(render_id, None)
+            if not future.cancelled():
+                self.n_completed += 1
+        if (not future.cancelled()) and (future.exception() is not None):
+            print(f'ERROR: background preview render failed:\n\terr: {future.exception()}')
+
+    def _drop_oldest_queued(self):
+        """ Must be called with the lock held. Renders that already started can't be cancelled and are left to finish. """
+        for render_id, (future, _cell_id, display_handle, dropped_html) in self._pending.items():
+            if future.cancel():
+                self._pending.pop(render_id, None)
+                self.n_dropped += 1
+                if dropped_html is not None:
+                    from IPython.display import HTML
+                    display_handle.update(HTML(dropped_html))
+                return
+        # everything queued is already running; nothing more can be dropped
+        self._pending.popitem(last=False)
+
+    def cancel_cell(self, cell_id: Optional[str]) -> int:
+        """ Cancels the still-queued renders that were submitted by `cell_id`. Returns the number cancelled. """
+        if cell_id is None:
+            return 0
+        n_cancelled: int = 0
+        with self._lock:
+            for render_id, (future, render_cell_id, _display_handle, _dropped_html) in list(self._pending.items()):
+                if (render_cell_id == cell_id) and future.cancel():
+                    self._pending.pop(render_id, None)
+                    n_cancelled += 1
+            self.n_cancelled += n_cancelled
+        return n_cancelled
+
+    def on_pre_run_cell(self, info=None):
+        """ `ip.events` 'pre_run_cell' callback: remembers the running cell and drops its stale queued renders from the previous run. """
+        cell_id: Optional[str] = getattr(info, 'cell_id', None)
+        self._current_cell_id = cell_id
+        self.cancel_cell(cell_id)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(n_pending=self.n_pending, n_completed=self.n_completed, n_dropped=self.n_dropped, n_cancelled=self.n_cancelled)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_default_renderer: Optional[BackgroundPreviewRenderer] = None
+
+
+def _get_executing_cell_id(ip) -> Optional[str]:
+    """ The frontend's id for the cell currently executing in `ip` (from the execute_request metadata), if the kernel exposes one. """
+    kernel = getattr(ip, 'kernel', None)
+    if kernel is None:
+        return None
+    try:
+        parent = kernel.get_parent() if hasattr(kernel, 'get_parent') else getattr(kernel, '_parent_header', {})
+        return (parent or {}).get('metadata', {}).get('cellId', None)
+    except Exception:
+        return None
+
+
+def get_background_renderer(ip=None) -> BackgroundPreviewRenderer:
+    """ Returns the shared renderer, creating it on first use.
+
+    If `ip` is provided (and not hooked yet), registers the 'pre_run_cell' callback and seeds the current cell id from the execution in progress, since that cell's own 'pre_run_cell' has already fired.
+    """
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = BackgroundPreviewRenderer()
+    if (ip is not None) and (ip not in _default_renderer._hooked_shells):
+        ip.events.register('pre_run_cell', _default_renderer.on_pre_run_cell)
+        _default_renderer._hooked_shells.append(ip)
+        _default_renderer._current_cell_id = _get_executing_cell_id(ip)
+    return _default_renderer
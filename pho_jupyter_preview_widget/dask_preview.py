@@ -0,0 +1,69 @@
+""" Thumbnail previews of `dask.array.Array`s that only compute the few chunks the thumbnail is drawn from.
+
+    import dask.array as da
+    from pho_jupyter_preview_widget.dask_preview import dask_preview_sample
+
+    darr = da.from_zarr('recording.zarr') # e.g. 100 GB in 64 MB chunks
+    sample, n_blocks_read = dask_preview_sample(darr, target_shape=(256, 256), max_blocks=16)
+    sample.shape # at most ~256 x 256 (per displayed axis), computed from at most 16 chunks
+
+Rather than coarsening the whole array (`da.coarsen` still reads every chunk), a handful of evenly spaced blocks is selected
+per axis with `darr.blocks[...]` and strided inside, so the culled task graph touches at most `max_blocks` input chunks and
+runs on the local synchronous scheduler. The thumbnail is therefore a mosaic of the sampled chunks, not of the whole array.
+"""
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from pho_jupyter_preview_widget.nd_preview import sample_slice_indices
+
+
+def is_dask_array(obj) -> bool:
+    """ True for `dask.array.Array` instances, checked without importing dask. """
+    return type(obj).__module__.startswith('dask.array') and hasattr(obj, 'chunks') and hasattr(obj, 'blocks')
+
+
+def _allocate_blocks_per_axis(numblocks: Tuple[int, ...], priority_axes: List[int], max_blocks: int) -> List[int]:
+    """ How many blocks to select along each axis: one everywhere, then more along `priority_axes` (round-robin) while the total stays within `max_blocks`. """
+    counts: List[int] = [1] * len(numblocks)
+    grew: bool = True
+    while grew:
+        grew = False
+        for axis in priority_axes:
+            if (counts[axis] < numblocks[axis]) and (math.prod(counts) // counts[axis] * (counts[axis] + 1) <= max_blocks):
+                counts[axis] += 1
+                grew = True
+    return counts
+
+
+def dask_preview_sample(darr, target_shape: Tuple[int, int]=(256, 256), max_blocks: int=16, nd_axis: int=0, nd_max_slices: int=16) -> Tuple[np.ndarray, int]:
+    """ Computes a small NumPy sample of `darr` to draw a thumbnail from. Returns (sample, n_blocks_read).
+
+    target_shape: the resolution of the two image (last) axes of the sample.
+    max_blocks: the most input chunks that are computed.
+    nd_axis, nd_max_slices: for ndim > 2, the slicing axis (see `nd_preview.nd_preview_image`), which keeps up to `nd_max_slices` elements. Every other leading axis keeps a single block, strided to the same extent.
+
+    Raises ValueError for arrays with unknown chunk sizes (computing those would mean computing the array).
+    """
+    if any(math.isnan(n) for n in darr.shape):
+        raise ValueError('dask array has unknown chunk sizes; call `compute_chunk_sizes()` first to preview it')
+    if darr.ndim == 0 or darr.size == 0:
+        return np.asarray(darr.compute(scheduler='synchronous')), 1
+
+    image_axes: List[int] = list(range(darr.ndim))[-2:]
+    axis_targets: List[int] = [nd_max_slices] * darr.ndim
+    for axis, target in zip(image_axes, target_shape[-len(image_axes):]):
+        axis_targets[axis] = target
+    priority_axes: List[int] = image_axes + ([int(nd_axis) % darr.ndim] if darr.ndim > 2 else [])
+    blocks_per_axis = _allocate_blocks_per_axis(darr.numblocks, priority_axes=priority_axes, max_blocks=max_blocks)
+
+    selected = darr
+    for axis, n_selected in enumerate(blocks_per_axis):
+        if n_selected < darr.numblocks[axis]:
+            block_indices = sample_slice_indices(darr.numblocks[axis], n_selected).tolist()
+            selected = selected.blocks[(slice(None),) * axis + (block_indices,)]
+
+    steps = tuple(slice(None, None, max(1, int(math.ceil(n / target)))) for n, target in zip(selected.shape, axis_targets))
+    sample = np.asarray(selected[steps].compute(scheduler='synchronous'))
+    return sample, math.prod(blocks_per_axis)
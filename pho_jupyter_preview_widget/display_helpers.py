@@ -1,26 +1,40 @@
+from __future__ import annotations # annotations (`NDArray`, "ipykernel...") are never evaluated, so their modules needn't be imported
+
+import sys
 from copy import deepcopy
-from typing import Dict, List, Tuple, Optional, Callable, Union, Any, NewType, TypeVar
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Callable, Union, Any, NewType, TypeVar
 import IPython
 import IPython.display
-from nptyping import NDArray
 
 import numpy as np
-import pandas as pd
 # import dask.array as da
 # from pho_jupyter_preview_widget.array_shape_display import array_repr_html
 from pho_jupyter_preview_widget.array_shape_display.array_shape_display import array_repr_html
+from pho_jupyter_preview_widget.profiling import default_profiler # per-stage timers/counters, a no-op unless enabled (`%preview_stats on`)
 
-import ipykernel # ip: "ipykernel.zmqshell.ZMQInteractiveShell)" = IPython.get_ipython()
-from IPython.display import display, HTML, Javascript
-from ipywidgets import widgets, VBox, HBox
+from IPython.display import display, HTML
 
 from io import BytesIO
 import base64
+import html
+import math
+import threading
+import time
+
+## Heavy dependencies (matplotlib, pandas, ipywidgets, jinja2, pyphocorehelpers) are imported by the functions that use them, so importing this module (and registering the formatters) stays fast
+if TYPE_CHECKING:
+    import ipykernel # ip: "ipykernel.zmqshell.ZMQInteractiveShell)" = IPython.get_ipython()
+    from nptyping import NDArray
 
 
-import matplotlib.pyplot as plt
+_LAZY_PRINT_HELPERS = ('render_scrollable_colored_table_from_dataframe', 'render_scrollable_colored_table')
 
-from pyphocorehelpers.print_helpers import render_scrollable_colored_table_from_dataframe, render_scrollable_colored_table
+def __getattr__(name: str):
+    """ Still exposes the `pyphocorehelpers.print_helpers` table renderers this module used to import eagerly, loading them on first access. """
+    if name in _LAZY_PRINT_HELPERS:
+        import pyphocorehelpers.print_helpers
+        return getattr(pyphocorehelpers.print_helpers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ==================================================================================================================== #
@@ -43,11 +57,12 @@ def array_preview_with_shape(arr):
         display(arr)
 
     """
+    pd = sys.modules.get('pandas', None) # if pandas was never imported, `arr` can't be a DataFrame
     if isinstance(arr, np.ndarray):
         display(HTML(f"<pre>array{arr.shape} of dtype {arr.dtype}</pre>"))
     elif isinstance(arr, (list, tuple)):
         display(HTML(f"<pre>native-python list {len(arr)}</pre>"))
-    elif isinstance(arr, pd.DataFrame):
+    elif (pd is not None) and isinstance(arr, pd.DataFrame):
         display(HTML(f"<pre>DataFrame with {len(arr)} rows and {len(arr.columns)} columns</pre>"))
     else:
         raise ValueError("The input is not a NumPy array.")
@@ -77,8 +92,7 @@ def array_preview_with_graphical_shape_repr_html(arr):
     """
     if isinstance(arr, np.ndarray):
         # arr = da.array(arr)
-        arr = array_repr_html(arr)
-        return display(arr)
+        return array_repr_html(arr.shape, None, arr.dtype)
         # shape_str = ' &times; '.join(map(str, arr.shape))
         # dtype_str = arr.dtype
         # return f"<pre>array[{shape_str}] dtype={dtype_str}</pre>"
@@ -128,9 +142,11 @@ class MatplotlibToIPythonWidget:
             
         """
         try:                
-            buf = BytesIO()            
-            fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
-            buf.seek(0)
+            with default_profiler.stage('matplotlib') as stage:
+                buf = BytesIO()            
+                fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
+                buf.seek(0)
+                stage.add(bytes_out=buf.getbuffer().nbytes)
         except BaseException as err:
             # SystemError: tile cannot extend outside image
             print(f'ERROR: Encountered error while convert matplotlib fig: {fig} to bytes:\n\terr: {err}')
@@ -142,12 +158,13 @@ class MatplotlibToIPythonWidget:
 
 
     @classmethod
-    def matplotlib_fig_to_ipython_img(cls, fig, **img_kwargs) -> Optional[widgets.Image]:
+    def matplotlib_fig_to_ipython_img(cls, fig, **img_kwargs) -> Optional[IPython.core.display.Image]:
+        """ The figure as a PNG `IPython.display.Image`. Deliberately not a `widgets.Image`: constructing a widget opens a comm to the frontend (never closed) just to read back `.data`. """
         img_kwargs = dict(width=None, height=img_kwargs.get('height', 100), format='png') | img_kwargs
         buf = cls._matplotlib_fig_to_bytes(fig)
         if buf is not None:
             # Create an IPython Image object
-            img = widgets.Image(data=buf.getvalue(), **img_kwargs)
+            img = IPython.core.display.Image(data=buf.getvalue(), **img_kwargs)
             return img
         else:
             return None
@@ -229,8 +246,10 @@ class MatplotlibToIPythonWidget:
 
 
     
-def _subfn_create_heatmap(data: NDArray, brokenaxes_kwargs=None) -> Optional[BytesIO]: # , omission_indices: list = None
-    """ 
+_matplotlib_heatmap_lock = threading.Lock()
+
+def _subfn_create_heatmap_matplotlib(data: NDArray, brokenaxes_kwargs=None, cmap: str='viridis', vmin: Optional[float]=None, vmax: Optional[float]=None, norm: str='linear', sentinel_colors: Optional[Dict]=None) -> Optional[BytesIO]: # , omission_indices: list = None
+    """ Matplotlib fallback render path for `_subfn_create_heatmap` (builds a pyplot figure, `imshow`s the data and `savefig`s it).
     
     #TODO 2024-08-16 04:05: - [ ] Make non-interactive and open in the background
 
@@ -265,39 +284,78 @@ def _subfn_create_heatmap(data: NDArray, brokenaxes_kwargs=None) -> Optional[Byt
     
     import matplotlib.pyplot as plt
     
-    try:
-        imshow_shared_kwargs = {
-            'origin': 'lower',
-        }
-
-        active_cmap = 'viridis'
-        fig = plt.figure(figsize=(3, 3), num='_jup_backend')
-        ax = fig.add_subplot(111)
-        ax.imshow(data, cmap=active_cmap, **imshow_shared_kwargs)
-        ax.axis('off')
+    with _matplotlib_heatmap_lock, default_profiler.stage('matplotlib', bytes_in=data.nbytes) as stage: # pyplot isn't thread-safe and every call shares the '_jup_backend' figure (background renders can get here concurrently)
+        try:
+            imshow_shared_kwargs = {
+                'origin': 'lower',
+            }
+
+            active_cmap = cmap
+            if sentinel_colors and (sentinel_colors.get('nan', None) is not None):
+                import matplotlib
+                active_cmap = matplotlib.colormaps[cmap].with_extremes(bad=tuple(c / 255.0 for c in sentinel_colors['nan'])) # matplotlib has a single "bad" color for NaN and inf
+            if norm == 'log':
+                from matplotlib.colors import LogNorm
+                imshow_shared_kwargs['norm'] = LogNorm(vmin=vmin, vmax=vmax)
+            else:
+                imshow_shared_kwargs.update(vmin=vmin, vmax=vmax)
+            fig = plt.figure(figsize=(3, 3), num='_jup_backend')
+            ax = fig.add_subplot(111)
+            ax.imshow(data, cmap=active_cmap, **imshow_shared_kwargs)
+            ax.axis('off')
+                
+            buf = BytesIO()
+            fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
+            buf.seek(0)
+            stage.add(bytes_out=buf.getbuffer().nbytes)
             
-        buf = BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
-        buf.seek(0)
-        
-    except SystemError as err:
-        # SystemError: tile cannot extend outside image
-        print(f'ERROR: Encountered error while plotting heatmap:\n\terr: {err}')
-        print(f'\tnp.shape(data): {np.shape(data)}\n\tdata: {data}')
-        buf = None
+        except SystemError as err:
+            # SystemError: tile cannot extend outside image
+            print(f'ERROR: Encountered error while plotting heatmap:\n\terr: {err}')
+            print(f'\tnp.shape(data): {np.shape(data)}\n\tdata: {data}')
+            buf = None
 
-    finally:
-        plt.close()        
+        finally:
+            plt.close()        
     
     return buf
 
+
+def _subfn_create_heatmap(data: NDArray, brokenaxes_kwargs=None, cmap: str='viridis', render_engine: str='native', vmin: Optional[float]=None, vmax: Optional[float]=None, png_compression_level: int=9, norm: str='linear', sentinel_colors: Optional[Dict]=None) -> Optional[BytesIO]: # , omission_indices: list = None
+    """ Renders `data` as a thumbnail heatmap PNG.
+
+    render_engine: 'native' (default) rasterizes directly with NumPy + zlib to an 8-bit palette PNG (see `heatmap_rendering.render_heatmap_png`), falling back to matplotlib if that fails. 'matplotlib' always uses the `imshow` + `savefig` path (32-bit RGBA).
+    vmin, vmax: explicit color scale limits (e.g. shared between several arrays); computed from the data when None.
+    png_compression_level: the zlib level (0-9) of the native encoder; lower is faster, higher is smaller.
+    norm: 'linear' or 'log' color scaling.
+    sentinel_colors: the RGB colors of NaN, +inf and -inf (keys 'nan', 'posinf', 'neginf', see `heatmap_rendering.DEFAULT_SENTINEL_COLORS`); None leaves them transparent. matplotlib only has one "bad" color, the NaN one.
+
+    """
+    if render_engine == 'native':
+        try:
+            from pho_jupyter_preview_widget.heatmap_rendering import render_heatmap_png
+            buf = BytesIO(render_heatmap_png(data, cmap=cmap, vmin=vmin, vmax=vmax, origin='lower', compression_level=png_compression_level, norm=norm, sentinel_colors=sentinel_colors))
+            return buf
+        except (ValueError, TypeError) as err:
+            print(f'WARN: native heatmap rendering failed, falling back to matplotlib:\n\terr: {err}')
+            default_profiler.count('matplotlib', fallbacks=1)
+    elif render_engine != 'matplotlib':
+        raise ValueError(f'Unknown render_engine: "{render_engine}". Expected "native" or "matplotlib".')
+
+    try:
+        return _subfn_create_heatmap_matplotlib(data, brokenaxes_kwargs=brokenaxes_kwargs, cmap=cmap, vmin=vmin, vmax=vmax, norm=norm, sentinel_colors=sentinel_colors)
+    except ImportError as err:
+        print(f'ERROR: matplotlib is not available for the fallback heatmap render:\n\terr: {err}')
+        return None
+
+
 # Convert to ipywidgets Image
-def _subfn_display_heatmap(data: NDArray, brokenaxes_kwargs=None, **img_kwargs) -> Optional[IPython.core.display.Image]:
+def _subfn_display_heatmap(data: NDArray, brokenaxes_kwargs=None, cmap: str='viridis', render_engine: str='native', vmin: Optional[float]=None, vmax: Optional[float]=None, png_compression_level: int=9, norm: str='linear', sentinel_colors: Optional[Dict]=None, **img_kwargs) -> Optional[IPython.core.display.Image]:
     """ Renders a small thumbnail Image of a heatmap array
     
     """
     img_kwargs = dict(width=None, height=img_kwargs.get('height', 100), format='png') | img_kwargs
-    buf = _subfn_create_heatmap(data, brokenaxes_kwargs=brokenaxes_kwargs)
+    buf = _subfn_create_heatmap(data, brokenaxes_kwargs=brokenaxes_kwargs, cmap=cmap, render_engine=render_engine, vmin=vmin, vmax=vmax, png_compression_level=png_compression_level, norm=norm, sentinel_colors=sentinel_colors)
     if buf is not None:
         # Create an IPython Image object
         img = IPython.core.display.Image(data=buf.getvalue(), **img_kwargs) # IPython.core.display.Image
@@ -307,13 +365,28 @@ def _subfn_display_heatmap(data: NDArray, brokenaxes_kwargs=None, **img_kwargs)
 
 
 # @function_attributes(short_name='array2str', tags=['array', 'formatting', 'fix'], input_requires=[], output_provides=[], uses=[], used_by=[], creation_date='2024-11-27 07:45')
-def smart_array2string(arr: NDArray, disable_readible_format: bool=False, separator=',', **kwargs) -> str:
+def smart_array2string(arr: NDArray, disable_readible_format: bool=False, separator=',', max_chars: int=4000, **kwargs) -> str:
     """ Drop-in replacement for `np.array2string` which consistently handles spaces. np.array2string automatically tries to format arrays in a way that is readable for matricies of data, but it uses the same formatting rules for 1D arrays, resulting in inconsistent numbers of spaces between elements. This function fixes that.
     if disable_readible_format is False, nothing special is done.
+
+    Arrays that could print more than `max_chars` characters (or more elements than the summarization `threshold`), compact 1D output and empty N-D arrays (which keep their shape),
+    are formatted by `plaintext_formatting.format_array_text` instead, which only reads the elements it shows and never returns more than `max_chars` characters.
+    kwargs: `np.array2string`'s precision, threshold, edgeitems, suppress_small and max_line_width are honored by both paths.
     """
-    if disable_readible_format and (np.ndim(arr) == 1):
-        ## np.array2string automatically tries to format arrays in a way that is readable for matricies of data, but it uses the same formatting rules for 1D arrays, resulting in inconsistent numbers of spaces between elements. This function fixes that.
-        return f'{separator} '.join([v.strip(' ') for v in np.array2string(arr, separator=separator, **kwargs).split(separator)]).replace('[ ', '[').replace(' ]', ']')
+    with default_profiler.stage('plaintext') as stage:
+        text: str = _smart_array2string(arr, disable_readible_format=disable_readible_format, separator=separator, max_chars=max_chars, **kwargs)
+        stage.add(bytes_out=len(text))
+    return text
+
+
+def _smart_array2string(arr: NDArray, disable_readible_format: bool=False, separator=',', max_chars: int=4000, **kwargs) -> str:
+    print_options = np.get_printoptions()
+    threshold: int = kwargs.get('threshold', print_options['threshold'])
+    if (disable_readible_format and (np.ndim(arr) == 1)) or (np.size(arr) > min(threshold, max_chars // 2)) or ((np.size(arr) == 0) and (np.ndim(arr) > 1)):
+        from pho_jupyter_preview_widget.plaintext_formatting import format_array_text
+        return format_array_text(arr, max_chars=max_chars, separator=(f'{separator} ' if disable_readible_format else separator), align_columns=(False if disable_readible_format else None),
+                                 edgeitems=kwargs.get('edgeitems', print_options['edgeitems']), threshold=threshold, precision=kwargs.get('precision', print_options['precision']),
+                                 suppress_small=kwargs.get('suppress_small', print_options['suppress']), linewidth=kwargs.get('max_line_width', print_options['linewidth']))
     else:
         return np.array2string(arr, separator=separator, **kwargs)
     
@@ -321,8 +394,237 @@ def smart_array2string(arr: NDArray, disable_readible_format: bool=False, separa
 # ==================================================================================================================== #
 # Main formatting function                                                                                             #
 # ==================================================================================================================== #
-def single_NDArray_array_preview_with_heatmap_repr_html(arr, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, **kwargs):
+def _base64_length(n_bytes: int) -> int:
+    return 4 * math.ceil(n_bytes / 3)
+
+
+def _budgeted_heatmap_image(heatmap_arr: np.ndarray, max_image_bytes: Optional[int]=None, downsample_reducer: str='mean', min_side: int=8, **kwargs) -> Tuple[Optional[IPython.core.display.Image], Optional[Tuple[int, int]]]:
+    """ Renders `heatmap_arr` with `_subfn_display_heatmap`, halving its resolution until the base64-encoded PNG fits in `max_image_bytes`.
+
+    Returns (image, reduced_shape): reduced_shape is None if the full resolution already fitted, and image is None if the image couldn't be
+    rendered or still doesn't fit once every side is down to `min_side` pixels. The color scale is fixed from the full-resolution data, so the degraded image shows the same colors.
+    """
+    heatmap_image = _subfn_display_heatmap(heatmap_arr, **kwargs)
+    if (heatmap_image is None) or (max_image_bytes is None) or (_base64_length(len(heatmap_image.data)) <= max_image_bytes):
+        return heatmap_image, None
+
+    from pho_jupyter_preview_widget.array_downsampling import downsample_2d
+    default_profiler.count('output_budget', degraded=1)
+    if (kwargs.get('vmin', None) is None) or (kwargs.get('vmax', None) is None):
+        from pho_jupyter_preview_widget.normalization import finite_range
+        value_range = finite_range(heatmap_arr)
+        if value_range is not None:
+            kwargs['vmin'] = value_range[0] if (kwargs.get('vmin', None) is None) else kwargs['vmin']
+            kwargs['vmax'] = value_range[1] if (kwargs.get('vmax', None) is None) else kwargs['vmax']
+    reducer: str = 'max' if (downsample_reducer == 'minmax') else downsample_reducer # the envelope is already interleaved, don't interleave it again
+
+    reduced_arr = np.atleast_2d(heatmap_arr)
+    while max(reduced_arr.shape) > min_side:
+        reduced_arr = downsample_2d(reduced_arr, target_shape=tuple(n if (n <= min_side) else max(min_side, n // 2) for n in reduced_arr.shape), reducer=reducer)
+        heatmap_image = _subfn_display_heatmap(reduced_arr, **kwargs)
+        if heatmap_image is None:
+            return None, None
+        if _base64_length(len(heatmap_image.data)) <= max_image_bytes:
+            return heatmap_image, tuple(reduced_arr.shape)
+    return None, None
+
+
+def _resolve_color_scale(heatmap_arr: np.ndarray, render_kwargs: Dict, color_scale: str='percentile', color_percentiles: Tuple[float, float]=(1.0, 99.0), nonfinite_colors: bool=True, color_scale_info: Optional[Dict]=None, data_stats: Optional[Dict]=None):
+    """ Sets the 'vmin', 'vmax', 'norm' and 'sentinel_colors' of `render_kwargs` (of `_subfn_display_heatmap`) for the thumbnail `heatmap_arr`, keeping any vmin/vmax already given,
+    and describes them in `color_scale_info` (if given). The limits come from a bounded sample of the thumbnail, so the cost doesn't depend on the size of the array it was reduced from.
+
+    data_stats: the exact `array_stats` of the array the thumbnail was reduced from, if already computed (for its shape card). The 'minmax' scale then spans its
+        true range (which a mean-reduced thumbnail understates) without another pass, and the non-finite scans are skipped when it has no NaN/inf.
+    """
+    from pho_jupyter_preview_widget.normalization import color_scale_limits, finite_range
+    from pho_jupyter_preview_widget.heatmap_rendering import DEFAULT_SENTINEL_COLORS
+    vmin, vmax = render_kwargs.get('vmin', None), render_kwargs.get('vmax', None)
+    norm: str = 'log' if (color_scale == 'log') else 'linear'
+    used_scale: str = color_scale if ((vmin is None) or (vmax is None)) else 'fixed'
+    if (data_stats is not None) and data_stats.get('is_estimate', True):
+        data_stats = None # only exact statistics stand in for reading the thumbnail
+    data_range = None if ((data_stats is None) or (data_stats['min'] is None)) else (data_stats['min'], data_stats['max'])
+    with default_profiler.stage('color_scale', bytes_in=heatmap_arr.nbytes):
+        if used_scale != 'fixed':
+            if (color_scale == 'minmax') and (data_range is not None):
+                limits = data_range
+            else:
+                limits = color_scale_limits(heatmap_arr, color_scale=color_scale, percentiles=color_percentiles)
+            if (limits is None) and (color_scale == 'log'):
+                norm, used_scale = 'linear', 'minmax' # nothing positive to take the log of
+                limits = data_range or finite_range(heatmap_arr)
+            if limits is not None:
+                vmin = limits[0] if (vmin is None) else vmin
+                vmax = limits[1] if (vmax is None) else vmax
+        sentinels: Dict[str, Tuple[int, int, int]] = {}
+        values = np.ma.getdata(heatmap_arr)
+        has_nonfinite: bool = (data_stats is None) or ((data_stats['n_nan'] + data_stats['n_posinf'] + data_stats['n_neginf']) > 0)
+        if nonfinite_colors and (values.dtype.kind == 'f') and has_nonfinite:
+            sentinels = {label: DEFAULT_SENTINEL_COLORS[key] for label, key, test in (('NaN', 'nan', np.isnan), ('+inf', 'posinf', np.isposinf), ('-inf', 'neginf', np.isneginf)) if test(values).any()}
+    render_kwargs.update(vmin=vmin, vmax=vmax, norm=norm, sentinel_colors=(DEFAULT_SENTINEL_COLORS if nonfinite_colors else None))
+    if (color_scale_info is not None) and (vmin is not None) and (vmax is not None):
+        color_scale_info.update(color_scale=used_scale, vmin=float(vmin), vmax=float(vmax), percentiles=tuple(color_percentiles), sentinels=sentinels)
+
+
+def _structured_heatmap_html(arr: np.ndarray, max_fields: int=8, max_image_bytes: Optional[int]=None, **kwargs) -> str:
+    """ One heatmap per displayable field of the structured array `arr` (the first `max_fields` of them), side by side and captioned with the field names. """
+    from pho_jupyter_preview_widget.normalization import structured_fields
+    fields = structured_fields(arr.dtype)
+    if len(fields) == 0:
+        return f'<div style="padding: 10px; color: #888; font-style: italic;">no heatmap for the fields of {html.escape(str(arr.dtype))}</div>'
+    shown_fields = fields[:max_fields]
+    field_max_image_bytes = None if (max_image_bytes is None) else (max_image_bytes // len(shown_fields)) # the fields share the image budget
+    field_htmls = [f'<div style="margin-right: 6px;">{_array_heatmap_html(arr, structured_field=field, max_image_bytes=field_max_image_bytes, **kwargs)}</div>' for field in shown_fields]
+    omitted_html: str = f'<div style="font-size: 10px; color: #888;">+{len(fields) - len(shown_fields)} more fields</div>' if (len(fields) > len(shown_fields)) else ''
+    return f'<div style="display: flex; flex-direction: row; align-items: flex-start;">{"".join(field_htmls)}{omitted_html}</div>'
+
+
+def _array_heatmap_html(arr: np.ndarray, downsample_reducer: str='mean', max_thumbnail_pixels: int=256, nd_mode: str='montage', nd_axis: int=0, nd_reduction_order=None, nd_max_slices: int=16, heatmap_caption: Optional[str]=None, max_image_bytes: Optional[int]=None, max_block_size: int=8, complex_mode: str='magnitude', structured_field: Optional[str]=None, color_scale: str='percentile', color_percentiles: Tuple[float, float]=(1.0, 99.0), nonfinite_colors: bool=True, color_scale_info: Optional[Dict]=None, data_stats: Optional[Dict]=None, **kwargs) -> str:
+    """ The thumbnail heatmap `<img>` (plus an optional caption) for `arr`, or an error box if it couldn't be rendered. See `single_NDArray_array_preview_with_heatmap_repr_html` for the parameters.
+
+    max_block_size: the largest block (per axis) reduced into one thumbnail pixel, beyond which the input is strided first (see `array_downsampling.downsample_2d`); 1 strides straight to the thumbnail resolution.
+
+    max_image_bytes: if provided, the resolution of the thumbnail is degraded until its base64-encoded PNG fits (see `_budgeted_heatmap_image`); it's displayed at the same size either way.
+
+    complex_mode, structured_field: what is shown of complex and structured arrays (see `normalization.display_values`). Structured arrays show every field (up to 8) side by side unless `structured_field` picks one.
+
+    color_scale, color_percentiles: how the color limits are picked from (a bounded sample of) the thumbnail, unless `vmin`/`vmax` are given: 'percentile' (default) clips
+        to the `color_percentiles`, 'symmetric' centers them on zero, 'log' scales log10 of the positive values, 'minmax' spans every finite value (see `normalization.color_scale_limits`).
+    nonfinite_colors: render NaN, +inf and -inf in the `heatmap_rendering.DEFAULT_SENTINEL_COLORS` instead of transparent (masked entries stay transparent).
+    color_scale_info: if a dict is given it's filled with the limits that were used, for the shape card (see `array_shape_display.color_scale_html`).
+    data_stats: the `array_stats.get_array_stats` of `arr`, if already computed, so the color scale can reuse its range (see `_resolve_color_scale`).
+    """
+    if (max_image_bytes is not None) and (max_image_bytes <= 0):
+        default_profiler.count('output_budget', omitted=1)
+        return '<div style="padding: 10px; color: #888; font-style: italic;">preview omitted (output byte budget spent)</div>'
+    if (arr.dtype.names is not None) and (structured_field is None):
+        return _structured_heatmap_html(arr, downsample_reducer=downsample_reducer, max_thumbnail_pixels=max_thumbnail_pixels, nd_mode=nd_mode, nd_axis=nd_axis, nd_reduction_order=nd_reduction_order, nd_max_slices=nd_max_slices,
+                                        heatmap_caption=heatmap_caption, max_image_bytes=max_image_bytes, max_block_size=max_block_size, complex_mode=complex_mode, color_scale=color_scale, color_percentiles=color_percentiles, nonfinite_colors=nonfinite_colors, **kwargs)
+
+    from pho_jupyter_preview_widget.array_downsampling import downsample_2d, thumbnail_target_shape, thumbnail_max_block_size
+    from pho_jupyter_preview_widget.normalization import display_values
+    target_shape = thumbnail_target_shape(height=kwargs.get('height', None), width=kwargs.get('width', None), max_thumbnail_pixels=max_thumbnail_pixels)
+    heatmap_captions = [heatmap_caption] if heatmap_caption else []
+
+    n_dim: int = np.ndim(arr)
+    # complex/datetime/structured/masked arrays become real numbers; conversions that copy only see what the reduction below would read
+    max_elements: int = target_shape[0] * target_shape[1] * (thumbnail_max_block_size(arr, max_block_size=max_block_size) ** 2) * (arr.shape[nd_axis] if (n_dim > 2) else 1)
+    try:
+        arr, values_description = display_values(arr, complex_mode=complex_mode, field=structured_field, max_elements=max_elements, keep_axis=(nd_axis if (n_dim > 2) else None))
+    except ValueError as err:
+        return f'<div style="padding: 10px; color: #888; font-style: italic;">no heatmap: {html.escape(str(err))}</div>'
+    if values_description:
+        heatmap_captions.append(values_description)
+    if arr.size == 0:
+        return f'<div style="padding: 10px; color: #888; font-style: italic;">no heatmap: the array is empty (shape {arr.shape})</div>'
+
+    with default_profiler.stage('reduction', bytes_in=arr.nbytes) as stage:
+        if n_dim > 2:
+            from pho_jupyter_preview_widget.nd_preview import nd_preview_image
+            try:
+                heatmap_arr, nd_description = nd_preview_image(arr, mode=nd_mode, axis=nd_axis, reduction_order=nd_reduction_order, max_slices=nd_max_slices, target_shape=target_shape, downsample_reducer=downsample_reducer, max_block_size=max_block_size)
+                heatmap_captions.append(nd_description)
+            except ValueError as err:
+                print(f'WARN: could not build an n_dim: {n_dim} preview:\n\terr: {err}')
+                heatmap_arr = None
+        else:
+            ## n_dim <= 2
+            heatmap_arr = downsample_2d(arr, target_shape=target_shape, reducer=downsample_reducer, max_block_size=thumbnail_max_block_size(arr, max_block_size=max_block_size))
+        stage.add(bytes_out=(heatmap_arr.nbytes if (heatmap_arr is not None) else 0))
+
+    if heatmap_arr is not None:
+        _resolve_color_scale(heatmap_arr, kwargs, color_scale=color_scale, color_percentiles=color_percentiles, nonfinite_colors=nonfinite_colors, color_scale_info=color_scale_info,
+                             data_stats=(data_stats if ((values_description is None) and not ((n_dim > 2) and (nd_mode == 'sum'))) else None)) # the stats are of `arr` itself, not of a conversion or a sum of it
+
+    heatmap_image, reduced_shape = _budgeted_heatmap_image(heatmap_arr, max_image_bytes=max_image_bytes, downsample_reducer=downsample_reducer, **kwargs) if (heatmap_arr is not None) else (None, None)
+    if (heatmap_image is None) and (heatmap_arr is not None) and (max_image_bytes is not None):
+        default_profiler.count('output_budget', omitted=1)
+        return f'<div style="padding: 10px; color: #888; font-style: italic;">preview omitted (larger than the {max_image_bytes / 1024:.0f} KB output byte budget)</div>'
+    if reduced_shape is not None:
+        heatmap_captions.append(f'reduced to {reduced_shape[0]}x{reduced_shape[1]} to fit the {max_image_bytes / 1024:.0f} KB output byte budget')
+    if (heatmap_image is not None):
+        # Convert the IPython Image object to a base64-encoded string
+        heatmap_image_data = heatmap_image.data
+        with default_profiler.stage('base64', bytes_in=len(heatmap_image_data)) as stage:
+            b64_image = base64.b64encode(heatmap_image_data).decode('utf-8')
+            stage.add(bytes_out=len(b64_image))
+        # Create an HTML widget for the heatmap
+        heatmap_size_format_str: str = ''
+        width = kwargs.get('width', None)
+        if (width is not None) and (width > 0):
+            heatmap_size_format_str = heatmap_size_format_str + f'width="{width}" '
+        height = kwargs.get('height', None)
+        if (height is not None) and (height > 0):
+            heatmap_size_format_str = heatmap_size_format_str + f'height="{height}" '
+        elif (reduced_shape is not None) and not ((width is not None) and (width > 0)):
+            heatmap_size_format_str = heatmap_size_format_str + f'height="{np.shape(np.atleast_2d(heatmap_arr))[0]}" ' # keep the full-resolution display size
+
+        heatmap_caption_html: str = ''.join(f'<div style="font-size: 10px; color: #888;">{caption}</div>' for caption in heatmap_captions)
+        return f'<img src="data:image/png;base64,{b64_image}" {heatmap_size_format_str}style="background:transparent; image-rendering: pixelated;"/>{heatmap_caption_html}' #  width="{ndarray_preview_config.heatmap_thumbnail_width}"
+
+    else:
+        # getting image failed:
+        # Create an HTML widget for the heatmap
+        message = "Heatmap Err"
+        return f"""
+        <div style="text-align: center; padding: 20px; border: 1px solid #ccc;">
+            <p style="font-size: 16px; color: red;">{message}</p>
+        </div>
+        """
+
+
+def _combine_preview_html(heatmap_html: str, shape_html: str='', plaintext_html: str='', horizontal_layout: bool=True) -> str:
+    """ Lays out the heatmap, the shape card and the plaintext repr (either of the last two may be empty) side-by-side or stacked. """
+    if shape_html:
+        shape_html = f"""
+            <div style="margin-left: 10px;">
+                {shape_html}
+            </div>
+        """
+    if plaintext_html:
+        plaintext_html = f"""
+            <div style="margin-left: 10px;">
+                {plaintext_html}
+            </div>
+        """
+
+    # Combine both HTML representations
+    if horizontal_layout:
+        ## horizontal layout:
+        return f"""
+        <div style="display: flex; flex-direction: row; align-items: flex-start;">
+            <div>{heatmap_html}</div>
+            {shape_html}
+            {plaintext_html}
+        </div>
+        """
+    else:
+        ## vertical layout:
+        return f"""
+        <div style="display: flex; flex-direction: column; align-items: center;">
+            <div>{heatmap_html}</div>
+            <div style="margin-top: 10px;">
+                {shape_html}
+                {plaintext_html}
+            </div>
+        </div>
+        """
+
+
+def single_NDArray_array_preview_with_heatmap_repr_html(arr, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, downsample_reducer: str='mean', max_thumbnail_pixels: int=256, nd_mode: str='montage', nd_axis: int=0, nd_reduction_order=None, nd_max_slices: int=16, include_stats: bool=True, plaintext_max_chars: int=4000, stats_max_exact_elements: Optional[int]=None, **kwargs):
     """ Generate an HTML representation for a NumPy array with a Dask shape preview and a thumbnail heatmap
+
+        Large arrays are block-reduced to roughly the thumbnail's pixel size (see `array_downsampling.downsample_2d`) before rendering, so preview time doesn't scale with the number of elements.
+        Memory-mapped arrays (`np.memmap`, `np.load(..., mmap_mode='r')`) are only strided down to the thumbnail's pixel size, so displaying a multi-GB recording pages in a few MB at most.
+        downsample_reducer: 'mean', 'max', 'minmax' (min/max envelope) or 'stride'
+        max_thumbnail_pixels: the minimum rasterized resolution per axis (raised to `height`/`width` if those are larger)
+        nd_mode, nd_axis, nd_reduction_order, nd_max_slices: how arrays with ndim > 2 are previewed - a 'montage' of sampled slices along `nd_axis` or a 'max'/'mean'/'sum' projection along it (see `nd_preview.nd_preview_image`)
+        plaintext_max_chars: the most characters of the plaintext repr (see `smart_array2string`), which is only built from the elements it shows
+        include_stats: if True (and include_shape), the shape card also lists min/max, mean/std, the NaN/inf counts and a small histogram, computed in one chunked pass (see `array_stats.get_array_stats`)
+        stats_max_exact_elements: if provided, arrays with more elements get their statistics estimated from a bounded sample (see `array_stats.compute_array_stats`)
+        max_block_size: the largest block per axis reduced into one thumbnail pixel (1 strides, see `array_downsampling.downsample_2d`)
+        max_image_bytes: the most bytes the base64 PNG may take, its resolution is degraded until it fits (see `_array_heatmap_html`)
+        max_output_bytes: the most bytes of the whole preview, shape card and plaintext repr included: the thumbnail gets what they leave over (and the plaintext at most half of it)
     
         from pho_jupyter_preview_widget.pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
 
@@ -336,129 +638,237 @@ def single_NDArray_array_preview_with_heatmap_repr_html(arr, include_shape: bool
         display(arr)
 
     """
-    max_allowed_arr_elements: int = 10000
-
     if isinstance(arr, np.ndarray):
-        
-        n_dim: int = np.ndim(arr)
-        if n_dim > 2:
-            print(f'WARN: n_dim: {n_dim} greater than 2 is unsupported!')
-            # from pyphocorehelpers.plotting.media_output_helpers import get_array_as_image_stack
-            # #TODO 2024-08-13 05:05: - [ ] use get_array_as_image_stack to render the 3D array
-            message = f"Heatmap Err: n_dim: {n_dim} greater than 2 is unsupported!"
-            heatmap_html = f"""
-            <div style="text-align: center; padding: 20px; border: 1px solid #ccc;">
-                <p style="font-size: 16px; color: red;">{message}</p>
-            </div>
-            """
+        max_output_bytes: Optional[int] = kwargs.pop('max_output_bytes', None)
+        stats = None
+        if include_shape and include_stats:
+            from pho_jupyter_preview_widget.array_stats import get_array_stats
+            with default_profiler.stage('stats', bytes_in=arr.nbytes):
+                stats = get_array_stats(arr, **({} if (stats_max_exact_elements is None) else dict(max_exact_elements=stats_max_exact_elements)))
 
-        else:
-            ## n_dim == 2
-            if np.shape(arr)[0] > max_allowed_arr_elements: 
-                # truncate 
-                arr = arr[max_allowed_arr_elements:]
-            
-            heatmap_image = _subfn_display_heatmap(arr, **kwargs)
-            if (heatmap_image is not None):
-                orientation = "row" if horizontal_layout else "column"
-                ## Lays out side-by-side:
-                # Convert the IPython Image object to a base64-encoded string
-                heatmap_image_data = heatmap_image.data
-                b64_image = base64.b64encode(heatmap_image_data).decode('utf-8')
-                # Create an HTML widget for the heatmap
-                heatmap_size_format_str: str = ''
-                width = kwargs.get('width', None)
-                if (width is not None) and (width > 0):
-                    heatmap_size_format_str = heatmap_size_format_str + f'width="{width}" '
-                height = kwargs.get('height', None)
-                if (height is not None) and (height > 0):
-                    heatmap_size_format_str = heatmap_size_format_str + f'height="{height}" '
-                
-                heatmap_html = f'<img src="data:image/png;base64,{b64_image}" {heatmap_size_format_str}style="background:transparent;"/>' #  width="{ndarray_preview_config.heatmap_thumbnail_width}"
+        plaintext_html = ""
+        if include_plaintext_repr:
+            if max_output_bytes is not None:
+                plaintext_max_chars = min(plaintext_max_chars, max(64, max_output_bytes // 2)) # leaves the heatmap at least half of the output budget
+            # plaintext_repr = smart_array2string(arr, edgeitems=3, threshold=5)  # Adjust these parameters as needed
+            plaintext_repr = smart_array2string(arr, max_chars=plaintext_max_chars)
+            plaintext_html = f"<pre>{plaintext_repr}</pre>"
 
-            else:
-                # getting image failed:
-                # Create an HTML widget for the heatmap
-                message = "Heatmap Err"
-                heatmap_html = f"""
-                <div style="text-align: center; padding: 20px; border: 1px solid #ccc;">
-                    <p style="font-size: 16px; color: red;">{message}</p>
-                </div>
-                """
+        if max_output_bytes is not None:
+            # the shape card and the plaintext repr are part of the same output: the heatmap gets what they leave over
+            shape_card_bytes: int = (len(array_repr_html(arr.shape, None, arr.dtype, stats=stats)) if include_shape else 0)
+            kwargs['max_image_bytes'] = _image_bytes_left(max_output_bytes, shape_card_bytes + len(plaintext_html), max_image_bytes=kwargs.get('max_image_bytes', None))
+
+        color_scale_info: Dict = {}
+        heatmap_html: str = _array_heatmap_html(arr, downsample_reducer=downsample_reducer, max_thumbnail_pixels=max_thumbnail_pixels, nd_mode=nd_mode, nd_axis=nd_axis, nd_reduction_order=nd_reduction_order, nd_max_slices=nd_max_slices, color_scale_info=color_scale_info, data_stats=stats, **kwargs)
 
         # height="{height}"
         dask_array_widget_html = ""
-        plaintext_html = ""
-        
         if include_shape:
             # dask_array_widget: widgets.HTML = widgets.HTML(value=da.array(arr)._repr_html_())
             # dask_array_widget: widgets.HTML = widgets.HTML(value=array_repr_html(arr)) ## use new custom `array_repr_html` function
-            dask_array_widget: widgets.HTML = widgets.HTML(value=array_repr_html(arr.shape, None, arr.dtype)) ## use new custom `array_repr_html` function
+            with default_profiler.stage('shape_card') as stage:
+                dask_array_widget_html: str = array_repr_html(arr.shape, None, arr.dtype, stats=stats, color_scale=(color_scale_info or None))
+                stage.add(bytes_out=len(dask_array_widget_html)) ## build the string directly: instantiating a `widgets.HTML` just to read back `.value` opens a comm (and isn't safe on the background render threads)
 
-            dask_array_widget_html: str = dask_array_widget.value
-            dask_array_widget_html = f"""
-                <div style="margin-left: 10px;">
-                    {dask_array_widget_html}
-                </div>
-            """
-
-        if include_plaintext_repr:                
-            # plaintext_repr = smart_array2string(arr, edgeitems=3, threshold=5)  # Adjust these parameters as needed
-            plaintext_repr = smart_array2string(arr)
-            plaintext_html = f"<pre>{plaintext_repr}</pre>"
-            plaintext_html = f"""
-                <div style="margin-left: 10px;">
-                    {plaintext_html}
-                </div>
-            """
-            
-        # Combine both HTML representations
-        if horizontal_layout:
-            ## vertical layout:
-            combined_html = f"""
-            <div style="display: flex; flex-direction: row; align-items: flex-start;">
-                <div>{heatmap_html}</div>
-                {dask_array_widget_html}
-                {plaintext_html}
-            </div>
-            """
-        else:
-            ## vertical layout:
-            combined_html = f"""
-            <div style="display: flex; flex-direction: column; align-items: center;">
-                <div>{heatmap_html}</div>
-                <div style="margin-top: 10px;">
-                    {dask_array_widget_html}
-                    {plaintext_html}
-                </div>
-            </div>
-            """
-        return combined_html
+        return _combine_preview_html(heatmap_html, shape_html=dask_array_widget_html, plaintext_html=plaintext_html, horizontal_layout=horizontal_layout)
 
     else:
         raise ValueError("The input is not a NumPy array.")
 
 
-def array_preview_with_heatmap_repr_html(arr_or_list, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, **kwargs):
+def _output_budget_bytes(use_output_budget: bool=True, n_outputs: int=1, cell_key=None) -> Optional[int]:
+    """ The `max_output_bytes` for each of the next `n_outputs` previews, from `output_budget.default_output_budget` (None if unlimited or `use_output_budget` is False). """
+    if not use_output_budget:
+        return None
+    from pho_jupyter_preview_widget.output_budget import default_output_budget
+    available_bytes = default_output_budget.available(cell_key=cell_key)
+    return None if (available_bytes is None) else (available_bytes // max(1, n_outputs))
+
+
+_PREVIEW_MARKUP_BYTES: int = 2048 # the layout <div>s, the <img> tag, the heatmap captions and the shape card's color scale row, which are only known once the heatmap is rendered
+
+def _image_bytes_left(max_output_bytes: int, other_bytes: int, max_image_bytes: Optional[int]=None) -> int:
+    """ The `max_image_bytes` left for the thumbnail of a preview limited to `max_output_bytes`, once `other_bytes` of shape card/plaintext and the markup around them are taken out. """
+    image_bytes: int = max_output_bytes - other_bytes - _PREVIEW_MARKUP_BYTES
+    return image_bytes if (max_image_bytes is None) else min(image_bytes, max_image_bytes)
+
+
+def _charge_output_budget(formatted_html: str, use_output_budget: bool=True, cell_key=None) -> str:
+    if use_output_budget:
+        from pho_jupyter_preview_widget.output_budget import default_output_budget
+        default_output_budget.charge(len(formatted_html), cell_key=cell_key)
+    return formatted_html
+
+
+_preview_pipeline_is_warm: bool = False
+
+def _warm_up_preview_pipeline(include_shape: bool=True, include_plaintext_repr: bool=False, include_stats: bool=True, cmap: str='viridis', render_engine: str='native', **kwargs):
+    """ Renders a tiny array once per process (uncached, untimed), so the one-off costs of a first preview (lazy imports, compiling the shape card template,
+    building the colormap) aren't learned by the quality controller as if every render of that kind of array paid them. """
+    global _preview_pipeline_is_warm
+    if not _preview_pipeline_is_warm:
+        _preview_pipeline_is_warm = True
+        single_NDArray_array_preview_with_heatmap_repr_html(np.arange(4.0).reshape(2, 2), include_shape=include_shape, include_plaintext_repr=include_plaintext_repr, include_stats=include_stats, cmap=cmap, render_engine=render_engine)
+
+
+def _cached_single_array_preview_html(arr: np.ndarray, use_render_cache: bool=True, latency_target_s: Optional[float]=None, **render_kwargs) -> str:
+    """ `single_NDArray_array_preview_with_heatmap_repr_html` behind the shared render cache (see `render_cache.default_render_cache`).
+
+    latency_target_s: if provided, the preview is rendered at the quality tier `adaptive_quality.default_quality_controller` predicts to take at most
+        this long (reported in a caption when below 'full'), and the time the render took is fed back into its cost model.
+        The richest tier already in the cache is displayed without asking the controller, so re-displaying an array never shows it at a lower
+        quality than before, and only real renders count toward the controller's probe schedule.
+    """
+    def _tier_render_kwargs(tier_index: int) -> Dict:
+        """ captures: render_kwargs, latency_target_s """
+        if tier_index == 0:
+            return render_kwargs
+        from pho_jupyter_preview_widget.adaptive_quality import default_quality_controller
+        tier_kwargs = default_quality_controller.tier_render_kwargs(tier_index, render_kwargs)
+        tier_caption: str = f"{default_quality_controller.tiers[tier_index]['name']} quality, to display within {latency_target_s * 1e3:.0f} ms"
+        tier_kwargs['heatmap_caption'] = '; '.join(c for c in (tier_kwargs.get('heatmap_caption', None), tier_caption) if c)
+        return tier_kwargs
+
+    tier_names: List[str] = ['full']
+    if latency_target_s is not None:
+        from pho_jupyter_preview_widget.adaptive_quality import default_quality_controller
+        tier_names = [tier['name'] for tier in default_quality_controller.tiers]
+
+    cache_keys = None
+    if use_render_cache:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        cache_keys = default_render_cache.make_keys(arr, [_tier_render_kwargs(i) for i in range(len(tier_names))])
+        if cache_keys is not None:
+            for tier_index, cache_key in enumerate(cache_keys): # richest first
+                cached_html = default_render_cache.get(cache_key, None)
+                if cached_html is not None:
+                    default_profiler.count('render_cache', hits=1)
+                    if latency_target_s is not None:
+                        default_profiler.count('quality_tier', **{tier_names[tier_index]: 1})
+                    return cached_html
+            default_profiler.count('render_cache', misses=1)
+
+    tier_index: int = 0
+    if latency_target_s is not None:
+        from pho_jupyter_preview_widget.adaptive_quality import array_mode
+        mode: str = array_mode(arr, nd_mode=render_kwargs.get('nd_mode', 'montage'))
+        _warm_up_preview_pipeline(**render_kwargs)
+        tier_index = default_quality_controller.choose_tier(arr, target_s=latency_target_s, mode=mode)
+        default_profiler.count('quality_tier', **{tier_names[tier_index]: 1})
+
+    start_time: float = time.perf_counter()
+    with default_profiler.stage('preview', bytes_in=arr.nbytes) as stage:
+        formatted_html: str = single_NDArray_array_preview_with_heatmap_repr_html(arr, **_tier_render_kwargs(tier_index))
+        stage.add(bytes_out=len(formatted_html))
+    if latency_target_s is not None:
+        default_quality_controller.record(arr, tier_index, (time.perf_counter() - start_time), mode=mode)
+    if cache_keys is not None:
+        default_render_cache.put(cache_keys[tier_index], formatted_html)
+    return formatted_html
+
+
+def array_list_preview_with_heatmap_repr_html(arrs: List[np.ndarray], shared_color_scale: bool=False, list_max_workers: Optional[int]=None, list_time_budget_s: float=2.0, list_max_total_bytes: int=(4 * 1024**2), use_render_cache: bool=True, **kwargs) -> str:
+    """ Renders a thumbnail preview for every array in `arrs` in parallel (on a thread pool) and returns them as an HTML list, in input order.
+
+    shared_color_scale: if True, every thumbnail uses the same vmin/vmax (the finite range over all the arrays, estimated from bounded samples) so they can be compared directly.
+    list_max_workers: size of the thread pool (defaults to `ThreadPoolExecutor`'s default).
+    list_time_budget_s: total time budget for the whole list; elements whose render hasn't finished by then fall back to their plaintext repr (renders still running are abandoned).
+    list_max_total_bytes: total output size budget, plaintext fallbacks included; previews that would exceed it fall back to their plaintext repr, and once even that doesn't fit the remaining elements are elided.
+    The remaining kwargs are passed through to `single_NDArray_array_preview_with_heatmap_repr_html`.
+
+        from pho_jupyter_preview_widget.display_helpers import array_list_preview_with_heatmap_repr_html
+        html = array_list_preview_with_heatmap_repr_html([np.random.rand(10, 20) for _ in range(100)], shared_color_scale=True, height=30)
+
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    if len(arrs) == 0:
+        return "<ul></ul>"
+
+    if shared_color_scale and (kwargs.get('vmin', None) is None) and (kwargs.get('vmax', None) is None):
+        from pho_jupyter_preview_widget.heatmap_rendering import sampled_finite_range
+        if kwargs.get('include_shape', True) and kwargs.get('include_stats', True):
+            from pho_jupyter_preview_widget.array_stats import get_array_stats
+            for arr in arrs:
+                get_array_stats(arr) # computed once for the shape cards, `sampled_finite_range` then reuses their range
+        ranges = [r for r in (sampled_finite_range(arr, complex_mode=kwargs.get('complex_mode', 'magnitude')) for arr in arrs) if r is not None]
+        if len(ranges) > 0:
+            kwargs['vmin'] = min(r[0] for r in ranges)
+            kwargs['vmax'] = max(r[1] for r in ranges)
+
+    deadline: float = time.perf_counter() + list_time_budget_s
+    plaintext_max_chars: int = kwargs.get('plaintext_max_chars', 4000)
+
+    def _render_one(arr) -> Optional[str]:
+        """ captures: deadline, use_render_cache, kwargs """
+        if time.perf_counter() > deadline:
+            return None # over the time budget
+        return _cached_single_array_preview_html(arr, use_render_cache=use_render_cache, **kwargs)
+
+    executor = ThreadPoolExecutor(max_workers=list_max_workers, thread_name_prefix='pho_preview_list')
+    try:
+        futures = [executor.submit(_render_one, arr) for arr in arrs]
+        wait(futures, timeout=max(0.0, deadline - time.perf_counter())) # renders still running at the deadline are abandoned, not waited on
+        rendered = [(f.result() if (f.done() and not f.cancelled()) else None) for f in futures] # in input order
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    total_bytes: int = 0
+    formatted_items = []
+    for i, (arr, item_html) in enumerate(zip(arrs, rendered)):
+        if (item_html is not None) and ((total_bytes + len(item_html)) > list_max_total_bytes):
+            item_html = None
+        if item_html is None:
+            remaining_bytes: int = list_max_total_bytes - total_bytes - len('<pre></pre>')
+            if remaining_bytes < 64:
+                default_profiler.count('list_preview', fallbacks=(len(arrs) - i))
+                formatted_items.append(f"<pre>... ({len(arrs) - i} more arrays)</pre>") # the output budget is spent, even on plaintext
+                break
+            default_profiler.count('list_preview', fallbacks=1)
+            item_html = f"<pre>{smart_array2string(arr, max_chars=min(plaintext_max_chars, remaining_bytes))}</pre>" # the fallback text is charged to the budget too
+        total_bytes += len(item_html)
+        formatted_items.append(item_html)
+
+    return "<ul>" + "".join(f"<li>{item_html}</li>" for item_html in formatted_items) + "</ul>"
+
+
+def array_preview_with_heatmap_repr_html(arr_or_list, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, use_render_cache: bool=True, list_heatmaps: bool=True, use_output_budget: bool=True, latency_target_s: Optional[float]=None, **kwargs):
     """
     Generates an HTML representation for a single numpy array or a list of numpy arrays.
+
+    use_render_cache: if True, single-array previews are looked up in (and stored to) `render_cache.default_render_cache`, keyed by the array's content fingerprint and the formatter config, so re-displaying the same array is a dictionary lookup.
+    list_heatmaps: if True, lists of arrays get a thumbnail per element (rendered in parallel by `array_list_preview_with_heatmap_repr_html`, which also takes the `list_*`/`shared_color_scale` kwargs), otherwise just their joined plaintext reprs.
+    use_output_budget: if True (and no explicit `max_output_bytes` is given), each preview (its thumbnail, shape card and plaintext repr) is kept within what's left of `output_budget.default_output_budget`
+        (split evenly between the elements of a list) by degrading its thumbnail, and the emitted HTML is charged to it.
+    latency_target_s: if provided, each array is rendered at the richest quality tier predicted to display within this many seconds (see `adaptive_quality`).
     """
     # output_fn = HTML
-    output_fn = str
+    def output_fn(formatted_html: str) -> str:
+        return _charge_output_budget(str(formatted_html), use_output_budget=use_output_budget)
+
+    if 'max_output_bytes' not in kwargs:
+        kwargs['max_output_bytes'] = _output_budget_bytes(use_output_budget, n_outputs=(len(arr_or_list) if (isinstance(arr_or_list, list) and list_heatmaps) else 1))
     
     def format_single_array(arr):
-        """ captures: include_shape, horizontal_layout, include_plaintext_repr, **kwargs """
-        # Use your existing logic for single numpy array heatmap representation
-        # Assuming this logic generates an HTML string for an array heatmap
-        return single_NDArray_array_preview_with_heatmap_repr_html(arr, include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, **kwargs)
+        """ captures: include_shape, horizontal_layout, include_plaintext_repr, use_render_cache, **kwargs """
+        return _cached_single_array_preview_html(arr, use_render_cache=use_render_cache, latency_target_s=latency_target_s, include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, **kwargs)
     
 
     if isinstance(arr_or_list, list):
         if all(isinstance(v, np.ndarray) for v in arr_or_list):
             # Handle list of numpy arrays
-            # formatted_arrays = [format_single_array(arr) for arr in arr_or_list] # not sure if we want to show the heatmap for each array, probably not.
-            # return output_fn("<ul>" + "".join(f"<li>{fa}</li>" for fa in formatted_arrays) + "</ul>") ## do I want to return the HTML or just the raw string?
-            formatted_arrays = [smart_array2string(arr) for arr in arr_or_list]
+            if list_heatmaps and (len(arr_or_list) > 0):
+                return output_fn(array_list_preview_with_heatmap_repr_html(arr_or_list, include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, use_render_cache=use_render_cache, latency_target_s=latency_target_s, **kwargs))
+            plaintext_max_chars: int = kwargs.get('plaintext_max_chars', 4000)
+            formatted_arrays = []
+            n_chars: int = 0
+            for arr in arr_or_list:
+                if n_chars >= plaintext_max_chars:
+                    formatted_arrays.append(f'... ({len(arr_or_list) - len(formatted_arrays)} more arrays)')
+                    break
+                formatted_arrays.append(smart_array2string(arr, max_chars=max(64, plaintext_max_chars - n_chars)))
+                n_chars += len(formatted_arrays[-1])
             plaintext_repr: str = ', '.join(formatted_arrays)
             plaintext_html = f"<pre>{plaintext_repr}</pre>"
             plaintext_html = f"""
@@ -481,6 +891,135 @@ def array_preview_with_heatmap_repr_html(arr_or_list, include_shape: bool=True,
         return output_fn(f"<div>Unsupported type: {type(arr_or_list)}</div>")
 
 
+def dask_array_preview_with_heatmap_repr_html(darr, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, max_thumbnail_pixels: int=256, max_preview_blocks: int=16, use_render_cache: bool=True, use_output_budget: bool=True, include_stats: bool=True, **kwargs) -> str:
+    """ Generates an HTML preview for a `dask.array.Array`: its real chunk grid and a thumbnail heatmap computed from at most `max_preview_blocks` of its chunks.
+
+    The thumbnail is drawn from evenly spaced blocks selected with `darr.blocks[...]` and strided inside (see `dask_preview.dask_preview_sample`), which is computed synchronously on the local scheduler. Previewing a 100 GB lazy array reads a few chunks, not the whole array.
+    include_plaintext_repr: shows dask's own (lazy) text repr, nothing is computed for it.
+    include_stats: list the statistics of the computed sample in the shape card (marked as estimates unless every chunk was read).
+    use_output_budget: degrade the thumbnail so the whole preview fits `output_budget.default_output_budget` (unless `max_output_bytes` is given) and charge the emitted HTML to it (see `array_preview_with_heatmap_repr_html`).
+    The remaining kwargs are the same as for `single_NDArray_array_preview_with_heatmap_repr_html`.
+
+        import dask.array as da
+        from pho_jupyter_preview_widget.display_helpers import dask_array_preview_with_heatmap_repr_html
+
+        ip.display_formatter.formatters['text/html'].for_type_by_name('dask.array.core', 'Array', dask_array_preview_with_heatmap_repr_html)
+        da.random.random((100000, 100000), chunks=(5000, 5000))
+
+    """
+    import html
+    from pho_jupyter_preview_widget.array_downsampling import thumbnail_target_shape
+    from pho_jupyter_preview_widget.dask_preview import dask_preview_sample
+
+    max_output_bytes: Optional[int] = kwargs.pop('max_output_bytes', None)
+    if max_output_bytes is None:
+        max_output_bytes = _output_budget_bytes(use_output_budget)
+    cache_key = None
+    if use_render_cache:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        cache_key = default_render_cache.make_key(darr, dict(include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, max_thumbnail_pixels=max_thumbnail_pixels, max_preview_blocks=max_preview_blocks, include_stats=include_stats, max_output_bytes=max_output_bytes, **kwargs))
+        if cache_key is not None:
+            cached_html = default_render_cache.get(cache_key, None)
+            if cached_html is not None:
+                default_profiler.count('render_cache', hits=1)
+                return _charge_output_budget(cached_html, use_output_budget=use_output_budget)
+            default_profiler.count('render_cache', misses=1)
+
+    target_shape = thumbnail_target_shape(height=kwargs.get('height', None), width=kwargs.get('width', None), max_thumbnail_pixels=max_thumbnail_pixels)
+    stats = None
+    color_scale_info: Dict = {}
+    shape_card_kwargs = dict(n_layers=len(darr.dask.layers), meta_typename=f'{type(darr._meta).__module__}.{type(darr._meta).__name__}')
+    plaintext_html: str = f"<pre>{html.escape(repr(darr))}</pre>" if include_plaintext_repr else ''
+    try:
+        with default_profiler.stage('dask_sample') as stage:
+            sample, n_blocks_read = dask_preview_sample(darr, target_shape=target_shape, max_blocks=max_preview_blocks, nd_axis=kwargs.get('nd_axis', 0), nd_max_slices=kwargs.get('nd_max_slices', 16))
+            stage.add(bytes_out=sample.nbytes)
+        n_blocks: int = math.prod(darr.numblocks)
+        heatmap_caption: Optional[str] = None if (n_blocks_read >= n_blocks) else f'sampled from {n_blocks_read}/{n_blocks} chunks'
+        if include_stats and include_shape:
+            from pho_jupyter_preview_widget.array_stats import compute_array_stats
+            stats = compute_array_stats(sample) # the sample is already in memory: nothing more is computed
+            if stats is not None:
+                stats['is_estimate'] = stats['is_estimate'] or (sample.size < math.prod(darr.shape))
+        if max_output_bytes is not None:
+            shape_card_bytes: int = (len(array_repr_html(darr.shape, darr.chunks, darr.dtype, stats=stats, **shape_card_kwargs)) if include_shape else 0)
+            kwargs['max_image_bytes'] = _image_bytes_left(max_output_bytes, shape_card_bytes + len(plaintext_html), max_image_bytes=kwargs.get('max_image_bytes', None))
+        heatmap_html: str = _array_heatmap_html(sample, max_thumbnail_pixels=max_thumbnail_pixels, heatmap_caption=heatmap_caption, color_scale_info=color_scale_info, data_stats=stats, **kwargs)
+    except ValueError as err:
+        print(f'WARN: could not build a dask array preview:\n\terr: {err}')
+        heatmap_html = f"""
+        <div style="text-align: center; padding: 20px; border: 1px solid #ccc;">
+            <p style="font-size: 16px; color: red;">Heatmap Err: {html.escape(str(err))}</p>
+        </div>
+        """
+
+    shape_html: str = array_repr_html(darr.shape, darr.chunks, darr.dtype, stats=stats, color_scale=(color_scale_info or None), **shape_card_kwargs) if include_shape else ''
+    formatted_html: str = _combine_preview_html(heatmap_html, shape_html=shape_html, plaintext_html=plaintext_html, horizontal_layout=horizontal_layout)
+    if cache_key is not None:
+        default_render_cache.put(cache_key, formatted_html)
+    return _charge_output_budget(formatted_html, use_output_budget=use_output_budget)
+
+
+def _array_preview_placeholder_html(arr: np.ndarray, message: str, horizontal_layout: bool=True) -> str:
+    """ The cheap stand-in (a status message next to the shape card) shown while the full preview renders in the background. """
+    shape_card_html: str = array_repr_html(arr.shape, None, arr.dtype)
+    flex_direction: str = "row" if horizontal_layout else "column"
+    return f"""
+    <div style="display: flex; flex-direction: {flex_direction}; align-items: flex-start;">
+        <div style="padding: 10px; color: #888; font-style: italic;">{message}</div>
+        <div style="margin-left: 10px;">
+            {shape_card_html}
+        </div>
+    </div>
+    """
+
+
+def array_preview_with_heatmap_async_display(arr, include_shape: bool=True, horizontal_layout=True, include_plaintext_repr:bool=False, use_render_cache: bool=True, use_output_budget: bool=True, **kwargs):
+    """ Non-blocking counterpart to `array_preview_with_heatmap_repr_html`, for use as an `ipython_display_formatter` printer.
+
+    Immediately displays the cheap shape card under a new `display_id` and queues the full render on the shared `BackgroundPreviewRenderer`, which swaps it in with `update_display`. Previews already in the render cache are displayed synchronously.
+    NOTE: the array is rendered as it is when the worker gets to it, so in-place edits made right after displaying may show up in the preview.
+    The output byte budget (see `array_preview_with_heatmap_repr_html`) is looked up when the array is displayed and charged to the cell that displayed it.
+
+        import IPython
+        ip = IPython.get_ipython()
+        ip.display_formatter.ipython_display_formatter.for_type(np.ndarray, array_preview_with_heatmap_async_display)
+
+    """
+    from pho_jupyter_preview_widget.background_rendering import get_background_renderer
+
+    kwargs['render_engine'] = 'native' # the matplotlib engine would serialize every worker behind `_matplotlib_heatmap_lock`; it's only used as a (locked) fallback here
+    cell_key = None
+    if use_output_budget and ('max_output_bytes' not in kwargs):
+        from pho_jupyter_preview_widget.output_budget import current_cell_key
+        cell_key = current_cell_key() # the worker may only get to it once the next cell is running
+        kwargs['max_output_bytes'] = _output_budget_bytes(use_output_budget, cell_key=cell_key)
+    render_kwargs = dict(include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, **kwargs)
+    cache_key = None
+    if use_render_cache:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        cache_key = default_render_cache.make_key(arr, render_kwargs)
+        if cache_key is not None:
+            cached_html = default_render_cache.get(cache_key, None)
+            if cached_html is not None:
+                default_profiler.count('render_cache', hits=1)
+                display(HTML(_charge_output_budget(cached_html, use_output_budget=use_output_budget, cell_key=cell_key)))
+                return
+            default_profiler.count('render_cache', misses=1)
+
+    def _render() -> str:
+        """ captures: arr, render_kwargs, cache_key, use_output_budget, cell_key """
+        with default_profiler.stage('preview', bytes_in=arr.nbytes) as stage:
+            formatted_html: str = single_NDArray_array_preview_with_heatmap_repr_html(arr, **render_kwargs)
+            stage.add(bytes_out=len(formatted_html))
+        if cache_key is not None:
+            default_render_cache.put(cache_key, formatted_html)
+        return _charge_output_budget(formatted_html, use_output_budget=use_output_budget, cell_key=cell_key)
+
+    display_handle = display(HTML(_array_preview_placeholder_html(arr, message='rendering preview&hellip;', horizontal_layout=horizontal_layout)), display_id=True)
+    get_background_renderer(ip=IPython.get_ipython()).submit(display_handle, _render, dropped_html=_array_preview_placeholder_html(arr, message='preview skipped (render queue full)', horizontal_layout=horizontal_layout))
+
+
 # ---------------------------------------------------------------------------- #
 #                       Jupyter Datatype Printing Helpers                      #
 # ---------------------------------------------------------------------------- #
@@ -504,12 +1043,48 @@ def array_repr_with_graphical_shape(ip: "ipykernel.zmqshell.ZMQInteractiveShell"
     return ip
 
 
-def array_repr_with_graphical_preview(ip: "ipykernel.zmqshell.ZMQInteractiveShell", include_shape: bool=True, horizontal_layout:bool=True, include_plaintext_repr:bool=True, height:int=50, width:Optional[int]=None) -> "ipykernel.zmqshell.ZMQInteractiveShell":
+def array_repr_with_graphical_preview(ip: "ipykernel.zmqshell.ZMQInteractiveShell", include_shape: bool=True, horizontal_layout:bool=True, include_plaintext_repr:bool=True, height:int=50, width:Optional[int]=None, cmap:str='viridis', render_engine:str='native', downsample_reducer:str='mean', max_thumbnail_pixels:int=256, nd_mode:str='montage', nd_axis:int=0, nd_max_slices:int=16, use_render_cache:bool=True, render_cache_max_bytes:Optional[int]=None, use_disk_cache:Optional[bool]=None, disk_cache_path:Optional[str]=None, async_rendering:bool=False, list_heatmaps:bool=True, shared_color_scale:bool=False, list_time_budget_s:float=2.0, list_max_total_bytes:int=(4 * 1024**2), max_preview_blocks:int=16, png_compression_level:int=9, use_output_budget:bool=True, max_output_bytes:Optional[int]=(256 * 1024), max_cell_bytes:Optional[int]=(2 * 1024**2), include_stats:bool=True, latency_target_s:Optional[float]=0.03, complex_mode:str='magnitude', color_scale:str='percentile', color_percentiles:Tuple[float, float]=(1.0, 99.0), nonfinite_colors:bool=True) -> "ipykernel.zmqshell.ZMQInteractiveShell":
     """Generate an HTML representation for a NumPy array with a Dask shape preview and a thumbnail heatmap
+
+    cmap: name of the colormap used for the heatmap thumbnail (any matplotlib colormap name).
+    render_engine: 'native' (default, pure NumPy/zlib rasterizer) or 'matplotlib' (the original `imshow` + `savefig` path).
+    downsample_reducer: how large arrays are reduced to thumbnail size: 'mean', 'max', 'minmax' or 'stride'.
+    max_thumbnail_pixels: minimum rasterized thumbnail resolution per axis.
+    use_render_cache: re-use previously rendered previews of identical arrays (see `render_cache.default_render_cache`).
+    render_cache_max_bytes: if provided, updates the byte budget of the shared render cache (least-recently-used previews are evicted beyond it).
+    use_disk_cache: True attaches the persistent SQLite tier (at `disk_cache_path`, see `render_cache.enable_disk_render_cache`) so previews survive kernel restarts, False detaches it, None leaves it unchanged.
+    async_rendering: if True, arrays immediately display their shape card and the heatmap preview is rendered on a background thread and swapped in with `update_display` (see `array_preview_with_heatmap_async_display`), so cell execution time no longer includes preview rendering.
+    nd_mode, nd_axis, nd_max_slices: arrays with ndim > 2 are previewed as a 'montage' of at most `nd_max_slices` slices along `nd_axis`, or a 'max'/'mean'/'sum' projection along it.
+    list_heatmaps: if True, lists of arrays show a thumbnail per element, rendered in parallel (see `array_list_preview_with_heatmap_repr_html`), limited by `list_time_budget_s` and `list_max_total_bytes`.
+    shared_color_scale: if True, the thumbnails of a list of arrays share one color scale.
+    max_preview_blocks: `dask.array.Array`s show their chunk grid and a thumbnail computed from at most this many chunks (see `dask_array_preview_with_heatmap_repr_html`).
+    include_stats: list min/max, mean/std, NaN/inf counts and a small histogram in the shape card of in-memory arrays (see `array_stats.get_array_stats`).
+    png_compression_level: zlib level (0-9) of the native 8-bit palette PNG encoder; lower renders faster, higher keeps notebooks smaller.
+    use_output_budget, max_output_bytes, max_cell_bytes: keep each preview under `max_output_bytes` and the previews of one executed cell under `max_cell_bytes` together (None for no limit), by degrading the thumbnail resolution until it fits (see `output_budget.default_output_budget`).
+    latency_target_s: render each in-memory array at the richest quality tier (thumbnail resolution, reduction block size, stats, plaintext) predicted to display within this many seconds, learned from the previous renders (see `adaptive_quality`). None always renders at the settings above, as do `async_rendering` previews (which are off the cell's critical path anyway).
+    complex_mode: what the heatmaps of complex arrays show: 'magnitude', 'phase', 'real' or 'imag'. Datetimes are shown as their int64 ticks, masked entries are transparent, structured arrays show a heatmap per numeric field (see `normalization.display_values`).
+    color_scale, color_percentiles: how the heatmap color limits are chosen: 'percentile' (clip to `color_percentiles`, robust to outliers and infs), 'symmetric' (around zero, for diverging colormaps like 'RdBu_r'), 'log' or 'minmax'. The limits are listed in the shape card.
+    nonfinite_colors: show NaN (magenta), +inf (white) and -inf (black) in distinct colors instead of transparent.
     
     """
     from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
 
+    if render_cache_max_bytes is not None:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        default_render_cache.max_bytes = render_cache_max_bytes
+
+    if use_output_budget:
+        from pho_jupyter_preview_widget.output_budget import default_output_budget
+        default_output_budget.max_output_bytes = max_output_bytes
+        default_output_budget.max_cell_bytes = max_cell_bytes
+
+    if use_disk_cache is not None:
+        from pho_jupyter_preview_widget.render_cache import default_render_cache, enable_disk_render_cache, disable_disk_render_cache
+        if not use_disk_cache:
+            disable_disk_render_cache()
+        elif (default_render_cache.disk_cache is None) or ((disk_cache_path is not None) and (default_render_cache.disk_cache.path != disk_cache_path)):
+            enable_disk_render_cache(path=disk_cache_path)
+
     # def format_single_array(arr):
     #     # Your existing logic to render a single np.ndarray
     #     return f"<div>{smart_array2string(arr, precision=3, separator=', ', suppress_small=True)}</div>"
@@ -526,10 +1101,23 @@ def array_repr_with_graphical_preview(ip: "ipykernel.zmqshell.ZMQInteractiveShel
     #     return HTML(f"<div>Unsupported type: {type(arr_or_list)}</div>")
 
 
+    preview_kwargs = dict(include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, height=height, width=width, cmap=cmap, render_engine=render_engine, downsample_reducer=downsample_reducer, max_thumbnail_pixels=max_thumbnail_pixels, nd_mode=nd_mode, nd_axis=nd_axis, nd_max_slices=nd_max_slices, use_render_cache=use_render_cache, png_compression_level=png_compression_level, use_output_budget=use_output_budget, include_stats=include_stats, complex_mode=complex_mode, color_scale=color_scale, color_percentiles=color_percentiles, nonfinite_colors=nonfinite_colors)
+
     # Register the custom display function for NumPy arrays
-    ip.display_formatter.formatters['text/html'].for_type(np.ndarray, lambda arr: array_preview_with_heatmap_repr_html(arr, include_shape=include_shape, horizontal_layout=horizontal_layout, include_plaintext_repr=include_plaintext_repr, height=height, width=width))
+    ip.display_formatter.formatters['text/html'].for_type(np.ndarray, lambda arr: array_preview_with_heatmap_repr_html(arr, latency_target_s=latency_target_s, **preview_kwargs))
+
+    if async_rendering:
+        from pho_jupyter_preview_widget.background_rendering import get_background_renderer
+        get_background_renderer(ip=ip) # hooks 'pre_run_cell' now, so the renders of the very first async cell are already tagged with its cell id
+        # the `ipython_display_formatter` takes precedence over the mimetype formatters and lets us publish the placeholder under a display_id ourselves
+        ip.display_formatter.ipython_display_formatter.for_type(np.ndarray, lambda arr: array_preview_with_heatmap_async_display(arr, **preview_kwargs))
+    else:
+        ip.display_formatter.ipython_display_formatter.type_printers.pop(np.ndarray, None)
     
-    ip.display_formatter.formatters['text/html'].for_type(list, lambda lst: array_preview_with_heatmap_repr_html(lst))
+    # Dask arrays (registered by name so dask is never imported here):
+    ip.display_formatter.formatters['text/html'].for_type_by_name('dask.array.core', 'Array', lambda darr: dask_array_preview_with_heatmap_repr_html(darr, max_preview_blocks=max_preview_blocks, **preview_kwargs))
+
+    ip.display_formatter.formatters['text/html'].for_type(list, lambda lst: array_preview_with_heatmap_repr_html(lst, latency_target_s=latency_target_s, list_heatmaps=list_heatmaps, shared_color_scale=shared_color_scale, list_time_budget_s=list_time_budget_s, list_max_total_bytes=list_max_total_bytes, **preview_kwargs))
 
 
     # ## Plain-text type representation can be suppressed like:
@@ -573,69 +1161,41 @@ def array_repr_with_graphical_preview(ip: "ipykernel.zmqshell.ZMQInteractiveShel
 # ip.display_formatter.formatters['text/plain'].type_printers.pop(list, None)
 
 
-def dataframe_show_more_button(ip: "ipykernel.zmqshell.ZMQInteractiveShell") -> "ipykernel.zmqshell.ZMQInteractiveShell":
-    """Adds a functioning 'show more' button below each displayed dataframe to show more rows.
+def dataframe_show_more_button(ip: "ipykernel.zmqshell.ZMQInteractiveShell", window_rows: int=50, max_live_tables: int=8) -> "ipykernel.zmqshell.ZMQInteractiveShell":
+    """Displays DataFrames with more than `window_rows` rows as a scrollable virtual table (`widget.DataFrameWindowWidget`): the kernel serves
+    `iloc` windows of `window_rows` rows as the table is scrolled, so only the rows in view are ever serialized and the output size doesn't grow with the number of rows.
+    Smaller frames keep pandas' own display.
+
+    Every table's widget keeps its frame (and an open comm) alive, so they are closed again: re-displaying a frame closes its previous table, and only the
+    `max_live_tables` most recently displayed tables stay scrollable.
 
     Usage:
         ip = get_ipython()
         ip = dataframe_show_more_button(ip=ip)
     """
-    def _subfn_dataframe_show_more(df, initial_rows=10, default_more_rows=50):
-        """Generate an HTML representation for a Pandas DataFrame with a 'show more' button."""
-        total_rows = df.shape[0]
-        if total_rows <= initial_rows:
-            return df.to_html()
-
-        # Create the initial view
-        initial_view = df.head(initial_rows).to_html()
-
-        # Escape backticks and newlines in the DataFrame HTML to ensure proper JavaScript string
-        df_html = df.to_html().replace("`", "\\`").replace("\n", "\\n")
-
-        # Generate the script for the 'show more' button with input for number of rows
-        script = f"""
-        <script type="text/javascript">
-            function showMore() {{
-                var numRows = document.getElementById('num-rows').value;
-                if (numRows === "") {{
-                    numRows = {default_more_rows};
-                }} else {{
-                    numRows = parseInt(numRows);
-                }}
-                var div = document.getElementById('dataframe-more');
-                var df_html = `{df_html}`;
-                var parser = new DOMParser();
-                var doc = parser.parseFromString(df_html, 'text/html');
-                var rows = doc.querySelectorAll('tbody tr');
-                for (var i = 0; i < rows.length; i++) {{
-                    if (i >= numRows) {{
-                        rows[i].style.display = 'none';
-                    }} else {{
-                        rows[i].style.display = '';
-                    }}
-                }}
-                div.innerHTML = doc.body.innerHTML;
-            }}
-        </script>
-        """
-
-        # Create the 'show more' button and input field with default value
-        button_and_input = f"""
-        <input type="number" id="num-rows" placeholder="Enter number of rows to display" value="{default_more_rows}">
-        <button onclick="showMore()">Show more</button>
-        <div id="dataframe-more"></div>
-        """
-
-        # Combine everything into the final HTML
-        html = f"""
-        {script}
-        {initial_view}
-        {button_and_input}
-        """
-        return HTML(html)
-
-
-    ip.display_formatter.formatters['text/html'].for_type(pd.DataFrame, lambda df: display(_subfn_dataframe_show_more(df)))
+    from collections import OrderedDict
+    if max_live_tables < 1:
+        raise ValueError(f'max_live_tables must be at least 1 but got: {max_live_tables}')
+    live_tables = OrderedDict() # id(df) -> its DataFrameWindowWidget, oldest first. The widget holds `df`, so the id can't be reused while it's in here.
+
+    def _subfn_dataframe_window_mimebundle(df):
+        """ captures: window_rows, max_live_tables, live_tables """
+        if df.shape[0] <= window_rows:
+            return None # falls through to the default formatters
+        from pho_jupyter_preview_widget.widget import DataFrameWindowWidget # ipywidgets is only imported once a large frame is displayed
+        previous_widget = live_tables.pop(id(df), None)
+        if previous_widget is not None:
+            previous_widget.close()
+        widget = DataFrameWindowWidget(df, window_rows=window_rows)
+        live_tables[id(df)] = widget
+        while len(live_tables) > max_live_tables:
+            _, oldest_widget = live_tables.popitem(last=False)
+            oldest_widget.close() # closes its comm and releases its frame
+        return widget._repr_mimebundle_()
+
+    # registered by name, so neither pandas nor ipywidgets are imported here (`DataFrame.__module__` is 'pandas' in recent versions, 'pandas.core.frame' in older ones)
+    for type_module in ('pandas', 'pandas.core.frame'):
+        ip.display_formatter.mimebundle_formatter.for_type_by_name(type_module, 'DataFrame', _subfn_dataframe_window_mimebundle)
     return ip
 
 
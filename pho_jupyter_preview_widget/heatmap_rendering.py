@@ -0,0 +1,315 @@
+""" Native (pure-NumPy) heatmap rasterizer used by the ndarray preview formatters.
+
+Skips matplotlib entirely: the data is normalized, mapped through a precomputed 256-entry colormap lookup table and written out as a PNG with `zlib`.
+
+    from pho_jupyter_preview_widget.heatmap_rendering import render_heatmap_png
+
+    png_bytes: bytes = render_heatmap_png(np.random.rand(30, 40), cmap='viridis')
+
+"""
+import struct
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pho_jupyter_preview_widget._colormap_data import _COLORMAP_LUT_HEX
+from pho_jupyter_preview_widget.normalization import display_values, finite_range, normalize_to_uint8 # `normalize_to_uint8` is re-exported from here
+
+
+# ==================================================================================================================== #
+# Colormap Lookup Tables                                                                                               #
+# ==================================================================================================================== #
+
+@lru_cache(maxsize=None)
+def get_colormap_lut(cmap_name: str = 'viridis') -> np.ndarray:
+    """ Returns the (256, 3) uint8 RGB lookup table for the colormap named `cmap_name`.
+
+    The bundled maps (see `_colormap_data`) never touch matplotlib. Any other name (or a reversed '_r' variant) is extracted once from matplotlib if it is installed and then cached.
+    Raises ValueError for unknown colormaps.
+    """
+    hex_str = _COLORMAP_LUT_HEX.get(cmap_name, None)
+    if hex_str is not None:
+        lut = np.frombuffer(bytes.fromhex(''.join(hex_str)), dtype=np.uint8).reshape(256, 3)
+        lut.flags.writeable = False
+        return lut
+
+    if cmap_name.endswith('_r') and (cmap_name[:-2] in _COLORMAP_LUT_HEX):
+        lut = np.ascontiguousarray(get_colormap_lut(cmap_name[:-2])[::-1])
+        lut.flags.writeable = False
+        return lut
+
+    try:
+        import matplotlib
+        cmap = matplotlib.colormaps[cmap_name]
+    except ImportError as err:
+        raise ValueError(f'Colormap "{cmap_name}" is not bundled and matplotlib is not available to extract it.') from err
+    except KeyError as err:
+        raise ValueError(f'Unknown colormap: "{cmap_name}"') from err
+
+    lut = np.round(cmap(np.linspace(0.0, 1.0, 256))[:, :3] * 255.0).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+# ==================================================================================================================== #
+# Normalization                                                                                                        #
+# ==================================================================================================================== #
+
+def quantize_to_levels(data: np.ndarray, vmin: Optional[float] = None, vmax: Optional[float] = None, dtype=np.uint16) -> Tuple[np.ndarray, np.ndarray, Tuple[float, float]]:
+    """ Linearly maps `data` onto the full range of the unsigned integer `dtype` (vmin -> 0, vmax -> the dtype's max), for clients that apply the colormap themselves.
+
+    Returns (codes, is_valid, (vmin, vmax)). Like `normalize_to_uint8`, NaN/inf and masked entries are invalid (their code is 0) and left out of the automatic vmin/vmax.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'u':
+        raise ValueError(f'quantize_to_levels expects an unsigned integer dtype but got: {dtype}')
+    if vmin is None or vmax is None:
+        value_range = finite_range(data) or (0.0, 1.0)
+        vmin = value_range[0] if vmin is None else vmin
+        vmax = value_range[1] if vmax is None else vmax
+    is_masked = np.ma.getmaskarray(data) if np.ma.isMaskedArray(data) else None
+    data = np.asarray(np.ma.getdata(data), dtype=np.float64)
+    is_valid = np.isfinite(data)
+    if is_masked is not None:
+        is_valid &= ~is_masked
+
+    max_code: int = int(np.iinfo(dtype).max)
+    codes = np.zeros(data.shape, dtype=dtype)
+    span: float = float(vmax) - float(vmin)
+    if span > 0.0:
+        scaled = (data - vmin) * (max_code / span)
+        np.clip(scaled, 0.0, max_code, out=scaled)
+        np.rint(scaled, out=scaled)
+        np.copyto(codes, scaled, casting='unsafe', where=is_valid)
+    return codes, is_valid, (float(vmin), float(vmax))
+
+
+def sampled_finite_range(data: np.ndarray, max_samples: Optional[int] = None, complex_mode: str = 'magnitude') -> Optional[Tuple[float, float]]:
+    """ (min, max) of the finite (and unmasked) values of `data`, estimated from a strided subsample of at most ~`max_samples` elements so the cost is bounded. Returns None if there are no such values.
+
+    max_samples: defaults to 2**20 elements, or `array_downsampling.OUT_OF_CORE_MAX_SAMPLES` for memory-mapped arrays.
+    complex_mode: which values of complex, datetime and structured arrays the range is of (see `normalization.display_values`); None for arrays with no heatmap.
+    If the stats of `data` were already computed for its shape card (see `array_stats.get_array_stats`), their range is used and nothing is read.
+
+    Used to give several heatmaps one shared color scale without scanning every element of every array.
+    """
+    data = np.asanyarray(data)
+    if data.size == 0:
+        return None
+    from pho_jupyter_preview_widget.array_downsampling import is_out_of_core, OUT_OF_CORE_MAX_SAMPLES
+    from pho_jupyter_preview_widget.array_stats import bounded_sample, is_stats_dtype, peek_array_stats
+    cached_stats = peek_array_stats(data) if is_stats_dtype(data.dtype) else None
+    if cached_stats is not None:
+        return None if (cached_stats['min'] is None) else (cached_stats['min'], cached_stats['max'])
+    if max_samples is None:
+        max_samples = OUT_OF_CORE_MAX_SAMPLES if is_out_of_core(data) else (1 << 20)
+    try:
+        data, _ = display_values(bounded_sample(data, max_samples), complex_mode=complex_mode)
+    except ValueError:
+        return None
+    return finite_range(data)
+
+
+# ==================================================================================================================== #
+# Non-finite Sentinel Colors                                                                                           #
+# ==================================================================================================================== #
+
+DEFAULT_SENTINEL_COLORS: Dict[str, Tuple[int, int, int]] = {'nan': (255, 0, 255), 'posinf': (255, 255, 255), 'neginf': (0, 0, 0)} # magenta, white, black
+_SENTINEL_TESTS = (('nan', np.isnan), ('posinf', np.isposinf), ('neginf', np.isneginf))
+
+
+def invalid_pixel_classes(data: np.ndarray, is_valid: np.ndarray, sentinel_colors: Optional[Dict[str, Tuple[int, int, int]]] = None) -> List[Tuple[np.ndarray, Optional[Tuple[int, int, int]]]]:
+    """ Splits the invalid pixels of `data` into (pixels, rgb) classes: NaN, +inf and -inf get their color from `sentinel_colors` ('nan', 'posinf', 'neginf'
+    keys, missing ones stay transparent), every other invalid pixel (masked entries, classes without a color) is in a last class with rgb None (transparent).
+    """
+    invalid = ~is_valid
+    if not invalid.any():
+        return []
+    classes = []
+    values = np.ma.getdata(data)
+    if sentinel_colors and (values.dtype.kind == 'f'):
+        if np.ma.isMaskedArray(data):
+            invalid = invalid & ~np.ma.getmaskarray(data) # masked entries stay transparent whatever their value
+        remaining = ~is_valid
+        for key, test in _SENTINEL_TESTS:
+            rgb = sentinel_colors.get(key, None)
+            if rgb is None:
+                continue
+            pixels = test(values) & invalid
+            if pixels.any():
+                classes.append((pixels, tuple(rgb)))
+                remaining &= ~pixels
+        invalid = remaining
+    if invalid.any():
+        classes.append((invalid, None))
+    return classes
+
+
+def render_heatmap_rgba(data: np.ndarray, cmap: str = 'viridis', vmin: Optional[float] = None, vmax: Optional[float] = None, origin: str = 'lower', norm: str = 'linear', sentinel_colors: Optional[Dict[str, Tuple[int, int, int]]] = None) -> np.ndarray:
+    """ Colormaps a 1D/2D array into an (H, W, 4) uint8 RGBA image. Non-finite and masked values are fully transparent, unless `sentinel_colors` gives NaN/+inf/-inf a color (see `invalid_pixel_classes`).
+
+    origin: 'lower' places row 0 at the bottom of the image (matching the `imshow(..., origin='lower')` call used by the matplotlib path).
+    norm: 'linear' or 'log' (see `normalization.normalize_to_uint8`).
+    """
+    data = np.asanyarray(data) # keeps the mask of `np.ma.MaskedArray` inputs
+    if data.ndim < 2:
+        data = np.atleast_2d(data)
+    if data.ndim != 2:
+        raise ValueError(f'render_heatmap_rgba expects 1D or 2D data but got ndim: {data.ndim}')
+    if origin == 'lower':
+        data = data[::-1]
+
+    indices, is_valid = normalize_to_uint8(data, vmin=vmin, vmax=vmax, norm=norm)
+    lut = get_colormap_lut(cmap)
+    rgba = np.empty(indices.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[indices]
+    rgba[..., 3] = np.where(is_valid, 255, 0)
+    for pixels, rgb in invalid_pixel_classes(data, is_valid, sentinel_colors=sentinel_colors):
+        if rgb is not None:
+            rgba[pixels] = rgb + (255,)
+    return rgba
+
+
+# ==================================================================================================================== #
+# PNG Encoding                                                                                                         #
+# ==================================================================================================================== #
+
+def _png_chunk(chunk_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', len(payload)) + chunk_type + payload + struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xFFFFFFFF)
+
+
+def encode_png(pixels: np.ndarray, compression_level: int = 6) -> bytes:
+    """ Writes an (H, W), (H, W, 3) or (H, W, 4) uint8 image as PNG bytes (grayscale, RGB or RGBA respectively) using only `zlib`. """
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    if pixels.ndim == 2:
+        pixels = pixels[..., np.newaxis]
+    height, width, n_channels = pixels.shape
+    color_type: int = {1: 0, 3: 2, 4: 6}[n_channels]
+
+    # Every scanline is prefixed by its filter-type byte (0 = None)
+    raw = np.zeros((height, (width * n_channels) + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(height, width * n_channels)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), compression_level)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+PNG_SCANLINE_FILTERS: Tuple[str, ...] = ('auto', 'none', 'sub', 'up')
+
+
+def _filter_scanlines(indices: np.ndarray, png_filter: str) -> np.ndarray:
+    """ The (H, W + 1) PNG scanlines (each prefixed by its filter-type byte) of a 1-byte-per-pixel image, filtered with `png_filter` ('none', 'sub' or 'up'). """
+    filter_type: int = PNG_SCANLINE_FILTERS.index(png_filter) - 1 # PNG filter types: 0 = None, 1 = Sub, 2 = Up
+    if png_filter == 'sub':
+        filtered = np.diff(indices, axis=1, prepend=np.uint8(0)) # uint8 arithmetic wraps modulo 256, as PNG filters do
+    elif png_filter == 'up':
+        filtered = np.diff(indices, axis=0, prepend=np.zeros((1, indices.shape[1]), dtype=np.uint8))
+    else:
+        filtered = indices
+    raw = np.empty((indices.shape[0], indices.shape[1] + 1), dtype=np.uint8)
+    raw[:, 0] = filter_type
+    raw[:, 1:] = filtered
+    return raw
+
+
+def encode_indexed_png(indices: np.ndarray, palette: np.ndarray, transparent_index: Optional[int] = None, compression_level: int = 9, png_filter: str = 'auto') -> bytes:
+    """ Writes an (H, W) uint8 image of palette indices as an 8-bit indexed-color PNG (a PLTE chunk, plus a tRNS chunk making `transparent_index` fully transparent).
+
+    One byte per pixel instead of RGBA's four, which is all a 256-entry colormap needs.
+    png_filter: the scanline filter. Colormap indices follow the data, so smooth data compresses several times better after 'sub' or 'up' filtering while
+        noisy data is best left unfiltered. 'auto' picks whichever compresses smallest in a quick (zlib level 3) trial.
+    """
+    indices = np.asarray(indices, dtype=np.uint8)
+    palette = np.asarray(palette, dtype=np.uint8)
+    if indices.ndim != 2:
+        raise ValueError(f'encode_indexed_png expects (H, W) indices but got shape: {indices.shape}')
+    if (palette.ndim != 2) or (palette.shape[1] != 3) or not (1 <= palette.shape[0] <= 256):
+        raise ValueError(f'encode_indexed_png expects an (N <= 256, 3) palette but got shape: {palette.shape}')
+    if png_filter not in PNG_SCANLINE_FILTERS:
+        raise ValueError(f'Unknown png_filter: "{png_filter}". Expected one of {PNG_SCANLINE_FILTERS}.')
+    height, width = indices.shape
+
+    if png_filter == 'auto':
+        candidates = [_filter_scanlines(indices, f) for f in PNG_SCANLINE_FILTERS[1:]]
+        raw = min(candidates, key=lambda c: len(zlib.compress(c.tobytes(), 3)))
+    else:
+        raw = _filter_scanlines(indices, png_filter)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    chunks = [_png_chunk(b'IHDR', header), _png_chunk(b'PLTE', palette.tobytes())]
+    if transparent_index is not None:
+        alpha = np.full(transparent_index + 1, 255, dtype=np.uint8) # entries past the end of tRNS are opaque
+        alpha[transparent_index] = 0
+        chunks.append(_png_chunk(b'tRNS', alpha.tobytes()))
+    return b''.join([b'\x89PNG\r\n\x1a\n'] + chunks + [
+        _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), compression_level)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def render_heatmap_indexed(data: np.ndarray, cmap: str = 'viridis', vmin: Optional[float] = None, vmax: Optional[float] = None, origin: str = 'lower', norm: str = 'linear', sentinel_colors: Optional[Dict[str, Tuple[int, int, int]]] = None) -> Tuple[np.ndarray, np.ndarray, Optional[int]]:
+    """ Colormaps a 1D/2D array into (indices, palette, transparent_index) for `encode_indexed_png`. Renders the same colors as `render_heatmap_rgba`.
+
+    The palette is the colormap's 256-entry table. Invalid (NaN/inf/masked) pixels need entries of their own (the transparent one, plus one per
+    color of `sentinel_colors` that occurs): indices no valid pixel uses are taken if there are enough, otherwise the top indices are merged into
+    their (nearly identical) neighbour to free them.
+    """
+    data = np.asanyarray(data)
+    if data.ndim < 2:
+        data = np.atleast_2d(data)
+    if data.ndim != 2:
+        raise ValueError(f'render_heatmap_indexed expects 1D or 2D data but got ndim: {data.ndim}')
+    if origin == 'lower':
+        data = data[::-1]
+
+    indices, is_valid = normalize_to_uint8(data, vmin=vmin, vmax=vmax, norm=norm)
+    palette = get_colormap_lut(cmap)
+    classes = invalid_pixel_classes(data, is_valid, sentinel_colors=sentinel_colors)
+    if len(classes) == 0:
+        return indices, palette, None
+
+    n_entries: int = len(classes)
+    unused = np.flatnonzero(np.bincount(indices[is_valid], minlength=256) == 0)
+    if len(unused) >= n_entries:
+        entries = [int(i) for i in unused[-n_entries:]]
+    else:
+        entries = list(range((256 - n_entries), 256))
+        np.minimum(indices, (255 - n_entries), out=indices)
+    transparent_index = None
+    if any(rgb is not None for _, rgb in classes):
+        palette = palette.copy()
+    for entry, (pixels, rgb) in zip(entries, classes):
+        indices[pixels] = entry
+        if rgb is None:
+            transparent_index = entry
+        else:
+            palette[entry] = rgb
+    return indices, palette, transparent_index
+
+
+def render_heatmap_png(data: np.ndarray, cmap: str = 'viridis', vmin: Optional[float] = None, vmax: Optional[float] = None, origin: str = 'lower', compression_level: int = 9, indexed: bool = True, png_filter: str = 'auto', norm: str = 'linear', sentinel_colors: Optional[Dict[str, Tuple[int, int, int]]] = None) -> bytes:
+    """ Renders `data` as a colormapped heatmap and returns the encoded PNG bytes (one image pixel per array element).
+
+    indexed: if True (default) writes an 8-bit palette PNG (see `encode_indexed_png`, which also takes `png_filter`), otherwise 32-bit RGBA.
+    compression_level: the zlib level, 0-9.
+    norm, sentinel_colors: 'linear'/'log' scaling and the colors of NaN/+inf/-inf (see `render_heatmap_indexed`, e.g. `DEFAULT_SENTINEL_COLORS`; None leaves them transparent).
+    """
+    from pho_jupyter_preview_widget.profiling import default_profiler
+    with default_profiler.stage('colormap', bytes_in=np.asarray(data).nbytes) as stage:
+        if indexed:
+            indices, palette, transparent_index = render_heatmap_indexed(data, cmap=cmap, vmin=vmin, vmax=vmax, origin=origin, norm=norm, sentinel_colors=sentinel_colors)
+            stage.add(bytes_out=indices.nbytes)
+        else:
+            pixels = render_heatmap_rgba(data, cmap=cmap, vmin=vmin, vmax=vmax, origin=origin, norm=norm, sentinel_colors=sentinel_colors)
+            stage.add(bytes_out=pixels.nbytes)
+    with default_profiler.stage('png_encode', bytes_in=(indices.nbytes if indexed else pixels.nbytes)) as stage:
+        png_bytes: bytes = encode_indexed_png(indices, palette, transparent_index=transparent_index, compression_level=compression_level, png_filter=png_filter) if indexed else encode_png(pixels, compression_level=compression_level)
+        stage.add(bytes_out=len(png_bytes))
+    return png_bytes
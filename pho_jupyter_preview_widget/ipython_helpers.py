@@ -1,13 +1,30 @@
+import ast
 from typing import Dict, List, Tuple, Optional, Callable, Union, Any
 from IPython.core.magic import Magics, magics_class, cell_magic, line_magic
 from IPython import get_ipython
 from IPython.display import display
-import ipykernel
 import numpy as np
-import pandas as pd
 
 # from pho_jupyter_preview_widget.display_helpers import render_scrollable_colored_table_from_dataframe
-from pyphocorehelpers.print_helpers import render_scrollable_colored_table_from_dataframe, render_scrollable_colored_table
+## pandas and pyphocorehelpers are imported by the magics that use them, so registering the magics stays fast
+
+def _save_preview_formatters(ip) -> Dict:
+    """ Snapshots the type printers of the formatters that `array_repr_with_graphical_preview` registers into, and the output byte budget limits. """
+    from pho_jupyter_preview_widget.output_budget import default_output_budget
+    formatters = [ip.display_formatter.formatters['text/html'], ip.display_formatter.formatters['text/plain'], ip.display_formatter.ipython_display_formatter]
+    return dict(printers=[(formatter, dict(formatter.type_printers), dict(formatter.deferred_printers)) for formatter in formatters],
+                output_budget_limits=(default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes))
+
+
+def _restore_preview_formatters(ip, saved_state: Dict):
+    from pho_jupyter_preview_widget.output_budget import default_output_budget
+    for formatter, type_printers, deferred_printers in saved_state['printers']:
+        formatter.type_printers.clear()
+        formatter.type_printers.update(type_printers)
+        formatter.deferred_printers.clear()
+        formatter.deferred_printers.update(deferred_printers)
+    default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes = saved_state['output_budget_limits']
+
 
 def _parse_ndarray_preview_params(line: str) -> Dict:
     """ 
@@ -21,6 +38,8 @@ def _parse_ndarray_preview_params(line: str) -> Dict:
     config = {}
     
     for param in params:
+        if not param.strip():
+            continue # e.g. a bare `%%ndarray_preview`
         key, value = param.split('=')
         key = key.strip()
         value = value.strip()
@@ -82,6 +101,9 @@ class PreviewWidgetMagics(Magics):
         %%ndarray_preview height=None, width=100, include_plaintext_repr=True, include_shape=False, horizontal_layout=False
         
         compatable with `InteractiveShell.ast_node_interactivity = "all"` and handles multiple outputs gracefully.
+
+        The cell is parsed once with `ast` and every top-level statement is executed exactly once (multi-line statements included), so a wrapped
+        cell costs the same as an unwrapped one. The previous formatters are restored even if the cell raises.
         
         """
         from pho_jupyter_preview_widget.display_helpers import array_repr_with_graphical_preview
@@ -89,51 +111,71 @@ class PreviewWidgetMagics(Magics):
         debug_print = False
 
         # Split the magic line by commas to get individual key-value pairs (like `%%ndarray_preview height=500, width=200, include_plaintext_repr=False`)
-        params = line.split(',')
         config = _parse_ndarray_preview_params(line=line) 
         
         if debug_print:
             print(f'config: {config}\n')
             
         ip = get_ipython()
-        
-        ## Backup the current NDArray formatter
-        _bak_formatter = ip.display_formatter.formatters['text/html'].type_printers.pop(np.ndarray, None)
-            
-        # Register the custom display function for NumPy arrays for the duration of the cell:
-        array_repr_with_graphical_preview(ip=ip, **config)
 
-        # Split the cell into individual lines
-        cell_lines = cell.splitlines()
-        cell_outputs = []
-        
-        # Execute each line and capture output (for compatibility with `InteractiveShell.ast_node_interactivity = "all"` to handle multiple outputs gracefully)
-        for line in cell_lines:
-            exec(line, self.shell.user_ns, self.shell.user_ns)
-            
-            # If the last line was an expression, capture its value to display
-            if line.strip() and not line.strip().startswith('#'):
-                try:
-                    output = eval(line, self.shell.user_ns, self.shell.user_ns)
+        # Parse the (IPython-syntax transformed) cell once, up front: a syntax error anywhere runs nothing, like an unwrapped cell
+        source: str = ip.transform_cell(cell)
+        filename: str = ip.compile.cache(source) if hasattr(ip.compile, 'cache') else '<ndarray_preview>' # registered with linecache, so tracebacks show the cell's lines
+        top_level_nodes = ast.parse(source, filename=filename).body
+
+        ## Backup every formatter (and the output byte budget) `array_repr_with_graphical_preview` may replace, restored however the cell ends
+        saved_state = _save_preview_formatters(ip)
+        try:
+            # Register the custom display function for NumPy arrays for the duration of the cell:
+            array_repr_with_graphical_preview(ip=ip, **config)
+
+            # Execute each top-level statement exactly once, displaying the value of every expression statement (like `InteractiveShell.ast_node_interactivity = "all"`)
+            for node in top_level_nodes:
+                if isinstance(node, ast.Expr):
+                    output = eval(compile(ast.Expression(body=node.value), filename, 'eval'), self.shell.user_ns, self.shell.user_ns)
                     if output is not None:
                         display(output)
-                        cell_outputs.append(output)
-                        
-                except BaseException:
-                    pass  # Ignore errors for non-expressions or if exec-ed code raises an exception
-        
-        # Remove the custom formatter
-        ip.display_formatter.formatters['text/html'].type_printers.pop(np.ndarray, None)
-
-        ## Restore the previous formatter
-        if _bak_formatter is not None:
-            ip.display_formatter.formatters['text/html'].for_type(np.ndarray, _bak_formatter)
+                else:
+                    exec(compile(ast.Module(body=[node], type_ignores=[]), filename, 'exec'), self.shell.user_ns, self.shell.user_ns)
+        finally:
+            ## Restore the previous formatters
+            _restore_preview_formatters(ip, saved_state)
         
     
 
+    @line_magic
+    def preview_stats(self, line):
+        """ Shows where preview rendering time goes: per-stage timers and counters (calls, bytes in/out, cache hits, fallbacks) aggregated by `profiling.default_profiler`.
+        Profiling is off by default (the instrumented stages then cost next to nothing).
+
+        %preview_stats on       # start recording
+        %preview_stats          # print the aggregated table
+        %preview_stats df       # return it as a pandas DataFrame
+        %preview_stats reset    # clear what was recorded so far
+        %preview_stats off      # stop recording
+
+        """
+        from pho_jupyter_preview_widget.profiling import default_profiler
+        command: str = line.strip().lower()
+        if command in ('', 'show'):
+            print(default_profiler.format_table())
+        elif command == 'df':
+            return default_profiler.to_dataframe()
+        elif command == 'reset':
+            default_profiler.reset()
+        elif command == 'on':
+            default_profiler.enable()
+        elif command == 'off':
+            default_profiler.disable()
+        else:
+            print(f'ERROR: unknown %preview_stats command "{line.strip()}". Expected one of: on, off, show, df, reset.')
+
+
     @cell_magic
     def scrollable_colored_table(self, line, cell):
         # Execute the cell and capture the result
+        import pandas as pd
+        from pyphocorehelpers.print_helpers import render_scrollable_colored_table_from_dataframe
         result = self.shell.run_cell(cell).result
         if isinstance(result, pd.DataFrame):
             # Apply custom formatter
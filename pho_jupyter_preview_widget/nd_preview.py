@@ -0,0 +1,200 @@
+""" Thumbnail previews for arrays with more than 2 dimensions: a montage of sampled slices or a max/mean/sum projection along one axis.
+
+    from pho_jupyter_preview_widget.nd_preview import nd_preview_image
+
+    volume = np.random.rand(40, 5, 2000, 300) # trials x channels x time x cells
+    image, description = nd_preview_image(volume, mode='montage', axis=0, reduction_order=[(1, 'mean')])
+    description # 'montage of 16/40 slices along axis 0; axis 1: mean'
+
+The cost is bounded regardless of the size of the array:
+    - the two image axes are strided down to what the thumbnail can show before anything is read (the same bound as `array_downsampling.downsample_2d`)
+    - a montage only reads the (at most `max_slices`) slices it draws
+    - projections over volumes larger than `max_projection_elements` are estimated from `max_slices` evenly spaced slices instead of reducing the full volume
+    - out-of-core (memory-mapped) arrays are strided to one element per output pixel and use `OUT_OF_CORE_MAX_PROJECTION_ELEMENTS` (see `array_downsampling.is_out_of_core`)
+"""
+import math
+import warnings
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from pho_jupyter_preview_widget.array_downsampling import downsample_2d, is_out_of_core, thumbnail_max_block_size
+
+
+ND_PREVIEW_MODES: Tuple[str, ...] = ('montage', 'max', 'mean', 'sum')
+ND_AXIS_REDUCERS: Tuple[str, ...] = ('center', 'max', 'mean', 'sum') # how the axes beyond the third are collapsed ('center' takes the middle slice)
+OUT_OF_CORE_MAX_PROJECTION_ELEMENTS: int = (1 << 16)
+
+
+def sample_slice_indices(n: int, max_slices: int) -> np.ndarray:
+    """ At most `max_slices` evenly spaced indices into an axis of length `n` (always including the first and last). """
+    if n <= max_slices:
+        return np.arange(n)
+    if max_slices <= 1:
+        return np.array([n // 2])
+    return np.unique(np.round(np.linspace(0, n - 1, max_slices)).astype(np.intp))
+
+
+def _take(arr: np.ndarray, index, axis: int) -> np.ndarray:
+    """ `np.take` by indexing instead: a scalar index gives a view and an index array only copies the selected slices (`np.take` first copies a non-contiguous input in full). """
+    return arr[(slice(None),) * axis + (index,)]
+
+
+def _reduce_axis(arr: np.ndarray, axis: int, reducer: str) -> np.ndarray:
+    """ NaN-ignoring projection of `arr` along `axis` for float data, plain reductions otherwise. """
+    is_float: bool = np.issubdtype(arr.dtype, np.floating)
+    if reducer == 'max':
+        return np.fmax.reduce(arr, axis=axis) if is_float else np.max(arr, axis=axis)
+    elif reducer == 'mean':
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning) # all-NaN columns just stay NaN
+            return np.nanmean(arr, axis=axis) if is_float else np.mean(arr, axis=axis)
+    elif reducer == 'sum':
+        return np.nansum(arr, axis=axis) if is_float else np.sum(arr, axis=axis)
+    else:
+        raise ValueError(f'Unknown reducer: "{reducer}". Expected one of {ND_AXIS_REDUCERS}.')
+
+
+def _project_axis(arr: np.ndarray, axis: int, reducer: str, max_slices: int, max_projection_elements: int) -> Tuple[np.ndarray, str]:
+    """ Collapses `axis` of `arr` with `reducer`, sampling `max_slices` slices when `arr` is larger than `max_projection_elements`. Returns the result and a short description. """
+    n: int = arr.shape[axis]
+    if reducer == 'center':
+        return _take(arr, n // 2, axis=axis), f'[{n // 2}]'
+    if arr.size <= max_projection_elements:
+        return _reduce_axis(arr, axis=axis, reducer=reducer), reducer
+    indices = sample_slice_indices(n, max_slices)
+    projected = _reduce_axis(_take(arr, indices, axis=axis), axis=axis, reducer=reducer)
+    if reducer == 'sum':
+        projected = projected * (n / len(indices)) # scale the sampled sum up to an estimate of the full one
+    return projected, f'{reducer} (sampled {len(indices)}/{n})'
+
+
+def _resolve_reduction_order(reduction_order: Optional[Sequence[Union[int, Tuple[int, str]]]], extra_axes: List[int], ndim: int, default_reducer: str) -> List[Tuple[int, str]]:
+    """ Normalizes `reduction_order` into a list of (axis, reducer) covering every axis in `extra_axes` exactly once. Unlisted extra axes are appended with `default_reducer`. """
+    resolved: List[Tuple[int, str]] = []
+    for entry in (reduction_order or []):
+        axis, reducer = (entry, default_reducer) if isinstance(entry, (int, np.integer)) else entry
+        if not (-ndim <= axis < ndim):
+            raise ValueError(f'reduction_order axis {axis} is out of bounds for an array with ndim: {ndim}')
+        axis = int(axis) % ndim
+        if axis not in extra_axes:
+            raise ValueError(f'reduction_order axis {axis} is not one of the axes beyond the displayed three: {extra_axes}')
+        if reducer not in ND_AXIS_REDUCERS:
+            raise ValueError(f'Unknown reducer: "{reducer}". Expected one of {ND_AXIS_REDUCERS}.')
+        if axis in [a for a, _r in resolved]:
+            raise ValueError(f'reduction_order lists axis {axis} more than once')
+        resolved.append((axis, reducer))
+    resolved.extend((a, default_reducer) for a in extra_axes if a not in [a for a, _r in resolved])
+    return resolved
+
+
+def _montage_grid_shape(n_tiles: int, montage_columns: Optional[int]=None) -> Tuple[int, int]:
+    n_cols: int = montage_columns or int(math.ceil(math.sqrt(n_tiles)))
+    n_cols = max(1, min(n_cols, n_tiles))
+    return (int(math.ceil(n_tiles / n_cols)), n_cols)
+
+
+def assemble_montage(tiles: Sequence[np.ndarray], montage_columns: Optional[int]=None, gutter: int=1, origin: str='lower') -> np.ndarray:
+    """ Tiles equally shaped 2D arrays into a single float image (row-major), separated by `gutter` NaN pixels (which render transparent).
+
+    origin: the origin the montage will be rendered with. For 'lower' the tile rows are stacked bottom-up so that the first tile still ends up in the top-left corner, while each tile keeps the same orientation as a plain 2D preview.
+    """
+    n_rows, n_cols = _montage_grid_shape(len(tiles), montage_columns=montage_columns)
+    tile_rows, tile_cols = tiles[0].shape
+    out = np.full((n_rows * tile_rows + (n_rows - 1) * gutter, n_cols * tile_cols + (n_cols - 1) * gutter), np.nan, dtype=np.float64)
+    for i, tile in enumerate(tiles):
+        grid_row, grid_col = divmod(i, n_cols)
+        if origin == 'lower':
+            grid_row = (n_rows - 1) - grid_row
+        r0, c0 = grid_row * (tile_rows + gutter), grid_col * (tile_cols + gutter)
+        out[r0:(r0 + tile_rows), c0:(c0 + tile_cols)] = tile
+    return out
+
+
+def nd_preview_image(arr: np.ndarray, mode: str='montage', axis: int=0, reduction_order: Optional[Sequence[Union[int, Tuple[int, str]]]]=None, extra_axes_reducer: str='center',
+                     max_slices: int=16, max_projection_elements: int=(1 << 24), target_shape: Tuple[int, int]=(256, 256), downsample_reducer: str='mean', max_block_size: int=8,
+                     montage_columns: Optional[int]=None, origin: str='lower') -> Tuple[np.ndarray, str]:
+    """ Reduces an N-D (ndim > 2) array to a single 2D image no larger than `target_shape`. Returns (image, description).
+
+    mode:
+        'montage'           - a grid of (at most `max_slices`) evenly spaced slices along `axis`, sharing one color scale
+        'max'/'mean'/'sum'  - a projection along `axis`
+    axis: the slicing/projection axis. The last two remaining axes are the image (rows, cols).
+    reduction_order: for arrays with more than 3 dimensions, the order in which the remaining axes are collapsed, as axes or (axis, reducer) pairs with reducer in `ND_AXIS_REDUCERS`,
+        e.g. `[(0, 'mean'), 3]`. Axes that aren't listed are collapsed afterwards with `extra_axes_reducer` ('center' takes the middle slice, which reads nothing else).
+    max_slices: the most slices read along any axis that is drawn or (for large volumes) projected.
+    max_projection_elements: volumes up to this size are projected exactly; larger ones are projected from `max_slices` sampled slices.
+    """
+    arr = np.asanyarray(arr)
+    if arr.ndim <= 2:
+        raise ValueError(f'nd_preview_image expects ndim > 2 but got ndim: {arr.ndim}')
+    if mode not in ND_PREVIEW_MODES:
+        raise ValueError(f'Unknown mode: "{mode}". Expected one of {ND_PREVIEW_MODES}.')
+    if arr.dtype.kind not in 'biuf':
+        raise ValueError(f'nd_preview_image does not support dtype: {arr.dtype}')
+    if not (-arr.ndim <= axis < arr.ndim):
+        raise ValueError(f'axis {axis} is out of bounds for an array with ndim: {arr.ndim}')
+    if max_slices < 1:
+        raise ValueError(f'max_slices must be at least 1 but got: {max_slices}')
+    axis = int(axis) % arr.ndim
+    if arr.size == 0:
+        raise ValueError(f'nd_preview_image cannot preview an empty array of shape: {arr.shape}')
+    if is_out_of_core(arr):
+        max_block_size = thumbnail_max_block_size(arr, max_block_size=max_block_size)
+        max_projection_elements = min(max_projection_elements, OUT_OF_CORE_MAX_PROJECTION_ELEMENTS)
+    if arr.dtype.kind == 'b':
+        arr = arr.view(np.uint8)
+
+    image_axes: List[int] = [a for a in range(arr.ndim) if a != axis][-2:]
+    extra_axes: List[int] = [a for a in range(arr.ndim) if a not in ([axis] + image_axes)]
+    order = _resolve_reduction_order(reduction_order, extra_axes, arr.ndim, default_reducer=extra_axes_reducer)
+
+    n_stack: int = arr.shape[axis]
+    if mode == 'montage':
+        n_rows, n_cols = _montage_grid_shape(min(n_stack, max_slices), montage_columns=montage_columns)
+        tile_target = (max(1, target_shape[0] // n_rows), max(1, target_shape[1] // n_cols))
+    else:
+        tile_target = target_shape
+
+    # Stride the image axes down to the resolution `downsample_2d` would read anyway (a view, nothing is read yet):
+    image_strides = [max(1, int(math.ceil(arr.shape[a] / (t * max_block_size)))) for a, t in zip(image_axes, tile_target)]
+    arr = arr[tuple(slice(None, None, image_strides[image_axes.index(a)]) if a in image_axes else slice(None) for a in range(arr.ndim))]
+
+    remaining_axes: List[int] = list(range(arr.ndim)) # the original axis labels of `arr`'s current dimensions
+    descriptions: List[str] = []
+
+    def _collapse(original_axis: int, reducer: str):
+        """ captures: arr, remaining_axes, descriptions """
+        nonlocal arr
+        position: int = remaining_axes.index(original_axis)
+        arr, description = _project_axis(arr, axis=position, reducer=reducer, max_slices=max_slices, max_projection_elements=max_projection_elements)
+        remaining_axes.pop(position)
+        descriptions.append(f'axis {original_axis}: {description}')
+
+    # Selecting the middle slice commutes with every other reduction and reads nothing, so do those first:
+    for extra_axis, reducer in order:
+        if reducer == 'center':
+            _collapse(extra_axis, reducer)
+
+    stack_position: int = remaining_axes.index(axis)
+    if mode == 'montage':
+        indices = sample_slice_indices(n_stack, max_slices)
+        arr = _take(arr, indices, axis=stack_position) # only the drawn slices are read from here on
+        stack_description = f'montage of {len(indices)}/{n_stack} slices along axis {axis}'
+    else:
+        stack_description = None
+
+    for extra_axis, reducer in order:
+        if reducer != 'center':
+            _collapse(extra_axis, reducer)
+
+    stack_position = remaining_axes.index(axis)
+    if mode == 'montage':
+        tiles = [downsample_2d(_take(arr, i, axis=stack_position), target_shape=tile_target, reducer=downsample_reducer, max_block_size=max_block_size) for i in range(arr.shape[stack_position])]
+        image = assemble_montage(tiles, montage_columns=montage_columns, origin=origin)
+    else:
+        projected, projection_description = _project_axis(arr, axis=stack_position, reducer=mode, max_slices=max_slices, max_projection_elements=max_projection_elements)
+        image = downsample_2d(projected, target_shape=tile_target, reducer=downsample_reducer, max_block_size=max_block_size)
+        stack_description = f'{projection_description} projection along axis {axis}'
+
+    return image, '; '.join([stack_description] + descriptions)
@@ -0,0 +1,349 @@
+""" Dtype-specialized conversion of arrays into heatmap colormap indices, without full-size float64 temporaries.
+
+    from pho_jupyter_preview_widget.normalization import display_values, normalize_to_uint8
+
+    values, description = display_values(np.fft.fft2(image), complex_mode='phase', max_elements=(256 * 256 * 64)) # float phases of a bounded strided view, 'phase (rad)'
+    indices, is_valid = normalize_to_uint8(values) # uint8 colormap indices + validity
+
+`display_values` turns arrays without a natural color scale into real numbers:
+    complex             -> magnitude, phase, real or imaginary part (`COMPLEX_MODES`; the real/imaginary parts are views)
+    datetime/timedelta  -> int64 views of their ticks (NaT is masked)
+    masked arrays       -> keep their mask
+    structured arrays   -> one of their fields (`structured_fields` lists the ones that can be shown, each is displayed as its own heatmap)
+Whenever a conversion has to allocate, the input is first strided down to `max_elements` (what a thumbnail reduction reads anyway), so the
+copy is proportional to the thumbnail rather than to the input.
+
+`normalize_to_uint8` then dispatches on the dtype:
+    bool                -> a 2-entry lookup table
+    8/16-bit integers   -> a 256/65536-entry lookup table indexed by the raw values (no per-element arithmetic)
+    float16/float32     -> float32 arithmetic
+    other ints, float64 -> float64 arithmetic
+working through the input `CHUNK_ELEMENTS` at a time straight into a preallocated uint8 output (pass `out=` to reuse one), so its temporaries
+never exceed one chunk whatever the size of the input. `norm='log'` maps log10 of the values instead.
+
+`color_scale_limits` picks the (vmin, vmax) of one of the `COLOR_SCALES` from a bounded strided sample (percentiles via `np.partition`, not a sort),
+so a single outlier or inf doesn't wash out the whole thumbnail and the cost doesn't grow with the array:
+
+    vmin, vmax = color_scale_limits(thumbnail, 'percentile', percentiles=(1.0, 99.0))
+    vmin, vmax = color_scale_limits(thumbnail, 'symmetric') # (-m, m) for diverging colormaps
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+COMPLEX_MODES: Tuple[str, ...] = ('magnitude', 'phase', 'real', 'imag')
+COLOR_SCALES: Tuple[str, ...] = ('minmax', 'percentile', 'symmetric', 'log')
+NORMS: Tuple[str, ...] = ('linear', 'log')
+CHUNK_ELEMENTS: int = (1 << 16)
+LUT_16BIT_MIN_ELEMENTS: int = (1 << 14) # a 65536-entry table only pays for itself on inputs at least this large (8-bit tables always do)
+COLOR_SCALE_MAX_SAMPLES: int = (1 << 16) # the most values the color scale percentiles are computed from
+
+
+# ==================================================================================================================== #
+# Display Values                                                                                                       #
+# ==================================================================================================================== #
+
+def is_heatmap_dtype(dtype) -> bool:
+    """ True if arrays of `dtype` can be shown as a heatmap (after `display_values`): bools, numbers, complex numbers, datetimes/timedeltas, and structured dtypes with at least one such field. """
+    dtype = np.dtype(dtype)
+    if dtype.names is not None:
+        return len(structured_fields(dtype)) > 0
+    return dtype.kind in 'biufcmM'
+
+
+def structured_fields(dtype) -> List[str]:
+    """ The names of the fields of the structured `dtype` that can be shown as heatmaps (scalar fields of a heatmap dtype), in order. """
+    dtype = np.dtype(dtype)
+    return [name for name in (dtype.names or ()) if (dtype.fields[name][0].shape == ()) and is_heatmap_dtype(dtype.fields[name][0])]
+
+
+def bounded_view(arr: np.ndarray, max_elements: Optional[int]=None, keep_axis: Optional[int]=None) -> np.ndarray:
+    """ A strided view of `arr` with at most ~`max_elements` elements (`arr` itself if it fits or `max_elements` is None), strided by the same step along every axis but `keep_axis`. """
+    if (max_elements is None) or (arr.size <= max_elements) or (arr.ndim == 0):
+        return arr
+    strided_axes = [axis for axis in range(arr.ndim) if (keep_axis is None) or (axis != (keep_axis % arr.ndim))]
+    if len(strided_axes) == 0:
+        return arr
+    step: int = int(np.ceil((arr.size / max(1, max_elements)) ** (1.0 / len(strided_axes))))
+    return arr[tuple(slice(None, None, step) if (axis in strided_axes) else slice(None) for axis in range(arr.ndim))]
+
+
+def _int64_ticks(arr: np.ndarray) -> np.ndarray:
+    """ The int64 view of a datetime64/timedelta64 array (same byte order, no copy). """
+    int_dtype = np.dtype(np.int64)
+    return arr.view(int_dtype if arr.dtype.isnative else int_dtype.newbyteorder())
+
+
+def display_values(arr: np.ndarray, complex_mode: str='magnitude', field: Optional[str]=None, max_elements: Optional[int]=None, keep_axis: Optional[int]=None) -> Tuple[np.ndarray, Optional[str]]:
+    """ `arr` as real numbers (or bools) that `normalize_to_uint8` can color, and a short description of the conversion (None if there was none).
+
+    complex_mode: how complex arrays are shown, one of `COMPLEX_MODES`.
+    field: the field of a structured array to show (defaults to the first of its `structured_fields`).
+    max_elements, keep_axis: conversions that allocate (complex magnitude/phase, NaT masking) run on `bounded_view(arr, max_elements, keep_axis)`, so
+        they never copy more than the thumbnail reduction would read. Conversions that are views (bool/numeric arrays, real/imaginary parts, datetimes without NaT) keep every element.
+
+    Raises ValueError for arrays that can't be shown as a heatmap (strings, objects, structured arrays without a numeric field).
+
+        values, description = display_values(np.arange('2024-01-01', '2024-03-01', dtype='datetime64[D]')) # int64 days since 1970-01-01
+    """
+    arr = np.asanyarray(arr)
+    dtype = arr.dtype
+    if dtype.names is not None:
+        fields = structured_fields(dtype)
+        if len(fields) == 0:
+            raise ValueError(f'None of the fields of the structured dtype {dtype} can be shown as a heatmap.')
+        if field is None:
+            field = fields[0]
+        elif field not in fields:
+            raise ValueError(f'Unknown or non-numeric field "{field}" of the structured dtype {dtype}. Expected one of {fields}.')
+        values, description = display_values(arr[field], complex_mode=complex_mode, max_elements=max_elements, keep_axis=keep_axis)
+        return values, (f'field "{field}"' + (f', {description}' if description else ''))
+
+    if not is_heatmap_dtype(dtype):
+        raise ValueError(f'Arrays of dtype {dtype} can\'t be shown as a heatmap.')
+    if complex_mode not in COMPLEX_MODES:
+        raise ValueError(f'Unknown complex_mode: "{complex_mode}". Expected one of {COMPLEX_MODES}.')
+    if dtype.kind in 'biuf':
+        return arr, None
+
+    if np.ma.isMaskedArray(arr):
+        arr = bounded_view(arr, max_elements, keep_axis=keep_axis)
+        values, description = display_values(np.ma.getdata(arr), complex_mode=complex_mode)
+        return np.ma.masked_array(values, mask=(np.ma.getmaskarray(values) | np.ma.getmaskarray(arr))), description
+
+    if dtype.kind == 'c':
+        if complex_mode == 'real':
+            return arr.real, 'real part'
+        elif complex_mode == 'imag':
+            return arr.imag, 'imaginary part'
+        arr = bounded_view(arr, max_elements, keep_axis=keep_axis)
+        return (np.abs(arr), 'magnitude') if (complex_mode == 'magnitude') else (np.angle(arr), 'phase (rad)')
+
+    # datetime64/timedelta64:
+    unit, count = np.datetime_data(dtype)
+    unit_str: str = f'{count} {unit}' if (count != 1) else unit
+    description: str = f'{dtype} as {unit_str} since 1970-01-01' if (dtype.kind == 'M') else f'{dtype} in {unit_str}'
+    bounded = bounded_view(arr, max_elements, keep_axis=keep_axis)
+    is_nat = np.isnat(bounded)
+    if is_nat.any():
+        return np.ma.masked_array(_int64_ticks(bounded), mask=is_nat), description
+    return _int64_ticks(arr), description
+
+
+# ==================================================================================================================== #
+# Normalization Kernels                                                                                                #
+# ==================================================================================================================== #
+
+def _as_2d(arr: np.ndarray) -> np.ndarray:
+    """ `arr` as a 2D array, a view for 0-2D inputs (and contiguous N-D ones). """
+    if arr.ndim == 2:
+        return arr
+    if arr.ndim < 2:
+        return arr.reshape(1, -1)
+    return arr.reshape(-1, arr.shape[-1])
+
+
+def _iter_chunks(n_rows: int, n_cols: int, chunk_elements: int=CHUNK_ELEMENTS):
+    """ (rows, cols) slices of blocks of at most ~`chunk_elements` covering an (n_rows, n_cols) array: whole rows at a time, or runs of one row if a row is longer than a chunk. """
+    cols_per_chunk: int = max(1, min(n_cols, chunk_elements))
+    rows_per_chunk: int = max(1, chunk_elements // cols_per_chunk)
+    for row_start in range(0, n_rows, rows_per_chunk):
+        for col_start in range(0, n_cols, cols_per_chunk):
+            yield slice(row_start, (row_start + rows_per_chunk)), slice(col_start, (col_start + cols_per_chunk))
+
+
+def _check_normalizable(dtype: np.dtype, fn_name: str):
+    if dtype.kind not in 'biuf':
+        raise ValueError(f'{fn_name} expects boolean or real numeric data but got dtype: {dtype} (see `normalization.display_values`)')
+
+
+def finite_range(data: np.ndarray) -> Optional[Tuple[float, float]]:
+    """ (min, max) of the finite, unmasked values of `data` (None if there are none), computed chunk by chunk without a full-size copy or float64 cast. """
+    data = np.asanyarray(data)
+    mask = np.ma.getmask(data)
+    values = np.ma.getdata(data)
+    _check_normalizable(values.dtype, 'finite_range')
+    if values.size == 0:
+        return None
+    if (values.dtype.kind != 'f') and (mask is np.ma.nomask):
+        return (float(values.min()), float(values.max()))
+
+    values = _as_2d(values)
+    mask = None if (mask is np.ma.nomask) else _as_2d(mask)
+    low, high = np.inf, -np.inf
+    for rows, cols in _iter_chunks(*values.shape):
+        chunk = values[rows, cols]
+        is_valid = np.isfinite(chunk) if (values.dtype.kind == 'f') else np.ones(chunk.shape, dtype=bool)
+        if mask is not None:
+            is_valid &= ~mask[rows, cols]
+        if not is_valid.all():
+            chunk = chunk[is_valid]
+            if chunk.size == 0:
+                continue
+        low, high = min(low, float(chunk.min())), max(high, float(chunk.max()))
+    return None if (low > high) else (low, high)
+
+
+def _index_lut(domain: np.ndarray, vmin: float, span: float, norm: str='linear') -> np.ndarray:
+    """ The colormap index of every value in `domain`, computed exactly as the arithmetic path does (`vmin` and `span` are of the log10 values for `norm='log'`). """
+    domain = domain.astype(np.float64)
+    if norm == 'log':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            domain = np.log10(np.maximum(domain, (10.0 ** vmin)))
+    scaled = (domain - vmin) * (256.0 / span)
+    np.clip(scaled, 0.0, 255.0, out=scaled)
+    return scaled.astype(np.uint8)
+
+
+def _unsigned_view(values: np.ndarray) -> np.ndarray:
+    """ bool/integer `values` reinterpreted as the unsigned integers of the same size and byte order (the LUT index of each value). """
+    return values.view(values.dtype.str.replace('i', 'u').replace('b', 'u'))
+
+
+def normalize_to_uint8(data: np.ndarray, vmin: Optional[float]=None, vmax: Optional[float]=None, out: Optional[np.ndarray]=None, norm: str='linear') -> Tuple[np.ndarray, np.ndarray]:
+    """ Linearly maps `data` onto 0-255 colormap indices, like `matplotlib.colors.Normalize` followed by the colormap's `(x * N).astype(int)` lookup.
+
+    Returns (indices, is_valid) where `is_valid` is False for NaN/inf and masked entries (which matplotlib renders with the transparent "bad" color); their index is 0.
+    Masked entries are also left out of the automatic vmin/vmax.
+    out: a C-contiguous uint8 array of `data`'s shape to write the indices into (allocated if None).
+    norm: 'linear', or 'log' to map log10 of the values like `matplotlib.colors.LogNorm` (vmin must be > 0; values <= vmin, including 0 and negative ones, get the lowest color).
+
+    Bools and 8/16-bit integers are mapped through a lookup table, float16/float32 are scaled in float32 and everything else in float64,
+    `CHUNK_ELEMENTS` at a time, so no temporary is larger than a chunk. Other dtypes raise ValueError (convert them with `display_values` first).
+    """
+    data = np.asanyarray(data)
+    mask = np.ma.getmask(data)
+    values = np.ma.getdata(data)
+    _check_normalizable(values.dtype, 'normalize_to_uint8')
+    if out is None:
+        out = np.empty(values.shape, dtype=np.uint8)
+    elif (out.shape != values.shape) or (out.dtype != np.uint8) or not out.flags.c_contiguous:
+        raise ValueError(f'normalize_to_uint8 expects `out` to be a C-contiguous uint8 array of shape {values.shape} but got: {out.dtype} {out.shape}')
+
+    if norm not in NORMS:
+        raise ValueError(f'Unknown norm: "{norm}". Expected one of {NORMS}.')
+    if (vmin is None) or (vmax is None):
+        if norm == 'log':
+            value_range = color_scale_limits(data, 'log', percentiles=(0.0, 100.0)) or (1.0, 10.0) # the range of the positive values
+        else:
+            value_range = finite_range(data) or (0.0, 1.0)
+        vmin = value_range[0] if (vmin is None) else vmin
+        vmax = value_range[1] if (vmax is None) else vmax
+    if norm == 'log':
+        if float(vmin) <= 0.0:
+            raise ValueError(f'normalize_to_uint8 with norm="log" needs vmin > 0 but got: {vmin}')
+        vmin, vmax = np.log10(float(vmin)), np.log10(max(float(vmin), float(vmax)))
+    vmin, span = float(vmin), (float(vmax) - float(vmin))
+
+    is_float: bool = (values.dtype.kind == 'f')
+    is_valid = np.empty(values.shape, dtype=bool) if is_float else (np.ones(values.shape, dtype=bool) if (mask is np.ma.nomask) else ~mask)
+    if span <= 0.0:
+        out.fill(0)
+        if is_float:
+            np.isfinite(values, out=is_valid)
+            if mask is not np.ma.nomask:
+                is_valid &= ~mask
+        return out, is_valid
+
+    out_2d, values_2d, is_valid_2d = _as_2d(out), _as_2d(values), _as_2d(is_valid)
+    mask_2d = None if (mask is np.ma.nomask) else _as_2d(mask)
+    lut = None
+    if values.dtype.kind == 'b':
+        lut = _index_lut(np.array([0, 1]), vmin, span, norm=norm)
+    elif (values.dtype.kind in 'iu') and ((values.dtype.itemsize == 1) or ((values.dtype.itemsize == 2) and (values.size >= LUT_16BIT_MIN_ELEMENTS))):
+        n_bits: int = 8 * values.dtype.itemsize
+        domain = np.arange((1 << n_bits), dtype=f'u{values.dtype.itemsize}') # indexed by the unsigned reinterpretation of each value
+        lut = _index_lut((domain.view(f'i{values.dtype.itemsize}') if (values.dtype.kind == 'i') else domain), vmin, span, norm=norm)
+
+    if lut is not None:
+        unsigned_values_2d = _unsigned_view(values_2d)
+        for rows, cols in _iter_chunks(*values_2d.shape):
+            np.take(lut, unsigned_values_2d[rows, cols], out=out_2d[rows, cols], mode='clip')
+        if mask_2d is not None:
+            out_2d[mask_2d] = 0
+        return out, is_valid
+
+    work_dtype = np.float32 if (is_float and (values.dtype.itemsize <= 4)) else np.float64
+    work_vmin, work_scale = work_dtype(vmin), work_dtype(256.0 / span)
+    buffer = np.empty(min(CHUNK_ELEMENTS, max(1, values.size)), dtype=work_dtype)
+    for rows, cols in _iter_chunks(*values_2d.shape):
+        chunk, out_chunk = values_2d[rows, cols], out_2d[rows, cols]
+        scaled = buffer[:chunk.size].reshape(chunk.shape)
+        if norm == 'log':
+            np.maximum(chunk, work_dtype(10.0 ** vmin), out=scaled, casting='unsafe') # NaNs stay NaN, -inf (invalid anyway) becomes vmin
+            np.log10(scaled, out=scaled)
+            np.subtract(scaled, work_vmin, out=scaled)
+        else:
+            np.subtract(chunk, work_vmin, out=scaled, casting='unsafe')
+        np.multiply(scaled, work_scale, out=scaled)
+        np.clip(scaled, 0.0, 255.0, out=scaled)
+        if is_float or (mask_2d is not None):
+            chunk_is_valid = is_valid_2d[rows, cols]
+            if is_float:
+                np.isfinite(chunk, out=chunk_is_valid)
+                if mask_2d is not None:
+                    chunk_is_valid &= ~mask_2d[rows, cols]
+            out_chunk.fill(0)
+            np.copyto(out_chunk, scaled, casting='unsafe', where=chunk_is_valid)
+        else:
+            np.copyto(out_chunk, scaled, casting='unsafe')
+    return out, is_valid
+
+
+# ==================================================================================================================== #
+# Color Scaling                                                                                                        #
+# ==================================================================================================================== #
+
+def sample_percentiles(values: np.ndarray, percentiles: Tuple[float, ...]) -> Tuple[float, ...]:
+    """ The `percentiles` (0-100) of the 1D `values`, interpolated linearly like `np.percentile`'s default, from one `np.partition` (O(n)) instead of a full sort. Partitions `values` in place. """
+    n: int = values.shape[0]
+    positions = [(float(p) / 100.0) * (n - 1) for p in percentiles]
+    kth = sorted({int(np.floor(x)) for x in positions} | {min((n - 1), int(np.floor(x)) + 1) for x in positions})
+    values.partition(kth)
+    result = []
+    for x in positions:
+        low = int(np.floor(x))
+        high = min((n - 1), low + 1)
+        result.append(float(values[low]) + ((x - low) * (float(values[high]) - float(values[low]))))
+    return tuple(result)
+
+
+def _finite_sample(data: np.ndarray, max_samples: int) -> np.ndarray:
+    """ The finite, unmasked values (as a new 1D float64 array) of a bounded strided sample of `data`. """
+    from pho_jupyter_preview_widget.array_stats import bounded_sample
+    sample = bounded_sample(np.asanyarray(data), max_samples)
+    values = np.ma.getdata(sample)
+    _check_normalizable(values.dtype, 'color_scale_limits')
+    is_valid = np.isfinite(values) if (values.dtype.kind == 'f') else np.ones(values.shape, dtype=bool)
+    if np.ma.isMaskedArray(sample):
+        is_valid &= ~np.ma.getmaskarray(sample)
+    return values[is_valid].astype(np.float64, copy=False).ravel()
+
+
+def color_scale_limits(data: np.ndarray, color_scale: str='percentile', percentiles: Tuple[float, float]=(1.0, 99.0), max_samples: int=COLOR_SCALE_MAX_SAMPLES) -> Optional[Tuple[float, float]]:
+    """ The (vmin, vmax) that `data` is colored with under `color_scale`, or None if it has no finite (or, for 'log', positive) values.
+
+    color_scale:
+        'minmax'     - the finite min/max of every element (exact, chunked; use it on thumbnails, not on huge arrays)
+        'percentile' - the `percentiles` of a bounded sample, so outliers are clipped to the ends of the colormap instead of squeezing everything else into one color
+        'symmetric'  - (-m, m) where m is the upper percentile of |values|, centering a diverging colormap (e.g. 'RdBu_r') on zero
+        'log'        - the `percentiles` of the positive values, for `normalize_to_uint8(..., norm='log')`
+    max_samples: the percentiles are computed from a strided sample of at most ~this many elements, so the cost is constant whatever the size of `data`.
+    """
+    if color_scale not in COLOR_SCALES:
+        raise ValueError(f'Unknown color_scale: "{color_scale}". Expected one of {COLOR_SCALES}.')
+    if color_scale == 'minmax':
+        return finite_range(data)
+    values = _finite_sample(data, max_samples)
+    if color_scale == 'log':
+        values = values[values > 0.0]
+    if values.size == 0:
+        return None
+    if color_scale == 'symmetric':
+        np.abs(values, out=values)
+        (magnitude,) = sample_percentiles(values, (percentiles[1],))
+        magnitude = magnitude if (magnitude > 0.0) else 1.0
+        return (-magnitude, magnitude)
+    low, high = sample_percentiles(values, percentiles)
+    return (low, high)
@@ -0,0 +1,86 @@
+""" Byte budgets for the previews embedded in a notebook, per output and per cell, so heavy previews don't bloat the saved `.ipynb`.
+
+    from pho_jupyter_preview_widget.output_budget import default_output_budget
+
+    default_output_budget.max_output_bytes = 64 * 1024 # no single preview larger than 64 KB
+    default_output_budget.max_cell_bytes = 512 * 1024 # and at most 512 KB of previews per executed cell
+    default_output_budget.stats() # {'cell_key': 12, 'cell_bytes': 40960, 'max_output_bytes': 65536, 'max_cell_bytes': 524288, 'n_outputs': 3}
+
+Previews ask `available()` how many bytes they may use before rendering, degrade their thumbnail resolution until they fit (see
+`display_helpers._array_heatmap_html`), and `charge()` what they actually emitted afterwards. Cells are identified by the shell's `execution_count`;
+outside of IPython there are no cells, so only the per-output limit applies.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+def current_cell_key() -> Optional[Hashable]:
+    """ The `execution_count` of the running IPython shell (a new value per executed cell), or None outside of IPython. """
+    try:
+        import IPython
+    except ImportError:
+        return None
+    ip = IPython.get_ipython()
+    return getattr(ip, 'execution_count', None) if (ip is not None) else None
+
+
+class OutputByteBudget:
+    """ Tracks the bytes emitted by previews in the current cell against a per-output and a per-cell limit. Thread-safe.
+
+    max_output_bytes: the most bytes a single preview may embed (None for no limit).
+    max_cell_bytes: the most bytes all the previews of one cell may embed together (None for no limit).
+    max_tracked_cells: how many of the most recent cells keep their own tally, so a late (background) charge for an earlier cell still lands on that cell
+        instead of the one that is running now.
+    """
+    def __init__(self, max_output_bytes: Optional[int]=(256 * 1024), max_cell_bytes: Optional[int]=(2 * 1024**2), max_tracked_cells: int=16):
+        self.max_output_bytes = max_output_bytes
+        self.max_cell_bytes = max_cell_bytes
+        self.max_tracked_cells = max_tracked_cells
+        self._cell_key: Optional[Hashable] = None # the most recent cell
+        self._cell_tallies: "OrderedDict[Hashable, List[int]]" = OrderedDict() # cell_key -> [n_bytes, n_outputs], oldest cell first
+        self._lock = threading.Lock()
+
+
+    def _tally(self, cell_key: Hashable) -> List[int]:
+        """ The [n_bytes, n_outputs] tally of `cell_key`, starting a fresh one (and making it the current cell) the first time a cell is seen. Call with the lock held. """
+        tally = self._cell_tallies.get(cell_key, None)
+        if tally is None:
+            tally = self._cell_tallies[cell_key] = [0, 0]
+            self._cell_key = cell_key
+            while len(self._cell_tallies) > max(1, self.max_tracked_cells):
+                self._cell_tallies.popitem(last=False)
+        return tally
+
+    def available(self, cell_key: Optional[Hashable]=None) -> Optional[int]:
+        """ The most bytes the next preview in the cell may use (may be <= 0 once the cell's budget is spent), or None if unlimited. cell_key defaults to `current_cell_key()`. """
+        cell_key = current_cell_key() if (cell_key is None) else cell_key
+        limits = [self.max_output_bytes] if (self.max_output_bytes is not None) else []
+        if (self.max_cell_bytes is not None) and (cell_key is not None):
+            with self._lock:
+                limits.append(self.max_cell_bytes - self._tally(cell_key)[0])
+        return min(limits) if (len(limits) > 0) else None
+
+    def charge(self, n_bytes: int, cell_key: Optional[Hashable]=None):
+        """ Records that a preview of `n_bytes` was emitted in the cell (defaults to `current_cell_key()`). """
+        cell_key = current_cell_key() if (cell_key is None) else cell_key
+        if cell_key is None:
+            return
+        with self._lock:
+            tally = self._tally(cell_key)
+            tally[0] += int(n_bytes)
+            tally[1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._cell_key = None
+            self._cell_tallies.clear()
+
+    def stats(self) -> Dict:
+        """ The tally of the most recent cell. """
+        with self._lock:
+            cell_bytes, n_outputs = self._cell_tallies.get(self._cell_key, (0, 0))
+            return dict(cell_key=self._cell_key, cell_bytes=cell_bytes, max_output_bytes=self.max_output_bytes, max_cell_bytes=self.max_cell_bytes, n_outputs=n_outputs)
+
+
+default_output_budget = OutputByteBudget()
@@ -0,0 +1,184 @@
+""" A plaintext array formatter whose cost depends on what it shows, not on the size of the array.
+
+    from pho_jupyter_preview_widget.plaintext_formatting import format_array_text
+
+    format_array_text(np.random.rand(10_000_000)) # '[0.5488135, 0.71518937, 0.60276338, ..., 0.2311893, 0.68173297, 0.3108734]'
+    format_array_text(np.arange(24).reshape(2, 3, 4), align_columns=True)
+
+Only the edge items that will be displayed are gathered from the array (with one fancy-indexing call), so formatting a 10M-element array
+touches a few dozen elements. Numbers are formatted per dtype with one vectorized `np.char.mod` call per candidate precision, and the
+output is built from those strings directly: 1D arrays get exactly one `separator` between items (no post-hoc string surgery), N-D arrays
+are laid out like `np.array2string` (optionally with right-aligned columns). `max_chars` and `max_seconds` bound the output and the time spent.
+"""
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+ELISION_MARKER: str = '...'
+
+
+# ==================================================================================================================== #
+# Element Selection                                                                                                    #
+# ==================================================================================================================== #
+
+def _shown_indices(n: int, edgeitems: int, summarize: bool) -> Tuple[np.ndarray, Optional[int]]:
+    """ The indices shown along an axis of length `n`, and the position of the elision marker among them (None if nothing is elided). """
+    if summarize and (n > 2 * edgeitems):
+        return np.r_[0:edgeitems, (n - edgeitems):n], edgeitems
+    return np.arange(n), None
+
+
+def select_edge_items(arr: np.ndarray, edgeitems: int=3, threshold: int=1000, max_items: Optional[int]=None) -> Tuple[np.ndarray, List[Optional[int]]]:
+    """ Gathers the elements that a summarized display of `arr` shows: the first/last `edgeitems` along every axis once `arr.size > threshold`.
+
+    max_items: edgeitems is lowered (to 1 at the least) until at most this many elements are shown.
+    Returns (shown, gaps): the gathered elements (a copy of at most `(2 * edgeitems)**ndim` elements) and, per axis, the elision marker position.
+    """
+    arr = np.asanyarray(arr)
+    summarize: bool = arr.size > threshold
+    if max_items is not None:
+        while True:
+            n_shown: int = int(np.prod([len(_shown_indices(n, edgeitems, summarize or (arr.size > max_items))[0]) for n in arr.shape]))
+            if (n_shown <= max_items) or (edgeitems <= 1):
+                break
+            edgeitems -= 1
+        summarize = summarize or (arr.size > max_items)
+    indices, gaps = zip(*[_shown_indices(n, edgeitems, summarize) for n in arr.shape]) if (arr.ndim > 0) else ((), ())
+    shown = arr[np.ix_(*indices)] if (arr.ndim > 0) else arr
+    return shown, list(gaps)
+
+
+# ==================================================================================================================== #
+# Per-dtype Element Formatting                                                                                         #
+# ==================================================================================================================== #
+
+def _shortest_exact_format(values: np.ndarray, style: str, precision: int) -> np.ndarray:
+    """ `values` formatted with the fewest digits (at most `precision`) that every one of them needs, using one vectorized format per candidate precision. """
+    target = np.char.mod(f'%.{precision}{style}', values).astype(np.float64)
+    for digits in range(precision):
+        formatted = np.char.mod(f'%.{digits}{style}', values)
+        if np.array_equal(formatted.astype(np.float64), target):
+            return formatted
+    return np.char.mod(f'%.{precision}{style}', values)
+
+
+def _format_floats(values: np.ndarray, precision: int=8, suppress_small: bool=False) -> np.ndarray:
+    """ Follows `np.array2string`'s choice: scientific notation if the largest |value| >= 1e8, or (unless suppress_small) the smallest non-zero one is < 1e-4 or 1000x smaller than the largest. """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(values.shape, dtype=object)
+    is_finite = np.isfinite(values)
+    out[np.isnan(values)] = 'nan'
+    out[values == np.inf] = 'inf'
+    out[values == -np.inf] = '-inf'
+    finite_values = values[is_finite]
+    if finite_values.size > 0:
+        abs_values = np.abs(finite_values)
+        max_abs: float = float(abs_values.max())
+        non_zero = abs_values[abs_values > 0]
+        min_abs: float = float(non_zero.min()) if non_zero.size > 0 else 0.0
+        use_scientific: bool = (max_abs >= 1e8) or ((not suppress_small) and (min_abs > 0) and ((min_abs < 1e-4) or (max_abs / min_abs > 1e3)))
+        formatted = _shortest_exact_format(finite_values, 'e' if use_scientific else 'f', precision)
+        if not use_scientific:
+            formatted = np.char.add(formatted, np.where(np.char.find(formatted, '.') < 0, '.', '')) # integral floats keep numpy's trailing '.'
+        out[is_finite] = formatted
+    return out
+
+
+def format_elements(values: np.ndarray, precision: int=8, suppress_small: bool=False, max_element_chars: int=80, deadline: Optional[float]=None) -> np.ndarray:
+    """ The display string of every element of `values` (an object array of the same shape), vectorized per dtype kind. """
+    values = np.asanyarray(values)
+    if np.ma.isMaskedArray(values):
+        out = format_elements(np.ma.getdata(values), precision=precision, suppress_small=suppress_small, max_element_chars=max_element_chars, deadline=deadline)
+        out[np.ma.getmaskarray(values)] = '--'
+        return out
+    kind: str = values.dtype.kind
+    if kind == 'b':
+        return np.where(values, 'True', 'False').astype(object)
+    elif kind in 'iu':
+        return np.char.mod('%d', values).astype(object)
+    elif kind == 'f':
+        return _format_floats(values, precision=precision, suppress_small=suppress_small)
+    elif kind == 'c':
+        real = _format_floats(values.real, precision=precision, suppress_small=suppress_small)
+        imag = _format_floats(np.abs(values.imag), precision=precision, suppress_small=suppress_small)
+        signs = np.where(np.signbit(values.imag), '-', '+')
+        return (real + signs.astype(object) + imag + 'j').astype(object)
+    elif kind == 'M':
+        return np.char.add(np.char.add("'", np.datetime_as_string(values)), "'").astype(object) # like numpy: quoted ISO strings, 'NaT' included
+    elif kind == 'm':
+        out = np.char.mod('%d', values.astype(np.int64)).astype(object) # like numpy: the counts of the dtype's unit
+        out[np.isnat(values)] = "'NaT'"
+        return out
+
+    # strings, objects: one repr per (already bounded number of) element, cut short by the time budget
+    out = np.full(values.shape, ELISION_MARKER, dtype=object)
+    flat_values, flat_out = values.reshape(-1), out.reshape(-1)
+    for i in range(flat_values.shape[0]):
+        if (deadline is not None) and (time.perf_counter() > deadline):
+            break
+        text: str = repr(flat_values[i]) if kind != 'U' else repr(str(flat_values[i]))
+        flat_out[i] = text if (len(text) <= max_element_chars) else (text[:(max_element_chars - len(ELISION_MARKER))] + ELISION_MARKER)
+    return out
+
+
+# ==================================================================================================================== #
+# Layout                                                                                                               #
+# ==================================================================================================================== #
+
+def _wrap_items(items: List[str], separator: str, indent: int, linewidth: int) -> str:
+    """ Joins `items` with `separator`, starting a new (indented) line whenever the next item would pass `linewidth`. """
+    lines: List[str] = []
+    line: str = ''
+    for i, item in enumerate(items):
+        piece: str = item + (separator if (i < len(items) - 1) else '')
+        if line and (indent + len(line) + len(piece.rstrip()) > linewidth):
+            lines.append(line.rstrip())
+            line = ''
+        line += piece
+    lines.append(line)
+    return ('\n' + ' ' * indent).join(lines)
+
+
+def _layout(strings: np.ndarray, gaps: List[Optional[int]], separator: str, indent: int, linewidth: int) -> str:
+    if strings.ndim == 0:
+        return str(strings[()])
+    if strings.ndim == 1:
+        items: List[str] = list(strings)
+        if gaps[0] is not None:
+            items.insert(gaps[0], ELISION_MARKER)
+        return '[' + _wrap_items(items, separator, indent + 1, linewidth) + ']'
+    blocks: List[str] = [_layout(strings[i], gaps[1:], separator, indent + 1, linewidth) for i in range(strings.shape[0])]
+    if gaps[0] is not None:
+        blocks.insert(gaps[0], ELISION_MARKER)
+    block_separator: str = separator.rstrip() + ('\n' * (strings.ndim - 1 if (strings.size > 0) else 1)) + (' ' * (indent + 1))
+    return '[' + block_separator.join(blocks) + ']'
+
+
+def format_array_text(arr: np.ndarray, max_chars: int=4000, max_seconds: float=0.05, edgeitems: int=3, threshold: int=1000, precision: int=8, suppress_small: bool=False, separator: str=', ', linewidth: int=75, align_columns: Optional[bool]=None) -> str:
+    """ The plaintext repr of `arr`, built from at most ~`max_chars / 2` of its elements so the cost doesn't depend on its size.
+
+    max_chars: the most characters returned (edgeitems is lowered until the shown elements fit, and the text is cut short if it still doesn't).
+    max_seconds: the time budget for formatting object/string elements (whose reprs may be arbitrarily slow); elements not reached show as '...'.
+    edgeitems, threshold, precision, suppress_small, linewidth: as for `np.array2string`. Arrays with more than `threshold` elements are summarized.
+    separator: the exact string between items.
+    align_columns: right-align every element to a common width (like `np.array2string`), defaults to True for N-D arrays and False for 1D ones.
+
+        format_array_text(np.arange(5.0)) # '[0., 1., 2., 3., 4.]'
+    """
+    deadline: float = time.perf_counter() + max_seconds
+    arr = np.asanyarray(arr)
+    shown, gaps = select_edge_items(arr, edgeitems=edgeitems, threshold=threshold, max_items=max(1, max_chars // 2))
+    strings = format_elements(shown, precision=precision, suppress_small=suppress_small, max_element_chars=max(8, max_chars // 4), deadline=deadline)
+    if align_columns is None:
+        align_columns = arr.ndim > 1
+    if align_columns and (strings.size > 0):
+        width: int = max(len(s) for s in strings.reshape(-1))
+        strings = np.char.rjust(strings.astype(str), width).astype(object)
+    text: str = _layout(strings, gaps, separator=separator, indent=0, linewidth=linewidth)
+    if (arr.size == 0) and (arr.ndim > 1):
+        text += f'{separator.rstrip()} shape={arr.shape}' # like numpy's repr: the brackets alone don't tell the empty axes apart
+    if len(text) > max_chars:
+        text = text[:(max_chars - len(ELISION_MARKER))] + ELISION_MARKER
+    return text
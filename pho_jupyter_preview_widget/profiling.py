@@ -0,0 +1,168 @@
+""" Lightweight per-stage profiling of the preview render pipeline: wall time, calls, bytes in/out and event counters (cache hits, fallbacks, ...) per stage.
+
+    from pho_jupyter_preview_widget.profiling import default_profiler
+
+    default_profiler.enable()
+    display(np.random.rand(2000, 2000))
+    print(default_profiler.format_table())
+    default_profiler.to_dataframe()
+    default_profiler.reset()
+
+or, in a notebook: `%preview_stats on`, `%preview_stats`, `%preview_stats df`, `%preview_stats reset` (see `ipython_helpers.PreviewWidgetMagics`).
+
+The pipeline (`display_helpers`, `heatmap_rendering.render_heatmap_png`, `widget.DataFrameWindowWidget`) wraps each stage in `default_profiler.stage(name)`.
+Disabled (the default), `stage()` returns a shared no-op context manager and `count()` returns immediately, so instrumentation costs one attribute check per stage.
+Stages nest per thread: a stage's `total_s` includes the stages entered inside it, its `self_s` doesn't.
+"""
+import threading
+import time
+from typing import Dict, List
+
+
+_TIMING_COLUMNS = ('calls', 'total_s', 'self_s', 'max_s', 'bytes_in', 'bytes_out')
+_TABLE_COLUMNS = ('stage', 'calls', 'total_s', 'self_s', 'mean_s', 'max_s', 'bytes_in', 'bytes_out') # then the counters
+
+
+class _NullStage:
+    """ What `PreviewProfiler.stage` returns while profiling is disabled: does nothing. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add(self, bytes_in: int=0, bytes_out: int=0, **counters):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """ One timed entry into a stage. `add()` records the bytes it consumed/produced and any event counters while it runs. """
+    __slots__ = ('profiler', 'name', 'bytes_in', 'bytes_out', 'counters', 'start', 'child_s')
+
+    def __init__(self, profiler: "PreviewProfiler", name: str, bytes_in: int=0):
+        self.profiler = profiler
+        self.name = name
+        self.bytes_in: int = int(bytes_in)
+        self.bytes_out: int = 0
+        self.counters: Dict[str, int] = {}
+        self.start: float = 0.0
+        self.child_s: float = 0.0
+
+    def add(self, bytes_in: int=0, bytes_out: int=0, **counters):
+        self.bytes_in += int(bytes_in)
+        self.bytes_out += int(bytes_out)
+        for counter, n in counters.items():
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def __enter__(self):
+        self.profiler._stage_stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed_s: float = time.perf_counter() - self.start
+        stack = self.profiler._stage_stack()
+        stack.pop()
+        if len(stack) > 0:
+            stack[-1].child_s += elapsed_s
+        if exc_type is not None:
+            self.add(errors=1)
+        self.profiler._record(self.name, calls=1, total_s=elapsed_s, self_s=(elapsed_s - self.child_s), bytes_in=self.bytes_in, bytes_out=self.bytes_out, counters=self.counters)
+        return False
+
+
+class PreviewProfiler:
+    """ Aggregates the per-stage timings and counters of the render pipeline. Thread-safe (thumbnails of lists render on a thread pool).
+
+        with default_profiler.stage('png_encode', bytes_in=indices.nbytes) as stage:
+            png_bytes = encode_indexed_png(indices, palette)
+            stage.add(bytes_out=len(png_bytes))
+        default_profiler.count('render_cache', hits=1) # counters without timing anything
+
+    """
+    def __init__(self, enabled: bool=False):
+        self.enabled: bool = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _stage_stack(self) -> List[_Stage]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name: str, calls: int=0, total_s: float=0.0, self_s: float=0.0, bytes_in: int=0, bytes_out: int=0, counters=None):
+        with self._lock:
+            totals = self._totals.get(name, None)
+            if totals is None:
+                totals = self._totals[name] = dict.fromkeys(_TIMING_COLUMNS, 0)
+            totals['calls'] += calls
+            totals['total_s'] += total_s
+            totals['self_s'] += self_s
+            totals['max_s'] = max(totals['max_s'], total_s)
+            totals['bytes_in'] += bytes_in
+            totals['bytes_out'] += bytes_out
+            for counter, n in (counters or {}).items():
+                totals[counter] = totals.get(counter, 0) + n
+
+    def stage(self, name: str, bytes_in: int=0):
+        """ A context manager timing one run of the stage `name` (a no-op while disabled). """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, bytes_in=bytes_in)
+
+    def count(self, name: str, **counters):
+        """ Adds to the event counters of the stage `name` (e.g. `count('render_cache', hits=1)`) without timing anything. """
+        if self.enabled:
+            self._record(name, counters=counters)
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+    def table(self) -> List[Dict]:
+        """ One row per stage, slowest (by self time) first: stage, calls, total_s, self_s, mean_s, max_s, bytes_in, bytes_out and every counter (0 where a stage has none). """
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+        counter_names = sorted({key for values in totals.values() for key in values} - set(_TIMING_COLUMNS))
+        rows = []
+        for name, values in sorted(totals.items(), key=lambda item: item[1]['self_s'], reverse=True):
+            mean_s: float = (values['total_s'] / values['calls']) if (values['calls'] > 0) else 0.0
+            rows.append(dict(stage=name, calls=values['calls'], total_s=values['total_s'], self_s=values['self_s'], mean_s=mean_s, max_s=values['max_s'], bytes_in=values['bytes_in'], bytes_out=values['bytes_out'],
+                             **{counter: values.get(counter, 0) for counter in counter_names}))
+        return rows
+
+    def format_table(self) -> str:
+        """ The aggregated `table()` as fixed-width text (times in ms, sizes in KB). """
+        rows = self.table()
+        if len(rows) == 0:
+            return 'no preview stages recorded' + ('' if self.enabled else ' (profiling is disabled, enable it with `%preview_stats on`)')
+        counter_names = [key for key in rows[0] if key not in _TABLE_COLUMNS]
+        header = f'{"stage":<18}{"calls":>7}{"total ms":>11}{"self ms":>11}{"mean ms":>10}{"max ms":>10}{"in KB":>11}{"out KB":>11}' + ''.join(f'{counter:>{max(8, len(counter) + 2)}}' for counter in counter_names)
+        lines = [header]
+        for row in rows:
+            lines.append(f'{row["stage"]:<18}{row["calls"]:>7}{row["total_s"] * 1e3:>11.2f}{row["self_s"] * 1e3:>11.2f}{row["mean_s"] * 1e3:>10.2f}{row["max_s"] * 1e3:>10.2f}{row["bytes_in"] / 1024:>11.1f}{row["bytes_out"] / 1024:>11.1f}'
+                         + ''.join(f'{row[counter]:>{max(8, len(counter) + 2)}}' for counter in counter_names))
+        return '\n'.join(lines)
+
+    def to_dataframe(self):
+        """ The aggregated `table()` as a `pandas.DataFrame` indexed by stage. """
+        import pandas as pd
+        rows = self.table()
+        return pd.DataFrame(rows, columns=(None if (len(rows) > 0) else _TABLE_COLUMNS)).set_index('stage')
+
+
+default_profiler = PreviewProfiler()
@@ -0,0 +1,378 @@
+""" Caching of rendered array previews, keyed by a cheap content fingerprint of the array plus the formatter config.
+
+    from pho_jupyter_preview_widget.render_cache import default_render_cache
+
+    default_render_cache.stats() # {'hits': 12, 'misses': 3, 'n_entries': 3, 'n_bytes': 51234, 'max_bytes': 67108864}
+    default_render_cache.max_bytes = 256 * 1024**2 # raise the budget (evicts immediately if lowered)
+    default_render_cache.clear()
+
+    ## Optional persistent tier (survives kernel restarts, shareable between kernels):
+    from pho_jupyter_preview_widget.render_cache import enable_disk_render_cache
+    enable_disk_render_cache() # defaults to `~/.cache/pho_jupyter_preview_widget/render_cache.sqlite3`
+
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from pho_jupyter_preview_widget.dask_preview import is_dask_array
+
+
+# ==================================================================================================================== #
+# Content Fingerprints                                                                                                 #
+# ==================================================================================================================== #
+
+def array_fingerprint(arr: np.ndarray, full_hash_max_bytes: int = (1 << 20), n_sample_blocks: int = 64, sample_block_bytes: int = 4096) -> Optional[Tuple]:
+    """ A cheap fingerprint of an array's contents: (shape, dtype, strides, digest).
+
+    Buffers up to `full_hash_max_bytes` are hashed in full. Larger buffers only hash `n_sample_blocks` evenly spaced blocks of
+    `sample_block_bytes` (plus the first and last block), so the cost is bounded regardless of the array size.
+    Returns None for arrays whose contents can't be fingerprinted (object dtypes), which should simply not be cached.
+
+    NOTE: for large arrays an in-place edit that falls entirely between the sampled blocks won't change the fingerprint.
+
+    Dask arrays are fingerprinted by their name, a deterministic token of their task graph, without computing anything.
+    """
+    if is_dask_array(arr):
+        return (tuple(arr.shape), arr.dtype.str, 'dask', arr.name)
+
+    if arr.dtype.hasobject:
+        return None
+
+    if np.ma.isMaskedArray(arr):
+        # the data and the mask are separate buffers (and a masked array can't be reinterpreted as bytes without its mask)
+        data_fingerprint = array_fingerprint(np.ma.getdata(arr), full_hash_max_bytes=full_hash_max_bytes, n_sample_blocks=n_sample_blocks, sample_block_bytes=sample_block_bytes)
+        mask = np.ma.getmask(arr)
+        mask_fingerprint = None if (mask is np.ma.nomask) else array_fingerprint(mask, full_hash_max_bytes=full_hash_max_bytes, n_sample_blocks=n_sample_blocks, sample_block_bytes=sample_block_bytes)
+        return (arr.shape, arr.dtype.str, 'masked', data_fingerprint, mask_fingerprint)
+
+    hasher = hashlib.blake2b(digest_size=16)
+    if arr.nbytes <= full_hash_max_bytes:
+        hasher.update(np.ascontiguousarray(arr).reshape(-1).view(np.uint8).data)
+
+    elif arr.flags.c_contiguous or arr.flags.f_contiguous:
+        flat_bytes = arr.reshape(-1, order='A').view(np.uint8)
+        n_bytes: int = flat_bytes.shape[0]
+        offsets = np.linspace(0, n_bytes - sample_block_bytes, num=(n_sample_blocks + 2), dtype=np.int64)
+        for offset in offsets:
+            hasher.update(flat_bytes[offset:(offset + sample_block_bytes)].data)
+
+    else:
+        # non-contiguous views: hash a bounded strided subsample instead
+        max_sampled_elements: int = max(1, (n_sample_blocks * sample_block_bytes) // max(arr.itemsize, 1))
+        per_axis: int = max(1, int(max_sampled_elements ** (1.0 / max(arr.ndim, 1))))
+        steps = tuple(slice(None, None, max(1, int(math.ceil(n / per_axis)))) for n in arr.shape)
+        hasher.update(np.ascontiguousarray(arr[steps]).reshape(-1).view(np.uint8).data)
+
+    return (arr.shape, arr.dtype.str, arr.strides, hasher.hexdigest())
+
+
+# ==================================================================================================================== #
+# LRU Cache                                                                                                            #
+# ==================================================================================================================== #
+
+class PreviewRenderCache:
+    """ Thread-safe LRU cache of rendered preview strings, bounded by the total size of the cached values (in bytes).
+
+    Keys are built by `make_key(arr, config)`; values are the rendered HTML strings.
+    If `disk_cache` is set, memory misses fall through to it (promoting the hit into memory) and every `put` is written through to it.
+    """
+    def __init__(self, max_bytes: int = (64 * 1024**2), disk_cache: Optional["DiskRenderCache"] = None):
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_bytes: int = int(max_bytes)
+        self.disk_cache: Optional["DiskRenderCache"] = disk_cache
+        self.n_bytes: int = 0
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    @classmethod
+    def _freeze(cls, value) -> Hashable:
+        """ recursively converts a config value into a hashable equivalent (dicts/lists/sets become tuples/frozensets, anything else unhashable falls back to its repr) """
+        if isinstance(value, dict):
+            return tuple(sorted(((repr(k), cls._freeze(v)) for k, v in value.items())))
+        elif isinstance(value, (list, tuple)):
+            return tuple(cls._freeze(v) for v in value)
+        elif isinstance(value, (set, frozenset)):
+            return frozenset(cls._freeze(v) for v in value)
+        elif isinstance(value, np.ndarray):
+            return ('ndarray', array_fingerprint(value) or repr(value))
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            return repr(value)
+
+    @classmethod
+    def make_key(cls, arr: np.ndarray, config: Dict[str, Any]) -> Optional[Tuple]:
+        """ Returns None if the array can't be fingerprinted (and so shouldn't be cached). """
+        fingerprint = array_fingerprint(arr)
+        if fingerprint is None:
+            return None
+        return (fingerprint, cls._freeze(config))
+
+    @classmethod
+    def make_keys(cls, arr: np.ndarray, configs: List[Dict[str, Any]]) -> Optional[List[Tuple]]:
+        """ The `make_key` of `arr` with each of the `configs`, fingerprinting the array only once. Returns None if it can't be fingerprinted. """
+        fingerprint = array_fingerprint(arr)
+        if fingerprint is None:
+            return None
+        return [(fingerprint, cls._freeze(config)) for config in configs]
+
+    @classmethod
+    def _sizeof(cls, value) -> int:
+        if isinstance(value, (bytes, bytearray, str)):
+            return len(value)
+        return 1
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self._lock:
+            self._max_bytes = int(value)
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.disk_cache is not None:
+            value = self.disk_cache.get(key, None)
+            if value is not None:
+                self._put_memory(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._put_memory(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, value)
+
+    def _put_memory(self, key, value):
+        n_bytes: int = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.n_bytes -= self._entries.pop(key)[1]
+            if n_bytes > self._max_bytes:
+                return # would never fit
+            self._entries[key] = (value, n_bytes)
+            self.n_bytes += n_bytes
+            self._evict()
+
+    def _evict(self):
+        """ drops least-recently-used entries until within budget. Must be called with the lock held. """
+        while (self.n_bytes > self._max_bytes) and (len(self._entries) > 0):
+            _, (_, n_bytes) = self._entries.popitem(last=False)
+            self.n_bytes -= n_bytes
+
+    def clear(self, reset_counters: bool = True):
+        """ clears the in-memory tier only (use `disk_cache.clear()` to also drop the persistent entries) """
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+            if reset_counters:
+                self.hits = 0
+                self.disk_hits = 0
+                self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses, n_entries=len(self._entries), n_bytes=self.n_bytes, max_bytes=self._max_bytes)
+
+
+# ==================================================================================================================== #
+# Persistent (On-Disk) Tier                                                                                            #
+# ==================================================================================================================== #
+
+def default_disk_cache_path() -> str:
+    """ `$PHO_PREVIEW_CACHE_DIR/render_cache.sqlite3`, falling back to `$XDG_CACHE_HOME` or `~/.cache` """
+    cache_dir = os.environ.get('PHO_PREVIEW_CACHE_DIR', None)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'pho_jupyter_preview_widget')
+    return os.path.join(cache_dir, 'render_cache.sqlite3')
+
+
+class DiskRenderCache:
+    """ A size-capped SQLite store of rendered previews that survives kernel restarts.
+
+    - Lazy: nothing is opened (or created) until the first `get`/`put`, so registering the formatters doesn't slow kernel startup.
+    - Safe to share between several kernels: the database runs in WAL mode, every write is a single transaction (readers never see a partial entry) and lock contention is waited out up to `timeout` seconds.
+    - Reads never take the write lock: they wait at most `read_timeout` seconds, and the LRU `last_access` touches are recorded in memory (skipped if the stored one is newer than `touch_interval`) and flushed in batches with the next write.
+    - Evicts least-recently-accessed entries once the stored values exceed `max_bytes`.
+    - Any SQLite failure is reported and treated as a cache miss; it never breaks the display.
+
+    Keys are the same in-memory keys built by `PreviewRenderCache.make_key`, hashed (together with `CACHE_FORMAT_VERSION`) into a stable text key.
+    """
+    CACHE_FORMAT_VERSION: int = 1
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = (512 * 1024**2), timeout: float = 5.0, read_timeout: float = 0.1, touch_interval: float = 60.0, max_pending_touches: int = 64):
+        self.path: str = path or default_disk_cache_path()
+        self.max_bytes: int = int(max_bytes)
+        self.timeout: float = timeout
+        self.read_timeout: float = read_timeout
+        self.touch_interval: float = touch_interval
+        self.max_pending_touches: int = max_pending_touches
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pending_touches: Dict[str, float] = {} # stable_key -> access time, flushed in batches (never on the read path's own lock wait)
+
+    @classmethod
+    def _stable_key(cls, key) -> str:
+        return hashlib.blake2b(repr((cls.CACHE_FORMAT_VERSION, key)).encode('utf-8'), digest_size=20).hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """ opens (and if needed creates) the database on first use. Must be called with the lock held. """
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS previews (key TEXT PRIMARY KEY, value BLOB NOT NULL, n_bytes INTEGER NOT NULL, last_access REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS previews_last_access ON previews (last_access)')
+            self._connection = connection
+        return self._connection
+
+    def _set_busy_timeout(self, connection: sqlite3.Connection, timeout: float):
+        connection.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+
+    def get(self, key, default=None):
+        stable_key: str = self._stable_key(key)
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                self._set_busy_timeout(connection, self.read_timeout)
+                row = connection.execute('SELECT value, last_access FROM previews WHERE key = ?', (stable_key,)).fetchone()
+                if row is None:
+                    return default
+                now: float = time.time()
+                if (now - row[1]) > self.touch_interval:
+                    self._pending_touches[stable_key] = now
+                should_flush: bool = (len(self._pending_touches) >= self.max_pending_touches)
+            if should_flush:
+                self.flush_touches()
+            return row[0]
+        except sqlite3.Error as err:
+            print(f'WARN: disk render cache read failed ({self.path}):\n\terr: {err}')
+            return default
+
+    def _apply_touches(self, connection: sqlite3.Connection):
+        """ writes the batched `last_access` updates. Runs inside the caller's write transaction. """
+        if len(self._pending_touches) > 0:
+            connection.executemany('UPDATE previews SET last_access = MAX(last_access, ?) WHERE key = ?', [(t, k) for k, t in self._pending_touches.items()])
+            self._pending_touches.clear()
+
+    def flush_touches(self):
+        """ Writes the pending `last_access` touches. Gives up immediately (keeping them for later) if another kernel holds the write lock. """
+        try:
+            with self._lock:
+                if len(self._pending_touches) == 0:
+                    return
+                connection = self._get_connection()
+                self._set_busy_timeout(connection, 0.0)
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    self._apply_touches(connection)
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.OperationalError:
+            pass # busy: retried with the next flush/put
+
+    def put(self, key, value):
+        n_bytes: int = PreviewRenderCache._sizeof(value)
+        if n_bytes > self.max_bytes:
+            return
+        stable_key: str = self._stable_key(key)
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                self._set_busy_timeout(connection, self.timeout)
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    self._apply_touches(connection)
+                    connection.execute('INSERT OR REPLACE INTO previews (key, value, n_bytes, last_access) VALUES (?, ?, ?, ?)', (stable_key, value, n_bytes, time.time()))
+                    self._evict(connection)
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as err:
+            print(f'WARN: disk render cache write failed ({self.path}):\n\terr: {err}')
+
+    def _evict(self, connection: sqlite3.Connection):
+        """ deletes the least-recently-accessed entries until the stored total fits in `max_bytes`. Runs inside the caller's transaction. """
+        total_bytes: int = connection.execute('SELECT COALESCE(SUM(n_bytes), 0) FROM previews').fetchone()[0]
+        excess_bytes: int = total_bytes - self.max_bytes
+        if excess_bytes <= 0:
+            return
+        evicted_keys = []
+        for evict_key, n_bytes in connection.execute('SELECT key, n_bytes FROM previews ORDER BY last_access ASC'):
+            evicted_keys.append((evict_key,))
+            excess_bytes -= n_bytes
+            if excess_bytes <= 0:
+                break
+        connection.executemany('DELETE FROM previews WHERE key = ?', evicted_keys)
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._pending_touches.clear()
+                connection = self._get_connection()
+                self._set_busy_timeout(connection, self.timeout)
+                connection.execute('DELETE FROM previews')
+        except sqlite3.Error as err:
+            print(f'WARN: failed to clear the disk render cache ({self.path}):\n\terr: {err}')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            n_entries, n_bytes = self._get_connection().execute('SELECT COUNT(*), COALESCE(SUM(n_bytes), 0) FROM previews').fetchone()
+        return dict(n_entries=n_entries, n_bytes=n_bytes, max_bytes=self.max_bytes)
+
+    def close(self):
+        self.flush_touches()
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+default_render_cache = PreviewRenderCache()
+
+
+def enable_disk_render_cache(path: Optional[str] = None, max_bytes: int = (512 * 1024**2)) -> DiskRenderCache:
+    """ Attaches a persistent `DiskRenderCache` tier under `default_render_cache` (replacing any previous one). """
+    disable_disk_render_cache()
+    default_render_cache.disk_cache = DiskRenderCache(path=path, max_bytes=max_bytes)
+    return default_render_cache.disk_cache
+
+
+def disable_disk_render_cache():
+    if default_render_cache.disk_cache is not None:
+        default_render_cache.disk_cache.close()
+        default_render_cache.disk_cache = None
@@ -16,7 +16,7 @@ define(["@jupyter-widgets/base"], (__WEBPACK_EXTERNAL_MODULE__jupyter_widgets_ba
   \********************************************************/
 /***/ ((__unused_webpack_module, __webpack_exports__, __webpack_require__) => {
 
-eval("__webpack_require__.r(__webpack_exports__);\n/* harmony export */ __webpack_require__.d(__webpack_exports__, {\n/* harmony export */   MyWidgetView: () => (/* binding */ MyWidgetView)\n/* harmony export */ });\n/* harmony import */ var _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__ = __webpack_require__(/*! @jupyter-widgets/base */ \"@jupyter-widgets/base\");\n/* harmony import */ var _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0___default = /*#__PURE__*/__webpack_require__.n(_jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__);\nfunction _typeof(o) { \"@babel/helpers - typeof\"; return _typeof = \"function\" == typeof Symbol && \"symbol\" == typeof Symbol.iterator ? function (o) { return typeof o; } : function (o) { return o && \"function\" == typeof Symbol && o.constructor === Symbol && o !== Symbol.prototype ? \"symbol\" : typeof o; }, _typeof(o); }\nfunction _classCallCheck(a, n) { if (!(a instanceof n)) throw new TypeError(\"Cannot call a class as a function\"); }\nfunction _defineProperties(e, r) { for (var t = 0; t < r.length; t++) { var o = r[t]; o.enumerable = o.enumerable || !1, o.configurable = !0, \"value\" in o && (o.writable = !0), Object.defineProperty(e, _toPropertyKey(o.key), o); } }\nfunction _createClass(e, r, t) { return r && _defineProperties(e.prototype, r), t && _defineProperties(e, t), Object.defineProperty(e, \"prototype\", { writable: !1 }), e; }\nfunction _toPropertyKey(t) { var i = _toPrimitive(t, \"string\"); return \"symbol\" == _typeof(i) ? i : i + \"\"; }\nfunction _toPrimitive(t, r) { if (\"object\" != _typeof(t) || !t) return t; var e = t[Symbol.toPrimitive]; if (void 0 !== e) { var i = e.call(t, r || \"default\"); if (\"object\" != _typeof(i)) return i; throw new TypeError(\"@@toPrimitive must return a primitive value.\"); } return (\"string\" === r ? String : Number)(t); }\nfunction _callSuper(t, o, e) { return o = _getPrototypeOf(o), _possibleConstructorReturn(t, _isNativeReflectConstruct() ? Reflect.construct(o, e || [], _getPrototypeOf(t).constructor) : o.apply(t, e)); }\nfunction _possibleConstructorReturn(t, e) { if (e && (\"object\" == _typeof(e) || \"function\" == typeof e)) return e; if (void 0 !== e) throw new TypeError(\"Derived constructors may only return object or undefined\"); return _assertThisInitialized(t); }\nfunction _assertThisInitialized(e) { if (void 0 === e) throw new ReferenceError(\"this hasn't been initialised - super() hasn't been called\"); return e; }\nfunction _isNativeReflectConstruct() { try { var t = !Boolean.prototype.valueOf.call(Reflect.construct(Boolean, [], function () {})); } catch (t) {} return (_isNativeReflectConstruct = function _isNativeReflectConstruct() { return !!t; })(); }\nfunction _getPrototypeOf(t) { return _getPrototypeOf = Object.setPrototypeOf ? Object.getPrototypeOf.bind() : function (t) { return t.__proto__ || Object.getPrototypeOf(t); }, _getPrototypeOf(t); }\nfunction _inherits(t, e) { if (\"function\" != typeof e && null !== e) throw new TypeError(\"Super expression must either be null or a function\"); t.prototype = Object.create(e && e.prototype, { constructor: { value: t, writable: !0, configurable: !0 } }), Object.defineProperty(t, \"prototype\", { writable: !1 }), e && _setPrototypeOf(t, e); }\nfunction _setPrototypeOf(t, e) { return _setPrototypeOf = Object.setPrototypeOf ? Object.setPrototypeOf.bind() : function (t, e) { return t.__proto__ = e, t; }, _setPrototypeOf(t, e); }\n\nvar MyWidgetView = /*#__PURE__*/function (_DOMWidgetView) {\n  function MyWidgetView() {\n    _classCallCheck(this, MyWidgetView);\n    return _callSuper(this, MyWidgetView, arguments);\n  }\n  _inherits(MyWidgetView, _DOMWidgetView);\n  return _createClass(MyWidgetView, [{\n    key: \"render\",\n    value: function render() {\n      var _this = this;\n      this.el.innerHTML = '<div class=\"my-widget\">Right-click me!</div>';\n      this.el.addEventListener('contextmenu', function (event) {\n        event.preventDefault();\n        var menu = document.createElement('div');\n        menu.style.position = 'absolute';\n        menu.style.top = \"\".concat(event.clientY, \"px\");\n        menu.style.left = \"\".concat(event.clientX, \"px\");\n        menu.style.background = '#fff';\n        menu.style.border = '1px solid #ccc';\n        menu.innerHTML = \"\\n                <div class=\\\"menu-item\\\">Custom Action 1</div>\\n                <div class=\\\"menu-item\\\">Custom Action 2</div>\\n            \";\n        document.body.appendChild(menu);\n        var _removeMenu = function removeMenu() {\n          document.body.removeChild(menu);\n          document.removeEventListener('click', _removeMenu);\n        };\n        document.addEventListener('click', _removeMenu);\n        menu.querySelectorAll('.menu-item').forEach(function (item) {\n          item.addEventListener('click', function () {\n            _this.model.set('action', item.textContent);\n            _this.model.save_changes();\n          });\n        });\n      });\n    }\n  }]);\n}(_jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__.DOMWidgetView);\n\n//# sourceURL=webpack://pho_jupyter_preview_widget/./pho_jupyter_preview_widget/static/js/widget.js?");
+eval("__webpack_require__.r(__webpack_exports__);\n/* harmony export */ __webpack_require__.d(__webpack_exports__, {\n/* harmony export */   MyWidgetView: () => (/* binding */ MyWidgetView),\n/* harmony export */   ArrayPreviewView: () => (/* binding */ ArrayPreviewView),\n/* harmony export */   TiledArrayView: () => (/* binding */ TiledArrayView),\n/* harmony export */   DataFrameWindowView: () => (/* binding */ DataFrameWindowView)\n/* harmony export */ });\n/* harmony import */ var _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__ = __webpack_require__(/*! @jupyter-widgets/base */ \"@jupyter-widgets/base\");\n\nclass MyWidgetView extends _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__.DOMWidgetView {\n    render() {\n        this.el.innerHTML = '<div class=\"my-widget\">Right-click me!</div>';\n\n        this.el.addEventListener('contextmenu', (event) => {\n            event.preventDefault();\n            const menu = document.createElement('div');\n            menu.style.position = 'absolute';\n            menu.style.top = `${event.clientY}px`;\n            menu.style.left = `${event.clientX}px`;\n            menu.style.background = '#fff';\n            menu.style.border = '1px solid #ccc';\n            menu.innerHTML = `\n                <div class=\"menu-item\">Custom Action 1</div>\n                <div class=\"menu-item\">Custom Action 2</div>\n            `;\n            document.body.appendChild(menu);\n\n            const removeMenu = () => {\n                document.body.removeChild(menu);\n                document.removeEventListener('click', removeMenu);\n            };\n            document.addEventListener('click', removeMenu);\n\n            menu.querySelectorAll('.menu-item').forEach(item => {\n                item.addEventListener('click', () => {\n                    this.model.set('action', item.textContent);\n                    this.model.save_changes();\n                });\n            });\n        });\n    }\n}\n\n// Keep in sync with `ArrayPreviewWidget` in widget.py\nconst LUT_BYTES = 256 * 3;\n\nfunction bytesView(value) {\n    // Binary traits arrive as a DataView (or ArrayBuffer) over the message buffer.\n    if (!value) {\n        return new Uint8Array(0);\n    }\n    if (value instanceof ArrayBuffer) {\n        return new Uint8Array(value);\n    }\n    return new Uint8Array(value.buffer, value.byteOffset, value.byteLength);\n}\n\nfunction decodeCodes(value, pixelDtype) {\n    // -> [codes, maxCode] for a `pixels` buffer\n    const raw = bytesView(value);\n    if (pixelDtype === 'uint16') {\n        // copy: the buffer offset isn't guaranteed to be 2-byte aligned (the codes are little-endian, like every browser's typed arrays in practice)\n        return [new Uint16Array(raw.slice().buffer, 0, Math.floor(raw.byteLength / 2)), 65535];\n    }\n    return [raw, 255];\n}\n\nfunction colorize(rgba, codes, invalidMask, table) {\n    // rgba: a Uint32Array view of an ImageData's pixels\n    const n = Math.min(rgba.length, codes.length);\n    for (let i = 0; i < n; i++) {\n        rgba[i] = table[codes[i]];\n    }\n    if (invalidMask.length > 0) {\n        for (let i = 0; i < n; i++) {\n            if (invalidMask[i >> 3] & (0x80 >> (i & 7))) {\n                rgba[i] = 0; // transparent, like matplotlib's \"bad\" color\n            }\n        }\n    }\n}\n\nclass ArrayPreviewView extends _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__.DOMWidgetView {\n    render() {\n        this.el.classList.add('pho-array-preview');\n\n        this.canvas = document.createElement('canvas');\n        this.canvas.style.imageRendering = 'pixelated';\n        this.canvas.style.display = 'block';\n\n        this.cmapSelect = document.createElement('select');\n        this.cmapSelect.addEventListener('change', () => {\n            this.model.set('cmap', this.cmapSelect.value);\n            this.model.save_changes();\n        });\n\n        this.lowSlider = this._createSlider(0);\n        this.highSlider = this._createSlider(1000);\n        const onContrastInput = () => {\n            const low = Number(this.lowSlider.value) / 1000;\n            const high = Number(this.highSlider.value) / 1000;\n            this.model.set('contrast_limits', [Math.min(low, high), Math.max(low, high)]);\n            this.model.save_changes(); // redraws from the local change event, the kernel is only kept in sync\n        };\n        this.lowSlider.addEventListener('input', onContrastInput);\n        this.highSlider.addEventListener('input', onContrastInput);\n\n        this.caption = document.createElement('div');\n        this.caption.style.fontSize = 'smaller';\n\n        const controls = document.createElement('div');\n        controls.append(this.cmapSelect, this.lowSlider, this.highSlider);\n        this.el.append(this.canvas, controls, this.caption);\n\n        this.listenTo(this.model, 'change:pixels change:pixel_shape change:pixel_dtype change:invalid_mask', this._onPixelsChanged);\n        this.listenTo(this.model, 'change:cmap change:contrast_limits change:colormap_luts change:data_range', this._draw);\n        this.listenTo(this.model, 'change:colormap_names change:cmap change:contrast_limits', this._updateControls);\n        this.listenTo(this.model, 'change:display_height change:description change:data_range', this._updateCaption);\n\n        this._updateControls();\n        this._updateCaption();\n        this._onPixelsChanged();\n    }\n\n    _createSlider(value) {\n        const slider = document.createElement('input');\n        slider.type = 'range';\n        slider.min = '0';\n        slider.max = '1000';\n        slider.value = String(value);\n        return slider;\n    }\n\n    _updateControls() {\n        const names = this.model.get('colormap_names') || [];\n        if (this.cmapSelect.options.length !== names.length) {\n            this.cmapSelect.innerHTML = '';\n            names.forEach((name) => {\n                const option = document.createElement('option');\n                option.value = name;\n                option.textContent = name;\n                this.cmapSelect.appendChild(option);\n            });\n        }\n        this.cmapSelect.value = this.model.get('cmap');\n        const [low, high] = this.model.get('contrast_limits');\n        this.lowSlider.value = String(Math.round(low * 1000));\n        this.highSlider.value = String(Math.round(high * 1000));\n    }\n\n    _updateCaption() {\n        const [vmin, vmax] = this.model.get('data_range');\n        const description = this.model.get('description');\n        this.caption.textContent = `range: [${vmin.toPrecision(4)}, ${vmax.toPrecision(4)}]` + (description ? `; ${description}` : '');\n        this.canvas.style.height = `${this.model.get('display_height')}px`;\n    }\n\n    _onPixelsChanged() {\n        const [rows, cols] = this.model.get('pixel_shape');\n        [this.codes, this.maxCode] = decodeCodes(this.model.get('pixels'), this.model.get('pixel_dtype'));\n        this.invalidMask = bytesView(this.model.get('invalid_mask'));\n        this.canvas.width = cols;\n        this.canvas.height = rows;\n        this._draw();\n    }\n\n    _codeColorTable() {\n        // One packed RGBA (little-endian ABGR) color per code, so drawing is a single table lookup per pixel.\n        const names = this.model.get('colormap_names') || [];\n        const luts = bytesView(this.model.get('colormap_luts'));\n        const lutOffset = Math.max(0, names.indexOf(this.model.get('cmap'))) * LUT_BYTES;\n        const [low, high] = this.model.get('contrast_limits');\n        const span = Math.max(high - low, 1e-12);\n        const table = new Uint32Array(this.maxCode + 1);\n        for (let code = 0; code <= this.maxCode; code++) {\n            const t = (code / this.maxCode - low) / span;\n            const index = Math.min(255, Math.max(0, Math.floor(t * 256)));\n            const offset = lutOffset + index * 3;\n            table[code] = (255 << 24 | luts[offset + 2] << 16 | luts[offset + 1] << 8 | luts[offset]) >>> 0;\n        }\n        return table;\n    }\n\n    _draw() {\n        if (!this.codes || this.canvas.width === 0 || this.canvas.height === 0) {\n            return;\n        }\n        const context = this.canvas.getContext('2d');\n        const image = context.createImageData(this.canvas.width, this.canvas.height);\n        colorize(new Uint32Array(image.data.buffer), this.codes, this.invalidMask, this._codeColorTable());\n        context.putImageData(image, 0, 0);\n    }\n}\n\n// Keep in sync with `TiledArrayWidget` in widget.py\nconst MAX_CLIENT_TILES = 512;\n\nclass TiledArrayView extends ArrayPreviewView {\n    render() {\n        this.tiles = new Map(); // 'level/row/col' -> {rows, cols, codes, invalidMask, canvas}\n        this.pending = new Set();\n        this.viewport = null; // {x0, y0, scale}: the source pixel at the canvas' top-left corner, and source pixels per canvas pixel\n        this.colorKey = null;\n        super.render();\n        this.listenTo(this.model, 'msg:custom', this._onCustomMessage);\n        this.listenTo(this.model, 'change:display_height', () => { this._resetViewport(); this._draw(); });\n        this._addNavigation();\n    }\n\n    _addNavigation() {\n        this.canvas.addEventListener('wheel', (event) => {\n            event.preventDefault();\n            const {x0, y0, scale} = this.viewport;\n            const [rows, cols] = this.model.get('array_shape');\n            const fitScale = Math.max(rows / this.canvas.height, cols / this.canvas.width);\n            const newScale = Math.min(Math.max(scale * Math.exp(event.deltaY * 0.002), 1 / 16), fitScale * 2);\n            const rect = this.canvas.getBoundingClientRect();\n            const mx = (event.clientX - rect.left) * this.canvas.width / rect.width;\n            const my = (event.clientY - rect.top) * this.canvas.height / rect.height;\n            // keep the source pixel under the cursor fixed\n            this.viewport = {x0: x0 + mx * (scale - newScale), y0: y0 + my * (scale - newScale), scale: newScale};\n            this.navigated = true;\n            this._draw();\n        });\n        let drag = null;\n        this.canvas.addEventListener('pointerdown', (event) => {\n            drag = {x: event.clientX, y: event.clientY};\n            this.canvas.setPointerCapture(event.pointerId);\n        });\n        this.canvas.addEventListener('pointermove', (event) => {\n            if (!drag) {\n                return;\n            }\n            const rect = this.canvas.getBoundingClientRect();\n            const ratio = this.canvas.width / rect.width;\n            this.viewport.x0 -= (event.clientX - drag.x) * ratio * this.viewport.scale;\n            this.viewport.y0 -= (event.clientY - drag.y) * ratio * this.viewport.scale;\n            drag = {x: event.clientX, y: event.clientY};\n            this.navigated = true;\n            this._draw();\n        });\n        this.canvas.addEventListener('pointerup', () => { drag = null; });\n        this.canvas.addEventListener('dblclick', () => { this._resetViewport(); this._draw(); });\n    }\n\n    _resetViewport() {\n        // fits the whole array, which the coarsest tile alone covers: nothing more is fetched until the user zooms or pans\n        this.navigated = false;\n        const [rows, cols] = this.model.get('array_shape');\n        const height = this.model.get('display_height');\n        this.canvas.height = height;\n        this.canvas.width = Math.round(Math.min(Math.max(height * cols / Math.max(rows, 1), height / 4), height * 4));\n        const scale = Math.max(rows / this.canvas.height, cols / this.canvas.width, 1e-6);\n        this.viewport = {x0: (cols - this.canvas.width * scale) / 2, y0: (rows - this.canvas.height * scale) / 2, scale: scale};\n    }\n\n    _onPixelsChanged() {\n        // a new array: its coarsest level arrives as the `pixels` state, every other tile on request\n        const [codes, maxCode] = decodeCodes(this.model.get('pixels'), this.model.get('pixel_dtype'));\n        const [rows, cols] = this.model.get('pixel_shape');\n        this.maxCode = maxCode;\n        this.tiles.clear();\n        this.pending.clear();\n        this.topKey = `${this.model.get('n_levels') - 1}/0/0`;\n        this.tiles.set(this.topKey, {rows, cols, codes, invalidMask: bytesView(this.model.get('invalid_mask')), canvas: null});\n        this.codes = codes;\n        this._resetViewport();\n        this._draw();\n    }\n\n    _onCustomMessage(content, buffers) {\n        if (!content || content.type !== 'tiles') {\n            return;\n        }\n        content.tiles.forEach((tile) => {\n            const key = `${tile.level}/${tile.row}/${tile.col}`;\n            const [codes] = decodeCodes(buffers[tile.pixels], this.model.get('pixel_dtype'));\n            const invalidMask = (tile.invalid_mask === null) ? new Uint8Array(0) : bytesView(buffers[tile.invalid_mask]);\n            this.pending.delete(key);\n            this.tiles.set(key, {rows: tile.shape[0], cols: tile.shape[1], codes, invalidMask, canvas: null});\n        });\n        for (const key of this.tiles.keys()) {\n            if (this.tiles.size <= MAX_CLIENT_TILES) {\n                break;\n            }\n            if (key !== this.topKey) {\n                this.tiles.delete(key); // oldest first\n            }\n        }\n        this._draw();\n    }\n\n    _tileCanvas(tile, table) {\n        if (!tile.canvas) {\n            tile.canvas = document.createElement('canvas');\n            tile.canvas.width = tile.cols;\n            tile.canvas.height = tile.rows;\n            const context = tile.canvas.getContext('2d');\n            const image = context.createImageData(tile.cols, tile.rows);\n            colorize(new Uint32Array(image.data.buffer), tile.codes, tile.invalidMask, table);\n            context.putImageData(image, 0, 0);\n        }\n        return tile.canvas;\n    }\n\n    _draw() {\n        if (!this.viewport || !this.tiles || !this.tiles.has(this.topKey)) {\n            return;\n        }\n        const [low, high] = this.model.get('contrast_limits');\n        const colorKey = `${this.model.get('cmap')}|${low}|${high}|${this.model.get('colormap_names').length}`;\n        if (colorKey !== this.colorKey) {\n            this.colorKey = colorKey;\n            this.table = this._codeColorTable();\n            this.tiles.forEach((tile) => { tile.canvas = null; });\n        }\n\n        const context = this.canvas.getContext('2d');\n        context.imageSmoothingEnabled = false;\n        context.clearRect(0, 0, this.canvas.width, this.canvas.height);\n        const {x0, y0, scale} = this.viewport;\n        const tileSize = this.model.get('tile_size');\n        const nLevels = this.model.get('n_levels');\n        const drawTile = (tile, level, row, col) => {\n            const factor = 2 ** level;\n            const extent = tileSize * factor;\n            context.drawImage(this._tileCanvas(tile, this.table), (col * extent - x0) / scale, (row * extent - y0) / scale, tile.cols * factor / scale, tile.rows * factor / scale);\n        };\n\n        // coarse to fine: the coarsest tile is always available, and whatever is cached stands in while finer tiles load\n        drawTile(this.tiles.get(this.topKey), nLevels - 1, 0, 0);\n        const level = this._viewportLevel();\n        for (let coarser = nLevels - 2; coarser >= level; coarser--) {\n            this._visibleTiles(coarser).forEach(([row, col]) => {\n                const tile = this.tiles.get(`${coarser}/${row}/${col}`);\n                if (tile) {\n                    drawTile(tile, coarser, row, col);\n                }\n            });\n        }\n        if (this.navigated) {\n            this._scheduleTileRequest();\n        }\n    }\n\n    _viewportLevel() {\n        // the coarsest level that still has at least one tile pixel per canvas pixel\n        return Math.min(Math.max(Math.ceil(Math.log2(this.viewport.scale)), 0), this.model.get('n_levels') - 1);\n    }\n\n    _visibleTiles(level) {\n        const {x0, y0, scale} = this.viewport;\n        const [rows, cols] = this.model.get('array_shape');\n        const extent = this.model.get('tile_size') * 2 ** level;\n        const visible = [];\n        const lastRow = Math.min(Math.ceil(rows / extent), Math.ceil((y0 + this.canvas.height * scale) / extent)) - 1;\n        const lastCol = Math.min(Math.ceil(cols / extent), Math.ceil((x0 + this.canvas.width * scale) / extent)) - 1;\n        for (let row = Math.max(0, Math.floor(y0 / extent)); row <= lastRow; row++) {\n            for (let col = Math.max(0, Math.floor(x0 / extent)); col <= lastCol; col++) {\n                visible.push([row, col]);\n            }\n        }\n        return visible;\n    }\n\n    _scheduleTileRequest() {\n        // debounced, so a fast zoom only fetches the level it comes to rest on\n        clearTimeout(this.requestTimer);\n        this.requestTimer = setTimeout(() => {\n            const level = this._viewportLevel();\n            const missing = this._visibleTiles(level).map(([row, col]) => [level, row, col]).filter((index) => {\n                const key = index.join('/');\n                return !this.tiles.has(key) && !this.pending.has(key);\n            });\n            if (missing.length > 0) {\n                missing.forEach((index) => this.pending.add(index.join('/')));\n                this.model.send({type: 'request_tiles', tiles: missing});\n            }\n        }, 100);\n    }\n\n    remove() {\n        clearTimeout(this.requestTimer);\n        super.remove();\n    }\n}\n\n// Keep in sync with `DataFrameWindowWidget` in widget.py\nconst MAX_SCROLL_HEIGHT = 1000000; // CSS pixels; beyond it scrolling maps proportionally onto the rows\n\nclass DataFrameWindowView extends _jupyter_widgets_base__WEBPACK_IMPORTED_MODULE_0__.DOMWidgetView {\n    render() {\n        this.requestId = 0;\n        this.start = this.model.get('window_start'); // the first row of the window in `this.holder`\n        this.requestedStart = this.start; // the first row scrolled to\n        this.rowHeight = 24; // until measured\n\n        this.scroller = document.createElement('div');\n        this.scroller.style.overflowY = 'auto';\n        this.scroller.style.position = 'relative';\n        this.holder = document.createElement('div');\n        this.holder.classList.add('pho-df-window');\n        this.holder.style.position = 'sticky';\n        this.holder.style.top = '0';\n        this.holder.style.overflow = 'hidden'; // scrolled programmatically within the current window\n        this.spacer = document.createElement('div');\n        this.scroller.append(this.holder, this.spacer);\n\n        this.caption = document.createElement('div');\n        this.caption.style.fontSize = 'smaller';\n        const style = document.createElement('style');\n        style.textContent = '.pho-df-window thead th { position: sticky; top: 0; background: var(--jp-layout-color1, white); }';\n        this.el.append(style, this.scroller, this.caption);\n\n        this.scroller.addEventListener('scroll', () => this._onScroll());\n        this.listenTo(this.model, 'msg:custom', this._onCustomMessage);\n        this.listenTo(this.model, 'change:window_html change:n_rows change:max_height', () => {\n            this.start = this.model.get('window_start');\n            this.requestedStart = this.start;\n            this._showWindow(this.model.get('window_html'));\n        });\n        this._showWindow(this.model.get('window_html'));\n    }\n\n    _visibleRows() {\n        return Math.max(1, Math.floor((this.model.get('max_height') - this.headerHeight) / this.rowHeight));\n    }\n\n    _showWindow(html) {\n        // `this.holder` shows the current window at the top of the viewport; `this.spacer` stands in for every other row so the scrollbar reflects them\n        this.holder.innerHTML = html;\n        const nRows = this.model.get('n_rows');\n        const nWindowRows = Math.min(this.model.get('window_rows'), nRows - this.start);\n        const body = this.holder.querySelector('tbody');\n        const head = this.holder.querySelector('thead');\n        if (body && nWindowRows > 0 && body.offsetHeight > 0) {\n            this.rowHeight = body.offsetHeight / nWindowRows;\n        }\n        this.headerHeight = head ? head.offsetHeight : 0;\n        this.scroller.style.maxHeight = `${this.model.get('max_height')}px`;\n        this.holder.style.maxHeight = `${this.model.get('max_height')}px`;\n        this._scrollWithinWindow(this.requestedStart);\n        const totalHeight = Math.min(nRows * this.rowHeight, MAX_SCROLL_HEIGHT);\n        this.spacer.style.height = `${Math.max(0, totalHeight - this.holder.offsetHeight)}px`;\n    }\n\n    _scrollWithinWindow(start) {\n        // the kernel clamps windows to the end of the frame, so the row scrolled to may lie inside the window rather than at its top\n        const offset = Math.min(Math.max(0, start - this.start), this.model.get('window_rows'));\n        this.holder.scrollTop = offset * this.rowHeight;\n        const nRows = this.model.get('n_rows');\n        const firstRow = this.start + offset;\n        this.caption.textContent = `rows ${firstRow}-${Math.min(nRows, firstRow + this._visibleRows()) - 1} of ${nRows} x ${this.model.get('n_columns')} columns`;\n    }\n\n    _startForScroll() {\n        const maxScroll = this.scroller.scrollHeight - this.scroller.clientHeight;\n        const fraction = (maxScroll > 0) ? (this.scroller.scrollTop / maxScroll) : 0;\n        return Math.round(fraction * Math.max(0, this.model.get('n_rows') - this._visibleRows()));\n    }\n\n    _onScroll() {\n        // debounced: only the window the scroll comes to rest on is requested\n        clearTimeout(this.scrollTimer);\n        this.scrollTimer = setTimeout(() => {\n            const start = this._startForScroll();\n            this.requestedStart = start;\n            if (start >= this.start && start + this._visibleRows() <= this.start + this.model.get('window_rows')) {\n                this._scrollWithinWindow(start); // already in the current window\n                return;\n            }\n            this.requestId += 1;\n            this.model.send({type: 'request_window', start: start, request_id: this.requestId});\n        }, 50);\n    }\n\n    _onCustomMessage(content) {\n        if (!content || content.type !== 'window' || content.request_id !== this.requestId) {\n            return; // superseded by a later request\n        }\n        this.start = content.start;\n        this._showWindow(content.html);\n    }\n\n    remove() {\n        clearTimeout(this.scrollTimer);\n        super.remove();\n    }\n}\n\n\n//# sourceURL=webpack://pho_jupyter_preview_widget/./pho_jupyter_preview_widget/static/js/widget.js?");
 
 /***/ }),
 
@@ -33,3 +33,450 @@ export class MyWidgetView extends DOMWidgetView {
         });
     }
 }
+
+// Keep in sync with `ArrayPreviewWidget` in widget.py
+const LUT_BYTES = 256 * 3;
+
+function bytesView(value) {
+    // Binary traits arrive as a DataView (or ArrayBuffer) over the message buffer.
+    if (!value) {
+        return new Uint8Array(0);
+    }
+    if (value instanceof ArrayBuffer) {
+        return new Uint8Array(value);
+    }
+    return new Uint8Array(value.buffer, value.byteOffset, value.byteLength);
+}
+
+function decodeCodes(value, pixelDtype) {
+    // -> [codes, maxCode] for a `pixels` buffer
+    const raw = bytesView(value);
+    if (pixelDtype === 'uint16') {
+        // copy: the buffer offset isn't guaranteed to be 2-byte aligned (the codes are little-endian, like every browser's typed arrays in practice)
+        return [new Uint16Array(raw.slice().buffer, 0, Math.floor(raw.byteLength / 2)), 65535];
+    }
+    return [raw, 255];
+}
+
+function colorize(rgba, codes, invalidMask, table) {
+    // rgba: a Uint32Array view of an ImageData's pixels
+    const n = Math.min(rgba.length, codes.length);
+    for (let i = 0; i < n; i++) {
+        rgba[i] = table[codes[i]];
+    }
+    if (invalidMask.length > 0) {
+        for (let i = 0; i < n; i++) {
+            if (invalidMask[i >> 3] & (0x80 >> (i & 7))) {
+                rgba[i] = 0; // transparent, like matplotlib's "bad" color
+            }
+        }
+    }
+}
+
+export class ArrayPreviewView extends DOMWidgetView {
+    render() {
+        this.el.classList.add('pho-array-preview');
+
+        this.canvas = document.createElement('canvas');
+        this.canvas.style.imageRendering = 'pixelated';
+        this.canvas.style.display = 'block';
+
+        this.cmapSelect = document.createElement('select');
+        this.cmapSelect.addEventListener('change', () => {
+            this.model.set('cmap', this.cmapSelect.value);
+            this.model.save_changes();
+        });
+
+        this.lowSlider = this._createSlider(0);
+        this.highSlider = this._createSlider(1000);
+        const onContrastInput = () => {
+            const low = Number(this.lowSlider.value) / 1000;
+            const high = Number(this.highSlider.value) / 1000;
+            this.model.set('contrast_limits', [Math.min(low, high), Math.max(low, high)]);
+            this.model.save_changes(); // redraws from the local change event, the kernel is only kept in sync
+        };
+        this.lowSlider.addEventListener('input', onContrastInput);
+        this.highSlider.addEventListener('input', onContrastInput);
+
+        this.caption = document.createElement('div');
+        this.caption.style.fontSize = 'smaller';
+
+        const controls = document.createElement('div');
+        controls.append(this.cmapSelect, this.lowSlider, this.highSlider);
+        this.el.append(this.canvas, controls, this.caption);
+
+        this.listenTo(this.model, 'change:pixels change:pixel_shape change:pixel_dtype change:invalid_mask', this._onPixelsChanged);
+        this.listenTo(this.model, 'change:cmap change:contrast_limits change:colormap_luts change:data_range', this._draw);
+        this.listenTo(this.model, 'change:colormap_names change:cmap change:contrast_limits', this._updateControls);
+        this.listenTo(this.model, 'change:display_height change:description change:data_range', this._updateCaption);
+
+        this._updateControls();
+        this._updateCaption();
+        this._onPixelsChanged();
+    }
+
+    _createSlider(value) {
+        const slider = document.createElement('input');
+        slider.type = 'range';
+        slider.min = '0';
+        slider.max = '1000';
+        slider.value = String(value);
+        return slider;
+    }
+
+    _updateControls() {
+        const names = this.model.get('colormap_names') || [];
+        if (this.cmapSelect.options.length !== names.length) {
+            this.cmapSelect.innerHTML = '';
+            names.forEach((name) => {
+                const option = document.createElement('option');
+                option.value = name;
+                option.textContent = name;
+                this.cmapSelect.appendChild(option);
+            });
+        }
+        this.cmapSelect.value = this.model.get('cmap');
+        const [low, high] = this.model.get('contrast_limits');
+        this.lowSlider.value = String(Math.round(low * 1000));
+        this.highSlider.value = String(Math.round(high * 1000));
+    }
+
+    _updateCaption() {
+        const [vmin, vmax] = this.model.get('data_range');
+        const description = this.model.get('description');
+        this.caption.textContent = `range: [${vmin.toPrecision(4)}, ${vmax.toPrecision(4)}]` + (description ? `; ${description}` : '');
+        this.canvas.style.height = `${this.model.get('display_height')}px`;
+    }
+
+    _onPixelsChanged() {
+        const [rows, cols] = this.model.get('pixel_shape');
+        [this.codes, this.maxCode] = decodeCodes(this.model.get('pixels'), this.model.get('pixel_dtype'));
+        this.invalidMask = bytesView(this.model.get('invalid_mask'));
+        this.canvas.width = cols;
+        this.canvas.height = rows;
+        this._draw();
+    }
+
+    _codeColorTable() {
+        // One packed RGBA (little-endian ABGR) color per code, so drawing is a single table lookup per pixel.
+        const names = this.model.get('colormap_names') || [];
+        const luts = bytesView(this.model.get('colormap_luts'));
+        const lutOffset = Math.max(0, names.indexOf(this.model.get('cmap'))) * LUT_BYTES;
+        const [low, high] = this.model.get('contrast_limits');
+        const span = Math.max(high - low, 1e-12);
+        const table = new Uint32Array(this.maxCode + 1);
+        for (let code = 0; code <= this.maxCode; code++) {
+            const t = (code / this.maxCode - low) / span;
+            const index = Math.min(255, Math.max(0, Math.floor(t * 256)));
+            const offset = lutOffset + index * 3;
+            table[code] = (255 << 24 | luts[offset + 2] << 16 | luts[offset + 1] << 8 | luts[offset]) >>> 0;
+        }
+        return table;
+    }
+
+    _draw() {
+        if (!this.codes || this.canvas.width === 0 || this.canvas.height === 0) {
+            return;
+        }
+        const context = this.canvas.getContext('2d');
+        const image = context.createImageData(this.canvas.width, this.canvas.height);
+        colorize(new Uint32Array(image.data.buffer), this.codes, this.invalidMask, this._codeColorTable());
+        context.putImageData(image, 0, 0);
+    }
+}
+
+// Keep in sync with `TiledArrayWidget` in widget.py
+const MAX_CLIENT_TILES = 512;
+
+export class TiledArrayView extends ArrayPreviewView {
+    render() {
+        this.tiles = new Map(); // 'level/row/col' -> {rows, cols, codes, invalidMask, canvas}
+        this.pending = new Set();
+        this.viewport = null; // {x0, y0, scale}: the source pixel at the canvas' top-left corner, and source pixels per canvas pixel
+        this.colorKey = null;
+        super.render();
+        this.listenTo(this.model, 'msg:custom', this._onCustomMessage);
+        this.listenTo(this.model, 'change:display_height', () => { this._resetViewport(); this._draw(); });
+        this._addNavigation();
+    }
+
+    _addNavigation() {
+        this.canvas.addEventListener('wheel', (event) => {
+            event.preventDefault();
+            const {x0, y0, scale} = this.viewport;
+            const [rows, cols] = this.model.get('array_shape');
+            const fitScale = Math.max(rows / this.canvas.height, cols / this.canvas.width);
+            const newScale = Math.min(Math.max(scale * Math.exp(event.deltaY * 0.002), 1 / 16), fitScale * 2);
+            const rect = this.canvas.getBoundingClientRect();
+            const mx = (event.clientX - rect.left) * this.canvas.width / rect.width;
+            const my = (event.clientY - rect.top) * this.canvas.height / rect.height;
+            // keep the source pixel under the cursor fixed
+            this.viewport = {x0: x0 + mx * (scale - newScale), y0: y0 + my * (scale - newScale), scale: newScale};
+            this.navigated = true;
+            this._draw();
+        });
+        let drag = null;
+        this.canvas.addEventListener('pointerdown', (event) => {
+            drag = {x: event.clientX, y: event.clientY};
+            this.canvas.setPointerCapture(event.pointerId);
+        });
+        this.canvas.addEventListener('pointermove', (event) => {
+            if (!drag) {
+                return;
+            }
+            const rect = this.canvas.getBoundingClientRect();
+            const ratio = this.canvas.width / rect.width;
+            this.viewport.x0 -= (event.clientX - drag.x) * ratio * this.viewport.scale;
+            this.viewport.y0 -= (event.clientY - drag.y) * ratio * this.viewport.scale;
+            drag = {x: event.clientX, y: event.clientY};
+            this.navigated = true;
+            this._draw();
+        });
+        this.canvas.addEventListener('pointerup', () => { drag = null; });
+        this.canvas.addEventListener('dblclick', () => { this._resetViewport(); this._draw(); });
+    }
+
+    _resetViewport() {
+        // fits the whole array, which the coarsest tile alone covers: nothing more is fetched until the user zooms or pans
+        this.navigated = false;
+        const [rows, cols] = this.model.get('array_shape');
+        const height = this.model.get('display_height');
+        this.canvas.height = height;
+        this.canvas.width = Math.round(Math.min(Math.max(height * cols / Math.max(rows, 1), height / 4), height * 4));
+        const scale = Math.max(rows / this.canvas.height, cols / this.canvas.width, 1e-6);
+        this.viewport = {x0: (cols - this.canvas.width * scale) / 2, y0: (rows - this.canvas.height * scale) / 2, scale: scale};
+    }
+
+    _onPixelsChanged() {
+        // a new array: its coarsest level arrives as the `pixels` state, every other tile on request
+        const [codes, maxCode] = decodeCodes(this.model.get('pixels'), this.model.get('pixel_dtype'));
+        const [rows, cols] = this.model.get('pixel_shape');
+        this.maxCode = maxCode;
+        this.tiles.clear();
+        this.pending.clear();
+        this.topKey = `${this.model.get('n_levels') - 1}/0/0`;
+        this.tiles.set(this.topKey, {rows, cols, codes, invalidMask: bytesView(this.model.get('invalid_mask')), canvas: null});
+        this.codes = codes;
+        this._resetViewport();
+        this._draw();
+    }
+
+    _onCustomMessage(content, buffers) {
+        if (!content || content.type !== 'tiles') {
+            return;
+        }
+        content.tiles.forEach((tile) => {
+            const key = `${tile.level}/${tile.row}/${tile.col}`;
+            const [codes] = decodeCodes(buffers[tile.pixels], this.model.get('pixel_dtype'));
+            const invalidMask = (tile.invalid_mask === null) ? new Uint8Array(0) : bytesView(buffers[tile.invalid_mask]);
+            this.pending.delete(key);
+            this.tiles.set(key, {rows: tile.shape[0], cols: tile.shape[1], codes, invalidMask, canvas: null});
+        });
+        for (const key of this.tiles.keys()) {
+            if (this.tiles.size <= MAX_CLIENT_TILES) {
+                break;
+            }
+            if (key !== this.topKey) {
+                this.tiles.delete(key); // oldest first
+            }
+        }
+        this._draw();
+    }
+
+    _tileCanvas(tile, table) {
+        if (!tile.canvas) {
+            tile.canvas = document.createElement('canvas');
+            tile.canvas.width = tile.cols;
+            tile.canvas.height = tile.rows;
+            const context = tile.canvas.getContext('2d');
+            const image = context.createImageData(tile.cols, tile.rows);
+            colorize(new Uint32Array(image.data.buffer), tile.codes, tile.invalidMask, table);
+            context.putImageData(image, 0, 0);
+        }
+        return tile.canvas;
+    }
+
+    _draw() {
+        if (!this.viewport || !this.tiles || !this.tiles.has(this.topKey)) {
+            return;
+        }
+        const [low, high] = this.model.get('contrast_limits');
+        const colorKey = `${this.model.get('cmap')}|${low}|${high}|${this.model.get('colormap_names').length}`;
+        if (colorKey !== this.colorKey) {
+            this.colorKey = colorKey;
+            this.table = this._codeColorTable();
+            this.tiles.forEach((tile) => { tile.canvas = null; });
+        }
+
+        const context = this.canvas.getContext('2d');
+        context.imageSmoothingEnabled = false;
+        context.clearRect(0, 0, this.canvas.width, this.canvas.height);
+        const {x0, y0, scale} = this.viewport;
+        const tileSize = this.model.get('tile_size');
+        const nLevels = this.model.get('n_levels');
+        const drawTile = (tile, level, row, col) => {
+            const factor = 2 ** level;
+            const extent = tileSize * factor;
+            context.drawImage(this._tileCanvas(tile, this.table), (col * extent - x0) / scale, (row * extent - y0) / scale, tile.cols * factor / scale, tile.rows * factor / scale);
+        };
+
+        // coarse to fine: the coarsest tile is always available, and whatever is cached stands in while finer tiles load
+        drawTile(this.tiles.get(this.topKey), nLevels - 1, 0, 0);
+        const level = this._viewportLevel();
+        for (let coarser = nLevels - 2; coarser >= level; coarser--) {
+            this._visibleTiles(coarser).forEach(([row, col]) => {
+                const tile = this.tiles.get(`${coarser}/${row}/${col}`);
+                if (tile) {
+                    drawTile(tile, coarser, row, col);
+                }
+            });
+        }
+        if (this.navigated) {
+            this._scheduleTileRequest();
+        }
+    }
+
+    _viewportLevel() {
+        // the coarsest level that still has at least one tile pixel per canvas pixel
+        return Math.min(Math.max(Math.ceil(Math.log2(this.viewport.scale)), 0), this.model.get('n_levels') - 1);
+    }
+
+    _visibleTiles(level) {
+        const {x0, y0, scale} = this.viewport;
+        const [rows, cols] = this.model.get('array_shape');
+        const extent = this.model.get('tile_size') * 2 ** level;
+        const visible = [];
+        const lastRow = Math.min(Math.ceil(rows / extent), Math.ceil((y0 + this.canvas.height * scale) / extent)) - 1;
+        const lastCol = Math.min(Math.ceil(cols / extent), Math.ceil((x0 + this.canvas.width * scale) / extent)) - 1;
+        for (let row = Math.max(0, Math.floor(y0 / extent)); row <= lastRow; row++) {
+            for (let col = Math.max(0, Math.floor(x0 / extent)); col <= lastCol; col++) {
+                visible.push([row, col]);
+            }
+        }
+        return visible;
+    }
+
+    _scheduleTileRequest() {
+        // debounced, so a fast zoom only fetches the level it comes to rest on
+        clearTimeout(this.requestTimer);
+        this.requestTimer = setTimeout(() => {
+            const level = this._viewportLevel();
+            const missing = this._visibleTiles(level).map(([row, col]) => [level, row, col]).filter((index) => {
+                const key = index.join('/');
+                return !this.tiles.has(key) && !this.pending.has(key);
+            });
+            if (missing.length > 0) {
+                missing.forEach((index) => this.pending.add(index.join('/')));
+                this.model.send({type: 'request_tiles', tiles: missing});
+            }
+        }, 100);
+    }
+
+    remove() {
+        clearTimeout(this.requestTimer);
+        super.remove();
+    }
+}
+
+// Keep in sync with `DataFrameWindowWidget` in widget.py
+const MAX_SCROLL_HEIGHT = 1000000; // CSS pixels; beyond it scrolling maps proportionally onto the rows
+
+export class DataFrameWindowView extends DOMWidgetView {
+    render() {
+        this.requestId = 0;
+        this.start = this.model.get('window_start'); // the first row of the window in `this.holder`
+        this.requestedStart = this.start; // the first row scrolled to
+        this.rowHeight = 24; // until measured
+
+        this.scroller = document.createElement('div');
+        this.scroller.style.overflowY = 'auto';
+        this.scroller.style.position = 'relative';
+        this.holder = document.createElement('div');
+        this.holder.classList.add('pho-df-window');
+        this.holder.style.position = 'sticky';
+        this.holder.style.top = '0';
+        this.holder.style.overflow = 'hidden'; // scrolled programmatically within the current window
+        this.spacer = document.createElement('div');
+        this.scroller.append(this.holder, this.spacer);
+
+        this.caption = document.createElement('div');
+        this.caption.style.fontSize = 'smaller';
+        const style = document.createElement('style');
+        style.textContent = '.pho-df-window thead th { position: sticky; top: 0; background: var(--jp-layout-color1, white); }';
+        this.el.append(style, this.scroller, this.caption);
+
+        this.scroller.addEventListener('scroll', () => this._onScroll());
+        this.listenTo(this.model, 'msg:custom', this._onCustomMessage);
+        this.listenTo(this.model, 'change:window_html change:n_rows change:max_height', () => {
+            this.start = this.model.get('window_start');
+            this.requestedStart = this.start;
+            this._showWindow(this.model.get('window_html'));
+        });
+        this._showWindow(this.model.get('window_html'));
+    }
+
+    _visibleRows() {
+        return Math.max(1, Math.floor((this.model.get('max_height') - this.headerHeight) / this.rowHeight));
+    }
+
+    _showWindow(html) {
+        // `this.holder` shows the current window at the top of the viewport; `this.spacer` stands in for every other row so the scrollbar reflects them
+        this.holder.innerHTML = html;
+        const nRows = this.model.get('n_rows');
+        const nWindowRows = Math.min(this.model.get('window_rows'), nRows - this.start);
+        const body = this.holder.querySelector('tbody');
+        const head = this.holder.querySelector('thead');
+        if (body && nWindowRows > 0 && body.offsetHeight > 0) {
+            this.rowHeight = body.offsetHeight / nWindowRows;
+        }
+        this.headerHeight = head ? head.offsetHeight : 0;
+        this.scroller.style.maxHeight = `${this.model.get('max_height')}px`;
+        this.holder.style.maxHeight = `${this.model.get('max_height')}px`;
+        this._scrollWithinWindow(this.requestedStart);
+        const totalHeight = Math.min(nRows * this.rowHeight, MAX_SCROLL_HEIGHT);
+        this.spacer.style.height = `${Math.max(0, totalHeight - this.holder.offsetHeight)}px`;
+    }
+
+    _scrollWithinWindow(start) {
+        // the kernel clamps windows to the end of the frame, so the row scrolled to may lie inside the window rather than at its top
+        const offset = Math.min(Math.max(0, start - this.start), this.model.get('window_rows'));
+        this.holder.scrollTop = offset * this.rowHeight;
+        const nRows = this.model.get('n_rows');
+        const firstRow = this.start + offset;
+        this.caption.textContent = `rows ${firstRow}-${Math.min(nRows, firstRow + this._visibleRows()) - 1} of ${nRows} x ${this.model.get('n_columns')} columns`;
+    }
+
+    _startForScroll() {
+        const maxScroll = this.scroller.scrollHeight - this.scroller.clientHeight;
+        const fraction = (maxScroll > 0) ? (this.scroller.scrollTop / maxScroll) : 0;
+        return Math.round(fraction * Math.max(0, this.model.get('n_rows') - this._visibleRows()));
+    }
+
+    _onScroll() {
+        // debounced: only the window the scroll comes to rest on is requested
+        clearTimeout(this.scrollTimer);
+        this.scrollTimer = setTimeout(() => {
+            const start = this._startForScroll();
+            this.requestedStart = start;
+            if (start >= this.start && start + this._visibleRows() <= this.start + this.model.get('window_rows')) {
+                this._scrollWithinWindow(start); // already in the current window
+                return;
+            }
+            this.requestId += 1;
+            this.model.send({type: 'request_window', start: start, request_id: this.requestId});
+        }, 50);
+    }
+
+    _onCustomMessage(content) {
+        if (!content || content.type !== 'window' || content.request_id !== this.requestId) {
+            return; // superseded by a later request
+        }
+        this.start = content.start;
+        this._showWindow(content.html);
+    }
+
+    remove() {
+        clearTimeout(this.scrollTimer);
+        super.remove();
+    }
+}
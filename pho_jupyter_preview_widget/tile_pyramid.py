@@ -0,0 +1,145 @@
+""" A lazily computed multi-resolution tile pyramid for zooming and panning around 2D arrays far too large for one thumbnail.
+
+    from pho_jupyter_preview_widget.tile_pyramid import get_tile_pyramid
+
+    pyramid = get_tile_pyramid(np.memmap('matrix.dat', dtype=np.float32, shape=(50000, 50000)), tile_size=256)
+    pyramid.n_levels # 9: level 0 is full resolution, each level above it is 2x coarser, the top level is a single tile
+    tile = pyramid.get_tile(pyramid.n_levels - 1, 0, 0) # the whole matrix as one <= 256 x 256 tile
+    tile = pyramid.get_tile(0, 40, 12) # full-resolution rows 10240:10496, cols 3072:3328
+
+Nothing is computed up front: a tile is reduced straight from its footprint in the source array the first time it's requested, and kept in a
+bounded LRU cache. Level `k` reduces (by default averages) 2**k x 2**k blocks; beyond `max_block_size` the footprint is strided first (like `downsample_2d`), so
+the coarse levels never read the whole array and every tile costs at most `(tile_size * max_block_size)**2` element reads.
+"""
+import math
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from pho_jupyter_preview_widget.array_downsampling import _block_reduce_axis, _get_reduce_fn, thumbnail_max_block_size
+from pho_jupyter_preview_widget.heatmap_rendering import sampled_finite_range
+
+
+TILE_PYRAMID_REDUCERS: Tuple[str, ...] = ('mean', 'max', 'stride')
+
+
+class TilePyramid:
+    """ The tiles of a 2D array at every power-of-two zoom level, computed on demand. Thread-safe.
+
+    Tile (level, row, col) covers the source rows `[row, row + 1) * tile_size * 2**level` (and likewise for columns), clipped to the array.
+    `value_range` is estimated once (see `sampled_finite_range`) so every tile shares one color scale.
+    """
+    def __init__(self, arr: np.ndarray, tile_size: int=256, reducer: str='mean', max_block_size: int=8, max_cached_tiles: int=256):
+        arr = np.asanyarray(arr)
+        if arr.ndim != 2:
+            raise ValueError(f'TilePyramid expects a 2D array but got ndim: {arr.ndim}')
+        if reducer not in TILE_PYRAMID_REDUCERS:
+            raise ValueError(f'Unknown reducer: "{reducer}". Expected one of {TILE_PYRAMID_REDUCERS}.')
+        if tile_size < 1:
+            raise ValueError(f'tile_size must be at least 1 but got: {tile_size}')
+        self.arr = arr
+        self.tile_size = int(tile_size)
+        self.reducer = reducer
+        # a power of two, so strided and block-reduced levels stay aligned with each other
+        self.max_block_size = 1 << int(math.floor(math.log2(max(1, thumbnail_max_block_size(arr, max_block_size=max_block_size)))))
+        self.max_cached_tiles = max_cached_tiles
+        self.n_levels: int = 1 + max(0, int(math.ceil(math.log2(max(1, max(arr.shape)) / self.tile_size))))
+        self.value_range: Optional[Tuple[float, float]] = sampled_finite_range(arr)
+        self._tiles: "OrderedDict[Tuple[int, int, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+
+    def level_shape(self, level: int) -> Tuple[int, int]:
+        """ The (rows, cols) of the whole array at `level`. """
+        factor: int = 1 << level
+        return tuple(int(math.ceil(n / factor)) for n in self.arr.shape)
+
+    def grid_shape(self, level: int) -> Tuple[int, int]:
+        """ The number of (tile rows, tile cols) at `level`. """
+        return tuple(int(math.ceil(n / self.tile_size)) for n in self.level_shape(level))
+
+    def is_valid_tile(self, level: int, row: int, col: int) -> bool:
+        if not (0 <= level < self.n_levels):
+            return False
+        n_rows, n_cols = self.grid_shape(level)
+        return (0 <= row < n_rows) and (0 <= col < n_cols)
+
+    def tile_source_bounds(self, level: int, row: int, col: int) -> Tuple[slice, slice]:
+        """ The region of the source array that tile (level, row, col) is reduced from. """
+        extent: int = self.tile_size << level
+        return tuple(slice(i * extent, min(n, (i + 1) * extent)) for i, n in zip((row, col), self.arr.shape))
+
+
+    def get_tile(self, level: int, row: int, col: int) -> np.ndarray:
+        """ The (at most tile_size x tile_size) tile, computing and caching it on first use. Raises ValueError for tiles outside the pyramid. """
+        if not self.is_valid_tile(level, row, col):
+            raise ValueError(f'No tile ({level}, {row}, {col}) in a pyramid with {self.n_levels} levels over shape {self.arr.shape}')
+        key = (level, row, col)
+        with self._lock:
+            tile = self._tiles.get(key, None)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        tile = self._compute_tile(level, row, col)
+        tile.flags.writeable = False
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_cached_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def _compute_tile(self, level: int, row: int, col: int) -> np.ndarray:
+        region = self.arr[self.tile_source_bounds(level, row, col)]
+        factor: int = 1 << level
+        if (factor == 1) or (self.reducer == 'stride'):
+            return np.array(region[::factor, ::factor])
+        block: int = min(factor, self.max_block_size)
+        stride: int = factor // block
+        if stride > 1:
+            region = region[::stride, ::stride] # aligned: every tile starts at a multiple of `factor`
+        reduce_fn = _get_reduce_fn(self.reducer, region.dtype)
+        for axis in (0, 1):
+            region = _block_reduce_axis(region, block, axis=axis, ufunc_reduce=reduce_fn)
+        return np.asarray(region)
+
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, n_tiles=len(self._tiles), max_cached_tiles=self.max_cached_tiles, n_levels=self.n_levels)
+
+
+# ==================================================================================================================== #
+# Per-Array Pyramid Cache                                                                                              #
+# ==================================================================================================================== #
+
+_pyramids: "weakref.WeakValueDictionary[Tuple, TilePyramid]" = weakref.WeakValueDictionary() # weak: a cached pyramid must not keep a (huge) array alive
+_pyramids_lock = threading.Lock()
+
+
+def get_tile_pyramid(arr: np.ndarray, tile_size: int=256, reducer: str='mean', max_block_size: int=8, max_cached_tiles: int=256) -> TilePyramid:
+    """ The `TilePyramid` for `arr`, shared (with its computed tiles) by every preview of the same array contents that is still alive. """
+    from pho_jupyter_preview_widget.render_cache import array_fingerprint
+
+    fingerprint = array_fingerprint(np.asanyarray(arr))
+    if fingerprint is None:
+        return TilePyramid(arr, tile_size=tile_size, reducer=reducer, max_block_size=max_block_size, max_cached_tiles=max_cached_tiles)
+    key = (fingerprint, tile_size, reducer, max_block_size)
+    with _pyramids_lock:
+        pyramid = _pyramids.get(key, None)
+        if pyramid is None:
+            pyramid = TilePyramid(arr, tile_size=tile_size, reducer=reducer, max_block_size=max_block_size, max_cached_tiles=max_cached_tiles)
+            _pyramids[key] = pyramid
+    return pyramid
@@ -1,5 +1,8 @@
+from typing import Optional, Tuple
+
+import numpy as np
 from ipywidgets import DOMWidget
-from traitlets import Unicode
+from traitlets import Bytes, CaselessStrEnum, Float, Int, List, Unicode, observe
 
 class MyWidget(DOMWidget):
     _view_name = Unicode('MyWidgetView').tag(sync=True)
@@ -7,3 +10,272 @@ class MyWidget(DOMWidget):
     _view_module_version = Unicode('0.1.0').tag(sync=True)
 
     action = Unicode('').tag(sync=True)
+
+
+# ==================================================================================================================== #
+# Binary-Buffer Array Preview                                                                                          #
+# ==================================================================================================================== #
+
+PIXEL_DTYPES: Tuple[str, ...] = ('uint8', 'uint16')
+
+
+class ArrayPreviewWidget(DOMWidget):
+    """ A heatmap thumbnail that sends the downsampled array to the frontend as raw quantized pixels (an ipywidgets binary buffer) instead of a base64 PNG inside HTML.
+
+    The colormap is applied client-side on a canvas, so switching `cmap` or dragging `contrast_limits` redraws immediately without a round-trip to the kernel.
+
+        from pho_jupyter_preview_widget.widget import ArrayPreviewWidget
+
+        w = ArrayPreviewWidget(np.random.rand(2000, 3000), cmap='viridis', pixel_dtype='uint16')
+        w # displays a 256 x 256 canvas with a colormap dropdown and contrast sliders
+        w.set_array(other_arr) # re-sends only the new pixels
+
+    Synced state:
+        pixels: the (rows, cols) codes, row-major with the top row first, `pixel_dtype` little-endian. Code 0 is `data_range[0]` and the dtype's max is `data_range[1]`.
+        invalid_mask: `np.packbits` of the NaN/inf/masked pixels (row-major), or empty when every pixel is valid. Invalid pixels are drawn transparent.
+        colormap_names, colormap_luts: the concatenated (256, 3) uint8 lookup tables the frontend can switch between.
+        contrast_limits: the [low, high] fractions of `data_range` mapped onto the ends of the colormap.
+    """
+    _view_name = Unicode('ArrayPreviewView').tag(sync=True)
+    _view_module = Unicode('pho_jupyter_preview_widget').tag(sync=True)
+    _view_module_version = Unicode('0.1.0').tag(sync=True)
+
+    pixels = Bytes(b'').tag(sync=True)
+    pixel_shape = List(Int(), default_value=[0, 0], minlen=2, maxlen=2).tag(sync=True)
+    pixel_dtype = CaselessStrEnum(PIXEL_DTYPES, default_value='uint8').tag(sync=True)
+    invalid_mask = Bytes(b'').tag(sync=True)
+    data_range = List(Float(), default_value=[0.0, 1.0], minlen=2, maxlen=2).tag(sync=True)
+
+    colormap_names = List(Unicode()).tag(sync=True)
+    colormap_luts = Bytes(b'').tag(sync=True)
+    cmap = Unicode('viridis').tag(sync=True)
+    contrast_limits = List(Float(), default_value=[0.0, 1.0], minlen=2, maxlen=2).tag(sync=True)
+
+    display_height = Int(256).tag(sync=True) # CSS pixels; the width follows the aspect ratio
+    description = Unicode('').tag(sync=True)
+
+    def __init__(self, arr=None, cmap: str='viridis', pixel_dtype: str='uint8', max_thumbnail_pixels: int=256, downsample_reducer: str='mean',
+                 vmin: Optional[float]=None, vmax: Optional[float]=None, origin: str='lower', complex_mode: str='magnitude', structured_field: Optional[str]=None, **kwargs):
+        from pho_jupyter_preview_widget._colormap_data import _COLORMAP_LUT_HEX
+        from pho_jupyter_preview_widget.heatmap_rendering import get_colormap_lut
+
+        names = list(_COLORMAP_LUT_HEX.keys())
+        if cmap not in names:
+            get_colormap_lut(cmap) # raises ValueError for unknown colormaps
+            names.append(cmap)
+        super().__init__(colormap_names=names, colormap_luts=b''.join(get_colormap_lut(name).tobytes() for name in names), cmap=cmap, pixel_dtype=pixel_dtype, **kwargs)
+        self.max_thumbnail_pixels = max_thumbnail_pixels
+        self.downsample_reducer = downsample_reducer
+        self.origin = origin
+        self.complex_mode = complex_mode
+        self.structured_field = structured_field
+        if arr is not None:
+            self.set_array(arr, vmin=vmin, vmax=vmax)
+
+
+    @observe('cmap')
+    def _on_cmap_changed(self, change):
+        """ Bundled colormaps are already on the frontend; any other (matplotlib) colormap's table is appended once. """
+        if change['new'] in self.colormap_names:
+            return
+        from pho_jupyter_preview_widget.heatmap_rendering import get_colormap_lut
+        lut = get_colormap_lut(change['new'])
+        with self.hold_sync():
+            self.colormap_luts = self.colormap_luts + lut.tobytes()
+            self.colormap_names = self.colormap_names + [change['new']]
+
+
+    def set_array(self, arr, vmin: Optional[float]=None, vmax: Optional[float]=None):
+        """ Downsamples `arr` (1D, 2D, or N-D via an `nd_preview` montage) to the thumbnail resolution and sends its quantized pixels. Resets `contrast_limits`.
+
+        Like the HTML previews, complex, datetime, masked and structured arrays are first converted by `normalization.display_values` (see `complex_mode` and `structured_field`).
+        Raises ValueError for arrays that can't be shown as a heatmap.
+        """
+        from pho_jupyter_preview_widget.array_downsampling import downsample_2d, thumbnail_max_block_size, thumbnail_target_shape
+        from pho_jupyter_preview_widget.nd_preview import nd_preview_image
+        from pho_jupyter_preview_widget.normalization import display_values
+
+        arr = np.asanyarray(arr)
+        target_shape = thumbnail_target_shape(max_thumbnail_pixels=self.max_thumbnail_pixels)
+        max_block_size: int = thumbnail_max_block_size(arr)
+        max_elements: int = target_shape[0] * target_shape[1] * (max_block_size ** 2) * (arr.shape[0] if (arr.ndim > 2) else 1)
+        arr, values_description = display_values(arr, complex_mode=self.complex_mode, field=self.structured_field, max_elements=max_elements, keep_axis=(0 if (arr.ndim > 2) else None))
+        descriptions = ([values_description] if values_description else [])
+        if arr.ndim > 2:
+            image, nd_description = nd_preview_image(arr, target_shape=target_shape, downsample_reducer=self.downsample_reducer, max_block_size=max_block_size, origin=self.origin)
+            descriptions.append(nd_description)
+        else:
+            image = downsample_2d(np.atleast_2d(arr), target_shape=target_shape, reducer=self.downsample_reducer, max_block_size=max_block_size)
+        if self.origin == 'lower':
+            image = image[::-1]
+
+        self._set_image(image, vmin=vmin, vmax=vmax, description=', '.join(descriptions))
+
+
+    def _quantize(self, image: np.ndarray, vmin: Optional[float]=None, vmax: Optional[float]=None) -> Tuple[bytes, bytes, Tuple[float, float]]:
+        """ (pixels, invalid_mask, (vmin, vmax)) for an image whose top row comes first, encoded as the `pixels`/`invalid_mask` traits are. """
+        from pho_jupyter_preview_widget.heatmap_rendering import quantize_to_levels
+        codes, is_valid, value_range = quantize_to_levels(image, vmin=vmin, vmax=vmax, dtype=np.dtype(self.pixel_dtype).newbyteorder('<'))
+        invalid_mask: bytes = (b'' if is_valid.all() else np.packbits(~is_valid, axis=None).tobytes())
+        return np.ascontiguousarray(codes).tobytes(), invalid_mask, value_range
+
+    def _set_image(self, image: np.ndarray, vmin: Optional[float]=None, vmax: Optional[float]=None, description: str=''):
+        pixels, invalid_mask, (vmin, vmax) = self._quantize(image, vmin=vmin, vmax=vmax)
+        with self.hold_sync():
+            self.pixels = pixels
+            self.pixel_shape = list(image.shape)
+            self.invalid_mask = invalid_mask
+            self.data_range = [vmin, vmax]
+            self.contrast_limits = [0.0, 1.0]
+            self.description = description
+
+
+class TiledArrayWidget(ArrayPreviewWidget):
+    """ A zoomable, pannable view of a huge 2D array: the frontend requests only the `TilePyramid` tiles its viewport shows, over the widget comm.
+
+    The initial display sends a single tile (the pyramid's coarsest level, as the inherited `pixels`). Zooming in with the mouse wheel (drag to pan,
+    double-click to reset) fetches the visible tiles of the matching level, so the data sent and read stays O(visible tiles), never the full array.
+
+        from pho_jupyter_preview_widget.widget import TiledArrayWidget
+
+        TiledArrayWidget(np.memmap('matrix.dat', dtype=np.float32, shape=(50000, 50000)), tile_size=256)
+
+    Messages:
+        frontend -> kernel: `{'type': 'request_tiles', 'tiles': [[level, row, col], ...]}`
+        kernel -> frontend: `{'type': 'tiles', 'tiles': [{'level', 'row', 'col', 'shape', 'pixels', 'invalid_mask'}, ...]}` where `pixels`/`invalid_mask` index
+            the message's binary buffers (`invalid_mask` is None when every pixel of the tile is valid).
+    """
+    _view_name = Unicode('TiledArrayView').tag(sync=True)
+
+    array_shape = List(Int(), default_value=[0, 0], minlen=2, maxlen=2).tag(sync=True)
+    tile_size = Int(256).tag(sync=True)
+    n_levels = Int(1).tag(sync=True)
+
+    def __init__(self, arr=None, tile_size: int=256, vmin: Optional[float]=None, vmax: Optional[float]=None, max_tiles_per_request: int=64, max_cached_tiles: int=256, **kwargs):
+        self._pyramid = None
+        self.max_tiles_per_request = max_tiles_per_request
+        self.max_cached_tiles = max_cached_tiles
+        super().__init__(arr=None, tile_size=tile_size, **kwargs)
+        self.on_msg(self._handle_custom_msg)
+        if arr is not None:
+            self.set_array(arr, vmin=vmin, vmax=vmax)
+
+
+    def set_array(self, arr, vmin: Optional[float]=None, vmax: Optional[float]=None):
+        """ Builds (or reuses) the tile pyramid of the 2D `arr` and sends its single coarsest tile. """
+        from pho_jupyter_preview_widget.tile_pyramid import get_tile_pyramid
+
+        arr = np.asanyarray(arr)
+        if arr.ndim != 2:
+            raise ValueError(f'TiledArrayWidget expects a 2D array but got ndim: {arr.ndim}')
+        source = (arr[::-1] if self.origin == 'lower' else arr) # tiles are laid out top row first
+        reducer: str = (self.downsample_reducer if self.downsample_reducer in ('mean', 'max', 'stride') else 'mean')
+        self._pyramid = get_tile_pyramid(source, tile_size=self.tile_size, reducer=reducer, max_cached_tiles=self.max_cached_tiles)
+        value_range = self._pyramid.value_range or (0.0, 1.0)
+        self._vmin = value_range[0] if vmin is None else vmin
+        self._vmax = value_range[1] if vmax is None else vmax
+        top_level: int = self._pyramid.n_levels - 1
+        with self.hold_sync():
+            self.array_shape = list(arr.shape)
+            self.n_levels = self._pyramid.n_levels
+            self._set_image(self._pyramid.get_tile(top_level, 0, 0), vmin=self._vmin, vmax=self._vmax, description=f'{self._pyramid.n_levels} zoom levels of {self.tile_size} px tiles')
+
+
+    def _handle_custom_msg(self, widget, content, buffers):
+        if not isinstance(content, dict) or (content.get('type', None) != 'request_tiles') or (self._pyramid is None):
+            return
+        requested = content.get('tiles', [])[:self.max_tiles_per_request]
+        reply_tiles = []
+        reply_buffers = []
+        for tile_index in requested:
+            try:
+                level, row, col = (int(v) for v in tile_index)
+            except (TypeError, ValueError):
+                print(f'WARN: TiledArrayWidget ignoring malformed tile request: {tile_index!r}')
+                continue
+            if not self._pyramid.is_valid_tile(level, row, col):
+                continue # e.g. a request still in flight from before the array changed
+            tile = self._pyramid.get_tile(level, row, col)
+            pixels, invalid_mask, _ = self._quantize(tile, vmin=self._vmin, vmax=self._vmax)
+            reply_buffers.append(pixels)
+            tile_reply = dict(level=level, row=row, col=col, shape=list(tile.shape), pixels=(len(reply_buffers) - 1), invalid_mask=None)
+            if invalid_mask:
+                reply_buffers.append(invalid_mask)
+                tile_reply['invalid_mask'] = len(reply_buffers) - 1
+            reply_tiles.append(tile_reply)
+        if reply_tiles:
+            self.send(dict(type='tiles', tiles=reply_tiles), buffers=reply_buffers)
+
+
+# ==================================================================================================================== #
+# Virtualized DataFrame Table                                                                                          #
+# ==================================================================================================================== #
+
+class DataFrameWindowWidget(DOMWidget):
+    """ A scrollable table over a (possibly huge) DataFrame that only ever serializes the rows in view: as the table is scrolled, the frontend requests
+    `window_rows`-row windows and the kernel answers each with the HTML of `df.iloc[start:stop]`. The output size doesn't depend on the number of rows.
+
+        from pho_jupyter_preview_widget.widget import DataFrameWindowWidget
+
+        DataFrameWindowWidget(df, window_rows=50) # e.g. a 1M-row frame still sends 50 rows at a time
+
+    Columns are elided like pandas' own display (`display.max_columns`). The first window is part of the widget state, and also the
+    `text/html` fallback for frontends that can't render widgets.
+
+    Messages:
+        frontend -> kernel: `{'type': 'request_window', 'start': int, 'request_id': int}`
+        kernel -> frontend: `{'type': 'window', 'start': int, 'stop': int, 'html': str, 'request_id': int}`
+    """
+    _view_name = Unicode('DataFrameWindowView').tag(sync=True)
+    _view_module = Unicode('pho_jupyter_preview_widget').tag(sync=True)
+    _view_module_version = Unicode('0.1.0').tag(sync=True)
+
+    n_rows = Int(0).tag(sync=True)
+    n_columns = Int(0).tag(sync=True)
+    window_rows = Int(50).tag(sync=True)
+    window_start = Int(0).tag(sync=True) # of `window_html`, the initially displayed window
+    window_html = Unicode('').tag(sync=True)
+    max_height = Int(400).tag(sync=True) # CSS pixels
+
+    def __init__(self, df, window_rows: int=50, max_columns: Optional[int]=None, **kwargs):
+        if window_rows < 1:
+            raise ValueError(f'window_rows must be at least 1 but got: {window_rows}')
+        self._df = df
+        self.max_columns = max_columns
+        super().__init__(n_rows=int(df.shape[0]), n_columns=int(df.shape[1]), window_rows=window_rows, **kwargs)
+        self.window_html = self._window_html(0)
+        self.on_msg(self._handle_custom_msg)
+
+
+    def _clamp_start(self, start: int) -> int:
+        return int(min(max(0, start), max(0, self.n_rows - self.window_rows)))
+
+    def _window_html(self, start: int) -> str:
+        """ The HTML table of rows `[start, start + window_rows)` (always with the header, so every window renders on its own). """
+        import pandas as pd
+        from pho_jupyter_preview_widget.profiling import default_profiler
+        max_columns = self.max_columns if (self.max_columns is not None) else pd.get_option('display.max_columns')
+        with default_profiler.stage('to_html') as stage:
+            window_html: str = self._df.iloc[start:(start + self.window_rows)].to_html(max_rows=None, max_cols=max_columns, show_dimensions=False, border=0)
+            stage.add(bytes_out=len(window_html))
+        return window_html
+
+
+    def _handle_custom_msg(self, widget, content, buffers):
+        if not isinstance(content, dict) or (content.get('type', None) != 'request_window'):
+            return
+        try:
+            start: int = self._clamp_start(int(content.get('start', 0)))
+        except (TypeError, ValueError):
+            print(f'WARN: DataFrameWindowWidget ignoring malformed window request: {content!r}')
+            return
+        stop: int = min(self.n_rows, start + self.window_rows)
+        self.send(dict(type='window', start=start, stop=stop, html=self._window_html(start), request_id=content.get('request_id', None)))
+
+
+    def _repr_mimebundle_(self, **kwargs):
+        data = super()._repr_mimebundle_(**kwargs)
+        if data is not None:
+            # shown wherever the widget can't be, e.g. an exported notebook
+            data['text/html'] = self.window_html + f'<p>rows {self.window_start}-{min(self.n_rows, self.window_start + self.window_rows) - 1} of {self.n_rows} x {self.n_columns} columns</p>'
+        return data
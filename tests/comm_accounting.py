@@ -0,0 +1,44 @@
+# File: comm_accounting.py
+""" Test helper: counts the ipywidgets instances constructed and the comms opened while it's active.
+
+    with WidgetCommCounter() as counter:
+        html = formatter(arr)
+    assert (counter.n_widgets, counter.n_comms) == (0, 0)
+
+"""
+from unittest import mock
+
+
+class WidgetCommCounter:
+    """ Context manager counting widget constructions (`Widget._call_widget_constructed`) and comm creations (`comm.create_comm`, which every widget goes through to reach the frontend). """
+    def __init__(self):
+        self.n_widgets: int = 0
+        self.n_comms: int = 0
+        self._patches = []
+
+    def __enter__(self) -> "WidgetCommCounter":
+        import comm
+        from ipywidgets.widgets.widget import Widget
+
+        original_widget_constructed = Widget._call_widget_constructed
+        original_create_comm = comm.create_comm
+
+        def _counting_widget_constructed(widget):
+            self.n_widgets += 1
+            return original_widget_constructed(widget)
+
+        def _counting_create_comm(*args, **kwargs):
+            self.n_comms += 1
+            return original_create_comm(*args, **kwargs)
+
+        self._patches = [mock.patch.object(Widget, '_call_widget_constructed', staticmethod(_counting_widget_constructed)),
+                         mock.patch.object(comm, 'create_comm', _counting_create_comm)]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self._patches = []
+        return False
@@ -0,0 +1,119 @@
+# File: test_adaptive_quality.py
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pho_jupyter_preview_widget import adaptive_quality
+from pho_jupyter_preview_widget.adaptive_quality import AdaptiveQualityController, array_mode
+
+
+def _virtual_array(shape, dtype=np.float64) -> np.ndarray:
+    """ an array of `shape` that takes no memory (the controller only looks at its size, dtype and dimensionality) """
+    return np.broadcast_to(np.zeros((), dtype=dtype), shape)
+
+
+class TestAdaptiveQualityController(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = AdaptiveQualityController(probe_interval=0)
+
+    def test_priors_pick_cheaper_tiers_for_larger_arrays(self):
+        self.assertEqual(self.controller.choose_tier(_virtual_array((100, 100)), target_s=0.03), 0)
+        big_tier = self.controller.choose_tier(_virtual_array((20000, 20000)), target_s=0.03)
+        self.assertGreater(big_tier, 0)
+        self.assertLessEqual(self.controller.predict(_virtual_array((20000, 20000)), big_tier), 0.03)
+
+    def test_learns_from_recorded_render_times(self):
+        arr = _virtual_array((300, 300))
+        self.assertEqual(self.controller.choose_tier(arr, target_s=0.03), 0)
+        for _ in range(3):
+            self.controller.record(arr, 0, elapsed_s=0.1)
+        self.assertEqual(self.controller.choose_tier(arr, target_s=0.03), 1)
+        self.assertEqual(self.controller.choose_tier(_virtual_array((300, 300), np.float32), target_s=0.03), 0, "keyed by dtype")
+        self.assertEqual(self.controller.choose_tier(_virtual_array((300, 300, 2)), target_s=0.03), 0, "keyed by mode")
+
+    def test_estimates_include_the_deviation(self):
+        arr = _virtual_array((1000,))
+        for elapsed_s in (0.01, 0.03, 0.01, 0.03):
+            self.controller.record(arr, 0, elapsed_s=elapsed_s)
+        (mean_s, deviation_s), = self.controller.stats()[('full', '<f8', '1d')].values()
+        self.assertGreater(deviation_s, 0.0)
+        self.assertAlmostEqual(self.controller.predict(arr, 0), mean_s + 3.0 * deviation_s)
+
+    def test_unseen_sizes_are_extrapolated(self):
+        self.controller.record(_virtual_array((1000, 1000)), 0, elapsed_s=0.02)
+        self.assertGreater(self.controller.predict(_virtual_array((4000, 4000)), 0), 0.2, "the full tier reads every element")
+        self.controller.record(_virtual_array((1000, 1000)), 3, elapsed_s=0.002)
+        self.assertLess(self.controller.predict(_virtual_array((4000, 4000)), 3), 0.004, "the minimal tier's cost is bounded")
+
+    def test_probes_richer_tiers(self):
+        controller = AdaptiveQualityController(probe_interval=10)
+        arr = _virtual_array((500, 500))
+        controller.record(arr, 0, elapsed_s=0.05) # over the target, but within twice it
+        tiers = [controller.choose_tier(arr, target_s=0.03) for _ in range(10)]
+        self.assertEqual([i + 1 for i, tier in enumerate(tiers) if tier == 0], [2, 4, 8, 10])
+
+    def test_tier_render_kwargs(self):
+        render_kwargs = dict(max_thumbnail_pixels=256, include_stats=True, include_plaintext_repr=True, height=50)
+        self.assertEqual(self.controller.tier_render_kwargs(0, render_kwargs), render_kwargs)
+        reduced = self.controller.tier_render_kwargs(1, render_kwargs)
+        self.assertEqual((reduced['max_thumbnail_pixels'], reduced['max_block_size'], reduced['include_stats'], reduced['stats_max_exact_elements']), (128, 4, True, adaptive_quality.SAMPLED_STATS_MAX_ELEMENTS))
+        minimal = self.controller.tier_render_kwargs(3, render_kwargs)
+        self.assertEqual((minimal['max_thumbnail_pixels'], minimal['max_block_size'], minimal['include_stats'], minimal['include_plaintext_repr']), (32, 1, False, False))
+        self.assertEqual(render_kwargs['max_thumbnail_pixels'], 256, "the caller's kwargs aren't modified")
+
+    def test_array_mode(self):
+        self.assertEqual(array_mode(np.zeros(3)), '1d')
+        self.assertEqual(array_mode(np.zeros((2, 3, 4)), nd_mode='max'), 'nd-max')
+
+
+class TestAdaptiveQualityPreviews(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        self.array_preview_with_heatmap_repr_html = array_preview_with_heatmap_repr_html
+        self.controller = AdaptiveQualityController(probe_interval=0)
+        patcher = mock.patch.object(adaptive_quality, 'default_quality_controller', self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tier_is_reported_and_applied(self):
+        arr = np.random.default_rng(0).random((400, 300))
+        html = self.array_preview_with_heatmap_repr_html(arr, latency_target_s=1e-9, use_render_cache=False, use_output_budget=False, include_plaintext_repr=True)
+        self.assertIn('minimal quality, to display within 0 ms', html)
+        self.assertNotIn('Min / Max', html, "no stats in the minimal tier")
+        self.assertNotIn('<pre>', html, "no plaintext in the minimal tier")
+        self.assertEqual(len(self.controller.stats()), 1, "the render time was recorded")
+
+        html = self.array_preview_with_heatmap_repr_html(arr, latency_target_s=10.0, use_render_cache=False, use_output_budget=False)
+        self.assertNotIn('quality, to display within', html)
+        self.assertIn('Min / Max', html)
+
+    def test_the_richest_cached_tier_is_shown_without_choosing_one(self):
+        from pho_jupyter_preview_widget import render_cache
+        with mock.patch.object(render_cache, 'default_render_cache', render_cache.PreviewRenderCache()):
+            arr = np.random.default_rng(0).random((400, 300))
+            full_html = self.array_preview_with_heatmap_repr_html(arr, use_output_budget=False) # no target: cached at the 'full' tier
+            with mock.patch.object(self.controller, 'choose_tier', side_effect=AssertionError('chose a tier for a cached preview')):
+                html = self.array_preview_with_heatmap_repr_html(arr.copy(), latency_target_s=1e-9, use_output_budget=False)
+            self.assertEqual(html, full_html, "a cached richer render isn't downgraded")
+            self.assertEqual(self.controller.stats(), {}, "cache hits say nothing about the render cost")
+
+            other = np.random.default_rng(1).random((400, 300))
+            minimal_html = self.array_preview_with_heatmap_repr_html(other, latency_target_s=1e-9, use_output_budget=False)
+            self.assertIn('minimal quality', minimal_html)
+            with mock.patch.object(self.controller, 'choose_tier', side_effect=AssertionError('chose a tier for a cached preview')):
+                self.assertEqual(self.array_preview_with_heatmap_repr_html(other, latency_target_s=1e-9, use_output_budget=False), minimal_html, "the same array displays the same way again")
+
+    def test_no_target_renders_as_configured(self):
+        html = self.array_preview_with_heatmap_repr_html(np.random.default_rng(0).random((40, 30)), use_render_cache=False, use_output_budget=False)
+        self.assertNotIn('quality, to display within', html)
+        self.assertEqual(self.controller.stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
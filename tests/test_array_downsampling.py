@@ -0,0 +1,71 @@
+# File: test_array_downsampling.py
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.array_downsampling import downsample_2d, thumbnail_target_shape
+
+
+class TestDownsample2D(unittest.TestCase):
+
+    def test_small_arrays_pass_through(self):
+        arr = np.random.rand(10, 20)
+        self.assertIs(downsample_2d(arr, target_shape=(256, 256)), arr)
+
+    def test_1d_input_is_promoted(self):
+        out = downsample_2d(np.arange(10000, dtype=float), target_shape=(256, 256))
+        self.assertEqual(out.ndim, 2)
+        self.assertEqual(out.shape[0], 1)
+        self.assertLessEqual(out.shape[1], 256)
+
+    def test_output_bounded_by_target_shape(self):
+        arr = np.random.rand(1000, 3001)
+        for reducer in ('mean', 'max', 'stride'):
+            out = downsample_2d(arr, target_shape=(100, 100), reducer=reducer)
+            self.assertLessEqual(out.shape[0], 100, reducer)
+            self.assertLessEqual(out.shape[1], 100, reducer)
+        self.assertLessEqual(downsample_2d(arr, target_shape=(100, 100), reducer='minmax').shape[1], 100)
+
+    def test_mean_matches_block_average(self):
+        arr = np.arange(16, dtype=float).reshape(4, 4)
+        np.testing.assert_allclose(downsample_2d(arr, target_shape=(2, 2), reducer='mean'), [[2.5, 4.5], [10.5, 12.5]])
+
+    def test_uneven_blocks_keep_the_tail(self):
+        arr = np.zeros((1, 10))
+        arr[0, -1] = 1.0
+        out = downsample_2d(arr, target_shape=(1, 3), reducer='max')
+        self.assertEqual(out[0, -1], 1.0, "The trailing partial block must not be dropped")
+
+    def test_max_and_minmax_keep_peaks(self):
+        arr = np.zeros((512, 512))
+        arr[100, 200] = 10.0
+        arr[300, 400] = -10.0
+        self.assertEqual(downsample_2d(arr, target_shape=(64, 64), reducer='max').max(), 10.0)
+        envelope = downsample_2d(arr, target_shape=(64, 64), reducer='minmax')
+        self.assertEqual(envelope.max(), 10.0)
+        self.assertEqual(envelope.min(), -10.0)
+
+    def test_nans_do_not_blank_out_blocks(self):
+        arr = np.ones((64, 64))
+        arr[0, 0] = np.nan
+        out = downsample_2d(arr, target_shape=(8, 8), reducer='mean')
+        self.assertFalse(np.any(np.isnan(out)))
+
+    def test_cost_is_bounded_for_huge_inputs(self):
+        """A broadcast (zero-memory) view stands in for a huge array; only a bounded number of elements may be reduced."""
+        huge = np.broadcast_to(np.float32(1.0), (200000, 200000))
+        out = downsample_2d(huge, target_shape=(64, 64), reducer='mean', max_block_size=4)
+        self.assertLessEqual(out.shape[0], 64)
+        self.assertLessEqual(out.shape[1], 64)
+
+    def test_unknown_reducer(self):
+        with self.assertRaises(ValueError):
+            downsample_2d(np.zeros((4, 4)), reducer='median')
+
+    def test_thumbnail_target_shape(self):
+        self.assertEqual(thumbnail_target_shape(height=50, width=None), (256, 256))
+        self.assertEqual(thumbnail_target_shape(height=500, width=None), (500, 256))
+
+
+if __name__ == "__main__":
+    unittest.main()
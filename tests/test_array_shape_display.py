@@ -0,0 +1,93 @@
+# File: test_array_shape_display.py
+import os
+import re
+import tempfile
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.array_shape_display import array_shape_display
+from pho_jupyter_preview_widget.array_shape_display.array_shape_display import _svg_from_signature, array_repr_html, enable_template_bytecode_cache, get_template, get_template_environment, to_svg
+
+
+class TestShapeCardTemplates(unittest.TestCase):
+
+    def test_numpy_shape_card(self):
+        html = array_repr_html((10, 20), None, np.dtype('float32'))
+        self.assertIn('(10, 20)', html)
+        self.assertIn('800 B', html)
+        self.assertIn('float32 numpy.ndarray', html)
+        self.assertNotIn('Dask graph', html, "In-memory arrays have no chunk/graph row")
+        self.assertIn('<svg', html)
+
+    def test_color_scale_row(self):
+        html = array_repr_html((10, 20), None, np.dtype('float64'), color_scale=dict(color_scale='percentile', vmin=0.5, vmax=2.0, percentiles=(1.0, 99.0), sentinels={'NaN': (255, 0, 255)}))
+        self.assertIn('Color scale', html)
+        self.assertIn('0.5 &hellip; 2 (1&ndash;99 pct)', html)
+        self.assertIn('rgb(255, 0, 255)', html)
+        self.assertNotIn('Color scale', array_repr_html((10, 20), None, np.dtype('float64')))
+
+    def test_chunked_shape_card(self):
+        html = array_repr_html((100, 60), ((50, 50), (20, 20, 20)), np.dtype('int64'), n_layers=3)
+        self.assertIn('(50, 20)', html)
+        self.assertIn('6 chunks in 3 graph layers', html)
+
+    def test_templates_are_compiled_once(self):
+        self.assertIs(get_template('array.html.j2'), get_template('array.html.j2'))
+        self.assertFalse(get_template_environment().auto_reload)
+
+    def test_bytecode_cache(self):
+        previous_environment = array_shape_display._template_environment
+        array_shape_display._template_environment = None
+        try:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                enable_template_bytecode_cache(cache_dir)
+                array_repr_html((3,), None, np.dtype('float64'))
+                self.assertTrue(any(name.endswith('.cache') for name in os.listdir(cache_dir)))
+        finally:
+            array_shape_display._template_environment = previous_environment
+
+
+def _svg_size(svg: str):
+    width, height = re.match(r'<svg width="([\d.]+)" height="([\d.]+)"', svg).groups()
+    return float(width), float(height)
+
+
+class TestShapeGlyphs(unittest.TestCase):
+
+    def test_empty_and_scalar_shapes(self):
+        self.assertIn('<svg', to_svg(((0,), (5,))))
+        self.assertIn('<svg', to_svg(()))
+        self.assertIn('<svg', array_repr_html((0, 3), None, np.dtype('float64')))
+
+    def test_non_square_shapes_keep_a_log_scaled_aspect_ratio(self):
+        width, height = _svg_size(to_svg(((10,), (1000,)))) # 10 rows x 1000 cols
+        self.assertGreater(width, 2 * height)
+        thin_width, thin_height = _svg_size(to_svg(((1,), (10**6,))))
+        self.assertGreater(thin_height, 10, "Extreme ratios are compressed, not drawn as a 1px sliver")
+        square_width, square_height = _svg_size(to_svg(((100,), (100,))))
+        self.assertAlmostEqual(square_width, square_height)
+
+    def test_chunk_boundaries_are_drawn(self):
+        svg = to_svg(((50, 50), (20, 20, 20)))
+        self.assertEqual(svg.count('<line'), 1 + 2)
+        svg_3d = to_svg(((2, 2), (5, 5), (7, 7)))
+        self.assertEqual(svg_3d.count('<polygon'), 3)
+        self.assertEqual(svg_3d.count('<line'), 3 * 2)
+
+    def test_dense_chunk_grids_are_bounded(self):
+        svg = to_svg(((1,) * 100000, (1,) * 100000), max_primitives=200)
+        self.assertLessEqual(svg.count('<line'), 200 + 1) # + the hatch pattern's own line
+        self.assertIn('pho-hatch', svg)
+        self.assertLess(len(svg), 4096)
+        self.assertEqual(len(to_svg(((1,) * 100000,))), len(to_svg(((1,) * 200000,))), "Only the size label differs")
+
+    def test_glyphs_are_memoized(self):
+        _svg_from_signature.cache_clear()
+        to_svg(((5, 5), (3,)))
+        to_svg([[5, 5], [3]])
+        self.assertEqual(_svg_from_signature.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
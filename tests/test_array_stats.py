@@ -0,0 +1,97 @@
+# File: test_array_stats.py
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pho_jupyter_preview_widget import array_stats
+from pho_jupyter_preview_widget.array_shape_display.array_shape_display import array_repr_html
+from pho_jupyter_preview_widget.array_stats import compute_array_stats, get_array_stats
+from pho_jupyter_preview_widget.heatmap_rendering import sampled_finite_range
+from pho_jupyter_preview_widget.render_cache import default_render_cache
+
+
+class TestArrayStats(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.default_rng(0).normal(3.0, 2.0, size=(300, 500))
+        self.data[5, :7] = np.nan
+        self.data[6, :3] = np.inf
+        self.data[7, :2] = -np.inf
+
+    def assert_matches_numpy(self, stats, data):
+        finite = data[np.isfinite(data)]
+        self.assertEqual(stats['n_finite'], finite.size)
+        self.assertAlmostEqual(stats['min'], finite.min())
+        self.assertAlmostEqual(stats['max'], finite.max())
+        self.assertAlmostEqual(stats['mean'], finite.mean(), places=10)
+        self.assertAlmostEqual(stats['std'], finite.std(), places=10)
+
+    def test_single_pass_matches_separate_reductions(self):
+        stats = compute_array_stats(self.data, chunk_elements=1000, max_hist_samples=self.data.size)
+        self.assert_matches_numpy(stats, self.data)
+        self.assertEqual((stats['n_nan'], stats['n_posinf'], stats['n_neginf'], stats['n_masked']), (7, 3, 2, 0))
+        self.assertFalse(stats['is_estimate'])
+        self.assertEqual(len(stats['hist_counts']), 32)
+        self.assertEqual(sum(stats['hist_counts']), stats['n_finite'])
+
+    def test_threaded_and_non_contiguous_inputs(self):
+        threaded = compute_array_stats(self.data, chunk_elements=1000, parallel_min_elements=1, max_workers=4)
+        self.assert_matches_numpy(threaded, self.data)
+        self.assertEqual(threaded['n_nan'], 7)
+        transposed = self.data.T[::2]
+        self.assert_matches_numpy(compute_array_stats(transposed, chunk_elements=1000), transposed)
+
+    def test_integer_bool_masked_and_unsupported_dtypes(self):
+        ints = np.arange(-50, 50, dtype=np.int16).reshape(10, 10)
+        self.assert_matches_numpy(compute_array_stats(ints), ints.astype(float))
+        self.assertAlmostEqual(compute_array_stats(np.array([True, False, True, True]))['mean'], 0.75)
+        masked = np.ma.masked_greater(np.arange(10.0), 6.5)
+        stats = compute_array_stats(masked)
+        self.assertEqual((stats['n_finite'], stats['n_masked'], stats['max']), (7, 3, 6.0))
+        self.assertIsNone(compute_array_stats(np.array(['a', 'b'])))
+        self.assertIsNone(compute_array_stats(np.ones(3, dtype=complex)))
+        self.assertIsNone(compute_array_stats(np.full(4, np.nan))['mean'])
+
+    def test_large_arrays_are_estimated_from_a_sample(self):
+        stats = compute_array_stats(self.data, max_exact_elements=10_000, max_samples=5_000)
+        self.assertTrue(stats['is_estimate'])
+        self.assertLessEqual(stats['n'], 20_000)
+        self.assertAlmostEqual(stats['mean'], 3.0, delta=0.2)
+
+
+class TestArrayStatsCache(unittest.TestCase):
+
+    def setUp(self):
+        default_render_cache.clear()
+
+    def test_stats_are_cached_and_shared_with_the_color_scale(self):
+        data = np.random.default_rng(1).random((200, 200))
+        stats = get_array_stats(data)
+        with mock.patch.object(array_stats, 'compute_array_stats', side_effect=AssertionError('recomputed')), mock.patch.object(array_stats, 'bounded_sample', side_effect=AssertionError('re-sampled')):
+            self.assertEqual(get_array_stats(data.copy()), stats)
+            self.assertEqual(sampled_finite_range(data), (stats['min'], stats['max']))
+
+    def test_shape_card_lists_the_stats(self):
+        data = np.arange(12, dtype=float).reshape(3, 4)
+        data[0, 0] = np.nan
+        html = array_repr_html(data.shape, None, data.dtype, stats=get_array_stats(data))
+        self.assertIn('1 / 11', html)
+        self.assertIn('1 NaN', html)
+        self.assertIn('<rect', html, "the histogram is drawn")
+        self.assertNotIn('Min / Max', array_repr_html(data.shape, None, data.dtype))
+
+    def test_single_array_preview_reuses_the_stats_range(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import single_NDArray_array_preview_with_heatmap_repr_html
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        data = np.zeros((1000, 1000))
+        data[500, 500] = 100.0 # a mean-reduced thumbnail spreads this over its block
+        html = single_NDArray_array_preview_with_heatmap_repr_html(data, color_scale='minmax')
+        self.assertIn('0 &hellip; 100 (min/max)', html, "the color scale spans the exact range from the stats")
+        html = single_NDArray_array_preview_with_heatmap_repr_html(data, color_scale='minmax', include_stats=False)
+        self.assertIn('0 &hellip; 6.25 (min/max)', html, "without stats only the thumbnail's range is known")
+
+if __name__ == '__main__':
+    unittest.main()
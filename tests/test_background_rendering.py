@@ -0,0 +1,108 @@
+# File: test_background_rendering.py
+import threading
+import types
+import unittest
+
+from pho_jupyter_preview_widget import background_rendering
+from pho_jupyter_preview_widget.background_rendering import BackgroundPreviewRenderer, get_background_renderer
+
+
+class _RecordingDisplayHandle:
+    """ stands in for `IPython.display.DisplayHandle`, recording every update """
+    def __init__(self):
+        self.updates = []
+
+    def update(self, obj, **kwargs):
+        self.updates.append(obj.data)
+
+
+class TestBackgroundPreviewRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = BackgroundPreviewRenderer(max_workers=1, max_pending=2)
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.renderer.shutdown(wait=True)
+
+    def _blocking_render(self, html: str):
+        def _render():
+            self.started.set()
+            self.release.wait(timeout=5.0)
+            return html
+        return _render
+
+    def _submit_running(self):
+        """ occupies the single worker so that later submissions stay queued """
+        future = self.renderer.submit(_RecordingDisplayHandle(), self._blocking_render('running'))
+        self.assertTrue(self.started.wait(timeout=5.0))
+        return future
+
+    def test_result_is_swapped_into_the_display(self):
+        handle = _RecordingDisplayHandle()
+        future = self.renderer.submit(handle, lambda: '<div>full preview</div>')
+        self.assertEqual(future.result(timeout=5.0), '<div>full preview</div>')
+        self.assertEqual(handle.updates, ['<div>full preview</div>'])
+
+    def test_rerunning_a_cell_cancels_its_queued_renders(self):
+        self.renderer.on_pre_run_cell(types.SimpleNamespace(cell_id='cell-a'))
+        running = self._submit_running()
+        queued_handle = _RecordingDisplayHandle()
+        queued = self.renderer.submit(queued_handle, self._blocking_render('queued'))
+
+        self.renderer.on_pre_run_cell(types.SimpleNamespace(cell_id='cell-a'))
+        self.assertTrue(queued.cancelled())
+        self.release.set()
+        self.assertEqual(running.result(timeout=5.0), 'running')
+        self.assertEqual(queued_handle.updates, [])
+
+    def test_other_cells_are_not_cancelled(self):
+        self.renderer.on_pre_run_cell(types.SimpleNamespace(cell_id='cell-a'))
+        self._submit_running()
+        queued = self.renderer.submit(_RecordingDisplayHandle(), self._blocking_render('queued'))
+        self.renderer.on_pre_run_cell(types.SimpleNamespace(cell_id='cell-b'))
+        self.assertFalse(queued.cancelled())
+
+    def test_bounded_queue_drops_the_oldest_queued_render(self):
+        self._submit_running()
+        oldest_handle = _RecordingDisplayHandle()
+        oldest = self.renderer.submit(oldest_handle, self._blocking_render('oldest'), dropped_html='<div>skipped</div>')
+        newest = self.renderer.submit(_RecordingDisplayHandle(), self._blocking_render('newest'))
+        self.assertTrue(oldest.cancelled())
+        self.assertEqual(oldest_handle.updates, ['<div>skipped</div>'])
+        self.assertEqual(self.renderer.n_dropped, 1)
+        self.release.set()
+        self.assertEqual(newest.result(timeout=5.0), 'newest')
+
+
+class _FakeShell:
+    """ just enough of an InteractiveShell (events + kernel parent metadata) for `get_background_renderer` """
+    def __init__(self, cell_id):
+        self.registered = []
+        self.events = types.SimpleNamespace(register=lambda name, fn: self.registered.append((name, fn)))
+        self.kernel = types.SimpleNamespace(get_parent=lambda: {'metadata': {'cellId': cell_id}})
+
+
+class TestGetBackgroundRenderer(unittest.TestCase):
+
+    def setUp(self):
+        background_rendering._default_renderer = None
+
+    def tearDown(self):
+        if background_rendering._default_renderer is not None:
+            background_rendering._default_renderer.shutdown(wait=True)
+        background_rendering._default_renderer = None
+
+    def test_hook_is_registered_once_and_seeded_from_the_executing_cell(self):
+        ip = _FakeShell(cell_id='cell-a')
+        renderer = get_background_renderer(ip=ip)
+        self.assertEqual([name for name, _fn in ip.registered], ['pre_run_cell'])
+        self.assertEqual(renderer._current_cell_id, 'cell-a', "Renders from the cell that enabled async mode must be cancellable too")
+        self.assertIs(get_background_renderer(ip=ip), renderer)
+        self.assertEqual(len(ip.registered), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# File: test_benchmarks.py
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+
+
+def _load_bench_formatters():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'bench_formatters.py')
+    spec = importlib.util.spec_from_file_location('bench_formatters', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBenchFormatters(unittest.TestCase):
+
+    def setUp(self):
+        self.bench = _load_bench_formatters()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.baseline_path = os.path.join(self.tmp_dir.name, 'baseline.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_main(self, *args) -> int:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.bench.main(['--quick', '--repeat', '1', '--filter', '1d_1e3', '--filter', 'float32', *args])
+
+    def test_save_then_compare(self):
+        self.assertEqual(self.run_main('--save', self.baseline_path), 0)
+        with open(self.baseline_path) as f:
+            baseline = json.load(f)
+        self.assertEqual(sorted(baseline['results']), ['heatmap_repr_html/1d_1e3/float32', 'shape_card/1d_1e3/float32', 'smart_array2string/1d_1e3/float32'])
+        for result in baseline['results'].values():
+            self.assertEqual(sorted(result), ['best_s', 'median_s', 'output_bytes', 'peak_bytes'])
+            self.assertGreater(result['output_bytes'], 0)
+
+        baseline['results']['shape_card/1d_1e3/float32']['output_bytes'] = 10 # pretend the output used to be much smaller
+        with open(self.baseline_path, 'w') as f:
+            json.dump(baseline, f)
+        self.assertEqual(self.run_main('--compare', self.baseline_path), 1)
+
+    def test_compare_ignores_noise(self):
+        baseline = {'case': dict(best_s=0.001, peak_bytes=1000, output_bytes=5000)}
+        self.assertEqual(self.bench.compare_results({'case': dict(best_s=0.0015, peak_bytes=2000, output_bytes=5100)}, baseline), [], "below the absolute noise floors")
+        regressions = self.bench.compare_results({'case': dict(best_s=0.5, peak_bytes=1000, output_bytes=5000), 'new_case': dict(best_s=9.0, peak_bytes=0, output_bytes=0)}, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('best_s', regressions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
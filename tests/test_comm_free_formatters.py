@@ -0,0 +1,60 @@
+# File: test_comm_free_formatters.py
+import unittest
+
+import numpy as np
+
+from tests.comm_accounting import WidgetCommCounter
+
+
+class TestWidgetCommCounter(unittest.TestCase):
+
+    def test_counts_widget_construction(self):
+        from ipywidgets import widgets
+        with WidgetCommCounter() as counter:
+            html_widget = widgets.HTML(value='<b>x</b>')
+        self.assertGreaterEqual(counter.n_widgets, 1) # the HTML widget, plus its Layout and Style children
+        self.assertEqual(counter.n_comms, counter.n_widgets)
+        html_widget.close()
+
+
+class TestFormattersOpenNoComms(unittest.TestCase):
+    """ The text/html formatters must build plain strings: every widget construction opens a comm that is never closed. """
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget import display_helpers
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        self.display_helpers = display_helpers
+
+    def assertNoWidgetsOrComms(self, fn, *args, **kwargs):
+        with WidgetCommCounter() as counter:
+            result = fn(*args, **kwargs)
+        self.assertEqual((counter.n_widgets, counter.n_comms), (0, 0), f"{fn.__name__} created {counter.n_widgets} widgets and {counter.n_comms} comms")
+        return result
+
+    def test_array_formatters(self):
+        dh = self.display_helpers
+        for arr in (np.random.rand(20, 30), np.arange(10), np.random.rand(4, 5, 6)):
+            self.assertNoWidgetsOrComms(dh.array_preview_with_heatmap_repr_html, arr, include_plaintext_repr=True, use_render_cache=False)
+        self.assertNoWidgetsOrComms(dh.array_preview_with_heatmap_repr_html, [np.random.rand(3, 4), np.random.rand(5)], use_render_cache=False)
+        self.assertNoWidgetsOrComms(dh.array_preview_with_heatmap_repr_html, np.random.rand(20, 30), render_engine='matplotlib', use_render_cache=False)
+
+    def test_matplotlib_figure_formatter(self):
+        try:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+        except ImportError:
+            self.skipTest("matplotlib is not installed")
+        fig, ax = plt.subplots()
+        ax.plot([1, 2, 3])
+        try:
+            html = self.assertNoWidgetsOrComms(self.display_helpers.MatplotlibToIPythonWidget.matplotlib_fig_to_ipython_HTML, fig)
+            self.assertIn('data:image/png;base64', html)
+        finally:
+            plt.close(fig)
+
+
+if __name__ == "__main__":
+    unittest.main()
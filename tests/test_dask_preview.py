@@ -0,0 +1,75 @@
+# File: test_dask_preview.py
+import threading
+import unittest
+
+import numpy as np
+
+try:
+    import dask.array as da
+except ImportError:
+    da = None
+
+from pho_jupyter_preview_widget.dask_preview import dask_preview_sample, is_dask_array
+from pho_jupyter_preview_widget.render_cache import array_fingerprint
+
+
+class _ChunkReadCountingSource:
+    """ An array-like backing store for `da.from_array` that records every chunk read from it """
+    def __init__(self, data: np.ndarray):
+        self.data = data
+        self.shape, self.dtype, self.ndim = data.shape, data.dtype, data.ndim
+        self.reads = []
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        result = self.data[key]
+        if result.size > 0: # dask reads an empty slice up front to infer the chunk metadata
+            with self._lock:
+                self.reads.append(result.size)
+        return result
+
+
+@unittest.skipIf(da is None, "dask is not installed")
+class TestDaskPreviewSample(unittest.TestCase):
+
+    def test_only_the_sampled_chunks_are_read(self):
+        source = _ChunkReadCountingSource(np.random.rand(2000, 3000))
+        darr = da.from_array(source, chunks=(100, 100), asarray=True) # 20 x 30 = 600 chunks
+        sample, n_blocks_read = dask_preview_sample(darr, target_shape=(64, 64), max_blocks=16)
+        self.assertLessEqual(n_blocks_read, 16)
+        self.assertLessEqual(len(source.reads), 16, "Only the selected chunks may be read")
+        self.assertLessEqual(sum(source.reads), 16 * 100 * 100)
+        self.assertLessEqual(sample.shape[0], 64)
+        self.assertLessEqual(sample.shape[1], 64)
+        self.assertIsInstance(sample, np.ndarray)
+
+    def test_small_arrays_are_sampled_whole(self):
+        data = np.arange(12.0).reshape(3, 4)
+        sample, n_blocks_read = dask_preview_sample(da.from_array(data, chunks=(2, 2)))
+        np.testing.assert_array_equal(sample, data)
+        self.assertEqual(n_blocks_read, 4)
+
+    def test_nd_arrays_keep_slices_along_the_nd_axis(self):
+        source = _ChunkReadCountingSource(np.random.rand(40, 50, 60, 70))
+        darr = da.from_array(source, chunks=(5, 10, 30, 35), asarray=True)
+        sample, n_blocks_read = dask_preview_sample(darr, target_shape=(32, 32), max_blocks=16, nd_axis=0, nd_max_slices=8)
+        self.assertEqual(sample.ndim, 4)
+        self.assertLessEqual(sample.shape[0], 8)
+        self.assertLessEqual(len(source.reads), 16)
+
+    def test_unknown_chunk_sizes_are_rejected(self):
+        darr = da.from_array(np.arange(10.0), chunks=5)
+        darr = darr[darr > 3]
+        with self.assertRaises(ValueError):
+            dask_preview_sample(darr)
+
+    def test_fingerprint_uses_the_graph_name(self):
+        darr = da.ones((1000, 1000), chunks=100)
+        self.assertTrue(is_dask_array(darr))
+        self.assertFalse(is_dask_array(np.ones(3)))
+        self.assertEqual(array_fingerprint(darr), array_fingerprint(da.ones((1000, 1000), chunks=100)))
+        self.assertNotEqual(array_fingerprint(darr), array_fingerprint(darr + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
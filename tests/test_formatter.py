@@ -17,19 +17,28 @@ class TestArrayPreviewWithHeatmapReprHtml(unittest.TestCase):
             np.array([249.046, 249.046]),
         ]    
 
+    def _render(self, input_data, **kwargs) -> str:
+        """ The formatter's HTML string, without the process-wide render cache and output budget leaking state between tests. """
+        rendered = array_preview_with_heatmap_repr_html(input_data, use_render_cache=False, use_output_budget=False, **kwargs)
+        self.assertIsInstance(rendered, str, "the text/html formatter returns the HTML string itself")
+        return rendered
+
     def test_single_array(self):
         """Test rendering a single numpy array."""
         input_data = np.array([1.23, 4.56, 7.89])
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("Heatmap Preview:", rendered.data, "Single array preview should include heatmap text")
-        self.assertIn("1.23, 4.56, 7.89", rendered.data, "Array content should appear in the preview")
+        rendered = self._render(input_data, include_plaintext_repr=True)
+        self.assertIn("data:image/png;base64,", rendered, "Single array preview should include the heatmap image")
+        self.assertIn("Shape", rendered, "Single array preview should include the shape card")
+        self.assertIn("<pre>[1.23,4.56,7.89]</pre>", rendered, "Array content should appear in the preview")
+        self.assertNotIn("<pre>", self._render(input_data), "The plaintext repr is opt-in")
 
     def test_empty_array(self):
         """Test rendering an empty numpy array."""
         input_data = np.array([])
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("Heatmap Preview:", rendered.data, "Empty array preview should still include heatmap text")
-        self.assertIn("[]", rendered.data, "Empty array should render as []")
+        rendered = self._render(input_data, include_plaintext_repr=True)
+        self.assertIn("no heatmap: the array is empty", rendered, "Empty arrays have no heatmap image")
+        self.assertNotIn("<img", rendered)
+        self.assertIn("<pre>[]</pre>", rendered, "Empty array should render as []")
 
     def test_list_of_arrays(self):
         """Test rendering a list of numpy arrays."""
@@ -37,23 +46,26 @@ class TestArrayPreviewWithHeatmapReprHtml(unittest.TestCase):
             np.array([1.23, 4.56, 7.89]),
             np.array([9.87, 6.54, 3.21])
         ]
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("<ul>", rendered.data, "List of arrays should render as an HTML list")
-        self.assertIn("<li>", rendered.data, "Each array in the list should be wrapped in a list item")
-        self.assertIn("1.23, 4.56, 7.89", rendered.data, "First array content should appear in the preview")
-        self.assertIn("9.87, 6.54, 3.21", rendered.data, "Second array content should appear in the preview")
+        rendered = self._render(input_data, include_plaintext_repr=True)
+        self.assertIn("<ul>", rendered, "List of arrays should render as an HTML list")
+        self.assertEqual(rendered.count("<li>"), 2, "Each array in the list should be wrapped in a list item")
+        self.assertEqual(rendered.count("<img"), 2, "Each array in the list gets a heatmap")
+        self.assertIn("[1.23,4.56,7.89]", rendered, "First array content should appear in the preview")
+        self.assertIn("[9.87,6.54,3.21]", rendered, "Second array content should appear in the preview")
+        self.assertIn("<pre>[1.23,4.56,7.89], [9.87,6.54,3.21]</pre>", self._render(input_data, list_heatmaps=False), "Without heatmaps the reprs are joined")
 
     def test_mixed_list(self):
         """Test rendering a list with non-numpy array items."""
         input_data = [np.array([1.23]), "string_value", 123]
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("Unsupported list elements:", rendered.data, "Mixed lists should render an unsupported message")
+        rendered = self._render(input_data)
+        self.assertEqual(rendered, repr(input_data), "Mixed lists should fall back to their repr")
 
     def test_empty_list(self):
         """Test rendering an empty list."""
         input_data = []
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("<ul></ul>", rendered.data, "Empty list should render as an empty HTML list")
+        rendered = self._render(input_data)
+        self.assertIn("<pre></pre>", rendered, "Empty list should render as an empty plaintext repr")
+        self.assertNotIn("<img", rendered)
 
     def test_nested_list_of_arrays(self):
         """Test rendering nested lists of numpy arrays."""
@@ -61,22 +73,22 @@ class TestArrayPreviewWithHeatmapReprHtml(unittest.TestCase):
             [np.array([1.23, 4.56])],
             np.array([7.89, 10.11])
         ]
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("Unsupported type:", rendered.data, "Nested lists should render an unsupported message")
+        rendered = self._render(input_data)
+        self.assertEqual(rendered, repr(input_data), "Nested lists should fall back to their repr")
 
     def test_fallback_for_unsupported_type(self):
         """Test rendering unsupported types."""
         input_data = "string_value"
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("Unsupported type:", rendered.data, "Unsupported types should render an error message")
+        rendered = self._render(input_data)
+        self.assertIn("Unsupported type:", rendered, "Unsupported types should render an error message")
 
     def test_precision_handling(self):
         """Test precision handling in numpy array rendering."""
         input_data = np.array([1.23456789])
-        rendered = array_preview_with_heatmap_repr_html(input_data)
-        self.assertIn("1.235", rendered.data, "Array values should respect the precision setting")
-        self.assertNotIn("1.23456789", rendered.data, "Excessive precision should not appear")
-
+        with np.printoptions(precision=3):
+            rendered = self._render(input_data, include_plaintext_repr=True)
+        self.assertIn("1.235", rendered, "Array values should respect the precision setting")
+        self.assertNotIn("1.23456789", rendered, "Excessive precision should not appear")
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,180 @@
+# File: test_heatmap_rendering.py
+import struct
+import unittest
+import zlib
+
+import numpy as np
+
+from pho_jupyter_preview_widget.heatmap_rendering import DEFAULT_SENTINEL_COLORS, encode_indexed_png, get_colormap_lut, normalize_to_uint8, render_heatmap_indexed, quantize_to_levels, render_heatmap_rgba, render_heatmap_png, sampled_finite_range
+
+
+def _read_png_chunks(png_bytes: bytes):
+    """ Minimal PNG chunk reader (validates the CRCs) used to inspect the encoder output without PIL. """
+    assert png_bytes[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks = []
+    offset = 8
+    while offset < len(png_bytes):
+        (length,) = struct.unpack('>I', png_bytes[offset:offset+4])
+        chunk_type = png_bytes[offset+4:offset+8]
+        payload = png_bytes[offset+8:offset+8+length]
+        (crc,) = struct.unpack('>I', png_bytes[offset+8+length:offset+12+length])
+        assert crc == (zlib.crc32(chunk_type + payload) & 0xFFFFFFFF)
+        chunks.append((chunk_type, payload))
+        offset += 12 + length
+    return chunks
+
+
+def _unfilter_indexed_scanlines(raw: bytes, height: int, width: int) -> np.ndarray:
+    """ Undoes the None/Sub/Up scanline filters of an 8-bit single-channel PNG. """
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, width + 1)
+    out = np.zeros((height, width), dtype=np.uint8)
+    for i, (filter_type, row) in enumerate(zip(rows[:, 0], rows[:, 1:])):
+        if filter_type == 0:
+            out[i] = row
+        elif filter_type == 1:
+            out[i] = np.cumsum(row, dtype=np.uint8)
+        elif filter_type == 2:
+            out[i] = row + (out[i - 1] if i > 0 else 0)
+        else:
+            raise AssertionError(f'unexpected filter type: {filter_type}')
+    return out
+
+
+class TestNativeHeatmapRendering(unittest.TestCase):
+
+    def test_bundled_lut_matches_matplotlib(self):
+        """The precomputed viridis table should match matplotlib's own 256-entry table."""
+        try:
+            import matplotlib
+        except ImportError:
+            self.skipTest("matplotlib is not installed")
+        expected = np.round(matplotlib.colormaps['viridis'](np.linspace(0.0, 1.0, 256))[:, :3] * 255.0).astype(np.uint8)
+        np.testing.assert_array_equal(get_colormap_lut('viridis'), expected)
+        np.testing.assert_array_equal(get_colormap_lut('viridis_r'), expected[::-1])
+
+    def test_unknown_colormap_raises(self):
+        with self.assertRaises(ValueError):
+            get_colormap_lut('definitely_not_a_colormap')
+
+    def test_normalize_to_uint8(self):
+        indices, is_valid = normalize_to_uint8(np.array([0.0, 0.5, 1.0, np.nan]))
+        np.testing.assert_array_equal(indices[:3], [0, 128, 255])
+        np.testing.assert_array_equal(is_valid, [True, True, True, False])
+
+    def test_constant_data_does_not_divide_by_zero(self):
+        indices, is_valid = normalize_to_uint8(np.full((3, 3), 7.0))
+        self.assertTrue(np.all(indices == 0))
+        self.assertTrue(np.all(is_valid))
+
+    def test_rgba_origin_lower_and_nan_transparency(self):
+        data = np.array([[0.0, 1.0], [np.nan, 0.5]])
+        rgba = render_heatmap_rgba(data, cmap='gray', origin='lower')
+        self.assertEqual(rgba.shape, (2, 2, 4))
+        # origin='lower' puts row 0 at the bottom of the image
+        np.testing.assert_array_equal(rgba[1, 0, :3], [0, 0, 0])
+        np.testing.assert_array_equal(rgba[1, 1, :3], [255, 255, 255])
+        self.assertEqual(rgba[0, 0, 3], 0, "NaN entries should be transparent")
+
+    def test_masked_entries_are_transparent_and_ignored_for_scaling(self):
+        data = np.ma.masked_array([[1000.0, 0.0, 1.0], [0.5, 0.25, 0.75]], mask=[[1, 0, 0], [0, 0, 0]])
+        indices, is_valid = normalize_to_uint8(data)
+        self.assertFalse(is_valid[0, 0])
+        self.assertEqual(indices[0, 2], 255, "The masked outlier must not set vmax")
+        rgba = render_heatmap_rgba(data, origin='upper')
+        self.assertEqual(rgba[0, 0, 3], 0)
+        self.assertTrue(np.all(rgba[..., 3].ravel()[1:] == 255))
+
+    def test_1d_data_renders_as_single_row(self):
+        rgba = render_heatmap_rgba(np.arange(58))
+        self.assertEqual(rgba.shape, (1, 58, 4))
+
+    def test_sampled_finite_range(self):
+        self.assertEqual(sampled_finite_range(np.array([np.nan, -2.0, np.inf, 3.0])), (-2.0, 3.0))
+        self.assertIsNone(sampled_finite_range(np.full(4, np.nan)))
+        self.assertIsNone(sampled_finite_range(np.array([])))
+        self.assertEqual(sampled_finite_range(np.ma.masked_array([100.0, 1.0, 2.0], mask=[1, 0, 0])), (1.0, 2.0))
+        # large inputs are only sampled, but the estimate still lies within the true range
+        big = np.random.rand(2000, 1000)
+        vmin, vmax = sampled_finite_range(big, max_samples=10000)
+        self.assertTrue(big.min() <= vmin <= vmax <= big.max())
+
+    def test_quantize_to_levels(self):
+        codes, is_valid, value_range = quantize_to_levels(np.ma.masked_array([0.0, 0.5, 1.0, np.nan, 100.0], mask=[0, 0, 0, 0, 1]), dtype=np.uint16)
+        self.assertEqual(codes.dtype, np.uint16)
+        self.assertEqual(value_range, (0.0, 1.0))
+        np.testing.assert_array_equal(codes[:3], [0, 32768, 65535])
+        np.testing.assert_array_equal(is_valid, [True, True, True, False, False])
+        codes, _, _ = quantize_to_levels(np.array([-1.0, 2.0]), vmin=0.0, vmax=1.0, dtype=np.uint8)
+        np.testing.assert_array_equal(codes, [0, 255])
+        with self.assertRaises(ValueError):
+            quantize_to_levels(np.zeros(3), dtype=np.float32)
+
+    def test_png_structure(self):
+        data = np.random.rand(12, 34)
+        png_bytes = render_heatmap_png(data, indexed=False)
+        chunks = _read_png_chunks(png_bytes)
+        self.assertEqual([c[0] for c in chunks], [b'IHDR', b'IDAT', b'IEND'])
+        width, height, bit_depth, color_type = struct.unpack('>IIBB', chunks[0][1][:10])
+        self.assertEqual((width, height, bit_depth, color_type), (34, 12, 8, 6))
+        raw = zlib.decompress(chunks[1][1])
+        self.assertEqual(len(raw), height * (1 + width * 4))
+
+    def test_indexed_png_matches_rgba_colors(self):
+        data = np.random.rand(12, 34)
+        data[3, 4] = np.nan
+        chunks = dict(_read_png_chunks(render_heatmap_png(data, cmap='magma')))
+        width, height, bit_depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+        self.assertEqual((width, height, bit_depth, color_type), (34, 12, 8, 3))
+        palette = np.frombuffer(chunks[b'PLTE'], dtype=np.uint8).reshape(-1, 3)
+        alpha = np.full(len(palette), 255, dtype=np.uint8)
+        alpha[:len(chunks[b'tRNS'])] = np.frombuffer(chunks[b'tRNS'], dtype=np.uint8)
+        expected = render_heatmap_rgba(data, cmap='magma')
+        for png_filter in ('none', 'sub', 'up', 'auto'):
+            chunks = dict(_read_png_chunks(render_heatmap_png(data, cmap='magma', png_filter=png_filter)))
+            indices = _unfilter_indexed_scanlines(zlib.decompress(chunks[b'IDAT']), height, width)
+            np.testing.assert_array_equal(alpha[indices], expected[..., 3])
+            is_opaque = expected[..., 3] > 0
+            np.testing.assert_array_equal(palette[indices][is_opaque], expected[..., :3][is_opaque])
+
+    def test_indexed_png_frees_a_palette_entry_for_invalid_pixels(self):
+        data = np.linspace(0.0, 1.0, 512).reshape(16, 32) # uses every colormap index
+        data[0, 0] = np.nan
+        indices, palette, transparent_index = render_heatmap_indexed(data, origin='upper')
+        self.assertEqual(transparent_index, 255)
+        self.assertEqual(indices[0, 0], 255)
+        self.assertEqual(np.count_nonzero(indices == 255), 1)
+        self.assertIsNone(render_heatmap_indexed(np.random.rand(4, 4))[2], "no tRNS when every pixel is valid")
+
+    def test_sentinel_colors_for_nonfinite_values(self):
+        data = np.ma.masked_array(np.linspace(0.0, 1.0, 512).reshape(16, 32), mask=False) # uses every colormap index
+        data[0, :4] = [np.nan, np.inf, -np.inf, 0.5]
+        data[0, 3] = np.ma.masked
+        indices, palette, transparent_index = render_heatmap_indexed(data, origin='upper', sentinel_colors=DEFAULT_SENTINEL_COLORS)
+        np.testing.assert_array_equal(palette[indices[0, :3]], [DEFAULT_SENTINEL_COLORS['nan'], DEFAULT_SENTINEL_COLORS['posinf'], DEFAULT_SENTINEL_COLORS['neginf']])
+        self.assertEqual(indices[0, 3], transparent_index, "masked entries stay transparent")
+        self.assertEqual(len(set(indices[0, :4].tolist())), 4)
+        rgba = render_heatmap_rgba(data, origin='upper', sentinel_colors=DEFAULT_SENTINEL_COLORS)
+        np.testing.assert_array_equal(rgba[0, :4, 3], [255, 255, 255, 0])
+        np.testing.assert_array_equal(rgba[0, 0, :3], DEFAULT_SENTINEL_COLORS['nan'])
+        self.assertEqual(render_heatmap_indexed(data, origin='upper')[1][indices[0, 0]].tolist(), get_colormap_lut('viridis')[indices[0, 0]].tolist(), "without sentinel colors the palette is untouched")
+
+    def test_log_norm(self):
+        indices, is_valid = normalize_to_uint8(np.array([1.0, 10.0, 100.0, 0.0, -5.0, np.nan]), norm='log')
+        np.testing.assert_array_equal(indices[:5], [0, 128, 255, 0, 0])
+        np.testing.assert_array_equal(is_valid, [True, True, True, True, True, False])
+        np.testing.assert_array_equal(normalize_to_uint8(np.array([1, 10, 100], dtype=np.uint8), norm='log')[0], [0, 128, 255])
+        with self.assertRaises(ValueError):
+            normalize_to_uint8(np.ones(3), vmin=0.0, vmax=1.0, norm='log')
+
+    def test_indexed_png_is_smaller_and_compression_is_selectable(self):
+        data = np.add.outer(np.sin(np.linspace(0, 6, 256)), np.cos(np.linspace(0, 4, 256))) # smooth: the scanline filters pay off
+        indexed_png = render_heatmap_png(data)
+        self.assertLess(len(indexed_png), len(render_heatmap_png(data, indexed=False)) / 3)
+        self.assertLess(len(render_heatmap_png(np.random.rand(64, 64))), len(render_heatmap_png(np.random.rand(64, 64), indexed=False)))
+        self.assertLessEqual(len(indexed_png), len(render_heatmap_png(data, compression_level=1)))
+        with self.assertRaises(ValueError):
+            encode_indexed_png(np.zeros((2, 2)), np.zeros((300, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
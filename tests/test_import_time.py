@@ -0,0 +1,66 @@
+# File: test_import_time.py
+import subprocess
+import sys
+import unittest
+from typing import Dict, List, Tuple
+
+
+IMPORT_TIME_BUDGET_S: float = 0.25 # on top of IPython and numpy, which a kernel has already imported
+HEAVY_MODULES: Tuple[str, ...] = ('matplotlib', 'pandas', 'ipywidgets', 'nptyping', 'jinja2', 'pyphocorehelpers', 'ipykernel', 'dask')
+_MARKER: str = '--- preloaded ---'
+
+
+def _importtime(statement: str, preload: str='import IPython, IPython.display, numpy') -> List[Tuple[str, int, int]]:
+    """ The (module, self_us, cumulative_us) lines `python -X importtime` prints for `statement`, with `preload` already imported. """
+    code = f"{preload}\nimport sys; sys.stderr.write({_MARKER!r} + '\\n')\n{statement}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+    lines = result.stderr.split(_MARKER, 1)[1].splitlines()
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:') or ('self [us]' in line):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+class TestImportTime(unittest.TestCase):
+
+    def assert_light_import(self, statement: str):
+        entries = _importtime(statement)
+        imported: Dict[str, int] = {name.strip(): cumulative_us for name, _, cumulative_us in entries}
+        heavy = sorted(name for name in imported if name.split('.')[0] in HEAVY_MODULES)
+        self.assertEqual(heavy, [], f"`{statement}` imported heavy dependencies eagerly")
+        total_s: float = sum(cumulative_us for name, _, cumulative_us in entries if not name.startswith(' ')) / 1e6 # top-level entries only: their cumulative times include everything nested below them
+        self.assertLess(total_s, IMPORT_TIME_BUDGET_S, f"`{statement}` took {total_s:.3f} s")
+
+    def test_display_helpers_import_is_light(self):
+        self.assert_light_import('import pho_jupyter_preview_widget.display_helpers')
+
+    def test_ipython_helpers_import_is_light(self):
+        self.assert_light_import('import pho_jupyter_preview_widget.ipython_helpers')
+
+    def test_register_is_light(self):
+        self.assert_light_import('import pho_jupyter_preview_widget; from IPython.core.interactiveshell import InteractiveShell; pho_jupyter_preview_widget.register(InteractiveShell.instance(), dataframes=True)')
+
+
+class TestRegister(unittest.TestCase):
+
+    def test_register_installs_the_formatters(self):
+        import numpy as np
+        from IPython.core.interactiveshell import InteractiveShell
+        import pho_jupyter_preview_widget
+        ip = InteractiveShell.instance()
+        html_formatter = ip.display_formatter.formatters['text/html']
+        saved_printers = dict(html_formatter.type_printers)
+        try:
+            self.assertIs(pho_jupyter_preview_widget.register(ip, graphical_preview=False), ip)
+            self.assertIn('Data type', html_formatter(np.ones((3, 4))))
+            self.assertIn('ndarray_preview', ip.magics_manager.magics['cell'])
+        finally:
+            html_formatter.type_printers.clear()
+            html_formatter.type_printers.update(saved_printers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# File: test_ipython_helpers.py
+import unittest
+from unittest import mock
+
+import numpy as np
+
+
+class TestNDArrayPreviewCellMagic(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget import ipython_helpers
+        except ImportError as err:
+            self.skipTest(f"ipython_helpers dependencies are missing: {err}")
+        from IPython.core.interactiveshell import InteractiveShell
+        self.ipython_helpers = ipython_helpers
+        self.ip = InteractiveShell.instance()
+        self.ip.register_magics(ipython_helpers.PreviewWidgetMagics)
+        self.calls = []
+        self.ip.user_ns.update(np=np, record_call=lambda v: (self.calls.append(v), v)[1])
+        self.html_formatter = self.ip.display_formatter.formatters['text/html']
+
+    def run_magic(self, cell: str, line: str='height=20'):
+        with mock.patch.object(self.ipython_helpers, 'display') as display_mock:
+            self.ip.run_cell_magic('ndarray_preview', line, cell)
+        return [call.args[0] for call in display_mock.call_args_list]
+
+    def test_every_statement_runs_exactly_once(self):
+        outputs = self.run_magic("record_call(1)\nx = record_call(\n    2\n)\nif x:\n    y = np.ones(3)\ny\nNone\n# comment")
+        self.assertEqual(self.calls, [1, 2], "expression statements are not re-evaluated to capture their values")
+        self.assertEqual(outputs[0], 1)
+        np.testing.assert_array_equal(outputs[1], np.ones(3))
+        self.assertEqual(len(outputs), 2, "None values are not displayed")
+
+    def test_formatters_are_restored(self):
+        from pho_jupyter_preview_widget.output_budget import default_output_budget
+        previous_printers = dict(self.html_formatter.type_printers)
+        previous_limits = (default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes)
+        self.run_magic("record_call(np.ones(3))", line='height=20, max_output_bytes=1000')
+        self.assertEqual(dict(self.html_formatter.type_printers), previous_printers)
+        self.assertEqual((default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes), previous_limits)
+
+        self.calls.clear()
+        with self.assertRaises(ZeroDivisionError):
+            self.run_magic("record_call(1)\n1 / 0\nrecord_call(2)")
+        self.assertEqual(self.calls, [1], "the cell stops at the error")
+        self.assertEqual(dict(self.html_formatter.type_printers), previous_printers)
+
+    def test_syntax_errors_run_nothing(self):
+        with self.assertRaises(SyntaxError):
+            self.run_magic("record_call(1)\nx = (")
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
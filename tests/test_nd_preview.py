@@ -0,0 +1,94 @@
+# File: test_nd_preview.py
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.nd_preview import assemble_montage, nd_preview_image, sample_slice_indices
+
+
+class TestNDPreview(unittest.TestCase):
+
+    def test_sample_slice_indices(self):
+        np.testing.assert_array_equal(sample_slice_indices(5, 16), np.arange(5))
+        indices = sample_slice_indices(1000, 16)
+        self.assertLessEqual(len(indices), 16)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+
+    def test_montage_keeps_the_first_slice_top_left(self):
+        volume = np.stack([np.full((4, 6), float(i)) for i in range(4)])
+        image, description = nd_preview_image(volume, mode='montage', origin='upper')
+        self.assertEqual(image.shape, (2 * 4 + 1, 2 * 6 + 1))
+        self.assertTrue(np.all(np.isnan(image[4, :])), "Tiles are separated by a transparent gutter")
+        self.assertEqual((image[0, 0], image[0, -1], image[-1, 0], image[-1, -1]), (0.0, 1.0, 2.0, 3.0))
+        self.assertIn('montage of 4/4 slices along axis 0', description)
+        # origin='lower' flips the whole image when rendering, so the grid rows are stacked bottom-up
+        lower_image, _ = nd_preview_image(volume, mode='montage', origin='lower')
+        self.assertEqual(lower_image[-1, 0], 0.0)
+
+    def test_montage_samples_at_most_max_slices(self):
+        volume = np.random.rand(100, 8, 8)
+        image, description = nd_preview_image(volume, mode='montage', max_slices=9)
+        self.assertEqual(image.shape, (3 * 8 + 2, 3 * 8 + 2))
+        self.assertIn('9/100', description)
+
+    def test_projections(self):
+        volume = np.random.rand(5, 6, 7)
+        volume[2, 0, 0] = np.nan
+        for mode, expected in (('max', np.nanmax(volume, axis=1)), ('mean', np.nanmean(volume, axis=1)), ('sum', np.nansum(volume, axis=1))):
+            image, description = nd_preview_image(volume, mode=mode, axis=1)
+            np.testing.assert_allclose(image, expected)
+            self.assertEqual(description, f'{mode} projection along axis 1')
+
+    def test_large_projections_are_estimated_from_sampled_slices(self):
+        volume = np.ones((200, 10, 10))
+        image, description = nd_preview_image(volume, mode='sum', max_slices=10, max_projection_elements=1000)
+        np.testing.assert_allclose(image, 200.0)
+        self.assertIn('sampled 10/200', description)
+
+    def test_reduction_order_for_extra_axes(self):
+        volume = np.random.rand(3, 4, 5, 6) # axis 0 is drawn, (2, 3) are the image axes, axis 1 must be collapsed
+        image, description = nd_preview_image(volume, mode='max', axis=0, reduction_order=[(1, 'mean')])
+        np.testing.assert_allclose(image, volume.mean(axis=1).max(axis=0))
+        self.assertEqual(description, 'max projection along axis 0; axis 1: mean')
+        # unlisted extra axes default to their middle slice
+        image, description = nd_preview_image(volume, mode='max', axis=0)
+        np.testing.assert_allclose(image, volume[:, 2].max(axis=0))
+        with self.assertRaises(ValueError):
+            nd_preview_image(volume, reduction_order=[3]) # an image axis
+
+    def test_image_is_bounded_by_the_target_shape(self):
+        volume = np.zeros((4, 3000, 5000), dtype=np.float32)
+        image, _description = nd_preview_image(volume, mode='montage', target_shape=(256, 256))
+        self.assertLessEqual(image.shape[0], 256 + 1)
+        self.assertLessEqual(image.shape[1], 256 + 1)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            nd_preview_image(np.zeros((3, 3)))
+        with self.assertRaises(ValueError):
+            nd_preview_image(np.zeros((3, 3, 3)), mode='median')
+        with self.assertRaises(ValueError):
+            nd_preview_image(np.zeros((3, 3, 3)), axis=3)
+        for shape in ((0, 3, 4), (3, 0, 4), (2, 0, 3, 4)):
+            for mode in ('montage', 'max'):
+                with self.assertRaises(ValueError, msg=f'{shape} {mode}'):
+                    nd_preview_image(np.zeros(shape), mode=mode)
+
+    def test_empty_arrays_preview_as_a_message(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        for shape in ((0, 3, 4), (0, 3)):
+            html = array_preview_with_heatmap_repr_html(np.zeros(shape), use_render_cache=False, use_output_budget=False)
+            self.assertIn('no heatmap: the array is empty', html)
+            self.assertNotIn('<img', html)
+
+    def test_assemble_montage_partial_grid(self):
+        montage = assemble_montage([np.zeros((2, 2))] * 3, origin='upper')
+        self.assertEqual(montage.shape, (5, 5))
+        self.assertTrue(np.all(np.isnan(montage[3:, 3:])), "The unused cell of the grid stays transparent")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+# File: test_normalization.py
+import tracemalloc
+import unittest
+import warnings
+
+import numpy as np
+
+from pho_jupyter_preview_widget.normalization import CHUNK_ELEMENTS, bounded_view, color_scale_limits, sample_percentiles, display_values, finite_range, is_heatmap_dtype, normalize_to_uint8, structured_fields
+
+
+def _reference_indices(data, vmin, vmax) -> np.ndarray:
+    """ The float64 normalization every fast path has to agree with. """
+    scaled = (np.asarray(data, dtype=np.float64) - vmin) * (256.0 / (vmax - vmin))
+    return np.clip(scaled, 0.0, 255.0).astype(np.uint8)
+
+
+class TestNormalizeToUint8(unittest.TestCase):
+
+    def test_lookup_tables_match_the_float64_arithmetic(self):
+        rng = np.random.default_rng(0)
+        for dtype in (np.int8, np.uint8, np.int16, np.uint16, np.dtype('>i2')):
+            info = np.iinfo(dtype)
+            data = rng.integers(info.min, info.max, size=(200, 300), endpoint=True).astype(dtype)
+            indices, is_valid = normalize_to_uint8(data, vmin=-100.0, vmax=200.0)
+            np.testing.assert_array_equal(indices, _reference_indices(data, -100.0, 200.0), err_msg=str(dtype))
+            self.assertTrue(is_valid.all())
+            indices, _ = normalize_to_uint8(data) # automatic range
+            np.testing.assert_array_equal(indices, _reference_indices(data, float(data.min()), float(data.max())), err_msg=str(dtype))
+
+    def test_bool_and_wide_integers(self):
+        indices, is_valid = normalize_to_uint8(np.array([[True, False], [False, True]]))
+        np.testing.assert_array_equal(indices, [[255, 0], [0, 255]])
+        self.assertTrue(is_valid.all())
+        data = np.array([0, 2**62, 2**63], dtype=np.uint64)
+        indices, _ = normalize_to_uint8(data)
+        np.testing.assert_array_equal(indices, [0, 128, 255])
+
+    def test_float32_stays_float32_and_masks_nonfinite(self):
+        data = np.array([[0.0, 0.5], [np.inf, np.nan], [1.0, 0.25]], dtype=np.float32)
+        indices, is_valid = normalize_to_uint8(data)
+        np.testing.assert_array_equal(is_valid, [[True, True], [False, False], [True, True]])
+        np.testing.assert_array_equal(indices, [[0, 128], [0, 0], [255, 64]])
+
+    def test_masked_integers_honor_the_mask(self):
+        data = np.ma.masked_array(np.array([[100, 0], [1, 2]], dtype=np.int16), mask=[[1, 0], [0, 0]])
+        indices, is_valid = normalize_to_uint8(data)
+        np.testing.assert_array_equal(is_valid, [[False, True], [True, True]])
+        np.testing.assert_array_equal(indices, [[0, 0], [128, 255]])
+        self.assertEqual(finite_range(data), (0.0, 2.0))
+
+    def test_writes_into_the_given_buffer(self):
+        data = np.random.rand(40, 50)
+        out = np.empty((40, 50), dtype=np.uint8)
+        indices, _ = normalize_to_uint8(data[::-1], out=out) # a non-contiguous input
+        self.assertIs(indices, out)
+        np.testing.assert_array_equal(out, _reference_indices(data[::-1], data.min(), data.max()))
+        with self.assertRaises(ValueError):
+            normalize_to_uint8(data, out=np.empty((40, 50), dtype=np.int16))
+
+    def test_long_rows_are_chunked(self):
+        data = np.linspace(0.0, 1.0, 3 * CHUNK_ELEMENTS + 7)
+        indices, _ = normalize_to_uint8(data)
+        np.testing.assert_array_equal(indices, _reference_indices(data, 0.0, 1.0))
+
+    def test_peak_memory_is_bounded_by_the_output(self):
+        """ The temporaries of a float64 normalization stay around one chunk, far below the 8 bytes/element an `astype(float64)` copy would take. """
+        data = np.random.rand(1000, 1000)
+        for values in (data, data.astype(np.float32), (data * 30000).astype(np.int16)):
+            normalize_to_uint8(values) # warm up (lookup tables, ...)
+            tracemalloc.start()
+            normalize_to_uint8(values)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            output_bytes: int = values.size * 2 # the uint8 indices + the bool validity
+            self.assertLess(peak_bytes, output_bytes + (16 * CHUNK_ELEMENTS) + (1 << 20), str(values.dtype))
+
+    def test_unsupported_dtypes_raise(self):
+        with self.assertRaises(ValueError):
+            normalize_to_uint8(np.ones(3, dtype=complex))
+
+
+class TestDisplayValues(unittest.TestCase):
+
+    def test_numeric_arrays_pass_through(self):
+        data = np.arange(6, dtype=np.int16).reshape(2, 3)
+        values, description = display_values(data)
+        self.assertIs(values, data)
+        self.assertIsNone(description)
+
+    def test_complex_modes(self):
+        data = np.array([3 + 4j, -1j])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error') # no ComplexWarning: the imaginary part is never silently discarded
+            np.testing.assert_allclose(display_values(data)[0], [5.0, 1.0])
+            np.testing.assert_allclose(display_values(data, complex_mode='phase')[0], np.angle(data))
+            real, description = display_values(data, complex_mode='real')
+            self.assertTrue(np.shares_memory(real, data), "the real part is a view")
+            np.testing.assert_allclose(display_values(data, complex_mode='imag')[0], [4.0, -1.0])
+        with self.assertRaises(ValueError):
+            display_values(data, complex_mode='argument')
+
+    def test_copying_conversions_are_bounded(self):
+        data = np.ones((1000, 1000), dtype=np.complex64)
+        values, _ = display_values(data, max_elements=10000)
+        self.assertLessEqual(values.size, 10000)
+        stack = np.ones((5, 400, 400), dtype=complex)
+        values, _ = display_values(stack, max_elements=5 * 100 * 100, keep_axis=0)
+        self.assertEqual(values.shape, (5, 100, 100), "every slice along the kept axis survives")
+        self.assertEqual(bounded_view(stack, None).shape, stack.shape)
+
+    def test_datetimes_are_int64_views_with_nat_masked(self):
+        data = np.array(['2024-01-01', '2024-01-03'], dtype='datetime64[D]')
+        values, description = display_values(data)
+        self.assertEqual(values.dtype, np.int64)
+        self.assertTrue(np.shares_memory(values, data))
+        self.assertIn('since 1970-01-01', description)
+        values, _ = display_values(np.array([1, 'NaT', 3], dtype='timedelta64[ms]'))
+        np.testing.assert_array_equal(np.ma.getmaskarray(values), [False, True, False])
+        self.assertEqual(finite_range(values), (1.0, 3.0))
+
+    def test_masked_complex_keeps_its_mask(self):
+        data = np.ma.masked_array([1 + 1j, 3 + 4j], mask=[True, False])
+        values, _ = display_values(data)
+        np.testing.assert_array_equal(np.ma.getmaskarray(values), [True, False])
+        self.assertEqual(float(values[1]), 5.0)
+
+    def test_structured_fields(self):
+        dtype = np.dtype([('label', 'U4'), ('x', 'f4'), ('t', 'datetime64[s]'), ('xy', 'f8', (2,))])
+        self.assertEqual(structured_fields(dtype), ['x', 't'])
+        data = np.zeros(3, dtype=dtype)
+        data['x'] = [1, 2, 3]
+        values, description = display_values(data)
+        np.testing.assert_array_equal(values, [1, 2, 3])
+        self.assertIn('"x"', description)
+        self.assertIn('"t"', display_values(data, field='t')[1])
+        with self.assertRaises(ValueError):
+            display_values(data, field='label')
+
+    def test_non_numeric_dtypes_raise(self):
+        for data in (np.array(['a', 'b']), np.array([None, 1], dtype=object), np.zeros(2, dtype=[('s', 'U2')])):
+            self.assertFalse(is_heatmap_dtype(data.dtype))
+            with self.assertRaises(ValueError):
+                display_values(data)
+
+
+class TestColorScaleLimits(unittest.TestCase):
+
+    def test_partition_percentiles_match_numpy(self):
+        values = np.random.default_rng(0).random(1001)
+        percentiles = (0.0, 1.0, 37.5, 99.0, 100.0)
+        np.testing.assert_allclose(sample_percentiles(values.copy(), percentiles), np.percentile(values, percentiles))
+
+    def test_outliers_and_infs_do_not_set_the_limits(self):
+        data = np.random.default_rng(0).random((200, 200))
+        data[0, 0], data[1, 1], data[2, 2] = 1e9, np.inf, np.nan
+        vmin, vmax = color_scale_limits(data, 'percentile', percentiles=(1.0, 99.0))
+        self.assertTrue(0.0 < vmin < 0.05 and 0.95 < vmax < 1.0)
+        self.assertEqual(color_scale_limits(data, 'minmax'), (float(np.nanmin(data)), 1e9))
+
+    def test_symmetric_and_log(self):
+        data = np.linspace(-2.0, 1.0, 1001)
+        vmin, vmax = color_scale_limits(data, 'symmetric', percentiles=(0.0, 100.0))
+        self.assertEqual((vmin, vmax), (-2.0, 2.0))
+        self.assertEqual(color_scale_limits(np.zeros(4), 'symmetric'), (-1.0, 1.0))
+        self.assertEqual(color_scale_limits(np.array([-1.0, 0.0, 1e-3, 10.0]), 'log', percentiles=(0.0, 100.0)), (1e-3, 10.0))
+        self.assertIsNone(color_scale_limits(np.array([-1.0, 0.0]), 'log'))
+        self.assertIsNone(color_scale_limits(np.full(3, np.nan), 'percentile'))
+        with self.assertRaises(ValueError):
+            color_scale_limits(data, 'zscale')
+
+    def test_only_a_bounded_sample_is_read(self):
+        data = np.random.rand(2000, 2000)
+        tracemalloc.start()
+        color_scale_limits(data, 'percentile', max_samples=10000)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak_bytes, 64 * 10000, "proportional to the sample, not to the 32 MB array")
+
+
+class TestHeatmapPreviewDtypes(unittest.TestCase):
+
+    def test_every_dtype_previews_without_errors(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import array_preview_with_heatmap_repr_html
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        rng = np.random.default_rng(0)
+        cases = {
+            'int16': rng.integers(-300, 300, (300, 400)).astype(np.int16),
+            'complex': rng.random((600, 700)) + 1j * rng.random((600, 700)),
+            'datetime': np.datetime64('2024-01-01') + np.arange(600 * 700).reshape(600, 700).astype('timedelta64[s]'),
+            'masked': np.ma.masked_greater(rng.random((600, 700)), 0.9),
+            'structured': np.zeros((60, 70), dtype=[('x', 'f4'), ('y', 'i2')]),
+            'str': np.array([['a', 'b'], ['c', 'd']]),
+        }
+        for name, data in cases.items():
+            with self.subTest(name):
+                html = array_preview_with_heatmap_repr_html(data, use_render_cache=False, use_output_budget=False)
+                self.assertNotIn('WARN', html)
+                if name == 'str':
+                    self.assertIn('no heatmap', html)
+                elif name == 'structured':
+                    self.assertEqual(html.count('<img'), 2, "one heatmap per field")
+                else:
+                    self.assertIn('<img', html)
+                    self.assertIn('Color scale', html, "the shape card lists the color limits")
+
+
+if __name__ == '__main__':
+    unittest.main()
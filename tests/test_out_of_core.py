@@ -0,0 +1,113 @@
+# File: test_out_of_core.py
+import ctypes
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.array_downsampling import downsample_2d, is_out_of_core, thumbnail_max_block_size
+from pho_jupyter_preview_widget.heatmap_rendering import sampled_finite_range
+from pho_jupyter_preview_widget.nd_preview import nd_preview_image
+from pho_jupyter_preview_widget.render_cache import array_fingerprint
+
+
+class _PageReadAccounting:
+    """ Counts the bytes of a file-backed `np.memmap` that have actually been read, at page granularity.
+
+    The file is dropped from the page cache and mapped with MADV_RANDOM (no readahead), so afterwards `mincore` reports exactly the pages that were faulted in.
+    """
+    def __init__(self, path: str, dtype, shape):
+        self.path = path
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+        self.arr = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        self.arr._mmap.madvise(mmap.MADV_RANDOM)
+        self._libc = ctypes.CDLL(None, use_errno=True)
+
+    @property
+    def bytes_read(self) -> int:
+        n_pages: int = (self.arr.nbytes + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+        vec = (ctypes.c_ubyte * n_pages)()
+        if self._libc.mincore(ctypes.c_void_p(self.arr.ctypes.data), ctypes.c_size_t(self.arr.nbytes), vec) != 0:
+            raise OSError(ctypes.get_errno(), 'mincore failed')
+        return sum(v & 1 for v in vec) * mmap.PAGESIZE
+
+
+@unittest.skipUnless(sys.platform.startswith('linux') and hasattr(os, 'posix_fadvise') and hasattr(mmap, 'MADV_RANDOM'), "page read accounting needs Linux (posix_fadvise + mincore)")
+class TestOutOfCorePreviews(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _make_recording(self, shape, dtype=np.float32) -> _PageReadAccounting:
+        path = os.path.join(self._tmp_dir.name, 'recording.dat')
+        writer = np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        writer[:] = np.random.rand(*shape[:1], *([1] * (len(shape) - 1))) # cheap to write, still not constant
+        writer.flush()
+        del writer
+        accounting = _PageReadAccounting(path, dtype=dtype, shape=shape)
+        if accounting.bytes_read != 0:
+            self.skipTest("can't drop the file from the page cache here (e.g. tmpfs)")
+        return accounting
+
+    def test_thumbnail_only_reads_what_it_shows(self):
+        accounting = self._make_recording((4096, 4096)) # 64 MB, 16 KB rows
+        recording = accounting.arr
+        self.assertTrue(is_out_of_core(recording))
+        self.assertTrue(is_out_of_core(recording[10:, ::2]))
+
+        self.assertIsNotNone(array_fingerprint(recording))
+        thumb = downsample_2d(recording, target_shape=(64, 64), reducer='mean', max_block_size=thumbnail_max_block_size(recording))
+        self.assertEqual(thumb.shape, (64, 64))
+        vmin, vmax = sampled_finite_range(recording)
+        self.assertLessEqual(vmin, vmax)
+        np.array2string(recording) # the summarized plaintext repr only reads the edge items
+
+        self.assertLess(accounting.bytes_read, 0.05 * recording.nbytes, f"read {accounting.bytes_read} of {recording.nbytes} bytes")
+
+    def test_nd_montage_and_projection_read_a_bounded_sample(self):
+        accounting = self._make_recording((64, 512, 512)) # 64 MB
+        recording = accounting.arr
+        nd_preview_image(recording, mode='montage', target_shape=(64, 64))
+        nd_preview_image(recording, mode='max', target_shape=(64, 64)) # 16 sampled slices, each strided to 64 rows
+        self.assertLess(accounting.bytes_read, 0.10 * recording.nbytes, f"read {accounting.bytes_read} of {recording.nbytes} bytes")
+
+    def test_formatter_does_not_page_in_the_recording(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import single_NDArray_array_preview_with_heatmap_repr_html
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        accounting = self._make_recording((4096, 4096))
+        html = single_NDArray_array_preview_with_heatmap_repr_html(accounting.arr, include_plaintext_repr=True, max_thumbnail_pixels=64)
+        self.assertIn('<img', html)
+        self.assertLess(accounting.bytes_read, 0.05 * accounting.arr.nbytes, f"read {accounting.bytes_read} of {accounting.arr.nbytes} bytes")
+
+
+class TestIsOutOfCore(unittest.TestCase):
+
+    def test_in_memory_arrays(self):
+        arr = np.zeros((10, 10))
+        self.assertFalse(is_out_of_core(arr))
+        self.assertFalse(is_out_of_core(arr[::2]))
+        self.assertEqual(thumbnail_max_block_size(arr), 8)
+
+    def test_arrays_over_an_mmap_buffer(self):
+        buffer = mmap.mmap(-1, 8 * 100)
+        arr = np.frombuffer(buffer, dtype=np.float64).reshape(10, 10)
+        self.assertTrue(is_out_of_core(arr))
+        self.assertEqual(thumbnail_max_block_size(arr), 1)
+        del arr
+
+
+if __name__ == "__main__":
+    unittest.main()
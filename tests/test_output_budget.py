@@ -0,0 +1,123 @@
+# File: test_output_budget.py
+import re
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pho_jupyter_preview_widget import output_budget
+from pho_jupyter_preview_widget.output_budget import OutputByteBudget
+
+
+class TestOutputByteBudget(unittest.TestCase):
+
+    def test_available_is_the_tighter_of_the_output_and_remaining_cell_budgets(self):
+        budget = OutputByteBudget(max_output_bytes=100, max_cell_bytes=250)
+        self.assertEqual(budget.available(cell_key=1), 100)
+        budget.charge(100, cell_key=1)
+        budget.charge(100, cell_key=1)
+        self.assertEqual(budget.available(cell_key=1), 50)
+        budget.charge(80, cell_key=1)
+        self.assertLessEqual(budget.available(cell_key=1), 0)
+        self.assertEqual(budget.stats()['n_outputs'], 3)
+
+    def test_a_new_cell_starts_a_fresh_tally(self):
+        budget = OutputByteBudget(max_output_bytes=100, max_cell_bytes=250)
+        budget.charge(250, cell_key=1)
+        self.assertEqual(budget.available(cell_key=2), 100)
+        self.assertEqual(budget.stats()['cell_bytes'], 0)
+
+    def test_a_late_charge_for_an_earlier_cell_keeps_the_current_tally(self):
+        budget = OutputByteBudget(max_output_bytes=None, max_cell_bytes=250)
+        budget.charge(100, cell_key=1)
+        budget.charge(50, cell_key=2)
+        budget.charge(200, cell_key=1) # e.g. a background render displayed from cell 1 finishing while cell 2 runs
+        self.assertEqual(budget.available(cell_key=2), 200)
+        self.assertEqual(budget.available(cell_key=1), -50)
+        self.assertEqual((budget.stats()['cell_key'], budget.stats()['cell_bytes']), (2, 50))
+
+    def test_unlimited_and_outside_of_a_cell(self):
+        self.assertIsNone(OutputByteBudget(max_output_bytes=None, max_cell_bytes=None).available(cell_key=1))
+        budget = OutputByteBudget(max_output_bytes=100, max_cell_bytes=150)
+        with mock.patch.object(output_budget, 'current_cell_key', return_value=None): # no IPython shell: nothing to charge it to
+            budget.charge(1000)
+            self.assertEqual(budget.available(), 100)
+
+
+class TestBudgetedHeatmapPreviews(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget import display_helpers
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        self.display_helpers = display_helpers
+        self.noise = np.random.default_rng(0).random((256, 256)) # ~66 KB as a full-resolution palette PNG
+
+    def test_previews_are_degraded_until_they_fit(self):
+        html = self.display_helpers.single_NDArray_array_preview_with_heatmap_repr_html(self.noise, include_shape=False, max_image_bytes=20 * 1024)
+        b64_image = re.search(r'base64,([^"]+)"', html).group(1)
+        self.assertLessEqual(len(b64_image), 20 * 1024)
+        self.assertIn('to fit the 20 KB output byte budget', html)
+        self.assertIn('height="256"', html, "the degraded thumbnail is displayed at the full-resolution size")
+
+        full_html = self.display_helpers.single_NDArray_array_preview_with_heatmap_repr_html(self.noise, include_shape=False, max_image_bytes=None)
+        self.assertNotIn('output byte budget', full_html)
+        self.assertGreater(len(full_html), 3 * len(html))
+
+    def test_a_spent_budget_omits_the_thumbnail(self):
+        html = self.display_helpers.single_NDArray_array_preview_with_heatmap_repr_html(self.noise, max_image_bytes=0)
+        self.assertNotIn('<img', html)
+        self.assertIn('preview omitted', html)
+
+    def test_the_shape_card_and_plaintext_count_toward_the_output_budget(self):
+        for include_plaintext_repr in (False, True):
+            html = self.display_helpers.single_NDArray_array_preview_with_heatmap_repr_html(self.noise, include_plaintext_repr=include_plaintext_repr, max_output_bytes=24 * 1024)
+            self.assertIn('<img', html)
+            self.assertIn('Color scale', html)
+            self.assertLessEqual(len(html), 24 * 1024)
+
+    def test_formatter_uses_and_charges_the_default_budget(self):
+        from pho_jupyter_preview_widget.output_budget import default_output_budget
+        saved_limits = (default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes)
+        try:
+            default_output_budget.max_output_bytes = 16 * 1024
+            html = self.display_helpers.array_preview_with_heatmap_repr_html(self.noise, use_render_cache=False)
+            self.assertLessEqual(len(re.search(r'base64,([^"]+)"', html).group(1)), 16 * 1024)
+            html = self.display_helpers.array_preview_with_heatmap_repr_html(self.noise, use_render_cache=False, use_output_budget=False)
+            self.assertNotIn('output byte budget', html)
+        finally:
+            default_output_budget.max_output_bytes, default_output_budget.max_cell_bytes = saved_limits
+
+
+class TestListPreviewBudgets(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget import display_helpers
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        self.display_helpers = display_helpers
+
+    def test_plaintext_fallbacks_count_toward_the_byte_budget(self):
+        arrs = [np.random.rand(50, 50) for _ in range(40)]
+        html = self.display_helpers.array_list_preview_with_heatmap_repr_html(arrs, use_render_cache=False, list_max_total_bytes=2000, max_image_bytes=None)
+        self.assertLess(len(html), 2000 + 20 * len(arrs), "only the <ul>/<li> wrappers are outside the budget")
+        self.assertIn('more arrays', html)
+
+    def test_running_renders_are_not_waited_on_past_the_deadline(self):
+        def _slow_render(arr, **kwargs):
+            time.sleep(2.0)
+            return '<img>'
+        arrs = [np.random.rand(4, 4) for _ in range(4)]
+        with mock.patch.object(self.display_helpers, '_cached_single_array_preview_html', side_effect=_slow_render):
+            start = time.perf_counter()
+            html = self.display_helpers.array_list_preview_with_heatmap_repr_html(arrs, use_render_cache=False, list_time_budget_s=0.2)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(html.count('<pre>'), len(arrs), "every element fell back to its plaintext repr")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# File: test_plaintext_formatting.py
+import time
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.plaintext_formatting import format_array_text, select_edge_items
+
+
+class TestPlaintextFormatting(unittest.TestCase):
+
+    def test_matches_array2string_layout(self):
+        for arr in (np.arange(24).reshape(2, 3, 4), np.arange(3000.0).reshape(30, 100) / 7, np.arange(6.0).reshape(2, 3)):
+            self.assertEqual(format_array_text(arr, separator=','), np.array2string(arr, separator=','))
+
+    def test_1d_spacing_is_consistent(self):
+        text = format_array_text(np.array([1, -20, 300, 5]))
+        self.assertEqual(text, '[1, -20, 300, 5]')
+        self.assertEqual(format_array_text(np.arange(5.0)), '[0., 1., 2., 3., 4.]')
+        self.assertEqual(format_array_text(np.array([1.5, np.nan, -np.inf])), '[1.5, nan, -inf]')
+
+    def test_edge_items_are_elided_in_every_dimension(self):
+        shown, gaps = select_edge_items(np.zeros((100, 5, 2000)), edgeitems=3, threshold=1000)
+        self.assertEqual(shown.shape, (6, 5, 6))
+        self.assertEqual(gaps, [3, None, 3])
+        self.assertEqual(format_array_text(np.arange(20000)), '[0, 1, 2, ..., 19997, 19998, 19999]')
+
+    def test_character_budget(self):
+        text = format_array_text(np.random.rand(*(10,) * 8), max_chars=300)
+        self.assertLessEqual(len(text), 300)
+        self.assertLessEqual(len(format_array_text(np.array(['x' * 10_000] * 3), max_chars=200)), 200)
+
+    def test_cost_does_not_depend_on_size(self):
+        big = np.random.rand(10_000_000)
+        start = time.perf_counter()
+        text = format_array_text(big)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertIn('...', text)
+
+    def test_other_dtypes(self):
+        self.assertEqual(format_array_text(np.array([True, False])), '[True, False]')
+        self.assertEqual(format_array_text(np.array([1 + 2j, 3 - 1j])), '[1.+2.j, 3.-1.j]')
+        self.assertEqual(format_array_text(np.ma.masked_less(np.arange(4), 2)), '[--, --, 2, 3]')
+        self.assertEqual(format_array_text(np.array(['a', 'bb'])), "['a', 'bb']")
+        self.assertEqual(format_array_text(np.float64(3.5)), '3.5')
+
+    def test_datetimes_match_numpy(self):
+        for arr in (np.array(['2020-01-01', 'NaT'], dtype='datetime64[D]'), np.array(['2020-01-01T10:00'], dtype='datetime64[s]'),
+                    np.array([1, 'NaT', 30], dtype='timedelta64[s]'), np.arange(6).astype('datetime64[h]').reshape(2, 3)):
+            self.assertEqual(format_array_text(arr, separator=',', align_columns=True), np.array2string(arr, separator=','), str(arr.dtype))
+        self.assertEqual(format_array_text(np.array(['2020-01-01'], dtype='datetime64[D]')), "['2020-01-01']")
+
+    def test_empty_arrays_keep_their_shape(self):
+        self.assertEqual(format_array_text(np.zeros(0)), '[]')
+        self.assertEqual(format_array_text(np.zeros((0, 3))), '[], shape=(0, 3)')
+        self.assertEqual(format_array_text(np.zeros((3, 0))), '[[],\n [],\n []], shape=(3, 0)')
+        self.assertEqual(format_array_text(np.zeros((2, 0, 3))), '[[],\n []], shape=(2, 0, 3)')
+
+
+class TestSmartArray2String(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import smart_array2string
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        self.smart_array2string = smart_array2string
+
+    def test_small_arrays_are_unchanged(self):
+        arr = np.arange(12.0).reshape(3, 4)
+        self.assertEqual(self.smart_array2string(arr), np.array2string(arr, separator=','))
+        self.assertEqual(self.smart_array2string(np.array([1, 20, 300]), disable_readible_format=True), '[1, 20, 300]')
+
+    def test_large_arrays_are_budgeted(self):
+        text = self.smart_array2string(np.random.rand(2000, 2000), max_chars=500)
+        self.assertLessEqual(len(text), 500)
+        with np.printoptions(threshold=np.inf):
+            self.assertLessEqual(len(self.smart_array2string(np.arange(1_000_000), max_chars=1000)), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# File: test_profiling.py
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pho_jupyter_preview_widget import profiling
+from pho_jupyter_preview_widget.profiling import PreviewProfiler
+
+
+class TestPreviewProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = PreviewProfiler(enabled=True)
+
+    def rows(self):
+        return {row['stage']: row for row in self.profiler.table()}
+
+    def test_nested_stages_split_self_time(self):
+        with self.profiler.stage('outer', bytes_in=100) as outer:
+            with self.profiler.stage('inner'):
+                time.sleep(0.02)
+            outer.add(bytes_out=10, fallbacks=1)
+        rows = self.rows()
+        self.assertGreaterEqual(rows['outer']['total_s'], 0.02)
+        self.assertLess(rows['outer']['self_s'], rows['inner']['total_s'])
+        self.assertEqual((rows['outer']['bytes_in'], rows['outer']['bytes_out'], rows['outer']['fallbacks'], rows['inner']['fallbacks']), (100, 10, 1, 0))
+        self.assertEqual(self.profiler.table()[0]['stage'], 'inner', "slowest self time first")
+
+    def test_counters_errors_and_threads(self):
+        self.profiler.count('render_cache', hits=2)
+        with self.assertRaises(RuntimeError):
+            with self.profiler.stage('failing'):
+                raise RuntimeError()
+
+        def _work():
+            for _ in range(100):
+                with self.profiler.stage('threaded'):
+                    pass
+        threads = [threading.Thread(target=_work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rows = self.rows()
+        self.assertEqual((rows['render_cache']['calls'], rows['render_cache']['hits']), (0, 2))
+        self.assertEqual(rows['failing']['errors'], 1)
+        self.assertEqual(rows['threaded']['calls'], 400)
+
+    def test_disabled_records_nothing(self):
+        self.profiler.disable()
+        with self.profiler.stage('ignored') as stage:
+            stage.add(bytes_out=5, hits=1)
+        self.profiler.count('ignored', hits=1)
+        self.assertEqual(self.profiler.table(), [])
+        self.assertIn('disabled', self.profiler.format_table())
+
+    def test_reset_and_exports(self):
+        with self.profiler.stage('png_encode') as stage:
+            stage.add(bytes_out=2048)
+        self.assertIn('png_encode', self.profiler.format_table())
+        try:
+            df = self.profiler.to_dataframe()
+        except ImportError:
+            self.skipTest('pandas is not installed')
+        self.assertEqual(df.loc['png_encode', 'bytes_out'], 2048)
+        self.profiler.reset()
+        self.assertEqual(len(self.profiler.to_dataframe()), 0)
+
+
+class TestPipelineInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = PreviewProfiler(enabled=True)
+        patcher = mock.patch.object(profiling, 'default_profiler', self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        try:
+            from pho_jupyter_preview_widget import display_helpers
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        patcher = mock.patch.object(display_helpers, 'default_profiler', self.profiler) # bound at import, unlike the modules that import it per call
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.display_helpers = display_helpers
+
+    def test_render_pipeline_stages(self):
+        from pho_jupyter_preview_widget.render_cache import default_render_cache
+        default_render_cache.clear()
+        arr = np.random.default_rng(0).random((600, 400))
+        for _ in range(2):
+            self.display_helpers.array_preview_with_heatmap_repr_html(arr, include_plaintext_repr=True, use_output_budget=False)
+        rows = {row['stage']: row for row in self.profiler.table()}
+        for stage in ('preview', 'reduction', 'colormap', 'png_encode', 'base64', 'stats', 'shape_card', 'plaintext'):
+            self.assertEqual(rows[stage]['calls'], 1, stage)
+        self.assertEqual((rows['render_cache']['hits'], rows['render_cache']['misses']), (1, 1))
+        self.assertEqual(rows['reduction']['bytes_in'], arr.nbytes)
+        self.assertEqual(rows['base64']['bytes_in'], rows['png_encode']['bytes_out'])
+
+
+class TestPreviewStatsMagic(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            from pho_jupyter_preview_widget.ipython_helpers import PreviewWidgetMagics
+        except ImportError as err:
+            self.skipTest(f"ipython_helpers dependencies are missing: {err}")
+        from IPython.core.interactiveshell import InteractiveShell
+        self.ip = InteractiveShell.instance()
+        self.ip.register_magics(PreviewWidgetMagics)
+        self.profiler = PreviewProfiler()
+        patcher = mock.patch.object(profiling, 'default_profiler', self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_on_show_df_reset_off(self):
+        self.ip.run_line_magic('preview_stats', 'on')
+        self.assertTrue(self.profiler.enabled)
+        with self.profiler.stage('shape_card'):
+            pass
+        with mock.patch('builtins.print') as print_mock:
+            self.ip.run_line_magic('preview_stats', '')
+        self.assertIn('shape_card', print_mock.call_args.args[0])
+        try:
+            df = self.ip.run_line_magic('preview_stats', 'df')
+            self.assertEqual(list(df.index), ['shape_card'])
+        except ImportError:
+            pass # pandas is optional for everything else
+        self.ip.run_line_magic('preview_stats', 'reset')
+        self.assertEqual(self.profiler.table(), [])
+        self.ip.run_line_magic('preview_stats', 'off')
+        self.assertFalse(self.profiler.enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
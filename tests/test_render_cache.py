@@ -0,0 +1,149 @@
+# File: test_render_cache.py
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.render_cache import DiskRenderCache, PreviewRenderCache, array_fingerprint
+
+
+class TestArrayFingerprint(unittest.TestCase):
+
+    def test_equal_contents_share_a_fingerprint(self):
+        a = np.arange(100, dtype=float).reshape(10, 10)
+        self.assertEqual(array_fingerprint(a), array_fingerprint(a.copy()))
+
+    def test_contents_shape_and_dtype_change_the_fingerprint(self):
+        a = np.arange(100, dtype=float).reshape(10, 10)
+        b = a.copy()
+        b[5, 5] = -1.0
+        self.assertNotEqual(array_fingerprint(a), array_fingerprint(b))
+        self.assertNotEqual(array_fingerprint(a), array_fingerprint(a.reshape(20, 5)))
+        self.assertNotEqual(array_fingerprint(a), array_fingerprint(a.astype(np.float32)))
+        self.assertNotEqual(array_fingerprint(a), array_fingerprint(a.T), "Strides are part of the fingerprint")
+
+    def test_large_and_non_contiguous_buffers_are_sampled(self):
+        big = np.zeros((2048, 1024))
+        big_edited = big.copy()
+        big_edited[0, 0] = 1.0 # the first block is always sampled
+        self.assertNotEqual(array_fingerprint(big), array_fingerprint(big_edited))
+        self.assertIsNotNone(array_fingerprint(big[::2, ::3]))
+
+    def test_object_arrays_are_not_fingerprinted(self):
+        self.assertIsNone(array_fingerprint(np.array([object(), object()])))
+
+    def test_scalar_and_empty_arrays(self):
+        self.assertIsNotNone(array_fingerprint(np.array(3.0)))
+        self.assertIsNotNone(array_fingerprint(np.array([])))
+
+
+class TestPreviewRenderCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = PreviewRenderCache()
+        arr = np.random.rand(5, 5)
+        key = cache.make_key(arr, dict(height=50, width=None))
+        self.assertIsNone(cache.get(key))
+        cache.put(key, '<div>preview</div>')
+        self.assertEqual(cache.get(cache.make_key(arr.copy(), dict(width=None, height=50))), '<div>preview</div>')
+        self.assertIsNone(cache.get(cache.make_key(arr, dict(height=100, width=None))), "The config is part of the key")
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_unhashable_config_values(self):
+        cache = PreviewRenderCache()
+        arr = np.arange(4.0)
+        key = cache.make_key(arr, dict(brokenaxes_kwargs={'a': 1, 'b': [1, 2]}, height=50))
+        hash(key)
+        cache.put(key, '<div/>')
+        self.assertEqual(cache.get(cache.make_key(arr, dict(height=50, brokenaxes_kwargs={'b': [1, 2], 'a': 1}))), '<div/>')
+        self.assertIsNone(cache.get(cache.make_key(arr, dict(height=50, brokenaxes_kwargs={'a': 2, 'b': [1, 2]}))))
+
+    def test_lru_eviction_under_byte_budget(self):
+        cache = PreviewRenderCache(max_bytes=30)
+        cache.put('a', 'x' * 10)
+        cache.put('b', 'x' * 10)
+        cache.put('c', 'x' * 10)
+        cache.get('a') # 'b' is now the least recently used
+        cache.put('d', 'x' * 10)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertLessEqual(cache.n_bytes, 30)
+
+        cache.max_bytes = 10
+        self.assertEqual(len(cache), 1)
+        cache.put('too_big', 'x' * 11)
+        self.assertNotIn('too_big', cache)
+
+
+class TestDiskRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp_dir.name, 'cache', 'render_cache.sqlite3')
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_lazy_open(self):
+        disk_cache = DiskRenderCache(path=self.path)
+        self.assertFalse(os.path.exists(self.path), "Nothing should be created until the cache is first used")
+        self.assertIsNone(disk_cache.get('missing'))
+        self.assertTrue(os.path.exists(self.path))
+        disk_cache.close()
+
+    def test_survives_restarts_and_is_shared(self):
+        key = PreviewRenderCache.make_key(np.arange(10.0), dict(height=50))
+        first_kernel = DiskRenderCache(path=self.path)
+        second_kernel = DiskRenderCache(path=self.path)
+        first_kernel.put(key, '<div>preview</div>')
+        self.assertEqual(second_kernel.get(key), '<div>preview</div>')
+        first_kernel.close()
+        second_kernel.close()
+
+        restarted = DiskRenderCache(path=self.path)
+        self.assertEqual(restarted.get(PreviewRenderCache.make_key(np.arange(10.0), dict(height=50))), '<div>preview</div>')
+        restarted.close()
+
+    def test_size_capped_eviction(self):
+        disk_cache = DiskRenderCache(path=self.path, max_bytes=25, touch_interval=0.0)
+        disk_cache.put('a', 'x' * 10)
+        disk_cache.put('b', 'x' * 10)
+        disk_cache.get('a')
+        disk_cache.put('c', 'x' * 10)
+        self.assertIsNotNone(disk_cache.get('a'))
+        self.assertIsNone(disk_cache.get('b'))
+        self.assertLessEqual(disk_cache.stats()['n_bytes'], 25)
+        disk_cache.close()
+
+    def test_reads_do_not_wait_on_another_kernels_write_lock(self):
+        disk_cache = DiskRenderCache(path=self.path, touch_interval=0.0)
+        disk_cache.put('k', 'value')
+        other_kernel = sqlite3.connect(self.path, isolation_level=None)
+        other_kernel.execute('BEGIN IMMEDIATE') # holds the write lock
+        try:
+            start = time.perf_counter()
+            self.assertEqual(disk_cache.get('k'), 'value')
+            disk_cache.flush_touches() # busy: must give up immediately rather than block
+            self.assertLess(time.perf_counter() - start, 1.0)
+        finally:
+            other_kernel.execute('ROLLBACK')
+            other_kernel.close()
+        disk_cache.close()
+
+    def test_memory_tier_falls_through_to_disk(self):
+        disk_cache = DiskRenderCache(path=self.path)
+        disk_cache.put('k', 'value')
+        cache = PreviewRenderCache(disk_cache=disk_cache)
+        self.assertEqual(cache.get('k'), 'value')
+        self.assertIn('k', cache, "Disk hits are promoted into memory")
+        self.assertEqual((cache.hits, cache.disk_hits, cache.misses), (0, 1, 0))
+        cache.put('k2', 'value2')
+        self.assertEqual(disk_cache.get('k2'), 'value2', "Puts are written through to disk")
+        disk_cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# File: test_tile_pyramid.py
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from pho_jupyter_preview_widget.tile_pyramid import TilePyramid, get_tile_pyramid
+from tests.test_out_of_core import _PageReadAccounting
+
+
+class TestTilePyramid(unittest.TestCase):
+
+    def test_geometry(self):
+        pyramid = TilePyramid(np.zeros((1000, 1500)), tile_size=128)
+        self.assertEqual(pyramid.n_levels, 5)
+        self.assertEqual(pyramid.grid_shape(0), (8, 12))
+        self.assertEqual(pyramid.grid_shape(pyramid.n_levels - 1), (1, 1), "the top level is a single tile")
+        self.assertEqual(pyramid.get_tile(2, 1, 2).shape, (122, 119)) # the clipped bottom-right tile
+        self.assertFalse(pyramid.is_valid_tile(0, 8, 0))
+        with self.assertRaises(ValueError):
+            pyramid.get_tile(5, 0, 0)
+        self.assertEqual(TilePyramid(np.zeros((10, 10)), tile_size=128).n_levels, 1)
+
+    def test_levels_are_2x_block_reductions(self):
+        data = np.random.rand(512, 512)
+        pyramid = TilePyramid(data, tile_size=64, max_block_size=8)
+        np.testing.assert_array_equal(pyramid.get_tile(0, 1, 2), data[64:128, 128:192])
+        np.testing.assert_allclose(pyramid.get_tile(1, 0, 0), data[:128, :128].reshape(64, 2, 64, 2).mean(axis=(1, 3)))
+        np.testing.assert_allclose(pyramid.get_tile(3, 0, 0), data.reshape(64, 8, 64, 8).mean(axis=(1, 3)))
+        # past `max_block_size` the footprint is strided first, bounding the cost per tile pixel:
+        np.testing.assert_allclose(TilePyramid(data, tile_size=64, max_block_size=4).get_tile(3, 0, 0), data[::2, ::2].reshape(64, 4, 64, 4).mean(axis=(1, 3)))
+        self.assertEqual(TilePyramid(data, tile_size=64, reducer='max').get_tile(3, 0, 0).max(), data.max())
+
+    def test_lru_tile_cache(self):
+        pyramid = TilePyramid(np.random.rand(256, 256), tile_size=64, max_cached_tiles=2)
+        first = pyramid.get_tile(0, 0, 0)
+        self.assertIs(pyramid.get_tile(0, 0, 0), first)
+        pyramid.get_tile(0, 0, 1)
+        pyramid.get_tile(0, 0, 2)
+        self.assertEqual(pyramid.stats()['n_tiles'], 2)
+        self.assertEqual((pyramid.hits, pyramid.misses), (1, 3))
+        self.assertFalse(first.flags.writeable)
+
+    def test_pyramids_are_shared_per_array_while_alive(self):
+        data = np.random.rand(300, 300)
+        pyramid = get_tile_pyramid(data, tile_size=64)
+        self.assertIs(get_tile_pyramid(data.copy(), tile_size=64), pyramid)
+        self.assertIsNot(get_tile_pyramid(data, tile_size=32), pyramid)
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(ValueError):
+            TilePyramid(np.zeros((4, 4, 4)))
+        with self.assertRaises(ValueError):
+            TilePyramid(np.zeros((4, 4)), reducer='minmax')
+
+
+@unittest.skipUnless(sys.platform.startswith('linux') and hasattr(os, 'posix_fadvise') and hasattr(mmap, 'MADV_RANDOM'), "page read accounting needs Linux (posix_fadvise + mincore)")
+class TestTilePyramidReads(unittest.TestCase):
+
+    def test_tiles_only_read_their_footprint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'matrix.dat')
+            shape = (4096, 4096) # 64 MB of float32, 16 KB rows
+            writer = np.memmap(path, dtype=np.float32, mode='w+', shape=shape)
+            writer[:] = np.random.rand(shape[0], 1)
+            writer.flush()
+            del writer
+            accounting = _PageReadAccounting(path, dtype=np.float32, shape=shape)
+            if accounting.bytes_read != 0:
+                self.skipTest("can't drop the file from the page cache here (e.g. tmpfs)")
+
+            pyramid = TilePyramid(accounting.arr, tile_size=128)
+            pyramid.get_tile(pyramid.n_levels - 1, 0, 0) # the initial display
+            self.assertLess(accounting.bytes_read, 0.05 * accounting.arr.nbytes, f"read {accounting.bytes_read} of {accounting.arr.nbytes} bytes")
+            before: int = accounting.bytes_read
+            pyramid.get_tile(0, 10, 10) # a full-resolution tile: 128 rows x 512 bytes
+            self.assertLessEqual(accounting.bytes_read - before, 128 * 2 * mmap.PAGESIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+# File: test_widget.py
+import base64
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+from ipywidgets.widgets.widget import _remove_buffers
+
+from pho_jupyter_preview_widget.heatmap_rendering import get_colormap_lut, render_heatmap_png
+from pho_jupyter_preview_widget.widget import ArrayPreviewWidget, DataFrameWindowWidget, TiledArrayWidget
+
+
+class TestArrayPreviewWidget(unittest.TestCase):
+    """ Headless: checks the state the frontend receives, without a kernel or browser. """
+
+    def _serialize(self, widget):
+        """ The (json_state, buffer_paths, buffers) triple that ipywidgets sends in its comm message. """
+        state, buffer_paths, buffers = _remove_buffers(widget.get_state())
+        json.dumps(state) # the non-buffer part must be plain JSON
+        return state, buffer_paths, buffers
+
+    def test_state_schema(self):
+        widget = ArrayPreviewWidget(np.random.rand(40, 60))
+        state = widget.get_state()
+        for key in ('pixels', 'pixel_shape', 'pixel_dtype', 'invalid_mask', 'data_range', 'colormap_names', 'colormap_luts', 'cmap', 'contrast_limits', 'display_height', 'description'):
+            self.assertIn(key, state)
+        self.assertEqual((state['_view_name'], state['_view_module']), ('ArrayPreviewView', 'pho_jupyter_preview_widget'))
+        self.assertEqual(state['pixel_shape'], [40, 60])
+        self.assertEqual(state['contrast_limits'], [0.0, 1.0])
+        widget.close()
+
+    def test_pixels_are_sent_as_binary_buffers(self):
+        for pixel_dtype, itemsize in (('uint8', 1), ('uint16', 2)):
+            widget = ArrayPreviewWidget(np.random.rand(40, 60), pixel_dtype=pixel_dtype)
+            state, buffer_paths, buffers = self._serialize(widget)
+            sizes = {path[0]: len(buffer) for path, buffer in zip(buffer_paths, buffers)}
+            self.assertEqual(sizes['pixels'], 40 * 60 * itemsize)
+            self.assertEqual(sizes['invalid_mask'], 0, "no mask is sent when every pixel is valid")
+            self.assertEqual(sizes['colormap_luts'], len(widget.colormap_names) * 256 * 3)
+            self.assertNotIn('pixels', state)
+            widget.close()
+
+    def test_smaller_than_the_base64_png(self):
+        data = np.random.rand(256, 256)
+        widget = ArrayPreviewWidget(data, pixel_dtype='uint8')
+        _, buffer_paths, buffers = self._serialize(widget)
+        pixel_bytes = sum(len(buffer) for path, buffer in zip(buffer_paths, buffers) if path == ['pixels'])
+        self.assertLess(pixel_bytes, len(base64.b64encode(render_heatmap_png(data))))
+        widget.close()
+
+    def test_pixel_layout(self):
+        data = np.arange(12.0).reshape(3, 4)
+        data[0, 0] = np.nan
+        widget = ArrayPreviewWidget(data, pixel_dtype='uint16')
+        codes = np.frombuffer(widget.pixels, dtype='<u2').reshape(widget.pixel_shape)
+        self.assertEqual(widget.data_range, [1.0, 11.0])
+        self.assertEqual(codes[0, -1], 65535, "origin='lower': the last data row is sent first")
+        self.assertEqual(codes[-1, 1], 0)
+        invalid = np.unpackbits(np.frombuffer(widget.invalid_mask, dtype=np.uint8))[:codes.size].reshape(codes.shape)
+        np.testing.assert_array_equal(np.argwhere(invalid), [[2, 0]])
+        widget.close()
+
+    def test_thumbnail_resolution_and_nd_arrays(self):
+        widget = ArrayPreviewWidget(np.random.rand(2000, 3000), max_thumbnail_pixels=128)
+        self.assertTrue(all(n <= 128 * 2 for n in widget.pixel_shape))
+        widget.set_array(np.random.rand(8, 30, 40))
+        self.assertIn('montage', widget.description)
+        self.assertEqual(len(widget.pixels), widget.pixel_shape[0] * widget.pixel_shape[1])
+        widget.close()
+
+    def test_converts_dtypes_like_the_html_preview(self):
+        data = np.array([[3 + 4j, 0j], [1j, -2 + 0j]])
+        widget = ArrayPreviewWidget(data, pixel_dtype='uint16', origin='upper')
+        self.assertEqual(widget.data_range, [0.0, 5.0], "the magnitude, not the discarded imaginary part")
+        self.assertIn('magnitude', widget.description)
+        np.testing.assert_array_equal(np.frombuffer(widget.pixels, dtype='<u2').reshape(widget.pixel_shape), np.rint(np.abs(data) / 5.0 * 65535))
+        widget.complex_mode = 'phase'
+        widget.set_array(np.ones((2, 20, 30), dtype=np.complex64))
+        self.assertIn('phase', widget.description)
+        self.assertIn('montage', widget.description)
+        with self.assertRaises(ValueError):
+            widget.set_array(np.array([['a', 'b']]))
+        widget.close()
+
+    def test_colormaps(self):
+        widget = ArrayPreviewWidget(np.random.rand(4, 4), cmap='gray')
+        index = widget.colormap_names.index('gray')
+        np.testing.assert_array_equal(np.frombuffer(widget.colormap_luts, dtype=np.uint8).reshape(-1, 256, 3)[index], get_colormap_lut('gray'))
+        with self.assertRaises(ValueError):
+            ArrayPreviewWidget(np.random.rand(4, 4), cmap='not_a_colormap')
+        widget.close()
+
+
+class TestTiledArrayWidget(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.rand(3000, 5000)
+        self.widget = TiledArrayWidget(self.data, tile_size=256, pixel_dtype='uint16')
+        self.sent = []
+        self.widget.send = lambda content, buffers=None: self.sent.append((content, buffers))
+
+    def tearDown(self):
+        self.widget.close()
+
+    def test_initial_state_is_a_single_coarse_tile(self):
+        _, buffer_paths, buffers = _remove_buffers(self.widget.get_state())
+        pixel_bytes = sum(len(buffer) for path, buffer in zip(buffer_paths, buffers) if path == ['pixels'])
+        self.assertEqual((self.widget.n_levels, self.widget.array_shape), (6, [3000, 5000]))
+        self.assertEqual(self.widget.pixel_shape, [94, 157])
+        self.assertEqual(pixel_bytes, 94 * 157 * 2)
+        self.assertEqual(self.sent, [])
+
+    def test_serves_requested_tiles(self):
+        self.widget._handle_custom_msg(self.widget, dict(type='request_tiles', tiles=[[0, 0, 0], [0, 11, 19], [9, 0, 0]]), [])
+        content, buffers = self.sent[0]
+        self.assertEqual(content['type'], 'tiles')
+        self.assertEqual([(t['level'], t['row'], t['col'], t['shape']) for t in content['tiles']], [(0, 0, 0, [256, 256]), (0, 11, 19, [184, 136])], "out-of-range tiles are skipped")
+        self.assertEqual([len(buffers[t['pixels']]) for t in content['tiles']], [256 * 256 * 2, 184 * 136 * 2])
+        # origin='lower': tile row 0 holds the last source rows, quantized on the shared color scale
+        codes = np.frombuffer(buffers[0], dtype='<u2').reshape(256, 256)
+        vmin, vmax = self.widget.data_range
+        np.testing.assert_allclose(vmin + codes / 65535.0 * (vmax - vmin), self.data[::-1][:256, :256], atol=(vmax - vmin) / 65535.0)
+
+    def test_request_size_is_capped_and_bad_requests_are_ignored(self):
+        self.widget.max_tiles_per_request = 4
+        self.widget._handle_custom_msg(self.widget, dict(type='request_tiles', tiles=[[0, 0, c] for c in range(10)]), [])
+        self.assertEqual(len(self.sent[0][0]['tiles']), 4)
+        self.widget._handle_custom_msg(self.widget, dict(type='something_else'), [])
+        self.assertEqual(len(self.sent), 1)
+
+    def test_rejects_non_2d_arrays(self):
+        with self.assertRaises(ValueError):
+            self.widget.set_array(np.zeros((3, 4, 5)))
+
+
+class TestDataFrameWindowWidget(unittest.TestCase):
+
+    def _serve(self, widget, content):
+        sent = []
+        widget.send = lambda content, buffers=None: sent.append(content)
+        widget._handle_custom_msg(widget, content, [])
+        return sent
+
+    def test_output_size_does_not_grow_with_rows(self):
+        sizes = []
+        for n_rows in (1_000, 1_000_000):
+            widget = DataFrameWindowWidget(pd.DataFrame(np.zeros((n_rows, 4))), window_rows=50)
+            bundle = widget._repr_mimebundle_()
+            sizes.append(len(json.dumps(widget.get_state())) + len(bundle['text/html']))
+            self.assertEqual(widget.window_html.count('<tr'), 1 + 50)
+            self.assertNotIn(' id=', bundle['text/html'], "no fixed DOM ids: several tables can be displayed at once")
+            widget.close()
+        self.assertLess(abs(sizes[1] - sizes[0]), 100)
+
+    def test_serves_iloc_windows(self):
+        df = pd.DataFrame(dict(a=np.arange(1000), b=np.arange(1000) * 2.0))
+        widget = DataFrameWindowWidget(df, window_rows=20)
+        (reply,) = self._serve(widget, dict(type='request_window', start=500, request_id=7))
+        self.assertEqual((reply['type'], reply['start'], reply['stop'], reply['request_id']), ('window', 500, 520, 7))
+        self.assertIn('<th>500</th>', reply['html'])
+        self.assertNotIn('<th>520</th>', reply['html'])
+        (reply,) = self._serve(widget, dict(type='request_window', start=995))
+        self.assertEqual((reply['start'], reply['stop']), (980, 1000), "windows are clamped to the end of the frame")
+        self.assertEqual(self._serve(widget, dict(type='request_window', start='x')), [])
+        self.assertEqual(self._serve(widget, dict(type='something_else')), [])
+        widget.close()
+
+    def test_formatter_only_virtualizes_large_frames(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import dataframe_show_more_button
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        from IPython.core.interactiveshell import InteractiveShell
+        ip = InteractiveShell.instance()
+        dataframe_show_more_button(ip, window_rows=50)
+        try:
+            small_format, _ = ip.display_formatter.format(pd.DataFrame(np.zeros((10, 2))))
+            self.assertNotIn('application/vnd.jupyter.widget-view+json', small_format)
+            large_format, _ = ip.display_formatter.format(pd.DataFrame(np.zeros((100_000, 2))))
+            self.assertIn('application/vnd.jupyter.widget-view+json', large_format)
+            self.assertLess(len(large_format['text/html']), 10_000)
+        finally:
+            ip.display_formatter.mimebundle_formatter.type_printers.pop(pd.DataFrame, None)
+
+    def test_formatter_closes_replaced_and_old_tables(self):
+        try:
+            from pho_jupyter_preview_widget.display_helpers import dataframe_show_more_button
+        except ImportError as err:
+            self.skipTest(f"display_helpers dependencies are missing: {err}")
+        from IPython.core.interactiveshell import InteractiveShell
+        from ipywidgets.widgets.widget import _instances
+        ip = InteractiveShell.instance()
+        dataframe_show_more_button(ip, window_rows=50, max_live_tables=2)
+
+        def _model_id(df):
+            bundle, _ = ip.display_formatter.format(df)
+            return bundle['application/vnd.jupyter.widget-view+json']['model_id']
+
+        try:
+            frames = [pd.DataFrame(np.zeros((1000, 2))) for _ in range(3)]
+            first_id = _model_id(frames[0])
+            redisplayed_id = _model_id(frames[0])
+            self.assertNotIn(first_id, _instances, "re-displaying a frame closes its previous table")
+            self.assertIn(redisplayed_id, _instances)
+            later_ids = [_model_id(df) for df in frames[1:]]
+            self.assertNotIn(redisplayed_id, _instances, "only the `max_live_tables` most recent tables are kept open")
+            self.assertTrue(all(model_id in _instances for model_id in later_ids))
+        finally:
+            ip.display_formatter.mimebundle_formatter.type_printers.pop(pd.DataFrame, None)
+
+
+if __name__ == "__main__":
+    unittest.main()